@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Banc d'essai HTTP de l'API des feedbacks
+
+Client asyncio sans dépendance (connexions HTTP/1.1 persistantes) qui mesure
+le débit et les latences (p50/p95/p99) de la création et de la liste des
+feedbacks sur un serveur déjà démarré (runserver, gunicorn...).
+
+Usage:
+    python benchmarks/bench_api.py --url http://localhost:8000 --scenario create --requests 2000 --concurrency 50
+    python benchmarks/bench_api.py --url http://localhost:8000 --scenario list --username admin --password admin
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+
+class HTTPConnection:
+    """Connexion HTTP/1.1 persistante minimale au-dessus d'asyncio"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive']
+        if body is not None:
+            lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Connexion fermée par le serveur')
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            content = b''
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                content += await self.reader.readexactly(size)
+                await self.reader.readline()
+        else:
+            content = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, content
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+async def obtain_token(host, port, username, password):
+    connection = HTTPConnection(host, port)
+    try:
+        status, content = await connection.request(
+            'POST', '/api/auth/login/', {'username': username, 'password': password}
+        )
+    finally:
+        connection.close()
+    if status != 200:
+        raise SystemExit(f"Authentification impossible ({status}): {content[:200]!r}")
+    return json.loads(content)['access']
+
+
+def build_request(scenario, index, token):
+    """Requête à envoyer pour le scénario donné"""
+    if scenario == 'create':
+        return 'POST', '/api/feedback/', {
+            'channel': 'web',
+            'content': f'Banc d\'essai : le point d\'eau {index} ne fonctionne plus',
+            'contact_phone': f'+2237{index % 10000000:07d}',
+        }, {}
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return 'GET', f'/api/feedback/?page={index % 5 + 1}', None, headers
+
+
+async def run(args):
+    parts = urlsplit(args.url)
+    host, port = parts.hostname, parts.port or 80
+    token = None
+    if args.username:
+        token = await obtain_token(host, port, args.username, args.password)
+
+    latencies = []
+    statuses = {}
+
+    async def worker(counter, record):
+        connection = HTTPConnection(host, port)
+        try:
+            for index in counter:
+                method, path, body, headers = build_request(args.scenario, index, token)
+                start = time.perf_counter()
+                try:
+                    status, _ = await connection.request(method, path, body, headers)
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    connection.close()
+                    status = 'connexion'
+                if record:
+                    latencies.append(time.perf_counter() - start)
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            connection.close()
+
+    # Chauffe (connexions, caches, workers) non mesurée, puis mesure
+    warmup = iter(range(args.warmup))
+    await asyncio.gather(*(worker(warmup, False) for _ in range(args.concurrency)))
+
+    measured = iter(range(args.warmup, args.warmup + args.requests))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(measured, True) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    expected = 201 if args.scenario == 'create' else 200
+    errors = sum(count for status, count in statuses.items() if status != expected)
+    print(f"Scénario: {args.scenario}, requêtes: {args.requests}, concurrence: {args.concurrency}")
+    print(f"Codes de réponse: {statuses}, erreurs: {errors}")
+    print(f"Durée: {elapsed:.2f} s, débit: {args.requests / elapsed:.1f} req/s")
+    print(f"Latence p50: {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p95: {percentile(latencies, 0.95) * 1000:.1f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Banc d\'essai HTTP de l\'API des feedbacks')
+    parser.add_argument('--url', default='http://localhost:8000', help='URL de base du serveur')
+    parser.add_argument('--scenario', choices=['create', 'list'], default='create')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=100, help='Requêtes de chauffe non mesurées')
+    parser.add_argument('--username', help='Utilisateur (nécessaire pour lister tous les feedbacks)')
+    parser.add_argument('--password', default='')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Banc d'essai de la détection des zones de concentration (feedback_api.hotspots)
+
+Génère des points aléatoires (bruit de fond sur une région et un foyer
+injecté sur la fenêtre récente), puis mesure séparément le calcul des
+cellules, le regroupement par (cellule, catégorie, heure) et le test de
+Poisson. Aucun accès à la base de données.
+
+Usage:
+    python benchmarks/bench_hotspots.py --points 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'feedback_project.settings')
+
+
+def timed(label, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print(f'{label:<28} {(time.perf_counter() - start) * 1000:9.1f} ms')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--cell-size', type=float, default=0.01)
+    parser.add_argument('--window-hours', type=int, default=24)
+    parser.add_argument('--baseline-hours', type=int, default=7 * 24)
+    options = parser.parse_args()
+
+    import django
+    django.setup()
+    import numpy as np
+    from feedback_api.hotspots import bin_counts, cell_ids, poisson_hotspots, valid_points, window_totals
+
+    generator = np.random.default_rng(42)
+    hours_total = options.window_hours + options.baseline_hours
+    outbreak = options.points // 100
+
+    # Bruit de fond sur ~4° x 4° (Bamako et environs) + foyer sur une cellule, fenêtre récente
+    latitudes = np.concatenate([generator.uniform(11.0, 15.0, options.points - outbreak),
+                                generator.normal(12.6392, 0.002, outbreak)])
+    longitudes = np.concatenate([generator.uniform(-10.0, -6.0, options.points - outbreak),
+                                 generator.normal(-8.0029, 0.002, outbreak)])
+    categories = generator.integers(1, options.categories + 1, options.points)
+    categories[-outbreak:] = 1
+    hours = np.concatenate([generator.integers(0, hours_total, options.points - outbreak),
+                            generator.integers(options.baseline_hours, hours_total, outbreak)])
+
+    print(f'{options.points} points, cellules de {options.cell_size}°, '
+          f'fenêtre {options.window_hours} h / référence {options.baseline_hours} h')
+    total = time.perf_counter()
+    valid = timed('validation des coordonnées', valid_points, latitudes, longitudes)
+    cells = timed('calcul des cellules', cell_ids, latitudes[valid], longitudes[valid], options.cell_size)
+    cell, category, hour, counts = timed('regroupement horaire', bin_counts, cells, categories[valid], hours[valid])
+
+    _, _, observed, baseline = timed('fenêtre / référence', window_totals, cell, category, hour, counts,
+                                     options.baseline_hours)
+    flagged, _, _ = timed('test de Poisson', poisson_hotspots, observed, baseline,
+                          options.window_hours, options.baseline_hours)
+    elapsed = time.perf_counter() - total
+
+    print(f'{len(counts)} comptages horaires, {len(observed)} couples (cellule, catégorie), '
+          f'{int(flagged.sum())} signalé(s)')
+    print(f'Total: {elapsed:.2f} s ({options.points / elapsed:,.0f} points/s)')
+
+
+if __name__ == '__main__':
+    main()
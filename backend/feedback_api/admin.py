@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import (
     Category, Feedback, Response, Log, Tag, FeedbackTag, Attachment, Alert,
     NLPModel, NLPTrainingData, KeywordRule, NotificationChannel, NotificationTemplate, Notification,
-    UserProfile
+    UserProfile, OutboundMessage, InboundMessageReceipt
 )
 
 
@@ -135,3 +135,23 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'location')
     list_filter = ('role', 'location')
     search_fields = ('user__username', 'user__email')
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'provider', 'to', 'status', 'retry_count', 'enqueued_at', 'delivered_at')
+    list_filter = ('channel', 'provider', 'status', 'enqueued_at')
+    search_fields = ('provider_message_id', 'to')
+    readonly_fields = ('enqueued_at', 'updated_at')
+    date_hierarchy = 'enqueued_at'
+    list_per_page = 50
+
+
+@admin.register(InboundMessageReceipt)
+class InboundMessageReceiptAdmin(admin.ModelAdmin):
+    list_display = ('source', 'message_key', 'feedback', 'received_at')
+    list_filter = ('source', 'received_at')
+    search_fields = ('message_key',)
+    readonly_fields = ('received_at',)
+    date_hierarchy = 'received_at'
+    list_per_page = 50
@@ -7,14 +7,14 @@ from django.utils import timezone
 from django.contrib.auth.models import User
 from django.template.loader import render_to_string
 from django.core.mail import send_mail
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
 
 from .models import (
     Feedback, NLPModel, NLPTrainingData, KeywordRule, 
     Alert, Notification, NotificationChannel, NotificationTemplate
 )
 from .utils import send_sms_via_twilio, send_whatsapp
+from .notification_registry import notification_registry
+from .delivery import start_outbound_message, record_send_result
 
 logger = logging.getLogger(__name__)
 
@@ -26,66 +26,52 @@ def train_nlp_model(model_id):
     """
     try:
         model = NLPModel.objects.get(id=model_id)
-        training_data = NLPTrainingData.objects.filter(is_validated=True)
         
-        if not training_data.exists():
+        # Préparer les données d'entraînement : lecture en flux de couples
+        # (contenu, catégorie), sans requête par ligne
+        from .training_data import load_training_corpus
+        corpus = load_training_corpus(include_feedback=False)
+        
+        if not corpus.texts:
             logger.error(f"Pas de données d'entraînement validées disponibles pour le modèle {model_id}")
             return False
         
-        # Préparer les données d'entraînement
-        training_texts = []
-        training_labels = []
-        
-        for data in training_data:
-            training_texts.append(data.content)
-            training_labels.append(data.category.name)
-        
-        # Ici, vous intégreriez votre code d'entraînement NLP
-        # Par exemple, avec scikit-learn, spaCy, ou une autre bibliothèque
-        
-        # Exemple simplifié (à remplacer par votre implémentation réelle)
         from sklearn.feature_extraction.text import TfidfVectorizer
         from sklearn.naive_bayes import MultinomialNB
-        from sklearn.pipeline import Pipeline
-        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-        import pickle
+        from .model_artifact import save_artifact, train_artifact
+        from .nlp_search import holdout_metrics, split_holdout
         
-        # Créer un pipeline de classification
-        pipeline = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=5000)),
-            ('clf', MultinomialNB())
-        ])
+        # Évaluer sur un jeu de test tenu à part (et non sur les données
+        # d'entraînement, ce qui surestimait les métriques)
+        X_train, X_test, y_train, y_test = split_holdout(corpus.texts, corpus.category_ids)
         
-        # Entraîner le modèle
-        pipeline.fit(training_texts, training_labels)
-        
-        # Évaluer le modèle (idéalement avec un ensemble de validation)
-        # Pour simplifier, nous utilisons les mêmes données
-        predictions = pipeline.predict(training_texts)
-        
-        # Calculer les métriques
-        accuracy = accuracy_score(training_labels, predictions)
-        precision = precision_score(training_labels, predictions, average='weighted', zero_division=0)
-        recall = recall_score(training_labels, predictions, average='weighted', zero_division=0)
-        f1 = f1_score(training_labels, predictions, average='weighted', zero_division=0)
+        # Entraîner le modèle : étiquettes = ids de catégorie, vocabulaire
+        # enregistré dans l'artefact avec le classifieur
+        artifact = train_artifact(
+            TfidfVectorizer(max_features=5000), MultinomialNB(), X_train, y_train, corpus.categories
+        )
+        metrics = holdout_metrics(artifact, X_test, y_test)
+        accuracy = metrics['accuracy']
         
         # Sauvegarder le modèle entraîné
         model_path = os.path.join(settings.MEDIA_ROOT, 'nlp_models', f'model_{model.id}.pkl')
-        os.makedirs(os.path.dirname(model_path), exist_ok=True)
-        
-        with open(model_path, 'wb') as f:
-            pickle.dump(pipeline, f)
+        model.checksum = save_artifact(artifact, model_path)
         
         # Mettre à jour les métriques du modèle
         model.accuracy = accuracy
-        model.precision = precision
-        model.recall = recall
-        model.f1_score = f1
-        model.training_data_size = training_data.count()
+        model.precision = metrics['precision']
+        model.recall = metrics['recall']
+        model.f1_score = metrics['f1_score']
+        model.training_data_size = len(X_train)
+        model.is_trained = True
         model.last_trained = timezone.now()
         model.file.name = f'nlp_models/model_{model.id}.pkl'
         model.save()
         
+        # Recharger le classifieur de ce modèle au prochain usage
+        from .nlp import custom_classifiers
+        custom_classifiers.pop(model.id, None)
+        
         logger.info(f"Modèle NLP {model.id} entraîné avec succès. Accuracy: {accuracy:.2f}")
         return True
         
@@ -97,6 +83,85 @@ def train_nlp_model(model_id):
         return False
 
 
+@shared_task
+def train_nlp_model_incremental(model_id, full=False):
+    """
+    Met à jour un modèle NLP incrémental avec les seules données validées
+    depuis son dernier entraînement (voir nlp_training.train_incremental)
+    """
+    from .nlp_training import train_incremental
+    
+    try:
+        model = NLPModel.objects.get(id=model_id)
+        return train_incremental(model, full=full)
+    except NLPModel.DoesNotExist:
+        logger.error(f"Modèle NLP {model_id} non trouvé")
+        return False
+    except Exception as e:
+        logger.error(f"Erreur lors de l'entraînement incrémental du modèle NLP {model_id}: {str(e)}")
+        return False
+
+
+@shared_task
+def score_shadow_models():
+    """
+    Fait classer les nouveaux feedbacks par les modèles NLP évalués en mode
+    fantôme (voir nlp_shadow), hors du chemin de classification en service
+    """
+    from .nlp_shadow import score_shadow_models as score
+    
+    try:
+        return score(batch_size=settings.NLP_SETTINGS.get('SHADOW_BATCH_SIZE', 500))
+    except Exception as e:
+        logger.error(f"Erreur lors de l'évaluation des modèles NLP en mode fantôme: {str(e)}")
+        return False
+
+
+@shared_task
+def detect_hotspots():
+    """
+    Met à jour les comptages par cellule de la grille et rédige des alertes
+    brouillons pour les zones de concentration de feedbacks (voir hotspots)
+    """
+    from .hotspots import detect_hotspots as detect
+    
+    try:
+        hotspots = detect()
+        return [{'cell': hotspot['cell'], 'observed': hotspot['observed'], 'alert': hotspot['alert']}
+                for hotspot in hotspots]
+    except Exception as e:
+        logger.error(f"Erreur lors de la détection des zones de concentration: {str(e)}")
+        return False
+
+
+@shared_task
+def raise_surge_alert(payload):
+    """
+    Rédige l'alerte brouillon d'un afflux de messages détecté à la réception
+    et notifie les modérateurs (voir surge)
+    """
+    from .surge import draft_surge_alert
+    
+    try:
+        alert = draft_surge_alert(payload)
+        return alert.id if alert else None
+    except Exception as e:
+        logger.error(f"Erreur lors de la rédaction de l'alerte d'afflux {payload.get('series')}: {str(e)}")
+        return False
+
+
+@shared_task
+def purge_stale_uploads():
+    """Supprime les envois de pièces jointes par morceaux abandonnés (voir offline_sync)"""
+    from .offline_sync import purge_stale_uploads as purge
+    
+    try:
+        return purge()
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression des envois abandonnés: {str(e)}")
+        return False
+
+
 @shared_task
 def apply_keyword_rules(feedback_id):
     """
@@ -226,7 +291,10 @@ def send_notification(notification_id):
     Envoie une notification via le canal spécifié
     """
     try:
-        notification = Notification.objects.get(id=notification_id)
+        # Une seule requête : canal, profil du destinataire et modèle sont joints
+        notification = Notification.objects.select_related(
+            'channel', 'user__profile', 'template'
+        ).get(id=notification_id)
         
         # Vérifier que la notification n'a pas déjà été envoyée
         if notification.status != Notification.StatusChoices.PENDING:
@@ -259,7 +327,7 @@ def send_notification(notification_id):
         if result:
             notification.status = Notification.StatusChoices.SENT
             notification.sent_at = timezone.now()
-            notification.save()
+            notification.save(update_fields=['status', 'sent_at'])
             logger.info(f"Notification {notification_id} envoyée via {channel.channel_type}")
             return True
         else:
@@ -274,6 +342,14 @@ def send_notification(notification_id):
         return False
 
 
+def get_user_phone_number(user):
+    """Retourne le numéro de téléphone du profil de l'utilisateur, ou None"""
+    try:
+        return user.profile.phone_number
+    except User.profile.RelatedObjectDoesNotExist:
+        return None
+
+
 def send_notification_email(notification):
     """Envoie une notification par email"""
     try:
@@ -282,9 +358,10 @@ def send_notification_email(notification):
             logger.error(f"Impossible d'envoyer la notification {notification.id} par email: utilisateur sans email")
             return False
         
+        title, content = notification_registry.render(notification)
         send_mail(
-            notification.title,
-            notification.content,
+            title,
+            content,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
             fail_silently=False,
@@ -299,16 +376,24 @@ def send_notification_sms(notification):
     """Envoie une notification par SMS"""
     try:
         # Récupérer le numéro de téléphone de l'utilisateur
-        user_profile = notification.user.userprofile
-        if not user_profile.phone_number:
+        phone_number = get_user_phone_number(notification.user)
+        if not phone_number:
             logger.error(f"Impossible d'envoyer la notification {notification.id} par SMS: utilisateur sans numéro de téléphone")
             return False
         
         # Préparer le message
-        message = f"{notification.title}\n\n{notification.content}"
+        title, content = notification_registry.render(notification)
+        message = f"{title}\n\n{content}"
         
         # Envoyer le SMS via Twilio
-        result = send_sms_via_twilio(user_profile.phone_number, message)
+        outbound = start_outbound_message(
+            channel=Feedback.ChannelChoices.SMS,
+            to=phone_number,
+            notification=notification,
+            enqueued_at=notification.created_at
+        )
+        result = send_sms_via_twilio(phone_number, message)
+        record_send_result(outbound, result)
         return bool(result)
     except Exception as e:
         logger.error(f"Erreur lors de l'envoi du SMS pour la notification {notification.id}: {str(e)}")
@@ -319,16 +404,24 @@ def send_notification_whatsapp(notification):
     """Envoie une notification par WhatsApp"""
     try:
         # Récupérer le numéro de téléphone de l'utilisateur
-        user_profile = notification.user.userprofile
-        if not user_profile.phone_number:
+        phone_number = get_user_phone_number(notification.user)
+        if not phone_number:
             logger.error(f"Impossible d'envoyer la notification {notification.id} par WhatsApp: utilisateur sans numéro de téléphone")
             return False
         
         # Préparer le message
-        message = f"{notification.title}\n\n{notification.content}"
+        title, content = notification_registry.render(notification)
+        message = f"{title}\n\n{content}"
         
         # Envoyer le message WhatsApp
-        result = send_whatsapp(user_profile.phone_number, message)
+        outbound = start_outbound_message(
+            channel=Feedback.ChannelChoices.WHATSAPP,
+            to=phone_number,
+            notification=notification,
+            enqueued_at=notification.created_at
+        )
+        result = send_whatsapp(phone_number, message)
+        record_send_result(outbound, result)
         return bool(result)
     except Exception as e:
         logger.error(f"Erreur lors de l'envoi du WhatsApp pour la notification {notification.id}: {str(e)}")
@@ -355,7 +448,7 @@ def test_notification_channel(channel_id):
     Teste un canal de notification en envoyant un message de test
     """
     try:
-        channel = NotificationChannel.objects.get(id=channel_id)
+        channel = notification_registry.get_channel(channel_id)
         
         # Créer un message de test
         test_title = f"Test du canal {channel.name}"
@@ -395,6 +488,8 @@ def check_active_nlp_models():
     Vérifie les modèles NLP actifs et effectue des actions de maintenance si nécessaire
     Cette tâche est exécutée périodiquement via Celery Beat
     """
+    from .nlp_training import INCREMENTAL_MODEL_TYPE, has_new_training_data
+    
     try:
         from .models import NLPModel
         
@@ -408,6 +503,10 @@ def check_active_nlp_models():
                 best_model.is_active = True
                 best_model.save(update_fields=['is_active'])
                 logger.info(f"Modèle NLP {best_model.id} activé automatiquement (meilleur score F1: {best_model.f1_score})")
+        elif active_model.model_type == INCREMENTAL_MODEL_TYPE:
+            # Modèle incrémental : n'apprendre que les nouvelles données validées
+            if has_new_training_data(active_model):
+                train_nlp_model_incremental.delay(active_model.id)
         else:
             # Vérifier si le modèle actif a besoin d'être réentraîné
             if active_model.is_trained and active_model.last_trained:
@@ -421,14 +520,17 @@ def check_active_nlp_models():
         from .models import NLPTrainingData
         untrained_models = NLPModel.objects.filter(is_trained=False)
         
+        # Compter les données d'entraînement validées disponibles
+        validated_data_count = NLPTrainingData.objects.filter(is_validated=True).count()
+        
         for model in untrained_models:
-            # Compter les données d'entraînement validées disponibles
-            validated_data_count = NLPTrainingData.objects.filter(is_validated=True).count()
-            
             # Si nous avons au moins 100 exemples validés, planifier l'entraînement
             if validated_data_count >= 100:
                 logger.info(f"Planification de l'entraînement initial du modèle NLP {model.id} ({validated_data_count} exemples validés disponibles)")
-                train_nlp_model.delay(model.id)
+                if model.model_type == INCREMENTAL_MODEL_TYPE:
+                    train_nlp_model_incremental.delay(model.id)
+                else:
+                    train_nlp_model.delay(model.id)
         
         return True
     except Exception as e:
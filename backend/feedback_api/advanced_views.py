@@ -4,20 +4,26 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 
 from .models import (
-    UserProfile, Tag, FeedbackTag, Attachment, Alert, 
+    Category, UserProfile, Tag, FeedbackTag, Attachment, Alert, 
     NLPModel, NLPTrainingData, KeywordRule, 
-    NotificationChannel, NotificationTemplate, Notification
+    NotificationChannel, NotificationTemplate, Notification, OutboundMessage
 )
 from .serializers import (
     UserProfileSerializer, TagSerializer, FeedbackTagSerializer, 
     AttachmentSerializer, AlertSerializer, NLPModelSerializer, 
     NLPTrainingDataSerializer, KeywordRuleSerializer,
     NotificationChannelSerializer, NotificationTemplateSerializer, 
-    NotificationSerializer
+    NotificationSerializer, OutboundMessageSerializer
 )
 from .permissions import IsModeratorOrReadOnly, IsOwnerOrModerator
+from .http_cache import ConditionalCacheMixin
+from .attachment_store import download_response
 
 
 class UserProfileViewSet(viewsets.ModelViewSet):
@@ -36,7 +42,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalCacheMixin, viewsets.ModelViewSet):
     """API endpoint pour gérer les tags"""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -56,11 +62,16 @@ class FeedbackTagViewSet(viewsets.ModelViewSet):
 
 class AttachmentViewSet(viewsets.ModelViewSet):
     """API endpoint pour gérer les pièces jointes"""
-    queryset = Attachment.objects.all()
+    queryset = Attachment.objects.select_related('blob')
     serializer_class = AttachmentSerializer
     permission_classes = [IsOwnerOrModerator]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['feedback', 'uploaded_by', 'file_type']
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Télécharger le fichier, entier ou par plages (en-tête Range)"""
+        return download_response(request, self.get_object())
 
 
 class AlertViewSet(viewsets.ModelViewSet):
@@ -110,7 +121,7 @@ class AlertViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class NLPModelViewSet(viewsets.ModelViewSet):
+class NLPModelViewSet(ConditionalCacheMixin, viewsets.ModelViewSet):
     """API endpoint pour gérer les modèles NLP"""
     queryset = NLPModel.objects.all()
     serializer_class = NLPModelSerializer
@@ -123,26 +134,107 @@ class NLPModelViewSet(viewsets.ModelViewSet):
         """Activer un modèle NLP et désactiver les autres du même type"""
         model = self.get_object()
         
+        # Refuser un fichier absent, corrompu ou d'un format/prétraitement
+        # incompatible plutôt que de retomber silencieusement sur les mots-clés
+        from .model_artifact import ModelArtifactError, read_artifact_header
+        try:
+            if not model.file:
+                raise ModelArtifactError("aucun fichier de modèle")
+            read_artifact_header(model.file.path)
+        except (ModelArtifactError, OSError) as e:
+            return Response(
+                {"detail": f"Modèle non activable ({str(e)}), réentraînez-le."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Désactiver tous les autres modèles du même type
         NLPModel.objects.filter(model_type=model.model_type).update(is_active=False)
         
-        # Activer ce modèle
+        # Activer ce modèle (promu, il n'est plus évalué qu'en tant que référence)
         model.is_active = True
+        model.shadow_mode = False
         model.save()
         
+        # Recharger le classifieur de ce modèle au prochain usage
+        from .nlp import custom_classifiers
+        custom_classifiers.pop(model.id, None)
+        
         serializer = self.get_serializer(model)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsModeratorOrReadOnly])
     def train(self, request, pk=None):
-        """Déclencher l'entraînement d'un modèle NLP"""
+        """
+        Déclencher l'entraînement d'un modèle NLP
+
+        Avec {"incremental": true}, seules les données validées depuis le
+        dernier entraînement sont apprises ({"full": true} pour repartir de zéro).
+        """
         model = self.get_object()
         
         # Déclencher l'entraînement de manière asynchrone
-        from .tasks import train_nlp_model
-        task = train_nlp_model.delay(model.id)
+        from .advanced_tasks import train_nlp_model, train_nlp_model_incremental
+        from .nlp_training import INCREMENTAL_MODEL_TYPE
+        if request.data.get('incremental') or model.model_type == INCREMENTAL_MODEL_TYPE:
+            task = train_nlp_model_incremental.delay(model.id, full=bool(request.data.get('full')))
+        else:
+            task = train_nlp_model.delay(model.id)
         
         return Response({"detail": "Entraînement du modèle lancé.", "task_id": task.id})
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsModeratorOrReadOnly])
+    def shadow(self, request, pk=None):
+        """
+        Démarrer ({"enabled": true}) ou arrêter ({"enabled": false}) l'évaluation
+        du modèle en mode fantôme sur le trafic réel, sans l'activer
+        """
+        model = self.get_object()
+        enabled = bool(request.data.get('enabled', True))
+        
+        if enabled and not model.shadow_mode:
+            from .model_artifact import ModelArtifactError, read_artifact_header
+            try:
+                if not model.file or not model.is_trained:
+                    raise ModelArtifactError("modèle non entraîné")
+                read_artifact_header(model.file.path)
+            except (ModelArtifactError, OSError) as e:
+                return Response(
+                    {"detail": f"Modèle non évaluable ({str(e)})."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            model.shadow_started_at = timezone.now()
+        model.shadow_mode = enabled
+        model.save(update_fields=['shadow_mode', 'shadow_started_at'])
+        
+        serializer = self.get_serializer(model)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def classification_cache(self, request):
+        """Taux de succès du cache des résultats de classification (tous processus)"""
+        from .classification_cache import classification_cache
+        return Response(classification_cache.stats())
+    
+    @action(detail=False, methods=['get'])
+    def shadow_comparison(self, request):
+        """
+        Comparer les modèles évalués en mode fantôme : exactitude sur les
+        feedbacks catégorisés par un modérateur et durée d'inférence par message
+        """
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response(
+                {"detail": "Le paramètre 'days' doit être un entier."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from .nlp_shadow import shadow_comparison
+        since = timezone.now() - timedelta(days=days)
+        return Response({
+            'since': since.isoformat(),
+            'models': shadow_comparison(since)
+        })
 
 
 class NLPTrainingDataViewSet(viewsets.ModelViewSet):
@@ -159,16 +251,19 @@ class NLPTrainingDataViewSet(viewsets.ModelViewSet):
         """Valider une donnée d'entraînement"""
         training_data = self.get_object()
         training_data.is_validated = True
+        training_data.validated_by = request.user
+        training_data.validated_at = timezone.now()
         training_data.save()
         
         serializer = self.get_serializer(training_data)
         return Response(serializer.data)
 
 
-class KeywordRuleViewSet(viewsets.ModelViewSet):
+class KeywordRuleViewSet(ConditionalCacheMixin, viewsets.ModelViewSet):
     """API endpoint pour gérer les règles de mots-clés"""
     queryset = KeywordRule.objects.all()
     serializer_class = KeywordRuleSerializer
+    cache_models = (KeywordRule, Category, User)
     permission_classes = [IsModeratorOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['category', 'priority', 'created_by']
@@ -194,10 +289,11 @@ class NotificationChannelViewSet(viewsets.ModelViewSet):
         return Response({"detail": "Test du canal de notification lancé.", "task_id": task.id})
 
 
-class NotificationTemplateViewSet(viewsets.ModelViewSet):
+class NotificationTemplateViewSet(ConditionalCacheMixin, viewsets.ModelViewSet):
     """API endpoint pour gérer les modèles de notification"""
     queryset = NotificationTemplate.objects.all()
     serializer_class = NotificationTemplateSerializer
+    cache_models = (NotificationTemplate, NotificationChannel)
     permission_classes = [IsModeratorOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['channel']
@@ -253,3 +349,30 @@ class NotificationViewSet(viewsets.ModelViewSet):
         )
         
         return Response({"detail": f"{count} notifications marquées comme lues."})
+
+
+class OutboundMessageViewSet(viewsets.ReadOnlyModelViewSet):
+    """API endpoint pour consulter le registre des messages sortants (lecture seule)"""
+    queryset = OutboundMessage.objects.all()
+    serializer_class = OutboundMessageSerializer
+    permission_classes = [IsModeratorOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['channel', 'provider', 'status', 'response', 'notification']
+    
+    @action(detail=False, methods=['get'])
+    def latency(self, request):
+        """Latences d'envoi et de livraison (p50/p95, en secondes) par canal"""
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response(
+                {"detail": "Le paramètre 'days' doit être un entier."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from .delivery import delivery_latency_stats
+        since = timezone.now() - timedelta(days=days)
+        return Response({
+            'since': since.isoformat(),
+            'channels': delivery_latency_stats(since)
+        })
@@ -1,16 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FeedbackApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'feedback_api'
-    
+
     def ready(self):
         import feedback_api.signals  # Importer les signaux
-        
-        # Enregistrer les tâches périodiques
-        # Uniquement en mode serveur, pas pendant les migrations
-        import sys
-        if 'runserver' in sys.argv or 'celery' in sys.argv:
-            from feedback_api.periodic_tasks import register_periodic_tasks
-            register_periodic_tasks()
+
+        # Enregistrer les tâches périodiques après les migrations, plutôt
+        # qu'à chaque démarrage d'un serveur ou d'un worker. Le classifieur
+        # NLP et les SDK des fournisseurs sont chargés à la demande, ou
+        # préchargés par les seuls processus qui en ont besoin
+        # (voir feedback_project/celery.py et gunicorn.conf.py).
+        from feedback_api.periodic_tasks import register_periodic_tasks
+        post_migrate.connect(register_periodic_tasks, sender=self)
@@ -0,0 +1,172 @@
+"""
+Stockage des pièces jointes adressé par contenu
+
+Chaque contenu est stocké une seule fois, sous son empreinte SHA-256
+(attachments/sha256/ab/cd/abcd...), et décrit par un AttachmentBlob dont
+l'index unique sur l'empreinte sert d'index de déduplication : la même photo
+envoyée par de nombreux expéditeurs, ou renvoyée après un échec, n'occupe
+qu'une place. Chaque pièce jointe (Attachment) pointe vers ce fichier.
+L'empreinte est toujours calculée par le serveur sur les octets reçus :
+connaître l'empreinte d'un fichier ne permet pas de l'obtenir.
+
+Les fichiers sont lus et écrits par blocs, jamais chargés entiers en
+mémoire, et les téléchargements acceptent les requêtes partielles (Range),
+pour reprendre un téléchargement interrompu ou lire une note vocale.
+"""
+import hashlib
+import logging
+import re
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags
+
+from .models import Attachment, AttachmentBlob
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_sha256(fileobj):
+    """Empreinte d'un fichier (ouvert ou UploadedFile), lu par blocs"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(BLOCK_SIZE), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(sha256):
+    return f"attachments/sha256/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def store_blob(fileobj, sha256=None, size=None):
+    """
+    Contenu d'un fichier dans le stockage adressé par contenu
+
+    Args:
+        fileobj: fichier ouvert en lecture binaire, ou UploadedFile
+        sha256, size: empreinte et taille si déjà connues
+
+    Returns:
+        tuple: (AttachmentBlob, True si le contenu était nouveau)
+    """
+    sha256 = sha256 or file_sha256(fileobj)
+    blob = AttachmentBlob.objects.filter(sha256=sha256).first()
+    if blob is not None:
+        return blob, False
+
+    name = blob_name(sha256)
+    if not default_storage.exists(name):
+        fileobj.seek(0)
+        # File.chunks() : copie par blocs
+        name = default_storage.save(name, File(fileobj))
+    if size is None:
+        size = default_storage.size(name)
+    try:
+        with transaction.atomic():
+            blob = AttachmentBlob.objects.create(sha256=sha256, file=name, size=size)
+    except IntegrityError:
+        # Même contenu enregistré au même moment par un autre envoi
+        return AttachmentBlob.objects.get(sha256=sha256), False
+    logger.info(f"Nouveau contenu de pièce jointe {sha256[:12]} ({size} octets)")
+    return blob, True
+
+
+def create_attachment(feedback_id, blob, file_name, file_type, uploaded_by=None):
+    """Pièce jointe d'un feedback pointant vers un contenu stocké"""
+    return Attachment.objects.create(
+        feedback_id=feedback_id,
+        blob=blob,
+        file=blob.file.name,
+        file_name=file_name,
+        file_type=file_type,
+        file_size=blob.size,
+        uploaded_by=uploaded_by,
+    )
+
+
+def parse_range(value, size):
+    """
+    En-tête Range (une seule plage) -> (début, fin incluse)
+
+    Returns:
+        tuple, ou None pour renvoyer le fichier entier (en-tête absent, invalide
+        ou à plusieurs plages) ; lève ValueError si la plage est hors du fichier
+    """
+    match = RANGE.match((value or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # bytes=-500 : les 500 derniers octets
+        length = int(last)
+        if length == 0:
+            raise ValueError(value)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(value)
+    return start, end
+
+
+def _read_blocks(fieldfile, start, length):
+    with fieldfile.open('rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def download_response(request, attachment):
+    """
+    Téléchargement d'une pièce jointe, entier ou partiel (Range), lu par blocs
+
+    L'ETag d'un contenu stocké est son empreinte : il ne change jamais, et
+    If-None-Match / If-Range permettent de reprendre sans tout retélécharger.
+    """
+    size = attachment.blob.size if attachment.blob_id else attachment.file_size
+    etag = f'"{attachment.blob.sha256}"' if attachment.blob_id else None
+
+    if etag and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # If-Range : plage servie seulement si le fichier du client est toujours celui-ci
+    if not if_range or (etag and if_range == etag):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(
+        _read_blocks(attachment.file, start, end - start + 1),
+        status=206 if byte_range else 200,
+        content_type=attachment.file_type or 'application/octet-stream',
+    )
+    response['Content-Length'] = str(end - start + 1)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(False, attachment.file_name)
+    if etag:
+        response['ETag'] = etag
+        # Contenu adressé par empreinte : immuable
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,175 @@
+"""
+Flux des modifications pour la synchronisation différentielle des clients hors-ligne
+
+GET /api/sync/changes/?since=<marque> renvoie les feedbacks modifiés depuis
+la marque (watermark) transmise par le client, avec leurs nouvelles réponses
+et leurs changements de statut, et la marque à transmettre à l'appel
+suivant : un appareil qui se reconnecte ne télécharge que le delta.
+
+La marque encode (date, id) de la dernière ligne renvoyée ; la pagination
+par clé sur (updated_at, id) est servie par l'index feedback_updated_id_idx,
+quel que soit le nombre de feedbacks. Avec source=log, les modifications
+sont lues dans le journal (Log, index log_timestamp_id_idx), qui garde aussi
+celles faites sans enregistrer le feedback.
+
+Seules les lignes plus anciennes que CHANGES_SETTLE_SECONDS secondes
+sont renvoyées : une transaction validée en retard ne peut pas insérer de
+modification avant une marque déjà transmise. Les suppressions ne figurent
+pas dans le flux.
+
+Les réponses sont compressées (gzip) si le client l'accepte, et encodées en
+MessagePack (Accept: application/x-msgpack) si le paquet msgpack est installé.
+"""
+import importlib.util
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import BaseRenderer
+
+from .models import Feedback, Log, Response
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+WATERMARK = re.compile(r'^(\d+)-(\d+)$')
+
+SOURCES = ('feedback', 'log')
+
+# Représentation compacte : sans coordonnées de contact ni champs internes
+FEEDBACK_FIELDS = (
+    'id', 'local_id', 'channel', 'content', 'status', 'category', 'priority', 'location',
+    'latitude', 'longitude', 'assigned_to', 'created_at', 'updated_at', 'resolved_at'
+)
+RESPONSE_FIELDS = ('id', 'feedback', 'content', 'created_at', 'sent')
+
+
+def _setting(name, default):
+    return getattr(settings, 'SYNC_SETTINGS', {}).get(name, default)
+
+
+def encode_watermark(moment, row_id):
+    """Marque opaque et compacte : microsecondes depuis l'époque Unix et id"""
+    return f"{(moment - EPOCH) // timedelta(microseconds=1)}-{row_id}"
+
+
+def parse_watermark(value):
+    """Marque -> (date, id) ; None pour une première synchronisation"""
+    if not value:
+        return None
+    match = WATERMARK.match(value)
+    if not match:
+        raise ParseError("Paramètre 'since' invalide : marque renvoyée par un appel précédent attendue.")
+    return EPOCH + timedelta(microseconds=int(match.group(1))), int(match.group(2))
+
+
+def page_size(value):
+    maximum = _setting('CHANGES_MAX_PAGE_SIZE', 2000)
+    if not value:
+        return min(_setting('CHANGES_PAGE_SIZE', 500), maximum)
+    if not value.isdigit() or not 0 < int(value) <= maximum:
+        raise ParseError(f"Paramètre 'limit' invalide : entier de 1 à {maximum} attendu.")
+    return int(value)
+
+
+def sees_all_feedbacks(user):
+    return user.is_staff or user.groups.filter(name='Moderators').exists()
+
+
+def visibility(user, prefix=''):
+    """Feedbacks visibles hors modérateurs : ceux de l'utilisateur et ceux qui lui sont assignés"""
+    return Q(**{f'{prefix}user': user}) | Q(**{f'{prefix}assigned_to': user})
+
+
+def _after(watermark, date_field):
+    moment, row_id = watermark
+    return Q(**{f'{date_field}__gt': moment}) | Q(**{date_field: moment, 'id__gt': row_id})
+
+
+def _related(feedback_ids, since):
+    """Réponses et changements de statut des feedbacks depuis la date de la marque"""
+    responses = Response.objects.filter(feedback_id__in=feedback_ids)
+    status_changes = Log.objects.filter(feedback_id__in=feedback_ids, action=Log.ActionChoices.STATUS_CHANGED)
+    if since is not None:
+        # Bornes incluses : un client peut recevoir deux fois la même réponse, jamais la manquer
+        responses = responses.filter(created_at__gte=since[0])
+        status_changes = status_changes.filter(timestamp__gte=since[0])
+    return (
+        list(responses.order_by('created_at', 'id').values(*RESPONSE_FIELDS)),
+        list(status_changes.order_by('timestamp', 'id').values('id', 'feedback', 'details', 'timestamp')),
+    )
+
+
+def changes(user, since=None, limit=500, source='feedback'):
+    """
+    Modifications visibles par l'utilisateur depuis la marque since
+
+    Returns:
+        dict: feedbacks (état actuel), responses, status_changes, watermark
+            (marque de l'appel suivant) et has_more (page suivante disponible)
+    """
+    settled = timezone.now() - timedelta(seconds=_setting('CHANGES_SETTLE_SECONDS', 5))
+    restricted = not sees_all_feedbacks(user)
+    visible = Feedback.objects.filter(visibility(user)) if restricted else Feedback.objects.all()
+
+    if source == 'log':
+        entries = Log.objects.filter(timestamp__lt=settled)
+        if restricted:
+            entries = entries.filter(visibility(user, 'feedback__'))
+        if since is not None:
+            entries = entries.filter(_after(since, 'timestamp'))
+        entries = list(entries.order_by('timestamp', 'id').values('id', 'feedback', 'timestamp')[:limit + 1])
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        feedback_ids = list(dict.fromkeys(entry['feedback'] for entry in entries))
+        feedbacks = list(visible.filter(id__in=feedback_ids).order_by('updated_at', 'id').values(*FEEDBACK_FIELDS))
+        last = (entries[-1]['timestamp'], entries[-1]['id']) if entries else None
+    else:
+        rows = visible.filter(updated_at__lt=settled)
+        if since is not None:
+            rows = rows.filter(_after(since, 'updated_at'))
+        feedbacks = list(rows.order_by('updated_at', 'id').values(*FEEDBACK_FIELDS)[:limit + 1])
+        has_more = len(feedbacks) > limit
+        feedbacks = feedbacks[:limit]
+        feedback_ids = [feedback['id'] for feedback in feedbacks]
+        last = (feedbacks[-1]['updated_at'], feedbacks[-1]['id']) if feedbacks else None
+
+    responses, status_changes = _related(feedback_ids, since)
+    if last is not None:
+        watermark = encode_watermark(*last)
+    else:
+        watermark = encode_watermark(*since) if since is not None else None
+    return {
+        'feedbacks': feedbacks,
+        'responses': responses,
+        'status_changes': status_changes,
+        'watermark': watermark,
+        'has_more': has_more,
+    }
+
+
+def _msgpack_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable en MessagePack : {type(value).__name__}")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Encodage MessagePack (plus compact que JSON) des réponses"""
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+def renderer_classes(defaults):
+    """Rendus par défaut, et MessagePack si le paquet msgpack est installé"""
+    if importlib.util.find_spec('msgpack') is None:
+        return list(defaults)
+    return [*defaults, MessagePackRenderer]
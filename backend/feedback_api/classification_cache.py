@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Compteurs partagés (tous processus) des consultations du cache
+STATS_KEYS = ('local_hits', 'shared_hits', 'misses')
+
+# Les compteurs du processus sont reportés dans le cache partagé par paquets
+# (une écriture Redis toutes les STATS_FLUSH_EVERY consultations)
+STATS_FLUSH_EVERY = 50
+
+
+def _setting(name, default):
+    return settings.NLP_SETTINGS.get(name, default)
+
+
+class ClassificationCache:
+    """
+    Cache des résultats de classification, adressé par le contenu.
+
+    La clé est l'empreinte SHA-256 du texte normalisé (preprocess_text : la
+    classification par modèle ou par mots-clés et la suggestion de priorité
+    ne voient que ce texte) et la version du classifieur en service (id et
+    empreinte du modèle actif, version du prétraitement). Activer ou
+    réentraîner un modèle change cette version : les anciens résultats ne
+    sont plus consultés, dans tous les processus, sans suppression explicite.
+
+    Deux niveaux : LRU en mémoire du processus, puis cache Django partagé
+    (Redis en production) avec une durée de vie.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = dict.fromkeys(STATS_KEYS, 0)
+        self._lookups = 0
+
+    @staticmethod
+    def make_key(normalized_text, version):
+        digest = hashlib.sha256(normalized_text.encode('utf-8')).hexdigest()
+        return f"nlp:classify:{version}:{digest}"
+
+    def get(self, key):
+        """Retourne le résultat en cache ou None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+        if result is not None:
+            self._count('local_hits')
+            return result
+
+        try:
+            result = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Cache partagé de classification indisponible: {str(e)}")
+            result = None
+        if result is not None:
+            self._remember(key, result)
+            self._count('shared_hits')
+            return result
+
+        self._count('misses')
+        return None
+
+    def set(self, key, result):
+        self._remember(key, result)
+        try:
+            cache.set(key, result, _setting('CLASSIFICATION_CACHE_TTL', 86400))
+        except Exception as e:
+            logger.warning(f"Cache partagé de classification indisponible: {str(e)}")
+
+    def _remember(self, key, result):
+        max_size = _setting('CLASSIFICATION_CACHE_SIZE', 10000)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Vide le niveau local (les entrées partagées expirent d'elles-mêmes)"""
+        with self._lock:
+            self._entries.clear()
+
+    def _count(self, outcome):
+        with self._lock:
+            self._pending[outcome] += 1
+            self._lookups += 1
+            flush = self._lookups % STATS_FLUSH_EVERY == 0
+        if flush:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Reporte les compteurs du processus dans le cache partagé"""
+        with self._lock:
+            pending, self._pending = self._pending, dict.fromkeys(STATS_KEYS, 0)
+        for outcome, count in pending.items():
+            if not count:
+                continue
+            key = f"nlp:classify:stats:{outcome}"
+            try:
+                cache.add(key, 0, None)
+                cache.incr(key, count)
+            except Exception as e:
+                logger.warning(f"Compteur du cache de classification non enregistré: {str(e)}")
+
+    def stats(self):
+        """Taux de succès du cache, tous processus confondus"""
+        self.flush_stats()
+        counts = {outcome: 0 for outcome in STATS_KEYS}
+        try:
+            stored = cache.get_many([f"nlp:classify:stats:{outcome}" for outcome in STATS_KEYS])
+        except Exception as e:
+            logger.warning(f"Compteurs du cache de classification indisponibles: {str(e)}")
+            stored = {}
+        for key, value in stored.items():
+            counts[key.rsplit(':', 1)[1]] = value
+
+        lookups = sum(counts.values())
+        hits = counts['local_hits'] + counts['shared_hits']
+        with self._lock:
+            local_size = len(self._entries)
+        return {
+            **counts,
+            'lookups': lookups,
+            'hit_rate': hits / lookups if lookups else None,
+            'local_size': local_size,
+        }
+
+
+# Instance globale partagée par les tâches du processus
+classification_cache = ClassificationCache()
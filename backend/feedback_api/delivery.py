@@ -0,0 +1,276 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+# Rang de chaque statut : un statut ne peut qu'avancer, les callbacks
+# des fournisseurs pouvant arriver dans le désordre
+STATUS_RANK = {
+    OutboundMessage.StatusChoices.QUEUED: 0,
+    OutboundMessage.StatusChoices.SENT: 1,
+    OutboundMessage.StatusChoices.DELIVERED: 2,
+    OutboundMessage.StatusChoices.READ: 3,
+    OutboundMessage.StatusChoices.FAILED: 4,
+}
+
+# Correspondance des statuts Twilio (MessageStatus) vers le registre
+TWILIO_STATUS_MAP = {
+    'accepted': OutboundMessage.StatusChoices.QUEUED,
+    'scheduled': OutboundMessage.StatusChoices.QUEUED,
+    'queued': OutboundMessage.StatusChoices.QUEUED,
+    'sending': OutboundMessage.StatusChoices.SENT,
+    'sent': OutboundMessage.StatusChoices.SENT,
+    'delivered': OutboundMessage.StatusChoices.DELIVERED,
+    'read': OutboundMessage.StatusChoices.READ,
+    'undelivered': OutboundMessage.StatusChoices.FAILED,
+    'failed': OutboundMessage.StatusChoices.FAILED,
+    'canceled': OutboundMessage.StatusChoices.FAILED,
+}
+
+# Correspondance des statuts WhatsApp Cloud API vers le registre
+WHATSAPP_STATUS_MAP = {
+    'sent': OutboundMessage.StatusChoices.SENT,
+    'delivered': OutboundMessage.StatusChoices.DELIVERED,
+    'read': OutboundMessage.StatusChoices.READ,
+    'failed': OutboundMessage.StatusChoices.FAILED,
+}
+
+# Champ horodaté à renseigner pour chaque statut
+STATUS_TIMESTAMP_FIELDS = {
+    OutboundMessage.StatusChoices.SENT: 'sent_at',
+    OutboundMessage.StatusChoices.DELIVERED: 'delivered_at',
+    OutboundMessage.StatusChoices.READ: 'read_at',
+    OutboundMessage.StatusChoices.FAILED: 'failed_at',
+}
+
+# Statut de notification correspondant à un statut de livraison
+NOTIFICATION_STATUS_MAP = {
+    OutboundMessage.StatusChoices.DELIVERED: Notification.StatusChoices.DELIVERED,
+    OutboundMessage.StatusChoices.READ: Notification.StatusChoices.DELIVERED,
+    OutboundMessage.StatusChoices.FAILED: Notification.StatusChoices.FAILED,
+}
+
+
+def start_outbound_message(channel, to, response=None, notification=None, enqueued_at=None):
+    """
+    Récupère ou crée l'entrée du registre pour une réponse ou une notification.
+    Une nouvelle tentative d'envoi incrémente le compteur de tentatives.
+    """
+    lookup = {'response': response} if response is not None else {'notification': notification}
+    outbound, created = OutboundMessage.objects.get_or_create(
+        defaults={
+            'channel': channel,
+            'to': to,
+            'enqueued_at': enqueued_at or timezone.now(),
+        },
+        **lookup
+    )
+    if not created:
+        outbound.retry_count += 1
+        outbound.save(update_fields=['retry_count', 'updated_at'])
+    return outbound
+
+
+def record_send_result(outbound, result):
+    """
+    Enregistre le résultat de la remise au fournisseur (dict retourné par
+    les fonctions d'envoi de utils.py, ou None en cas d'échec)
+    """
+    now = timezone.now()
+    if result:
+        if result.get('status') == 'simulated':
+            outbound.provider = OutboundMessage.ProviderChoices.SIMULATION
+        elif 'sid' in result:
+            outbound.provider = OutboundMessage.ProviderChoices.TWILIO
+        else:
+            outbound.provider = OutboundMessage.ProviderChoices.FACEBOOK
+        outbound.provider_message_id = result.get('sid') or result.get('id') or ''
+        outbound.provider_status = result.get('status') or ''
+        outbound.status = OutboundMessage.StatusChoices.SENT
+        outbound.sent_at = now
+    else:
+        outbound.status = OutboundMessage.StatusChoices.FAILED
+        outbound.failed_at = now
+    outbound.save()
+    return outbound
+
+
+def valid_twilio_signature(request):
+    """
+    Vérifie l'en-tête X-Twilio-Signature d'un callback (HMAC de l'URL et des paramètres POST)
+
+    Twilio signe l'URL publique qui lui a été donnée (TWILIO_STATUS_CALLBACK_URL) ;
+    derrière un proxy terminant TLS, l'URL reconstruite par Django (http://...)
+    diffère : elle ne sert que si aucune URL n'est configurée. Sans
+    TWILIO_AUTH_TOKEN, aucune signature ne peut être vérifiée : la requête est refusée.
+    """
+    from twilio.request_validator import RequestValidator
+
+    if not settings.TWILIO_AUTH_TOKEN:
+        logger.error("TWILIO_AUTH_TOKEN non configuré : callback Twilio refusé")
+        return False
+    signature = request.META.get('HTTP_X_TWILIO_SIGNATURE', '')
+    url = getattr(settings, 'TWILIO_STATUS_CALLBACK_URL', '') or request.build_absolute_uri()
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN).validate(url, request.POST, signature)
+
+
+def parse_twilio_status_callback(data):
+    """Convertit un callback de statut Twilio en mise à jour du registre"""
+    message_sid = data.get('MessageSid') or data.get('SmsSid')
+    provider_status = (data.get('MessageStatus') or data.get('SmsStatus') or '').lower()
+    if not message_sid or provider_status not in TWILIO_STATUS_MAP:
+        return None
+    return {
+        'provider_message_id': message_sid,
+        'status': TWILIO_STATUS_MAP[provider_status],
+        'provider_status': provider_status,
+        'timestamp': timezone.now(),
+        'error_code': data.get('ErrorCode') or '',
+    }
+
+
+def parse_whatsapp_statuses(value):
+    """Convertit les entrées 'statuses' d'un webhook WhatsApp en mises à jour du registre"""
+    updates = []
+    for entry in value.get('statuses', []):
+        provider_status = entry.get('status', '')
+        if not entry.get('id') or provider_status not in WHATSAPP_STATUS_MAP:
+            continue
+        try:
+            timestamp = datetime.fromtimestamp(int(entry.get('timestamp')), tz=dt_timezone.utc)
+        except (TypeError, ValueError):
+            timestamp = timezone.now()
+        errors = entry.get('errors') or []
+        updates.append({
+            'provider_message_id': entry['id'],
+            'status': WHATSAPP_STATUS_MAP[provider_status],
+            'provider_status': provider_status,
+            'timestamp': timestamp,
+            'error_code': str(errors[0].get('code', '')) if errors else '',
+        })
+    return updates
+
+
+def _apply_status(outbound, update):
+    """Applique une mise à jour de statut ; retourne True si le message a changé"""
+    status = update['status']
+    if STATUS_RANK[status] < STATUS_RANK[outbound.status]:
+        return False
+    if outbound.status == OutboundMessage.StatusChoices.FAILED:
+        return False
+
+    outbound.status = status
+    outbound.provider_status = update.get('provider_status', '')
+    if update.get('error_code'):
+        outbound.error_code = update['error_code']
+
+    field = STATUS_TIMESTAMP_FIELDS.get(status)
+    if field and getattr(outbound, field) is None:
+        setattr(outbound, field, update['timestamp'])
+    # Un message lu a forcément été livré
+    if status == OutboundMessage.StatusChoices.READ and outbound.delivered_at is None:
+        outbound.delivered_at = update['timestamp']
+    return True
+
+
+def ingest_status_updates(updates):
+    """
+    Applique un lot de mises à jour de statut en une lecture et une écriture groupée.
+
+    Args:
+        updates (list): dicts produits par parse_twilio_status_callback ou parse_whatsapp_statuses
+
+    Returns:
+        int: nombre de messages du registre modifiés
+    """
+    # Ne garder que la mise à jour la plus avancée par message
+    latest = {}
+    for update in updates:
+        if not update:
+            continue
+        current = latest.get(update['provider_message_id'])
+        if current is None or STATUS_RANK[update['status']] >= STATUS_RANK[current['status']]:
+            latest[update['provider_message_id']] = update
+    if not latest:
+        return 0
+
+    with transaction.atomic():
+        messages = list(
+            OutboundMessage.objects.select_for_update().filter(provider_message_id__in=latest.keys())
+        )
+        changed = [message for message in messages if _apply_status(message, latest[message.provider_message_id])]
+        if not changed:
+            return 0
+
+        OutboundMessage.objects.bulk_update(
+            changed,
+            ['status', 'provider_status', 'error_code', 'sent_at', 'delivered_at', 'read_at', 'failed_at']
+        )
+
+        # Répercuter la livraison sur les notifications concernées
+        notification_ids = {}
+        for message in changed:
+            notification_status = NOTIFICATION_STATUS_MAP.get(message.status)
+            if message.notification_id and notification_status:
+                notification_ids.setdefault(notification_status, []).append(message.notification_id)
+        for notification_status, ids in notification_ids.items():
+            Notification.objects.filter(
+                id__in=ids,
+                status__in=[Notification.StatusChoices.SENT, Notification.StatusChoices.DELIVERED]
+            ).update(status=notification_status)
+
+    logger.info(f"{len(changed)} statut(s) de livraison mis à jour sur {len(latest)} reçu(s)")
+    return len(changed)
+
+
+def percentile(sorted_values, fraction):
+    """Percentile par interpolation linéaire sur une liste déjà triée"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def delivery_latency_stats(since):
+    """
+    Calcule les latences d'envoi et de livraison (p50/p95, en secondes) par canal
+    pour les messages mis en file depuis `since`
+    """
+    rows = OutboundMessage.objects.filter(enqueued_at__gte=since).values_list(
+        'channel', 'status', 'enqueued_at', 'sent_at', 'delivered_at'
+    )
+
+    per_channel = {}
+    for channel, status, enqueued_at, sent_at, delivered_at in rows.iterator(chunk_size=2000):
+        stats = per_channel.setdefault(channel, {'count': 0, 'failed': 0, 'send': [], 'delivery': []})
+        stats['count'] += 1
+        if status == OutboundMessage.StatusChoices.FAILED:
+            stats['failed'] += 1
+        if sent_at:
+            stats['send'].append((sent_at - enqueued_at).total_seconds())
+        if delivered_at:
+            stats['delivery'].append((delivered_at - enqueued_at).total_seconds())
+
+    result = []
+    for channel, stats in sorted(per_channel.items()):
+        send = sorted(stats['send'])
+        delivery = sorted(stats['delivery'])
+        result.append({
+            'channel': channel,
+            'count': stats['count'],
+            'delivered': len(delivery),
+            'failed': stats['failed'],
+            'send_latency_p50': percentile(send, 0.5),
+            'send_latency_p95': percentile(send, 0.95),
+            'delivery_latency_p50': percentile(delivery, 0.5),
+            'delivery_latency_p95': percentile(delivery, 0.95),
+        })
+    return result
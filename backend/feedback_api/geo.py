@@ -0,0 +1,157 @@
+"""
+Filtres géographiques et agrégation par tuiles des feedbacks
+
+Les filtres s'appuient uniquement sur les colonnes latitude / longitude et
+leur index composite (feedback_lat_lon_idx) : un rectangle se traduit par
+deux intervalles, et un rayon par le rectangle qui l'englobe (servi par
+l'index) affiné par la distance de haversine calculée en base.
+
+Paramètres de requête :
+    bbox=ouest,sud,est,nord      rectangle en degrés (ordre GeoJSON) ;
+                                 ouest > est : rectangle à cheval sur l'antiméridien
+    near=latitude,longitude      centre du cercle
+    radius=10                    rayon en kilomètres (avec near)
+"""
+import math
+
+from django.db.models import Avg, Count, F, FloatField, Min, Q, Value
+from django.db.models.functions import ASin, Cos, Floor, Greatest, Least, Ln, Power, Radians, Sin, Sqrt, Tan
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+
+EARTH_RADIUS_KM = 6371.0088
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Au-delà, la projection de Web Mercator (tuiles des fonds de carte) diverge
+MERCATOR_MAX_LATITUDE = 85.0511287798
+
+MAX_ZOOM = 22
+
+
+def _floats(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise ParseError(f"Paramètre '{name}' invalide : {count} nombres séparés par des virgules attendus.")
+    return numbers
+
+
+def parse_bbox(value):
+    """'ouest,sud,est,nord' -> (sud, ouest, nord, est)"""
+    west, south, east, north = _floats(value, 4, 'bbox')
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ParseError("Paramètre 'bbox' invalide : ouest,sud,est,nord en degrés avec sud <= nord.")
+    return south, west, north, east
+
+
+def parse_near(value, radius):
+    """'latitude,longitude' et rayon en km -> (latitude, longitude, rayon)"""
+    latitude, longitude = _floats(value, 2, 'near')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ParseError("Paramètre 'near' invalide : latitude,longitude en degrés.")
+    radius_km = _floats(radius or '', 1, 'radius')[0]
+    if radius_km <= 0:
+        raise ParseError("Paramètre 'radius' invalide : rayon positif en kilomètres attendu.")
+    return latitude, longitude, radius_km
+
+
+def bbox_q(south, west, north, east):
+    """Condition « dans le rectangle » (bornes incluses)"""
+    condition = Q(latitude__gte=south, latitude__lte=north)
+    if west <= east:
+        return condition & Q(longitude__gte=west, longitude__lte=east)
+    # À cheval sur l'antiméridien : deux intervalles de longitude
+    return condition & (Q(longitude__gte=west) | Q(longitude__lte=east))
+
+
+def filter_bbox(queryset, south, west, north, east):
+    return queryset.filter(bbox_q(south, west, north, east))
+
+
+def haversine_km(latitude, longitude):
+    """Expression : distance en km entre (latitude, longitude) et chaque feedback"""
+    center_latitude = math.radians(latitude)
+    half_dlat = (Radians(F('latitude')) - Value(center_latitude)) / Value(2.0)
+    half_dlon = (Radians(F('longitude')) - Value(math.radians(longitude))) / Value(2.0)
+    chord = (
+        Power(Sin(half_dlat), 2)
+        + Value(math.cos(center_latitude)) * Cos(Radians(F('latitude'))) * Power(Sin(half_dlon), 2)
+    )
+    # Least : un arrondi à peine supérieur à 1 ferait échouer asin
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(chord), Value(1.0)), output_field=FloatField())
+
+
+def filter_radius(queryset, latitude, longitude, radius_km):
+    """Feedbacks à moins de radius_km du centre"""
+    # Rectangle englobant, servi par l'index, puis distance exacte sur les seuls candidats
+    dlat = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    cos_latitude = math.cos(math.radians(max(abs(south), abs(north))))
+    dlon = radius_km / (KM_PER_DEGREE * cos_latitude) if cos_latitude > 1e-9 else 360.0
+    if dlon >= 180:
+        west, east = -180.0, 180.0
+    else:
+        west = (longitude - dlon + 180) % 360 - 180
+        east = (longitude + dlon + 180) % 360 - 180
+    return (
+        filter_bbox(queryset, south, west, north, east)
+        .alias(distance_km=haversine_km(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+    )
+
+
+def tile_counts(queryset, zoom):
+    """
+    Nombre de feedbacks par tuile Web Mercator (x, y) au niveau de zoom
+    donné, calculé en base (GROUP BY) sans charger les feedbacks
+
+    Returns:
+        list: dicts (x, y, count, latitude, longitude) ; latitude / longitude :
+            barycentre des feedbacks de la tuile ; feedback : id si elle n'en contient qu'un
+    """
+    tiles = 2 ** zoom
+    latitude = Radians(Greatest(Least(F('latitude'), Value(MERCATOR_MAX_LATITUDE)), Value(-MERCATOR_MAX_LATITUDE)))
+    tile_x = Floor((F('longitude') + Value(180.0)) / Value(360.0) * Value(float(tiles)))
+    mercator_y = Ln(Tan(latitude) + Value(1.0) / Cos(latitude))
+    tile_y = Floor((Value(1.0) - mercator_y / Value(math.pi)) / Value(2.0) * Value(float(tiles)))
+
+    rows = (
+        queryset.order_by()
+        .filter(latitude__isnull=False, longitude__isnull=False)
+        # Longitude 180° et latitude maximale : dernière colonne / ligne
+        .annotate(
+            tile_x=Least(tile_x, Value(float(tiles - 1)), output_field=FloatField()),
+            tile_y=Greatest(Least(tile_y, Value(float(tiles - 1))), Value(0.0), output_field=FloatField()),
+        )
+        .values('tile_x', 'tile_y')
+        .annotate(count=Count('id'), center_latitude=Avg('latitude'), center_longitude=Avg('longitude'),
+                  first_id=Min('id'))
+        .order_by('tile_y', 'tile_x')
+    )
+    return [
+        {
+            'x': int(row['tile_x']),
+            'y': int(row['tile_y']),
+            'count': row['count'],
+            'latitude': row['center_latitude'],
+            'longitude': row['center_longitude'],
+            'feedback': row['first_id'] if row['count'] == 1 else None,
+        }
+        for row in rows
+    ]
+
+
+class GeoFilterBackend(BaseFilterBackend):
+    """Filtres bbox et near / radius pour les listes de feedbacks"""
+
+    def filter_queryset(self, request, queryset, view):
+        bbox = request.query_params.get('bbox')
+        if bbox:
+            queryset = filter_bbox(queryset, *parse_bbox(bbox))
+        near = request.query_params.get('near')
+        if near:
+            queryset = filter_radius(queryset, *parse_near(near, request.query_params.get('radius')))
+        return queryset
@@ -0,0 +1,286 @@
+"""
+Détection des zones de concentration de feedbacks (hotspots)
+
+Les feedbacks géolocalisés sont répartis sur une grille régulière en
+degrés (cellules d'environ 1 km à la taille par défaut) et comptés par
+heure, par cellule et par catégorie. Les calculs sont vectorisés (NumPy) :
+un million de points sont regroupés en moins d'une seconde.
+
+Les comptages horaires sont conservés en base (HotspotCount) et mis à jour
+incrémentalement : chaque passage ne lit que les feedbacks des heures
+écoulées depuis le passage précédent. Une cellule est signalée lorsque
+son nombre de feedbacks sur la fenêtre récente est improbable au regard de
+son niveau habituel (test de Poisson sur la période de référence) ; une
+alerte est alors rédigée à l'état de brouillon pour validation par un
+modérateur.
+"""
+import logging
+import math
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Alert, Category, Feedback, HotspotCount
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+
+
+def _setting(name, default):
+    return getattr(settings, 'HOTSPOT_SETTINGS', {}).get(name, default)
+
+
+def cell_ids(latitudes, longitudes, cell_size):
+    """Identifiant de cellule de chaque point (lignes depuis -90°, colonnes depuis -180°)"""
+    import numpy as np
+
+    columns = math.ceil(360 / cell_size)
+    rows = np.floor((np.asarray(latitudes, dtype=np.float64) + 90) / cell_size).astype(np.int64)
+    cols = np.floor((np.asarray(longitudes, dtype=np.float64) + 180) / cell_size).astype(np.int64)
+    return rows * columns + np.minimum(cols, columns - 1)
+
+
+def cell_bounds(cell, cell_size):
+    """(latitude min, longitude min, latitude max, longitude max) d'une cellule"""
+    columns = math.ceil(360 / cell_size)
+    row, col = divmod(int(cell), columns)
+    south, west = row * cell_size - 90, col * cell_size - 180
+    return south, west, south + cell_size, west + cell_size
+
+
+def valid_points(latitudes, longitudes):
+    """Masque des coordonnées exploitables (ni manquantes ni hors limites)"""
+    import numpy as np
+
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    return (
+        np.isfinite(latitudes) & np.isfinite(longitudes)
+        & (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180)
+    )
+
+
+def bin_counts(cells, categories, hours):
+    """
+    Compte les points par (cellule, catégorie, heure)
+
+    Args:
+        cells, categories, hours: tableaux d'entiers positifs de même longueur
+            (catégorie 0 : sans catégorie ; heure : indice depuis le début de période)
+
+    Returns:
+        tuple: tableaux (cellules, catégories, heures, nombres) des combinaisons présentes
+    """
+    import numpy as np
+
+    if len(cells) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, empty
+    # Clé composite : une seule passe de tri (np.unique) au lieu d'un regroupement par colonne
+    category_radix = int(categories.max()) + 1
+    hour_radix = int(hours.max()) + 1
+    keys = (cells * category_radix + categories) * hour_radix + hours
+    unique, counts = np.unique(keys, return_counts=True)
+    rest, hour = np.divmod(unique, hour_radix)
+    cell, category = np.divmod(rest, category_radix)
+    return cell, category, hour, counts
+
+
+def window_totals(cells, categories, hours, counts, baseline_hours):
+    """
+    Totaux par (cellule, catégorie) sur la période de référence (heures
+    0..baseline_hours-1) et sur la fenêtre récente (heures suivantes)
+
+    Returns:
+        tuple: (cellules, catégories, observé sur la fenêtre, référence)
+    """
+    import numpy as np
+
+    category_radix = int(categories.max()) + 1 if len(categories) else 1
+    unique, inverse = np.unique(cells * category_radix + categories, return_inverse=True)
+    in_window = hours >= baseline_hours
+    observed = np.bincount(inverse, weights=counts * in_window, minlength=len(unique))
+    baseline = np.bincount(inverse, weights=counts * ~in_window, minlength=len(unique))
+    pair_cells, pair_categories = np.divmod(unique, category_radix)
+    return pair_cells, pair_categories, observed, baseline
+
+
+def poisson_hotspots(observed, baseline, window_hours, baseline_hours, min_count=5, min_expected=0.5, alpha=0.001):
+    """
+    Test de Poisson unilatéral, vectorisé : le nombre observé sur la fenêtre
+    est-il improbable étant donné le taux de la période de référence ?
+
+    Returns:
+        tuple: (masque des cellules signalées, nombres attendus, probabilités)
+    """
+    import numpy as np
+    from scipy.stats import poisson
+
+    observed = np.asarray(observed, dtype=np.float64)
+    # Taux plancher : une cellule sans historique n'est pas signalée pour un ou deux messages
+    expected = np.maximum(np.asarray(baseline, dtype=np.float64) * window_hours / baseline_hours, min_expected)
+    # La plupart des cellules n'atteignent pas le minimum : pas de calcul de probabilité pour elles
+    p_values = np.ones_like(observed)
+    candidates = observed >= min_count
+    p_values[candidates] = poisson.sf(observed[candidates] - 1, expected[candidates])
+    return candidates & (p_values < alpha), expected, p_values
+
+
+def _load_points(start, end):
+    """Feedbacks géolocalisés créés dans [start, end) : (latitudes, longitudes, catégories, heures)"""
+    import numpy as np
+
+    rows = (
+        Feedback.objects.filter(
+            created_at__gte=start, created_at__lt=end, latitude__isnull=False, longitude__isnull=False
+        ).order_by().values_list('latitude', 'longitude', 'category_id', 'created_at')
+    )
+    latitudes, longitudes, categories, hours = [], [], [], []
+    for latitude, longitude, category_id, created_at in rows.iterator(chunk_size=5000):
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        categories.append(category_id or 0)
+        hours.append(int((created_at - start).total_seconds() // 3600))
+    return (
+        np.array(latitudes, dtype=np.float64), np.array(longitudes, dtype=np.float64),
+        np.array(categories, dtype=np.int64), np.array(hours, dtype=np.int64),
+    )
+
+
+def _binned(start, end, cell_size):
+    latitudes, longitudes, categories, hours = _load_points(start, end)
+    valid = valid_points(latitudes, longitudes)
+    return bin_counts(cell_ids(latitudes[valid], longitudes[valid], cell_size), categories[valid], hours[valid])
+
+
+def update_counts(now=None):
+    """
+    Ajoute les comptages des heures écoulées depuis le dernier passage et
+    supprime ceux sortis de la période de référence
+
+    Returns:
+        int: nombre de comptages ajoutés
+    """
+    now = now or timezone.now()
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    horizon = current_hour - HOUR * (_setting('WINDOW_HOURS', 24) + _setting('BASELINE_HOURS', 7 * 24))
+
+    last = HotspotCount.objects.aggregate(last=Max('hour'))['last']
+    start = max(last + HOUR, horizon) if last else horizon
+    if start >= current_hour:
+        return 0
+
+    cells, categories, hours, counts = _binned(start, current_hour, _setting('CELL_SIZE_DEGREES', 0.01))
+    with transaction.atomic():
+        # Heures déjà comptées par un passage simultané : ignorées (contraintes d'unicité)
+        HotspotCount.objects.bulk_create([
+            HotspotCount(cell=int(cell), category_id=int(category) or None, hour=start + HOUR * int(hour), count=int(count))
+            for cell, category, hour, count in zip(cells, categories, hours, counts)
+        ], batch_size=2000, ignore_conflicts=True)
+        HotspotCount.objects.filter(hour__lt=horizon).delete()
+    return len(counts)
+
+
+def detect_hotspots(now=None, draft_alerts=True):
+    """
+    Signale les cellules dont l'activité récente dépasse nettement leur niveau habituel
+
+    Returns:
+        list: zones signalées (cellule, catégorie, nombres observé et attendu, probabilité, alerte)
+    """
+    import numpy as np
+
+    now = now or timezone.now()
+    cell_size = _setting('CELL_SIZE_DEGREES', 0.01)
+    window_hours = _setting('WINDOW_HOURS', 24)
+    baseline_hours = _setting('BASELINE_HOURS', 7 * 24)
+    update_counts(now)
+
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    start = current_hour - HOUR * (window_hours + baseline_hours - 1)
+    rows = HotspotCount.objects.filter(hour__gte=start).values_list('cell', 'category_id', 'hour', 'count')
+    stored = np.array(
+        [(cell, category or 0, int((hour - start).total_seconds() // 3600), count) for cell, category, hour, count in rows],
+        dtype=np.int64
+    ).reshape(-1, 4)
+
+    # L'heure en cours n'est pas encore enregistrée : la compter directement
+    cells, categories, hours, counts = _binned(current_hour, now + HOUR, cell_size)
+    hour_offset = window_hours + baseline_hours - 1
+    table = np.concatenate([stored, np.column_stack([cells, categories, hours + hour_offset, counts])])
+    if not len(table):
+        return []
+
+    # Observé (fenêtre récente) et référence par (cellule, catégorie)
+    pair_cells, pair_categories, observed, baseline = window_totals(
+        table[:, 0], table[:, 1], table[:, 2], table[:, 3], baseline_hours
+    )
+
+    flagged, expected, p_values = poisson_hotspots(
+        observed, baseline, window_hours, baseline_hours,
+        min_count=_setting('MIN_COUNT', 5), min_expected=_setting('MIN_EXPECTED', 0.5), alpha=_setting('ALPHA', 0.001)
+    )
+
+    hotspots = []
+    for index in np.flatnonzero(flagged):
+        hotspot = {
+            'cell': int(pair_cells[index]),
+            'category': int(pair_categories[index]) or None,
+            'bounds': cell_bounds(pair_cells[index], cell_size),
+            'observed': int(observed[index]),
+            'expected': float(expected[index]),
+            'p_value': float(p_values[index]),
+            'alert': None,
+        }
+        if draft_alerts:
+            hotspot['alert'] = _draft_alert(hotspot, now - HOUR * window_hours, window_hours)
+        hotspots.append(hotspot)
+
+    logger.info(f"Détection des zones de concentration: {len(hotspots)} cellule(s) signalée(s) sur {len(observed)}")
+    return hotspots
+
+
+def _draft_alert(hotspot, since, window_hours):
+    """Rédige une alerte brouillon, sauf si la cellule en a déjà une en cours sur la fenêtre pour cette catégorie"""
+    existing = Alert.objects.filter(
+        hotspot_cell=hotspot['cell'], hotspot_category_id=hotspot['category'], created_at__gte=since,
+        status__in=[Alert.StatusChoices.DRAFT, Alert.StatusChoices.PENDING]
+    ).first()
+    if existing:
+        return existing.id
+
+    south, west, north, east = hotspot['bounds']
+    feedbacks = Feedback.objects.filter(
+        created_at__gte=since, category_id=hotspot['category'],
+        latitude__gte=south, latitude__lt=north, longitude__gte=west, longitude__lt=east
+    )
+    # Feedback de rattachement (une alerte par feedback) : le plus récent sans alerte
+    feedback = feedbacks.filter(alert__isnull=True).order_by('-created_at').first()
+    if feedback is None:
+        return None
+
+    locations = Counter(location for location in feedbacks.values_list('location', flat=True)[:500] if location)
+    region = locations.most_common(1)[0][0] if locations else f"{(south + north) / 2:.3f}, {(west + east) / 2:.3f}"
+    category = Category.objects.filter(id=hotspot['category']).values_list('name', flat=True).first()
+    ratio = hotspot['observed'] / hotspot['expected']
+
+    alert = Alert.objects.create(
+        feedback=feedback,
+        title=f"Concentration de signalements: {category or 'sans catégorie'} ({region})"[:100],
+        description=(
+            f"{hotspot['observed']} feedback(s) en {window_hours} h dans la zone "
+            f"[{south:.3f}, {west:.3f}] - [{north:.3f}, {east:.3f}] pour {hotspot['expected']:.1f} attendu(s) "
+            f"(probabilité {hotspot['p_value']:.1e})."
+        ),
+        region=region[:100],
+        severity=Alert.SeverityChoices.HIGH if ratio >= 10 else Alert.SeverityChoices.MEDIUM,
+        hotspot_cell=hotspot['cell'],
+        hotspot_category_id=hotspot['category'],
+    )
+    logger.info(f"Alerte brouillon #{alert.id} rédigée pour la cellule {hotspot['cell']} ({category or 'sans catégorie'})")
+    return alert.id
@@ -0,0 +1,124 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) et cache des réponses
+pour les ressources lues à chaque chargement de page et rarement modifiées
+
+Chaque modèle concerné a un numéro de version dans le cache partagé,
+renouvelé par signal à chaque enregistrement ou suppression. L'ETag d'une
+réponse dérive de la requête (chemin, paramètres, format) et des versions
+des modèles qu'elle affiche : une requête dont l'ETag correspond reçoit une
+réponse 304 sans accès à la base, et les réponses complètes sont mises en
+cache sous leur ETag (une modification en change la clé, rien n'est à
+invalider).
+
+Les modifications par QuerySet.update() ne déclenchent pas de signal :
+appeler bump_version() après une telle mise à jour.
+"""
+import hashlib
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import Category, KeywordRule, NLPModel, NotificationChannel, NotificationTemplate, Tag
+
+logger = logging.getLogger(__name__)
+
+# Modèles versionnés, et champs dont la seule modification ne change pas les réponses
+VERSIONED_MODELS = {
+    Category: set(),
+    Tag: set(),
+    KeywordRule: set(),
+    NotificationTemplate: set(),
+    NotificationChannel: set(),
+    NLPModel: {'usage_count', 'last_used'},
+    User: {'last_login'},
+}
+
+
+def _setting(name, default):
+    return getattr(settings, 'HTTP_CACHE_SETTINGS', {}).get(name, default)
+
+
+def _version_key(model):
+    return f"http-cache:version:{model._meta.label_lower}"
+
+
+def _new_version():
+    # Jeton aléatoire : deux renouvellements concurrents donnent toujours une nouvelle version
+    return uuid.uuid4().hex[:16], time.time()
+
+
+def get_version(model):
+    """(jeton, date de dernière modification) de la version courante du modèle"""
+    version = cache.get(_version_key(model))
+    if version is None:
+        # Version inconnue (cache vidé ou expiré) : en créer une, les anciens ETag ne correspondent plus
+        cache.add(_version_key(model), _new_version(), None)
+        version = cache.get(_version_key(model)) or _new_version()
+    return version
+
+
+def bump_version(model):
+    cache.set(_version_key(model), _new_version(), None)
+
+
+def should_bump(model, update_fields):
+    ignored = VERSIONED_MODELS.get(model)
+    if ignored is None:
+        return False
+    return update_fields is None or not set(update_fields) <= ignored
+
+
+class ConditionalCacheMixin:
+    """
+    ETag / Last-Modified et cache des réponses pour list et retrieve
+
+    cache_models : modèles affichés par le serializer (par défaut, celui du queryset)
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
+    def _conditional(self, request, view, *args, **kwargs):
+        versions = [get_version(model) for model in self.cache_models or (self.queryset.model,)]
+        fingerprint = '|'.join([
+            request.get_full_path(), request.accepted_renderer.format,
+            *(token for token, _ in versions)
+        ])
+        etag = f'W/"{hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:32]}"'
+        last_modified = int(max(modified for _, modified in versions))
+
+        conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if isinstance(conditional, HttpResponseNotModified):
+            response = conditional
+        else:
+            response = self._cached_response(etag, view, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Le navigateur garde la réponse mais la revalide à chaque lecture
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+    def _cached_response(self, etag, view, request, *args, **kwargs):
+        if not _setting('RESPONSE_CACHE_ENABLED', True):
+            return view(request, *args, **kwargs)
+        key = f"http-cache:response:{etag}"
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, _setting('RESPONSE_CACHE_TIMEOUT', 300))
+        return response
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import InboundMessageReceipt
+
+logger = logging.getLogger(__name__)
+
+# Valeur stockée dans le cache pour un message traité sans feedback (commande)
+NO_FEEDBACK = 0
+
+
+def _cache_key(source, message_key):
+    return f"inbound:{source}:{message_key}"
+
+
+def json_sms_message_key(from_number, sent_stamp, text):
+    """
+    Clé d'idempotence d'un SMS de la passerelle JSON, qui ne fournit pas
+    d'identifiant : empreinte de l'expéditeur, de l'horodatage d'envoi et du texte.
+    Retourne None si l'horodatage manque (le message ne peut pas être dédupliqué).
+    """
+    if not sent_stamp:
+        return None
+    payload = f"{from_number}\x00{sent_stamp}\x00{text}".encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()
+
+
+def lookup_inbound_message(source, message_key):
+    """
+    Vérifie si un message a déjà été traité.
+
+    Returns:
+        tuple: (already_seen, feedback_id) - feedback_id vaut None pour une commande
+    """
+    if not message_key:
+        return False, None
+
+    cached = cache.get(_cache_key(source, message_key))
+    if cached is not None:
+        return True, cached or None
+
+    row = InboundMessageReceipt.objects.filter(
+        source=source, message_key=message_key
+    ).values_list('feedback_id').first()
+    if row is None:
+        return False, None
+
+    feedback_id = row[0]
+    cache.set(_cache_key(source, message_key), feedback_id or NO_FEEDBACK, settings.INBOUND_DEDUP_TTL)
+    return True, feedback_id
+
+
+def claim_inbound_message(source, message_key):
+    """
+    Réserve un message entrant avant son traitement.
+
+    Le chemin rapide (lookup_inbound_message, une lecture du cache Redis)
+    écarte les réessais déjà connus ; la contrainte d'unicité en base tranche
+    entre deux livraisons concurrentes. À appeler dans une transaction
+    englobant la création du feedback, pour qu'un échec de traitement libère
+    la réservation.
+
+    Returns:
+        InboundMessageReceipt: l'accusé de réception créé, ou None si le message
+        a déjà été traité
+    """
+    if not message_key:
+        # Message sans identifiant : traité sans déduplication
+        return InboundMessageReceipt(source=source, message_key='')
+
+    try:
+        with transaction.atomic():
+            receipt = InboundMessageReceipt.objects.create(source=source, message_key=message_key)
+    except IntegrityError:
+        logger.info(f"Message entrant {source}:{message_key} déjà traité, ignoré")
+        return None
+
+    return receipt
+
+
+def complete_inbound_message(receipt, feedback=None):
+    """
+    Associe le feedback créé à l'accusé de réception et publie la clé dans le
+    cache une fois la transaction validée
+    """
+    if not receipt.message_key:
+        return
+
+    if feedback is not None:
+        receipt.feedback = feedback
+        receipt.save(update_fields=['feedback'])
+
+    key = _cache_key(receipt.source, receipt.message_key)
+    value = feedback.id if feedback is not None else NO_FEEDBACK
+    transaction.on_commit(lambda: cache.set(key, value, settings.INBOUND_DEDUP_TTL))
+
+
+def lookup_inbound_messages(source, message_keys):
+    """
+    Version groupée de lookup_inbound_message pour un lot de messages :
+    une lecture du cache pour tout le lot, puis une requête pour les clés absentes.
+
+    Returns:
+        dict: clé déjà traitée -> id du feedback (None pour une commande)
+    """
+    keys = {key for key in message_keys if key}
+    if not keys:
+        return {}
+
+    cached = cache.get_many([_cache_key(source, key) for key in keys])
+    seen = {key: cached[_cache_key(source, key)] or None for key in keys if _cache_key(source, key) in cached}
+    remaining = keys - seen.keys()
+    if not remaining:
+        return seen
+
+    rows = dict(InboundMessageReceipt.objects.filter(
+        source=source, message_key__in=remaining
+    ).values_list('message_key', 'feedback_id'))
+    if rows:
+        cache.set_many(
+            {_cache_key(source, key): feedback_id or NO_FEEDBACK for key, feedback_id in rows.items()},
+            settings.INBOUND_DEDUP_TTL
+        )
+    seen.update(rows)
+    return seen
+
+
+def filter_new_inbound_messages(source, message_keys):
+    """
+    Returns:
+        set: clés du lot jamais traitées (les clés vides sont ignorées)
+    """
+    keys = {key for key in message_keys if key}
+    return keys - lookup_inbound_messages(source, keys).keys()
+
+
+def publish_inbound_messages(source, feedback_ids):
+    """
+    Publie dans le cache, après validation de la transaction, les clés d'un lot
+    de messages traités (dict clé -> id du feedback ou None pour une commande)
+    """
+    values = {
+        _cache_key(source, key): feedback_id or NO_FEEDBACK
+        for key, feedback_id in feedback_ids.items() if key
+    }
+    if values:
+        transaction.on_commit(lambda: cache.set_many(values, settings.INBOUND_DEDUP_TTL))
@@ -0,0 +1,153 @@
+import json
+import logging
+
+from django.db import IntegrityError, transaction
+
+from .models import Feedback, Log, InboundMessageReceipt
+from .idempotency import json_sms_message_key, lookup_inbound_messages, publish_inbound_messages
+from .surge import observe_feedbacks
+from .live_feed import CREATED, publish_events
+
+logger = logging.getLogger(__name__)
+
+SOURCE = InboundMessageReceipt.SourceChoices.JSON_SMS
+
+# Nombre de tentatives si une livraison concurrente insère les mêmes messages
+MAX_PERSIST_ATTEMPTS = 3
+
+
+def parse_json_lines(raw_body):
+    """
+    Découpe un corps JSON Lines (un SMS par ligne).
+
+    Returns:
+        list: objets décodés ; une ligne invalide donne None, pour être
+        signalée dans les résultats sans bloquer le reste du lot
+    """
+    items = []
+    for line in raw_body.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError:
+            items.append(None)
+    return items
+
+
+def _persist_batch(messages):
+    """
+    Crée feedbacks, logs et accusés de réception d'un lot par insertions groupées
+
+    Args:
+        messages (list): dicts (from, text, sim, key) des messages à créer
+
+    Returns:
+        list: feedbacks créés, dans l'ordre des messages
+    """
+    feedbacks = Feedback.objects.bulk_create([
+        Feedback(
+            content=message['text'],
+            channel=Feedback.ChannelChoices.SMS,
+            contact_phone=message['from'],
+            status=Feedback.StatusChoices.NEW,
+            reference_number=message['sim'],
+            external_id=message['key'] or ''
+        )
+        for message in messages
+    ])
+    Log.objects.bulk_create([
+        Log(feedback=feedback, action=Log.ActionChoices.CREATED, details="Feedback créé via webhook JSON SMS (lot)")
+        for feedback in feedbacks
+    ])
+
+    processed = {message['key']: feedback.id for message, feedback in zip(messages, feedbacks) if message['key']}
+    InboundMessageReceipt.objects.bulk_create([
+        InboundMessageReceipt(source=SOURCE, message_key=key, feedback_id=feedback_id)
+        for key, feedback_id in processed.items()
+    ])
+    publish_inbound_messages(SOURCE, processed)
+    return feedbacks
+
+
+def process_json_sms_batch(items):
+    """
+    Traite un lot de SMS de la passerelle JSON en une seule transaction.
+
+    Les doublons (réessais de la passerelle, ou même SMS répété dans le lot)
+    sont écartés sur la clé d'idempotence ; les éléments invalides sont
+    signalés sans faire échouer le reste du lot.
+
+    Args:
+        items (list): objets au format de JSONSMSWebhookView
+
+    Returns:
+        list: un résultat par élément, dans l'ordre du lot
+    """
+    from .tasks import classify_feedback_batch
+
+    results = [None] * len(items)
+    candidates = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {"index": index, "status": "error", "message": "Invalid JSON format"}
+            continue
+        from_number = item.get('from', '')
+        body = item.get('text', '')
+        if not from_number or not body:
+            results[index] = {"index": index, "status": "error", "message": "Missing required fields"}
+            continue
+        candidates.append({
+            'index': index,
+            'from': from_number,
+            'text': body,
+            'sim': item.get('sim', ''),
+            'key': json_sms_message_key(from_number, item.get('sentStamp') or item.get('receivedStamp'), body),
+        })
+
+    feedbacks = []
+    for attempt in range(MAX_PERSIST_ATTEMPTS):
+        seen = lookup_inbound_messages(SOURCE, [message['key'] for message in candidates])
+
+        # Répartir entre nouveaux messages et doublons (déjà traités ou répétés dans le lot)
+        fresh, duplicates, first_index = [], [], {}
+        for message in candidates:
+            key = message['key']
+            if key and (key in seen or key in first_index):
+                duplicates.append(message)
+            else:
+                if key:
+                    first_index[key] = message['index']
+                fresh.append(message)
+
+        try:
+            with transaction.atomic():
+                feedbacks = _persist_batch(fresh) if fresh else []
+            break
+        except IntegrityError:
+            # Livraison concurrente du même lot : recommencer avec les clés désormais connues
+            logger.warning(f"Conflit lors de l'enregistrement du lot JSON SMS (tentative {attempt + 1})")
+    else:
+        raise IntegrityError("Impossible d'enregistrer le lot JSON SMS après plusieurs tentatives")
+
+    created_ids = {}
+    for message, feedback in zip(fresh, feedbacks):
+        created_ids[message['key']] = feedback.id
+        results[message['index']] = {"index": message['index'], "status": "created", "feedback_id": str(feedback.id)}
+    for message in duplicates:
+        feedback_id = seen.get(message['key']) or created_ids.get(message['key'])
+        results[message['index']] = {
+            "index": message['index'],
+            "status": "duplicate",
+            "feedback_id": str(feedback_id) if feedback_id else None
+        }
+
+    if feedbacks:
+        classify_feedback_batch.delay([feedback.id for feedback in feedbacks])
+        observe_feedbacks(feedbacks)
+        publish_events(CREATED, feedbacks)
+
+    logger.info(f"Lot JSON SMS traité: {len(items)} élément(s), {len(feedbacks)} feedback(s) créé(s), "
+                f"{len(duplicates)} doublon(s)")
+    return results
@@ -0,0 +1,257 @@
+"""
+Flux en direct des événements de feedback (Server-Sent Events)
+
+Les chemins existants (création, classification, changement de statut,
+réponse) publient un événement compact après validation de la transaction.
+Les événements transitent par Redis (publication / abonnement) lorsque
+REDIS_URL est configuré : un tableau de bord connecté à n'importe quel
+processus reçoit aussi les événements publiés par les workers Celery. Sans
+Redis (développement, tests), ils ne sont diffusés qu'au sein du processus.
+
+Le point d'accès /api/events/feedback/ est prévu pour un serveur ASGI (une
+coroutine par connexion, voir gunicorn.conf.py) ; sous WSGI il reste
+utilisable en développement, au prix d'un thread par connexion.
+
+Paramètres de requête :
+    token=<jwt>          jeton d'accès (EventSource ne transmet pas d'en-tête)
+    category=3,5         catégories suivies
+    assigned_to=me|<id>  feedbacks assignés à un utilisateur
+    types=feedback.created,feedback.responded
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'feedback-events'
+
+CREATED = 'feedback.created'
+CLASSIFIED = 'feedback.classified'
+STATUS_CHANGED = 'feedback.status_changed'
+RESPONDED = 'feedback.responded'
+EVENT_TYPES = (CREATED, CLASSIFIED, STATUS_CHANGED, RESPONDED)
+
+# Nombre de messages en attente par abonné local avant d'écarter les plus récents
+LOCAL_QUEUE_SIZE = 1000
+
+
+def _setting(name, default):
+    return getattr(settings, 'LIVE_FEED_SETTINGS', {}).get(name, default)
+
+
+class RedisBackplane:
+    """Diffusion entre processus par publication / abonnement Redis"""
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+
+    def publish(self, message):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(CHANNEL, message)
+
+    def listen(self, timeout):
+        """Messages reçus (str), ou None toutes les timeout secondes sans message"""
+        import redis
+        client = redis.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CHANNEL)
+        try:
+            yield None
+            while True:
+                message = pubsub.get_message(timeout=timeout)
+                yield message['data'].decode('utf-8') if message else None
+        finally:
+            pubsub.close()
+            client.close()
+
+    async def alisten(self, timeout):
+        import redis.asyncio as aioredis
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(CHANNEL)
+        try:
+            yield None
+            while True:
+                message = await pubsub.get_message(timeout=timeout)
+                yield message['data'].decode('utf-8') if message else None
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+class LocalBackplane:
+    """Diffusion aux seuls abonnés du processus (sans Redis)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for put in subscribers:
+            put(message)
+
+    def _subscribe(self, put):
+        with self._lock:
+            self._subscribers.add(put)
+
+    def _unsubscribe(self, put):
+        with self._lock:
+            self._subscribers.discard(put)
+
+    def listen(self, timeout):
+        messages = queue.Queue(LOCAL_QUEUE_SIZE)
+
+        def put(message):
+            try:
+                messages.put_nowait(message)
+            except queue.Full:
+                pass
+
+        self._subscribe(put)
+        try:
+            yield None
+            while True:
+                try:
+                    yield messages.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+        finally:
+            self._unsubscribe(put)
+
+    async def alisten(self, timeout):
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue(LOCAL_QUEUE_SIZE)
+
+        def put(message):
+            # Publication depuis un autre thread : remise dans la boucle de l'abonné
+            loop.call_soon_threadsafe(lambda: messages.full() or messages.put_nowait(message))
+
+        self._subscribe(put)
+        try:
+            yield None
+            while True:
+                try:
+                    yield await asyncio.wait_for(messages.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._unsubscribe(put)
+
+
+_backplane = None
+
+
+def get_backplane():
+    global _backplane
+    if _backplane is None:
+        redis_url = getattr(settings, 'REDIS_URL', '')
+        _backplane = RedisBackplane(redis_url) if redis_url else LocalBackplane()
+    return _backplane
+
+
+def event_payload(event_type, feedback, **extra):
+    """Événement compact : identifiants et états, sans contenu ni coordonnées de contact"""
+    return {
+        'type': event_type,
+        'feedback': feedback.id,
+        'status': feedback.status,
+        'category': feedback.category_id,
+        'assigned_to': feedback.assigned_to_id,
+        'channel': feedback.channel,
+        'priority': feedback.priority,
+        'at': timezone.now().isoformat(),
+        **extra,
+    }
+
+
+def publish_events(event_type, feedbacks, **extra):
+    """Publie un événement par feedback, après validation de la transaction en cours"""
+    if not _setting('ENABLED', True):
+        return
+    messages = [json.dumps(event_payload(event_type, feedback, **extra)) for feedback in feedbacks]
+    if not messages:
+        return
+
+    def send():
+        backplane = get_backplane()
+        for message in messages:
+            try:
+                backplane.publish(message)
+            except Exception as e:
+                # Le flux en direct ne doit jamais faire échouer l'action qui le déclenche
+                logger.error(f"Publication de l'événement {event_type} impossible: {str(e)}")
+                return
+
+    transaction.on_commit(send)
+
+
+def publish_event(event_type, feedback, **extra):
+    publish_events(event_type, [feedback], **extra)
+
+
+def parse_filters(params, user):
+    """Filtres d'abonnement depuis les paramètres de requête"""
+    def ids(value):
+        return {int(part) for part in value.split(',') if part.strip().isdigit()}
+
+    filters = {}
+    if params.get('category'):
+        filters['category'] = ids(params['category'])
+    assigned_to = params.get('assigned_to')
+    if assigned_to:
+        filters['assigned_to'] = {user.id} if assigned_to == 'me' else ids(assigned_to)
+    if params.get('types'):
+        filters['types'] = set(params['types'].split(',')) & set(EVENT_TYPES)
+    return filters
+
+
+def matches(event, filters):
+    if 'types' in filters and event['type'] not in filters['types']:
+        return False
+    if 'category' in filters and event.get('category') not in filters['category']:
+        return False
+    if 'assigned_to' in filters and event.get('assigned_to') not in filters['assigned_to']:
+        return False
+    return True
+
+
+def _format(message, filters, connected):
+    """Bloc SSE d'un message (None : connexion établie ou maintien de la connexion)"""
+    if message is None:
+        return ': keepalive\n\n' if connected else f"retry: {_setting('RETRY_MS', 5000)}\n\n"
+    event = json.loads(message)
+    if not matches(event, filters):
+        return None
+    return f"event: {event['type']}\ndata: {message}\n\n"
+
+
+def stream(filters):
+    """Flux SSE synchrone (serveur WSGI)"""
+    connected = False
+    for message in get_backplane().listen(_setting('HEARTBEAT_SECONDS', 15)):
+        chunk = _format(message, filters, connected)
+        connected = True
+        if chunk:
+            yield chunk
+
+
+async def astream(filters):
+    """Flux SSE asynchrone (serveur ASGI)"""
+    connected = False
+    async for message in get_backplane().alisten(_setting('HEARTBEAT_SECONDS', 15)):
+        chunk = _format(message, filters, connected)
+        connected = True
+        if chunk:
+            yield chunk
@@ -0,0 +1,74 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from feedback_api.whatsapp_webhook import parse_whatsapp_payload
+
+# Webhooks WhatsApp enregistrés servant de jeu de données par défaut
+DEFAULT_FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tests', 'fixtures', 'whatsapp'
+)
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de l\'analyseur de webhooks WhatsApp sur des webhooks enregistrés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Fichiers JSON ou répertoires de webhooks enregistrés (par défaut : fixtures des tests)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Nombre de passes sur l\'ensemble des webhooks'
+        )
+
+    def _load_payloads(self, paths):
+        files = []
+        for path in paths or [DEFAULT_FIXTURES_DIR]:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.json')
+                )
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                raise CommandError(f'Fichier ou répertoire introuvable: {path}')
+
+        payloads = []
+        for file_path in files:
+            with open(file_path, encoding='utf-8') as f:
+                payloads.append(json.load(f))
+        return payloads
+
+    def handle(self, *args, **options):
+        payloads = self._load_payloads(options['paths'])
+        iterations = options['iterations']
+        if not payloads:
+            raise CommandError('Aucun webhook à analyser')
+
+        # Nombre de messages et de statuts par passe
+        messages_per_pass = 0
+        statuses_per_pass = 0
+        for payload in payloads:
+            messages, status_updates = parse_whatsapp_payload(payload)
+            messages_per_pass += len(messages)
+            statuses_per_pass += len(status_updates)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for payload in payloads:
+                parse_whatsapp_payload(payload)
+        elapsed = time.perf_counter() - start
+
+        total = (messages_per_pass + statuses_per_pass) * iterations
+        self.stdout.write(f'Webhooks: {len(payloads)}, messages: {messages_per_pass}, statuts: {statuses_per_pass}')
+        self.stdout.write(f'Passes: {iterations}, durée: {elapsed:.3f} s')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total / elapsed:,.0f} éléments/s ({len(payloads) * iterations / elapsed:,.0f} webhooks/s)'
+        ))
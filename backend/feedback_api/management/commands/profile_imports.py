@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Bibliothèques lourdes qui ne doivent pas être importées au démarrage
+# (chargées à la demande par les workers qui en ont besoin)
+HEAVY_MODULES = ('sklearn', 'scipy', 'numpy', 'pandas', 'nltk', 'twilio')
+
+# Code exécuté dans le sous-processus mesuré : démarrage de Django et
+# chargement des URLs (donc des vues), comme un worker web au premier appel
+STARTUP_SNIPPET = (
+    "import django; django.setup(); "
+    "from django.conf import settings; from django.urls import get_resolver; "
+    "get_resolver(settings.ROOT_URLCONF).url_patterns"
+)
+
+
+def parse_importtime(output):
+    """
+    Analyse la sortie de `python -X importtime`.
+
+    Returns:
+        list: triplets (module, temps propre en µs, temps cumulé en µs), dans
+        l'ordre d'import ; seuls les modules importés au premier niveau ont
+        un temps cumulé qui s'additionne
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # ligne d'en-tête
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return entries
+
+
+def measure_startup_imports(snippet=STARTUP_SNIPPET):
+    """
+    Lance un interpréteur neuf avec `-X importtime` sur le code de démarrage
+
+    Returns:
+        dict: total (ms), modules importés et détail par module
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', snippet],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise CommandError(f"Échec du démarrage mesuré: {result.stderr.strip().splitlines()[-1:]}")
+
+    entries = parse_importtime(result.stderr)
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    return {
+        'total_ms': total_us / 1000,
+        'modules': {name for name, _, _, _ in entries},
+        'entries': entries,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mesure le coût des imports au démarrage de Django (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Nombre de modules les plus coûteux à afficher'
+        )
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            default=getattr(settings, 'STARTUP_IMPORT_BUDGET_MS', None),
+            help='Échoue si le temps total d\'import dépasse ce budget (ms)'
+        )
+
+    def handle(self, *args, **options):
+        report = measure_startup_imports()
+
+        self.stdout.write(f"Temps total d'import au démarrage: {report['total_ms']:.0f} ms "
+                          f"({len(report['modules'])} modules)")
+        self.stdout.write(f"{'cumulé (ms)':>12} {'propre (ms)':>12}  module")
+        top = sorted(report['entries'], key=lambda entry: entry[2], reverse=True)[:options['top']]
+        for name, self_us, cumulative_us, depth in top:
+            self.stdout.write(f"{cumulative_us / 1000:>12.1f} {self_us / 1000:>12.1f}  {name}")
+
+        loaded = sorted(
+            module for module in HEAVY_MODULES
+            if module in report['modules']
+        )
+        if loaded:
+            raise CommandError(f"Bibliothèques lourdes importées au démarrage: {', '.join(loaded)}")
+
+        budget = options['budget_ms']
+        if budget and report['total_ms'] > budget:
+            raise CommandError(f"Budget dépassé: {report['total_ms']:.0f} ms > {budget:.0f} ms")
+        self.stdout.write(self.style.SUCCESS('Aucune bibliothèque lourde importée au démarrage'))
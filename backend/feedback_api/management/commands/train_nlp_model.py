@@ -1,13 +1,13 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 import logging
 import os
-import pickle
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
-from feedback_api.models import Feedback, Category, NLPModel, NLPTrainingData
-from feedback_api.nlp import FeedbackClassifier
+from feedback_api.model_artifact import save_artifact, train_artifact
+from feedback_api.models import NLPModel
+from feedback_api.nlp_search import holdout_metrics
+from feedback_api.training_data import load_training_corpus
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +32,52 @@ class Command(BaseCommand):
             action='store_true',
             help='Utiliser les données d\'entraînement existantes en plus des feedbacks'
         )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Entraînement incrémental (HashingVectorizer + partial_fit) sur les seules '
+                 'données validées depuis le dernier passage'
+        )
+        parser.add_argument(
+            '--model-id',
+            type=int,
+            help='Modèle incrémental à mettre à jour (par défaut : création d\'un nouveau modèle)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Avec --incremental : réapprendre toutes les données validées depuis zéro'
+        )
+        parser.add_argument(
+            '--snapshot',
+            type=str,
+            help='Fichier NPZ où mettre en cache le corpus d\'entraînement, réutilisé '
+                 'tant que les données sources n\'ont pas changé'
+        )
+        parser.add_argument(
+            '--search',
+            action='store_true',
+            help='Recherche d\'hyperparamètres en validation croisée (vectoriseurs, n-grammes, '
+                 'NB / SVM linéaire / régression logistique) avant l\'entraînement final'
+        )
+        parser.add_argument(
+            '--search-method',
+            choices=['grid', 'halving'],
+            default='grid',
+            help='Grille complète ou division successive (successive halving)'
+        )
+        parser.add_argument(
+            '--cv',
+            type=int,
+            default=5,
+            help='Nombre de plis de la validation croisée (--search)'
+        )
+        parser.add_argument(
+            '--n-jobs',
+            type=int,
+            default=-1,
+            help='Processus utilisés par la recherche (-1 : tous les cœurs)'
+        )
         parser.add_argument(
             '--name',
             type=str,
@@ -45,102 +91,149 @@ class Command(BaseCommand):
         use_existing = options['use_existing']
         model_name = options['name']
         
+        if options['incremental']:
+            self._train_incremental(options)
+            return
+        
         self.stdout.write(self.style.SUCCESS(f'Début de l\'entraînement du modèle NLP "{model_name}"'))
         
         # Collecter les données d'entraînement
-        training_data = self._collect_training_data(min_samples, use_existing)
+        corpus = self._collect_training_data(min_samples, use_existing, options['snapshot'])
         
-        if not training_data:
+        if not corpus.texts:
             self.stdout.write(self.style.ERROR('Pas assez de données pour entraîner le modèle'))
             return
         
         # Séparer les données en ensembles d'entraînement et de test
-        texts = [item['content'] for item in training_data]
-        labels = [item['category'] for item in training_data]
-        
+        # (étiquettes : ids de catégorie)
         X_train, X_test, y_train, y_test = train_test_split(
-            texts, labels, test_size=test_size, random_state=42, stratify=labels
+            corpus.texts, corpus.category_ids, test_size=test_size, random_state=42, stratify=corpus.category_ids
         )
         
         self.stdout.write(f'Données d\'entraînement: {len(X_train)}, Données de test: {len(X_test)}')
         
+        if options['search']:
+            self._train_with_search(X_train, X_test, y_train, y_test, corpus.categories, options)
+            return
+        
         # Créer et entraîner le classifieur
-        classifier = FeedbackClassifier()
-        classifier.train_model(X_train, y_train)
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        artifact = train_artifact(
+            TfidfVectorizer(max_features=5000), MultinomialNB(), X_train, y_train, corpus.categories
+        )
         
         # Évaluer le modèle
-        y_pred = [classifier.classify(text)[0] for text in X_test]
+        metrics = holdout_metrics(artifact, X_test, y_test)
+        self._write_metrics(metrics)
         
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred, average='weighted', zero_division=0)
-        recall = recall_score(y_test, y_pred, average='weighted', zero_division=0)
-        f1 = f1_score(y_test, y_pred, average='weighted', zero_division=0)
+        # Sauvegarder le modèle
+        model_file = self._save_model(
+            artifact, model_name, metrics['accuracy'], metrics['precision'], metrics['recall'],
+            metrics['f1_score'], len(X_train)
+        )
         
-        self.stdout.write(f'Précision: {accuracy:.4f}')
-        self.stdout.write(f'Precision: {precision:.4f}')
-        self.stdout.write(f'Recall: {recall:.4f}')
-        self.stdout.write(f'F1 Score: {f1:.4f}')
+        self.stdout.write(self.style.SUCCESS(f'Modèle entraîné et sauvegardé: {model_file}'))
+    
+    def _write_metrics(self, metrics):
+        self.stdout.write(f'Précision: {metrics["accuracy"]:.4f}')
+        self.stdout.write(f'Precision: {metrics["precision"]:.4f}')
+        self.stdout.write(f'Recall: {metrics["recall"]:.4f}')
+        self.stdout.write(f'F1 Score: {metrics["f1_score"]:.4f}')
+    
+    def _train_with_search(self, X_train, X_test, y_train, y_test, categories, options):
+        """
+        Choisit la meilleure combinaison en validation croisée sur le jeu
+        d'entraînement, l'entraîne puis l'évalue sur le jeu de test tenu à part
+        """
+        from collections import Counter
+        from feedback_api.nlp_search import candidate_label, search_hyperparameters, train_candidate
         
-        # Sauvegarder le modèle
-        model_file = self._save_model(classifier, model_name, accuracy, precision, recall, f1, len(X_train))
+        # Chaque pli doit contenir au moins un exemple de chaque catégorie
+        cv = max(2, min(options['cv'], min(Counter(y_train).values())))
+        self.stdout.write(f'Recherche d\'hyperparamètres ({options["search_method"]}, {cv} plis)...')
+        search = search_hyperparameters(
+            X_train, y_train, cv=cv, method=options['search_method'], n_jobs=options['n_jobs']
+        )
+        
+        ranking = sorted(search.scores.items(), key=lambda item: item[1], reverse=True)
+        for candidate, score in ranking[:10]:
+            self.stdout.write(f'  {score:.4f}  {candidate_label(candidate)}')
+        self.stdout.write(f'Meilleure combinaison: {candidate_label(search.best)} '
+                          f'(F1 validation croisée: {search.best_score:.4f}, {search.duration_seconds} s)')
         
+        artifact = train_candidate(search.best, X_train, y_train, categories)
+        metrics = holdout_metrics(artifact, X_test, y_test)
+        self._write_metrics(metrics)
+        
+        model_file = self._save_model(
+            artifact, options['name'], metrics['accuracy'], metrics['precision'], metrics['recall'],
+            metrics['f1_score'], len(X_train),
+            model_type=f'{search.best.vectorizer}{search.best.ngram_range} + {search.best.classifier}',
+            hyperparameters={
+                'vectorizer': search.best.vectorizer,
+                'ngram_range': list(search.best.ngram_range),
+                'classifier': search.best.classifier,
+                'params': dict(search.best.params),
+                'search_method': options['search_method'],
+                'cv_folds': cv,
+                'cv_f1_score': search.best_score,
+                'test_size': len(X_test),
+            }
+        )
         self.stdout.write(self.style.SUCCESS(f'Modèle entraîné et sauvegardé: {model_file}'))
     
-    def _collect_training_data(self, min_samples, use_existing):
+    def _train_incremental(self, options):
+        """Crée ou met à jour un modèle incrémental avec les nouvelles données validées"""
+        from feedback_api.nlp_training import INCREMENTAL_MODEL_TYPE, train_incremental
+        
+        if options['model_id']:
+            try:
+                model = NLPModel.objects.get(id=options['model_id'])
+            except NLPModel.DoesNotExist:
+                raise CommandError(f'Modèle NLP {options["model_id"]} introuvable')
+        else:
+            model = NLPModel.objects.create(
+                name=options['name'],
+                description='Modèle entraîné de façon incrémentale',
+                model_type=INCREMENTAL_MODEL_TYPE,
+                version='1.0'
+            )
+        
+        self.stdout.write(f'Entraînement incrémental du modèle NLP {model.id} "{model.name}"')
+        result = train_incremental(model, full=options['full'])
+        
+        self.stdout.write(f'Données apprises: {result["learned"]} (dont {result["evaluated"]} évaluées avant apprentissage)')
+        if 'accuracy' in result:
+            self.stdout.write(f'Précision sur les nouvelles données: {result["accuracy"]:.4f}')
+        self.stdout.write(self.style.SUCCESS(f'Terminé en {result["duration_seconds"]} s'))
+    
+    def _collect_training_data(self, min_samples, use_existing, snapshot_path=None):
         """Collecte les données d'entraînement à partir des feedbacks et des données existantes"""
-        training_data = []
-        
-        # Collecter les feedbacks avec une catégorie
-        feedbacks = Feedback.objects.filter(category__isnull=False)
-        self.stdout.write(f'Feedbacks avec catégorie trouvés: {feedbacks.count()}')
-        
-        # Regrouper par catégorie
-        category_data = {}
-        for feedback in feedbacks:
-            category_name = feedback.category.name
-            if category_name not in category_data:
-                category_data[category_name] = []
-            
-            category_data[category_name].append({
-                'content': feedback.content,
-                'category': category_name
-            })
-        
-        # Ajouter les données d'entraînement existantes si demandé
-        if use_existing:
-            training_entries = NLPTrainingData.objects.filter(is_validated=True)
-            self.stdout.write(f'Données d\'entraînement validées trouvées: {training_entries.count()}')
-            
-            for entry in training_entries:
-                category_name = entry.category.name
-                if category_name not in category_data:
-                    category_data[category_name] = []
-                
-                category_data[category_name].append({
-                    'content': entry.content,
-                    'category': category_name
-                })
-        
-        # Filtrer les catégories avec trop peu d'échantillons
-        valid_categories = {}
-        for category, samples in category_data.items():
-            if len(samples) >= min_samples:
-                valid_categories[category] = len(samples)
-                training_data.extend(samples)
-            else:
-                self.stdout.write(
-                    self.style.WARNING(
-                        f'Catégorie "{category}" ignorée: seulement {len(samples)} échantillons (min: {min_samples})'
-                    )
+        corpus = load_training_corpus(
+            min_samples=min_samples,
+            include_feedback=True,
+            include_training_data=use_existing,
+            snapshot_path=snapshot_path
+        )
+        if corpus.from_snapshot:
+            self.stdout.write(f'Corpus relu depuis l\'instantané {snapshot_path}')
+        
+        for category, count in corpus.skipped.items():
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Catégorie "{category}" ignorée: seulement {count} échantillons (min: {min_samples})'
                 )
+            )
         
-        self.stdout.write(f'Catégories valides pour l\'entraînement: {len(valid_categories)}')
-        for category, count in valid_categories.items():
-            self.stdout.write(f'  - {category}: {count} échantillons')
+        self.stdout.write(f'Catégories valides pour l\'entraînement: {len(corpus.categories)}')
+        for category_id, count in corpus.counts.items():
+            self.stdout.write(f'  - {corpus.categories[category_id]}: {count} échantillons')
         
-        return training_data
+        return corpus
     
-    def _save_model(self, classifier, name, accuracy, precision, recall, f1, training_size):
+    def _save_model(self, artifact, name, accuracy, precision, recall, f1, training_size,
+                    model_type='TF-IDF + MultinomialNB', hyperparameters=None):
         """Sauvegarde le modèle entraîné et crée une entrée dans la base de données"""
         from django.conf import settings
         import os
@@ -155,8 +248,7 @@ class Command(BaseCommand):
         filepath = os.path.join(models_dir, filename)
         
         # Sauvegarder le modèle sur le disque
-        with open(filepath, 'wb') as f:
-            pickle.dump(classifier.model, f)
+        checksum = save_artifact(artifact, filepath)
         
         # Désactiver tous les modèles existants
         NLPModel.objects.filter(is_active=True).update(is_active=False)
@@ -165,7 +257,7 @@ class Command(BaseCommand):
         model = NLPModel.objects.create(
             name=name,
             description=f'Modèle entraîné le {timezone.now().strftime("%d/%m/%Y à %H:%M")}',
-            model_type='TF-IDF + MultinomialNB',
+            model_type=model_type,
             version='1.0',
             file=f'nlp_models/{filename}',
             is_active=True,
@@ -175,7 +267,9 @@ class Command(BaseCommand):
             recall=recall,
             f1_score=f1,
             training_data_size=training_size,
-            last_trained=timezone.now()
+            last_trained=timezone.now(),
+            hyperparameters=hyperparameters or {},
+            checksum=checksum
         )
         
         return filepath
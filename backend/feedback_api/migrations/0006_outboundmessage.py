@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0005_keywordrule_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('web', 'Site Web'), ('sms', 'SMS'), ('whatsapp', 'WhatsApp'), ('email', 'Email'), ('api', 'API')], max_length=20, verbose_name='Canal')),
+                ('provider', models.CharField(blank=True, choices=[('twilio', 'Twilio'), ('facebook', 'Facebook WhatsApp'), ('simulation', 'Simulation')], max_length=20, verbose_name='Fournisseur')),
+                ('provider_message_id', models.CharField(blank=True, db_index=True, max_length=100, verbose_name='ID fournisseur')),
+                ('to', models.CharField(max_length=30, verbose_name='Destinataire')),
+                ('status', models.CharField(choices=[('queued', "En file d'attente"), ('sent', 'Envoyé'), ('delivered', 'Livré'), ('read', 'Lu'), ('failed', 'Échec')], default='queued', max_length=10, verbose_name='Statut')),
+                ('provider_status', models.CharField(blank=True, max_length=30, verbose_name='Statut fournisseur')),
+                ('error_code', models.CharField(blank=True, max_length=50, verbose_name="Code d'erreur")),
+                ('retry_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de tentatives supplémentaires')),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de mise en file')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name="Date d'envoi")),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de livraison')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de lecture')),
+                ('failed_at', models.DateTimeField(blank=True, null=True, verbose_name="Date d'échec")),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='outbound_messages', to='feedback_api.notification', verbose_name='Notification')),
+                ('response', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='outbound_messages', to='feedback_api.response', verbose_name='Réponse')),
+            ],
+            options={
+                'verbose_name': 'Message sortant',
+                'verbose_name_plural': 'Messages sortants',
+                'ordering': ['-enqueued_at'],
+                'indexes': [models.Index(fields=['channel', 'enqueued_at'], name='outbound_channel_enqueued_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0006_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedback',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=128, verbose_name='ID externe'),
+        ),
+        migrations.CreateModel(
+            name='InboundMessageReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('twilio', 'Twilio'), ('facebook', 'Facebook WhatsApp'), ('json_sms', 'Passerelle SMS JSON')], max_length=20, verbose_name='Source')),
+                ('message_key', models.CharField(max_length=128, verbose_name='Clé du message')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de réception')),
+                ('feedback', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inbound_receipts', to='feedback_api.feedback', verbose_name='Feedback')),
+            ],
+            options={
+                'verbose_name': 'Accusé de réception entrant',
+                'verbose_name_plural': 'Accusés de réception entrants',
+                'ordering': ['-received_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inboundmessagereceipt',
+            constraint=models.UniqueConstraint(fields=('source', 'message_key'), name='unique_inbound_message'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+def backfill_validated_at(apps, schema_editor):
+    """Données validées avant le suivi de la date de validation : date d'ajout"""
+    NLPTrainingData = apps.get_model('feedback_api', 'NLPTrainingData')
+    NLPTrainingData.objects.filter(is_validated=True, validated_at__isnull=True).update(
+        validated_at=models.F('added_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0007_inboundmessagereceipt_alter_feedback_external_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_validated_at, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='nlpmodel',
+            name='training_checkpoint',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Point de reprise de l'entraînement"),
+        ),
+        migrations.AddIndex(
+            model_name='nlptrainingdata',
+            index=models.Index(fields=['is_validated', 'validated_at'], name='nlp_training_validated_idx'),
+        ),
+    ]
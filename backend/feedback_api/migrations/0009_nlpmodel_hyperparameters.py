@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0008_nlp_incremental_training'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nlpmodel',
+            name='hyperparameters',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Hyperparamètres'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0009_nlpmodel_hyperparameters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nlpmodel',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Empreinte du fichier'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0010_nlpmodel_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nlpmodel',
+            name='shadow_mode',
+            field=models.BooleanField(default=False, verbose_name='Évaluation en mode fantôme'),
+        ),
+        migrations.AddField(
+            model_name='nlpmodel',
+            name='shadow_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Début de l'évaluation en mode fantôme"),
+        ),
+        migrations.CreateModel(
+            name='ShadowPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('confidence', models.FloatField(default=0.0, verbose_name='Confiance')),
+                ('latency_us', models.PositiveIntegerField(default=0, verbose_name="Durée d'inférence (µs)")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('feedback', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shadow_predictions', to='feedback_api.feedback', verbose_name='Feedback')),
+                ('nlp_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shadow_predictions', to='feedback_api.nlpmodel', verbose_name='Modèle NLP')),
+                ('predicted_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='feedback_api.category', verbose_name='Catégorie prédite')),
+            ],
+            options={
+                'verbose_name': 'Prédiction en mode fantôme',
+                'verbose_name_plural': 'Prédictions en mode fantôme',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shadowprediction',
+            constraint=models.UniqueConstraint(fields=('nlp_model', 'feedback'), name='unique_shadow_prediction'),
+        ),
+    ]
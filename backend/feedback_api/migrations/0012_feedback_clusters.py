@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0011_nlp_shadow_evaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.BinaryField(verbose_name='Signature MinHash')),
+                ('size', models.PositiveIntegerField(default=1, verbose_name='Nombre de feedbacks')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('representative', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='feedback_api.feedback', verbose_name='Feedback représentatif')),
+            ],
+            options={
+                'verbose_name': 'Groupe de doublons',
+                'verbose_name_plural': 'Groupes de doublons',
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClusterBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Bande')),
+                ('key', models.BigIntegerField(verbose_name='Clé')),
+                ('cluster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='feedback_api.feedbackcluster', verbose_name='Groupe de doublons')),
+            ],
+            options={
+                'verbose_name': 'Alvéole LSH',
+                'verbose_name_plural': 'Alvéoles LSH',
+            },
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='feedbacks', to='feedback_api.feedbackcluster', verbose_name='Groupe de doublons'),
+        ),
+        migrations.AddConstraint(
+            model_name='clusterbucket',
+            constraint=models.UniqueConstraint(fields=('band', 'key'), name='unique_cluster_bucket'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0012_feedback_clusters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='hotspot_cell',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='Cellule de la grille'),
+        ),
+        migrations.CreateModel(
+            name='HotspotCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.BigIntegerField(verbose_name='Cellule de la grille')),
+                ('hour', models.DateTimeField(verbose_name='Heure')),
+                ('count', models.PositiveIntegerField(verbose_name='Nombre de feedbacks')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='feedback_api.category', verbose_name='Catégorie')),
+            ],
+            options={
+                'verbose_name': 'Comptage horaire par cellule',
+                'verbose_name_plural': 'Comptages horaires par cellule',
+                'indexes': [models.Index(fields=['hour'], name='hotspot_count_hour_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0013_hotspot_detection'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['latitude', 'longitude'], name='feedback_lat_lon_idx'),
+        ),
+    ]
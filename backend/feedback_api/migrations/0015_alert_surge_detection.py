@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0014_feedback_location_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='detection_latency',
+            field=models.FloatField(blank=True, null=True, verbose_name='Délai de détection (s)'),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='surge_series',
+            field=models.CharField(blank=True, db_index=True, max_length=255, verbose_name='Série en afflux'),
+        ),
+    ]
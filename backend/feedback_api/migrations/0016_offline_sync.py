@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def clear_duplicate_local_ids(apps, schema_editor):
+    """Garde le local_id sur le plus ancien feedback de chaque doublon, vide les autres"""
+    Feedback = apps.get_model('feedback_api', 'Feedback')
+    duplicates = (
+        Feedback.objects.exclude(local_id='').values('local_id')
+        .annotate(count=models.Count('id'), first_id=models.Min('id')).filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        Feedback.objects.filter(local_id=duplicate['local_id']).exclude(id=duplicate['first_id']).update(local_id='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('feedback_api', '0015_alert_surge_detection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('client_key', models.CharField(max_length=100, verbose_name='Clé client')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Nom du fichier')),
+                ('file_type', models.CharField(max_length=100, verbose_name='Type de fichier')),
+                ('file_size', models.BigIntegerField(verbose_name='Taille du fichier')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='Empreinte SHA-256')),
+                ('received', models.BigIntegerField(default=0, verbose_name='Octets reçus')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Envoi de pièce jointe',
+                'verbose_name_plural': 'Envois de pièces jointes',
+            },
+        ),
+        migrations.RunPython(clear_duplicate_local_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='feedback',
+            constraint=models.UniqueConstraint(condition=models.Q(('local_id', ''), _negated=True), fields=('local_id',), name='unique_feedback_local_id'),
+        ),
+        migrations.AddField(
+            model_name='attachmentupload',
+            name='attachment',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='feedback_api.attachment', verbose_name='Pièce jointe'),
+        ),
+        migrations.AddField(
+            model_name='attachmentupload',
+            name='feedback',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='feedback_api.feedback', verbose_name='Feedback'),
+        ),
+        migrations.AddField(
+            model_name='attachmentupload',
+            name='uploaded_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Envoyé par'),
+        ),
+        migrations.AddConstraint(
+            model_name='attachmentupload',
+            constraint=models.UniqueConstraint(fields=('uploaded_by', 'client_key'), name='unique_attachment_upload'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:42
+
+from django.db import migrations, models
+
+
+def delete_duplicate_counts(apps, schema_editor):
+    """Supprime les comptages insérés deux fois par des passages simultanés"""
+    HotspotCount = apps.get_model('feedback_api', 'HotspotCount')
+    duplicates = (
+        HotspotCount.objects.values('cell', 'category', 'hour')
+        .annotate(count=models.Count('id'), first_id=models.Min('id')).filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        HotspotCount.objects.filter(
+            cell=duplicate['cell'], category=duplicate['category'], hour=duplicate['hour']
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0018_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_counts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='hotspotcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('cell', 'category', 'hour'), name='unique_hotspot_count'),
+        ),
+        migrations.AddConstraint(
+            model_name='hotspotcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('cell', 'hour'), name='unique_hotspot_count_uncategorized'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:53
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def initialize_updated_at(apps, schema_editor):
+    """Date de la dernière modification connue : les données déjà apprises ne sont pas réapprises"""
+    NLPTrainingData = apps.get_model('feedback_api', 'NLPTrainingData')
+    NLPTrainingData.objects.update(updated_at=Coalesce('validated_at', 'added_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0019_hotspot_count_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='nlptrainingdata',
+            name='nlp_training_validated_idx',
+        ),
+        migrations.AddField(
+            model_name='nlptrainingdata',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour'),
+        ),
+        migrations.RunPython(initialize_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='nlptrainingdata',
+            index=models.Index(fields=['is_validated', 'updated_at'], name='nlp_training_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_hotspot_category(apps, schema_editor):
+    """Catégorie des alertes de zone déjà rédigées : celle de leur feedback de rattachement"""
+    Alert = apps.get_model('feedback_api', 'Alert')
+    Feedback = apps.get_model('feedback_api', 'Feedback')
+    Alert.objects.filter(hotspot_cell__isnull=False).update(hotspot_category_id=models.Subquery(
+        Feedback.objects.filter(id=models.OuterRef('feedback_id')).values('category_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback_api', '0020_nlp_training_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='hotspot_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='feedback_api.category', verbose_name='Catégorie de la zone'),
+        ),
+        migrations.RunPython(backfill_hotspot_category, migrations.RunPython.noop),
+    ]
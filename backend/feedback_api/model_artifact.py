@@ -0,0 +1,170 @@
+"""
+Format versionné des modèles NLP entraînés
+
+Un artefact regroupe le vectoriseur, le classifieur et le vocabulaire des
+étiquettes (ids et noms des Category). Le classifieur est entraîné sur les
+indices 0..n-1 de ce vocabulaire : la colonne de predict_proba est
+directement l'indice de la catégorie, sans recherche dans une liste.
+
+Fichier : une ligne d'en-tête JSON (versions du format et du prétraitement,
+étiquettes, empreinte SHA-256 de la charge utile) suivie de la charge
+utile pickle. Le chargement échoue immédiatement (ModelArtifactError) si
+une version ne correspond pas ou si l'empreinte diffère, avant tout
+désérialisation.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+from django.utils import timezone
+
+from .nlp import PREPROCESSING_VERSION, preprocess_text
+
+ARTIFACT_FORMAT_VERSION = 1
+
+MAGIC = b'FEEDBACK-NLP-MODEL'
+
+
+class ModelArtifactError(Exception):
+    """Fichier de modèle illisible, corrompu ou d'une version incompatible"""
+
+
+class ModelArtifact:
+    """Vectoriseur + classifieur + vocabulaire des catégories, prêts pour l'inférence"""
+
+    def __init__(self, vectorizer, classifier, label_ids, label_names, metadata=None):
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.label_ids = list(label_ids)
+        self.label_names = list(label_names)
+        self.metadata = metadata or {}
+        self.checksum = None
+
+    def encode_labels(self, category_ids):
+        """Ids de catégorie -> indices du vocabulaire (entraînement)"""
+        index = {category_id: position for position, category_id in enumerate(self.label_ids)}
+        return [index[category_id] for category_id in category_ids]
+
+    def transform(self, texts):
+        return self.vectorizer.transform([preprocess_text(text) for text in texts])
+
+    def predict_many(self, texts):
+        """
+        Returns:
+            list: triplets (id de catégorie, nom de catégorie, confiance)
+        """
+        if not texts:
+            return []
+        probabilities = self.classifier.predict_proba(self.transform(texts))
+        best = probabilities.argmax(axis=1)
+        return [
+            (self.label_ids[index], self.label_names[index], float(row[index]))
+            for index, row in zip(best, probabilities)
+        ]
+
+    def predict(self, text):
+        return self.predict_many([text])[0]
+
+
+def train_artifact(vectorizer, classifier, texts, category_ids, categories, metadata=None):
+    """
+    Entraîne un artefact sur des textes étiquetés par id de catégorie
+
+    Args:
+        categories (dict): {id: nom} des catégories ; le vocabulaire est trié
+            par id pour être stable d'un entraînement à l'autre
+    """
+    label_ids = sorted(set(category_ids))
+    artifact = ModelArtifact(vectorizer, classifier, label_ids, [categories[i] for i in label_ids], metadata)
+    X = vectorizer.fit_transform([preprocess_text(text) for text in texts])
+    classifier.fit(X, artifact.encode_labels(category_ids))
+    return artifact
+
+
+def save_artifact(artifact, path):
+    """
+    Écrit l'artefact (fichier temporaire renommé : jamais de fichier à moitié écrit)
+
+    Returns:
+        str: empreinte SHA-256 de la charge utile
+    """
+    payload = pickle.dumps({'vectorizer': artifact.vectorizer, 'classifier': artifact.classifier},
+                           protocol=pickle.HIGHEST_PROTOCOL)
+    checksum = hashlib.sha256(payload).hexdigest()
+    header = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'preprocessing_version': PREPROCESSING_VERSION,
+        'label_ids': artifact.label_ids,
+        'label_names': artifact.label_names,
+        'metadata': artifact.metadata,
+        'created_at': timezone.now().isoformat(),
+        'sha256': checksum,
+        'payload_size': len(payload),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(MAGIC + b' ' + json.dumps(header).encode('utf-8') + b'\n')
+        f.write(payload)
+    os.replace(f'{path}.tmp', path)
+    artifact.checksum = checksum
+    return checksum
+
+
+def read_artifact_header(path):
+    """Lit et vérifie l'en-tête sans charger la charge utile"""
+    with open(path, 'rb') as f:
+        return _read_header(f, path)
+
+
+def _read_header(f, path):
+    line = f.readline()
+    if not line.startswith(MAGIC + b' '):
+        raise ModelArtifactError(f"{path}: format de modèle non versionné (à réentraîner)")
+    try:
+        header = json.loads(line[len(MAGIC) + 1:])
+    except ValueError:
+        raise ModelArtifactError(f"{path}: en-tête illisible")
+
+    if header.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ModelArtifactError(
+            f"{path}: version de format {header.get('format_version')} "
+            f"(attendue: {ARTIFACT_FORMAT_VERSION})"
+        )
+    if header.get('preprocessing_version') != PREPROCESSING_VERSION:
+        raise ModelArtifactError(
+            f"{path}: entraîné avec le prétraitement v{header.get('preprocessing_version')} "
+            f"(actuel: v{PREPROCESSING_VERSION})"
+        )
+    return header
+
+
+def load_artifact(path, expected_checksum=None):
+    """
+    Charge un artefact après vérification des versions et de l'empreinte
+
+    Args:
+        expected_checksum (str): empreinte enregistrée sur le NLPModel, le
+            cas échéant (détecte un fichier remplacé)
+
+    Raises:
+        ModelArtifactError
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = _read_header(f, path)
+            payload = f.read()
+    except OSError as e:
+        raise ModelArtifactError(f"{path}: {str(e)}")
+
+    checksum = hashlib.sha256(payload).hexdigest()
+    if checksum != header['sha256'] or (expected_checksum and checksum != expected_checksum):
+        raise ModelArtifactError(f"{path}: empreinte invalide, fichier corrompu ou remplacé")
+
+    content = pickle.loads(payload)
+    artifact = ModelArtifact(
+        content['vectorizer'], content['classifier'],
+        header['label_ids'], header['label_names'], header.get('metadata')
+    )
+    artifact.checksum = checksum
+    return artifact
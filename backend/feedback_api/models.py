@@ -1,8 +1,10 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User, AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -155,7 +157,7 @@ class Feedback(models.Model):
     contact_email = models.EmailField(_("Email de contact"), blank=True)
     # Nouveaux champs supplémentaires
     reference_number = models.CharField(_("Numéro de référence"), max_length=20, blank=True)
-    external_id = models.CharField(_("ID externe"), max_length=50, blank=True)
+    external_id = models.CharField(_("ID externe"), max_length=128, blank=True)
     source_url = models.URLField(_("URL de source"), blank=True)
     
     # Géolocalisation
@@ -182,15 +184,89 @@ class Feedback(models.Model):
     local_id = models.CharField(_("ID local"), max_length=100, blank=True)
     sync_status = models.CharField(_("Statut de synchronisation"), max_length=20, default='SYNCED')
     
+    # Groupe de messages quasi identiques (voir near_duplicates)
+    cluster = models.ForeignKey(
+        'FeedbackCluster',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='feedbacks',
+        verbose_name=_("Groupe de doublons")
+    )
+    
     class Meta:
         verbose_name = _("Feedback")
         verbose_name_plural = _("Feedbacks")
         ordering = ["-created_at"]
+        indexes = [
+            # Filtres géographiques (bbox, rayon) : voir geo.py
+            models.Index(fields=['latitude', 'longitude'], name='feedback_lat_lon_idx'),
+            # Synchronisation différentielle (pagination par clé) : voir change_feed.py
+            models.Index(fields=['updated_at', 'id'], name='feedback_updated_id_idx'),
+        ]
+        constraints = [
+            # Identifiant généré par l'appareil : rend la synchronisation hors-ligne idempotente (offline_sync.py)
+            models.UniqueConstraint(fields=['local_id'], condition=~Q(local_id=''), name='unique_feedback_local_id'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut chargé : ses changements sont publiés dans le flux en direct (voir signals)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
     
     def __str__(self):
         return f"Feedback #{self.id} - {self.get_status_display()}"
 
 
+class FeedbackCluster(models.Model):
+    """Groupe de feedbacks quasi identiques (transferts en masse, messages types)"""
+    representative = models.ForeignKey(
+        Feedback,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name=_("Feedback représentatif")
+    )
+    # Signature MinHash du feedback représentatif (uint32 x NUM_PERM)
+    signature = models.BinaryField(_("Signature MinHash"))
+    size = models.PositiveIntegerField(_("Nombre de feedbacks"), default=1)
+    created_at = models.DateTimeField(_("Date de création"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("Date de mise à jour"), auto_now=True)
+    
+    class Meta:
+        verbose_name = _("Groupe de doublons")
+        verbose_name_plural = _("Groupes de doublons")
+        ordering = ["-updated_at"]
+    
+    def __str__(self):
+        return f"Groupe #{self.id} ({self.size} feedbacks)"
+
+
+class ClusterBucket(models.Model):
+    """Table LSH persistée : alvéole (bande, clé) -> groupe de doublons"""
+    band = models.PositiveSmallIntegerField(_("Bande"))
+    key = models.BigIntegerField(_("Clé"))
+    cluster = models.ForeignKey(
+        FeedbackCluster,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name=_("Groupe de doublons")
+    )
+    
+    class Meta:
+        verbose_name = _("Alvéole LSH")
+        verbose_name_plural = _("Alvéoles LSH")
+        constraints = [
+            # Une alvéole appartient au premier groupe qui l'a occupée
+            models.UniqueConstraint(fields=['band', 'key'], name='unique_cluster_bucket'),
+        ]
+    
+    def __str__(self):
+        return f"Alvéole {self.band}:{self.key} -> groupe #{self.cluster_id}"
+
+
 class Response(models.Model):
     """Réponses aux feedbacks par les modérateurs"""
     feedback = models.ForeignKey(
@@ -255,6 +331,10 @@ class Log(models.Model):
         verbose_name = _("Journal")
         verbose_name_plural = _("Journaux")
         ordering = ["-timestamp"]
+        indexes = [
+            # Flux des modifications lu dans le journal : voir change_feed.py
+            models.Index(fields=['timestamp', 'id'], name='log_timestamp_id_idx'),
+        ]
     
     def __str__(self):
         return f"Log #{self.id} - {self.get_action_display()} sur #{self.feedback.id}"
@@ -303,6 +383,21 @@ class FeedbackTag(models.Model):
         return f"{self.feedback} - {self.tag}"
 
 
+class AttachmentBlob(models.Model):
+    """Contenu d'une pièce jointe, stocké une seule fois sous son empreinte (voir attachment_store.py)"""
+    sha256 = models.CharField(_('Empreinte SHA-256'), max_length=64, unique=True)
+    file = models.FileField(_('Fichier'), max_length=255)
+    size = models.BigIntegerField(_('Taille'))
+    created_at = models.DateTimeField(_('Date de création'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Contenu de pièce jointe')
+        verbose_name_plural = _('Contenus de pièces jointes')
+    
+    def __str__(self):
+        return self.sha256
+
+
 class Attachment(models.Model):
     """Pièces jointes aux feedbacks"""
     feedback = models.ForeignKey(
@@ -311,6 +406,14 @@ class Attachment(models.Model):
         related_name='attachments',
         verbose_name=_('Feedback'))
     file = models.FileField(_('Fichier'), upload_to='attachments/')
+    # Contenu partagé (file pointe vers son fichier) ; vide pour les pièces jointes antérieures au stockage par empreinte
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='attachments',
+        verbose_name=_('Contenu'))
     file_name = models.CharField(_('Nom du fichier'), max_length=255)
     file_type = models.CharField(_('Type de fichier'), max_length=100)
     file_size = models.IntegerField(_('Taille du fichier'))  # Taille en octets
@@ -331,6 +434,47 @@ class Attachment(models.Model):
         return self.file_name
 
 
+class AttachmentUpload(models.Model):
+    """Envoi par morceaux d'une pièce jointe, reprenable après une coupure (voir offline_sync.py)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    feedback = models.ForeignKey(
+        Feedback,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Feedback'))
+    uploaded_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Envoyé par'))
+    # Identifiant de la pièce jointe sur l'appareil : un nouvel essai reprend le même envoi
+    client_key = models.CharField(_('Clé client'), max_length=100)
+    file_name = models.CharField(_('Nom du fichier'), max_length=255)
+    file_type = models.CharField(_('Type de fichier'), max_length=100)
+    file_size = models.BigIntegerField(_('Taille du fichier'))
+    sha256 = models.CharField(_('Empreinte SHA-256'), max_length=64, blank=True)
+    received = models.BigIntegerField(_('Octets reçus'), default=0)
+    attachment = models.OneToOneField(
+        Attachment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('Pièce jointe'))
+    created_at = models.DateTimeField(_('Date de création'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Date de mise à jour'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Envoi de pièce jointe')
+        verbose_name_plural = _('Envois de pièces jointes')
+        constraints = [
+            models.UniqueConstraint(fields=['uploaded_by', 'client_key'], name='unique_attachment_upload'),
+        ]
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.received}/{self.file_size})"
+
+
 class Alert(models.Model):
     """Alertes générées à partir des feedbacks"""
     
@@ -397,6 +541,21 @@ class Alert(models.Model):
         blank=True,
         help_text=_('Groupes de destinataires séparés par virgule'))
     
+    # Alerte rédigée par la détection des zones de concentration (voir hotspots)
+    hotspot_cell = models.BigIntegerField(_('Cellule de la grille'), null=True, blank=True, db_index=True)
+    hotspot_category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('Catégorie de la zone'))
+    
+    # Alerte rédigée par la détection des afflux (voir surge) : série
+    # « canal|catégorie|localisation » et délai depuis l'arrivée du message déclencheur
+    surge_series = models.CharField(_('Série en afflux'), max_length=255, blank=True, db_index=True)
+    detection_latency = models.FloatField(_('Délai de détection (s)'), null=True, blank=True)
+    
     class Meta:
         verbose_name = _('Alerte')
         verbose_name_plural = _('Alertes')
@@ -406,6 +565,38 @@ class Alert(models.Model):
         return self.title
 
 
+class HotspotCount(models.Model):
+    """Nombre horaire de feedbacks géolocalisés par cellule de la grille et par catégorie"""
+    cell = models.BigIntegerField(_('Cellule de la grille'))
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('Catégorie'))
+    hour = models.DateTimeField(_('Heure'))
+    count = models.PositiveIntegerField(_('Nombre de feedbacks'))
+    
+    class Meta:
+        verbose_name = _('Comptage horaire par cellule')
+        verbose_name_plural = _('Comptages horaires par cellule')
+        indexes = [
+            models.Index(fields=['hour'], name='hotspot_count_hour_idx'),
+        ]
+        # Un comptage par (cellule, catégorie, heure) : deux passages simultanés ne comptent pas deux fois
+        # (NULL n'étant jamais égal à NULL, les feedbacks sans catégorie ont leur propre contrainte)
+        constraints = [
+            models.UniqueConstraint(fields=['cell', 'category', 'hour'], condition=Q(category__isnull=False),
+                                    name='unique_hotspot_count'),
+            models.UniqueConstraint(fields=['cell', 'hour'], condition=Q(category__isnull=True),
+                                    name='unique_hotspot_count_uncategorized'),
+        ]
+    
+    def __str__(self):
+        return f"Cellule {self.cell} à {self.hour:%Y-%m-%d %H:00}: {self.count}"
+
+
 class NLPModel(models.Model):
     """Modèles d'apprentissage automatique pour la classification"""
     name = models.CharField(_('Nom'), max_length=100)
@@ -428,6 +619,17 @@ class NLPModel(models.Model):
     last_used = models.DateTimeField(_('Dernière utilisation'), null=True, blank=True)
     created_at = models.DateTimeField(_('Date de création'), auto_now_add=True)
     last_trained = models.DateTimeField(_('Dernière formation'), null=True, blank=True)
+    # Entraînement incrémental : date de validation de la dernière donnée
+    # d'entraînement apprise (les suivantes seront apprises au prochain passage)
+    training_checkpoint = models.DateTimeField(_('Point de reprise de l\'entraînement'), null=True, blank=True)
+    # Combinaison retenue par la recherche d'hyperparamètres et score de validation croisée
+    hyperparameters = models.JSONField(_('Hyperparamètres'), default=dict, blank=True)
+    # Empreinte SHA-256 de l'artefact (model_artifact), vérifiée au chargement
+    checksum = models.CharField(_('Empreinte du fichier'), max_length=64, blank=True)
+    # Évaluation en mode fantôme : le modèle classe le trafic réel en tâche de
+    # fond (ShadowPrediction) sans jamais remplacer la classification en service
+    shadow_mode = models.BooleanField(_('Évaluation en mode fantôme'), default=False)
+    shadow_started_at = models.DateTimeField(_('Début de l\'évaluation en mode fantôme'), null=True, blank=True)
     
     class Meta:
         verbose_name = _('Modèle NLP')
@@ -462,14 +664,65 @@ class NLPTrainingData(models.Model):
         verbose_name=_('Validé par'))
     added_at = models.DateTimeField(_('Date d\'ajout'), auto_now_add=True)
     validated_at = models.DateTimeField(_('Date de validation'), null=True, blank=True)
+    # Point de reprise de l'entraînement incrémental : une correction (contenu, catégorie) est réapprise
+    updated_at = models.DateTimeField(_('Date de mise à jour'), auto_now=True)
     
     class Meta:
         verbose_name = _('Donnée d\'entraînement NLP')
         verbose_name_plural = _('Données d\'entraînement NLP')
         ordering = ["-added_at"]
+        indexes = [
+            # Données validées ou corrigées depuis le point de reprise (entraînement incrémental)
+            models.Index(fields=['is_validated', 'updated_at'], name='nlp_training_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Donnée d'entraînement pour {self.category.name}"
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.is_validated and self.validated_at is None:
+            self.validated_at = timezone.now()
+            if update_fields is not None:
+                update_fields = set(update_fields) | {'validated_at'}
+        if update_fields is not None:
+            # auto_now n'est enregistré qu'avec les champs listés
+            kwargs['update_fields'] = set(update_fields) | {'updated_at'}
+        super().save(*args, **kwargs)
+
+
+class ShadowPrediction(models.Model):
+    """Prédiction d'un modèle NLP évalué en mode fantôme sur un feedback réel"""
+    nlp_model = models.ForeignKey(
+        NLPModel,
+        on_delete=models.CASCADE,
+        related_name='shadow_predictions',
+        verbose_name=_('Modèle NLP'))
+    feedback = models.ForeignKey(
+        Feedback,
+        on_delete=models.CASCADE,
+        related_name='shadow_predictions',
+        verbose_name=_('Feedback'))
+    predicted_category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('Catégorie prédite'))
+    confidence = models.FloatField(_('Confiance'), default=0.0)
+    latency_us = models.PositiveIntegerField(_('Durée d\'inférence (µs)'), default=0)
+    created_at = models.DateTimeField(_('Date de création'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Prédiction en mode fantôme')
+        verbose_name_plural = _('Prédictions en mode fantôme')
+        constraints = [
+            models.UniqueConstraint(fields=['nlp_model', 'feedback'], name='unique_shadow_prediction'),
+        ]
+    
+    def __str__(self):
+        return f"Prédiction du modèle {self.nlp_model_id} sur #{self.feedback_id}"
 
 
 class KeywordRule(models.Model):
@@ -598,3 +851,103 @@ class Notification(models.Model):
     
     def __str__(self):
         return f"Notification pour {self.user.username}: {self.title}"
+
+
+class OutboundMessage(models.Model):
+    """Registre des messages sortants (SMS, WhatsApp) et de leur acheminement"""
+    
+    class ProviderChoices(models.TextChoices):
+        TWILIO = 'twilio', _('Twilio')
+        FACEBOOK = 'facebook', _('Facebook WhatsApp')
+        SIMULATION = 'simulation', _('Simulation')
+    
+    class StatusChoices(models.TextChoices):
+        QUEUED = 'queued', _('En file d\'attente')
+        SENT = 'sent', _('Envoyé')
+        DELIVERED = 'delivered', _('Livré')
+        READ = 'read', _('Lu')
+        FAILED = 'failed', _('Échec')
+    
+    channel = models.CharField(
+        _('Canal'), 
+        max_length=20, 
+        choices=Feedback.ChannelChoices.choices)
+    provider = models.CharField(
+        _('Fournisseur'), 
+        max_length=20, 
+        choices=ProviderChoices.choices, 
+        blank=True)
+    provider_message_id = models.CharField(_('ID fournisseur'), max_length=100, blank=True, db_index=True)
+    to = models.CharField(_('Destinataire'), max_length=30)
+    response = models.ForeignKey(
+        Response, 
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='outbound_messages',
+        verbose_name=_('Réponse'))
+    notification = models.ForeignKey(
+        Notification, 
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='outbound_messages',
+        verbose_name=_('Notification'))
+    status = models.CharField(
+        _('Statut'), 
+        max_length=10, 
+        choices=StatusChoices.choices, 
+        default=StatusChoices.QUEUED)
+    provider_status = models.CharField(_('Statut fournisseur'), max_length=30, blank=True)
+    error_code = models.CharField(_('Code d\'erreur'), max_length=50, blank=True)
+    retry_count = models.PositiveIntegerField(_('Nombre de tentatives supplémentaires'), default=0)
+    
+    # Horodatages du cycle de vie
+    enqueued_at = models.DateTimeField(_('Date de mise en file'), default=timezone.now)
+    sent_at = models.DateTimeField(_('Date d\'envoi'), null=True, blank=True)
+    delivered_at = models.DateTimeField(_('Date de livraison'), null=True, blank=True)
+    read_at = models.DateTimeField(_('Date de lecture'), null=True, blank=True)
+    failed_at = models.DateTimeField(_('Date d\'échec'), null=True, blank=True)
+    updated_at = models.DateTimeField(_('Date de mise à jour'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Message sortant')
+        verbose_name_plural = _('Messages sortants')
+        ordering = ["-enqueued_at"]
+        indexes = [
+            models.Index(fields=['channel', 'enqueued_at'], name='outbound_channel_enqueued_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Message {self.channel} vers {self.to} ({self.get_status_display()})"
+
+
+class InboundMessageReceipt(models.Model):
+    """Accusés de réception des messages entrants, pour rendre les webhooks idempotents"""
+    
+    class SourceChoices(models.TextChoices):
+        TWILIO = 'twilio', _('Twilio')
+        FACEBOOK = 'facebook', _('Facebook WhatsApp')
+        JSON_SMS = 'json_sms', _('Passerelle SMS JSON')
+    
+    source = models.CharField(_('Source'), max_length=20, choices=SourceChoices.choices)
+    message_key = models.CharField(_('Clé du message'), max_length=128)
+    feedback = models.ForeignKey(
+        Feedback, 
+        on_delete=models.SET_NULL, 
+        null=True,
+        blank=True,
+        related_name='inbound_receipts',
+        verbose_name=_('Feedback'))
+    received_at = models.DateTimeField(_('Date de réception'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Accusé de réception entrant')
+        verbose_name_plural = _('Accusés de réception entrants')
+        ordering = ["-received_at"]
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'message_key'], name='unique_inbound_message'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_source_display()} {self.message_key}"
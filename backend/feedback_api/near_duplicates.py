@@ -0,0 +1,218 @@
+"""
+Détection des feedbacks quasi identiques (MinHash / LSH)
+
+Chaque feedback est résumé par une signature MinHash calculée sur les
+n-grammes de caractères de son texte prétraité : la proportion de valeurs
+égales entre deux signatures estime la similarité de Jaccard des textes.
+La signature est découpée en bandes ; deux textes similaires partagent
+presque toujours au moins une bande, ce qui permet de retrouver les
+groupes candidats par simple consultation de dictionnaires.
+
+La table LSH est persistée (ClusterBucket) et chargée incrémentalement en
+mémoire dans chaque processus : seules les alvéoles créées depuis le
+dernier passage sont relues.
+"""
+import hashlib
+import logging
+import threading
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ClusterBucket, Feedback, FeedbackCluster
+from .nlp import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+
+# 16 bandes de 4 valeurs : deux textes ont ~50 % de chances de partager une
+# bande à 0.5 de similarité, plus de 99 % à 0.8
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+SHINGLE_SIZE = 5
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _setting(name, default):
+    return settings.NLP_SETTINGS.get(name, default)
+
+
+_permutations = None
+
+
+def _get_permutations():
+    """Coefficients (a, b) des fonctions de hachage, identiques dans tous les processus"""
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+        generator = np.random.RandomState(1)
+        # a, b < 2^31 et valeurs de n-gramme < 2^32 : a * x + b tient sur 64 bits
+        _permutations = (
+            generator.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64),
+            generator.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64),
+        )
+    return _permutations
+
+
+def shingles(text):
+    """n-grammes de caractères du texte prétraité (le texte entier s'il est plus court)"""
+    text = preprocess_text(text)
+    if not text:
+        return set()
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text):
+    """
+    Returns:
+        numpy.ndarray: NUM_PERM valeurs uint32, ou None pour un texte vide
+    """
+    import numpy as np
+
+    values = shingles(text)
+    if not values:
+        return None
+    hashed = np.fromiter((zlib.crc32(value.encode('utf-8')) for value in values), dtype=np.uint64, count=len(values))
+    a, b = _get_permutations()
+    permuted = (np.outer(hashed, a) + b) % MERSENNE_PRIME
+    return (permuted.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def band_keys(signature):
+    """Clé (entier signé 63 bits) de chaque bande de la signature"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        digest = hashlib.blake2b(rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big') >> 1)
+    return keys
+
+
+def similarity(first, second):
+    """Similarité de Jaccard estimée entre deux signatures"""
+    return float((first == second).mean())
+
+
+class NearDuplicateIndex:
+    """Copie en mémoire de la table LSH, mise à jour incrémentalement depuis la base"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._buckets = [{} for _ in range(BANDS)]
+            self._signatures = {}
+            self._last_bucket_id = 0
+
+    def refresh(self):
+        """Charge les alvéoles (et signatures) créées depuis le dernier passage"""
+        import numpy as np
+
+        rows = list(
+            ClusterBucket.objects.filter(id__gt=self._last_bucket_id)
+            .order_by('id').values_list('id', 'band', 'key', 'cluster_id')
+        )
+        if not rows:
+            return
+        missing = {cluster_id for _, _, _, cluster_id in rows} - set(self._signatures)
+        signatures = {
+            cluster_id: np.frombuffer(bytes(signature), dtype=np.uint32)
+            for cluster_id, signature in FeedbackCluster.objects.filter(id__in=missing).values_list('id', 'signature')
+        }
+        with self._lock:
+            self._signatures.update(signatures)
+            for bucket_id, band, key, cluster_id in rows:
+                self._buckets[band].setdefault(key, cluster_id)
+                self._last_bucket_id = max(self._last_bucket_id, bucket_id)
+
+    def match(self, signature, keys, threshold):
+        """
+        Returns:
+            tuple: (id du groupe le plus proche, similarité estimée) ou (None, 0.0)
+        """
+        with self._lock:
+            candidates = {self._buckets[band].get(key) for band, key in enumerate(keys)} - {None}
+            scored = [
+                (similarity(signature, self._signatures[cluster_id]), cluster_id)
+                for cluster_id in candidates if cluster_id in self._signatures
+            ]
+        best = max(scored, default=(0.0, None))
+        if best[0] >= threshold:
+            return best[1], best[0]
+        return None, 0.0
+
+    def add(self, cluster_id, signature, keys):
+        with self._lock:
+            self._signatures.setdefault(cluster_id, signature)
+            for band, key in enumerate(keys):
+                self._buckets[band].setdefault(key, cluster_id)
+
+
+# Instance globale partagée par les tâches du processus
+near_duplicate_index = NearDuplicateIndex()
+
+
+def assign_cluster(feedback_id, content):
+    """
+    Rattache un feedback au groupe de messages quasi identiques le plus
+    proche, ou crée un nouveau groupe dont il est le représentant
+
+    Un feedback déjà rattaché (classifié une seconde fois, texte modifié)
+    garde son groupe : la taille d'un groupe compte chaque membre une fois.
+
+    Returns:
+        int: id du groupe, ou None si le texte est vide
+    """
+    current = Feedback.objects.filter(id=feedback_id).values_list('cluster_id', flat=True).first()
+    if current is not None:
+        return current
+    signature = minhash_signature(content)
+    if signature is None:
+        return None
+    keys = band_keys(signature)
+
+    near_duplicate_index.refresh()
+    cluster_id, score = near_duplicate_index.match(
+        signature, keys, _setting('NEAR_DUPLICATE_THRESHOLD', 0.7)
+    )
+
+    with transaction.atomic():
+        if cluster_id is not None and not FeedbackCluster.objects.select_for_update().filter(id=cluster_id).exists():
+            # Groupe supprimé depuis le chargement de l'index : le recharger entièrement
+            near_duplicate_index.reset()
+            cluster_id = None
+        created = cluster_id is None
+        if created:
+            cluster_id = FeedbackCluster.objects.create(
+                representative_id=feedback_id, signature=signature.tobytes()
+            ).id
+
+        # Le feedback est réservé avant de compter : un second passage concurrent ne compte rien
+        claimed = Feedback.objects.filter(id=feedback_id, cluster__isnull=True).update(cluster_id=cluster_id)
+        if not claimed:
+            if created:
+                FeedbackCluster.objects.filter(id=cluster_id).delete()
+            return Feedback.objects.filter(id=feedback_id).values_list('cluster_id', flat=True).first()
+        if not created:
+            FeedbackCluster.objects.filter(id=cluster_id).update(size=F('size') + 1, updated_at=timezone.now())
+            logger.info(f"Feedback #{feedback_id} rattaché au groupe #{cluster_id} (similarité {score:.2f})")
+
+        # Les alvéoles de chaque membre sont ajoutées : les variantes d'un
+        # variant sont aussi retrouvées (une alvéole déjà occupée est conservée)
+        ClusterBucket.objects.bulk_create(
+            [ClusterBucket(band=band, key=key, cluster_id=cluster_id) for band, key in enumerate(keys)],
+            ignore_conflicts=True
+        )
+
+    near_duplicate_index.add(cluster_id, signature, keys)
+    return cluster_id
@@ -1,12 +1,8 @@
 import logging
 import re
-import pickle
 import os
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+import threading
+import time
 from django.conf import settings
 from django.utils import timezone
 
@@ -46,11 +42,40 @@ DEFAULT_MODEL_PATH = os.path.join(settings.BASE_DIR, 'feedback_api', 'nlp_model.
 # Dossier pour les modèles personnalisés
 CUSTOM_MODELS_DIR = os.path.join(settings.MEDIA_ROOT, 'nlp_models')
 
+
+# Version du prétraitement, enregistrée dans chaque modèle entraîné : à
+# incrémenter à toute modification de preprocess_text (les modèles entraînés
+# avec une autre version sont refusés au chargement)
+PREPROCESSING_VERSION = 1
+
+
+def preprocess_text(text):
+    """Prétraite le texte pour la classification (partagé par l'entraînement et l'inférence)"""
+    if not text:
+        return ""
+    
+    # Convertir en minuscules
+    text = text.lower()
+    
+    # Supprimer les caractères spéciaux et la ponctuation
+    text = re.sub(r'[^\w\s]', ' ', text)
+    
+    # Supprimer les chiffres
+    text = re.sub(r'\d+', '', text)
+    
+    # Supprimer les espaces multiples
+    text = re.sub(r'\s+', ' ', text).strip()
+    
+    return text
+
+
 class FeedbackClassifier:
     """Classe pour la classification automatique des feedbacks"""
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, expected_checksum=None):
         """Initialise le classifieur, charge le modèle s'il existe ou en crée un nouveau"""
+        from .model_artifact import ModelArtifactError, load_artifact
+        
         self.model = None
         self.categories = list(CATEGORY_KEYWORDS.keys())
         self.model_path = model_path or DEFAULT_MODEL_PATH
@@ -58,32 +83,25 @@ class FeedbackClassifier:
         
         try:
             if os.path.exists(self.model_path):
-                with open(self.model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                # ModelArtifact : versions et empreinte vérifiées au chargement
+                self.model = load_artifact(self.model_path, expected_checksum)
                 logger.info(f"Modèle NLP chargé avec succès depuis {self.model_path}")
             else:
                 logger.warning("Aucun modèle NLP trouvé, utilisation de la classification par mots-clés")
+        except ModelArtifactError as e:
+            logger.error(f"Modèle NLP refusé, utilisation de la classification par mots-clés: {str(e)}")
         except Exception as e:
             logger.error(f"Erreur lors du chargement du modèle NLP: {str(e)}")
     
     def preprocess_text(self, text):
         """Prétraite le texte pour la classification"""
-        if not text:
-            return ""
-        
-        # Convertir en minuscules
-        text = text.lower()
-        
-        # Supprimer les caractères spéciaux et la ponctuation
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # Supprimer les chiffres
-        text = re.sub(r'\d+', '', text)
-        
-        # Supprimer les espaces multiples
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        return preprocess_text(text)
+    
+    @property
+    def version(self):
+        """Identifie les résultats de ce classifieur (clé du cache de classification)"""
+        model_version = self.model.checksum if self.model else 'keywords'
+        return f"{self.active_custom_model_id or 'default'}:{model_version}:p{PREPROCESSING_VERSION}"
     
     def classify_by_keywords(self, text):
         """Classifie le texte en utilisant des mots-clés simples"""
@@ -135,16 +153,8 @@ class FeedbackClassifier:
             return None, 0.0
         
         try:
-            text = self.preprocess_text(text)
-            
-            # Prédire la catégorie
-            category_idx = self.model.predict([text])[0]
-            category = self.categories[category_idx]
-            
-            # Obtenir la probabilité (confiance)
-            proba = max(self.model.predict_proba([text])[0])
-            
-            return category, proba
+            _, category, confidence = self.model.predict(text)
+            return category, confidence
         except Exception as e:
             logger.error(f"Erreur lors de la classification par modèle: {str(e)}")
             return None, 0.0
@@ -159,27 +169,27 @@ class FeedbackClassifier:
         # Fallback sur la classification par mots-clés
         return self.classify_by_keywords(text)
     
-    def train_model(self, texts, labels):
-        """Entraîne un nouveau modèle ML avec les données fournies"""
+    def train_model(self, texts, category_ids, categories):
+        """
+        Entraîne un nouveau modèle ML (TF-IDF + Naive Bayes) et l'enregistre
+        sous self.model_path
+
+        Args:
+            texts (list): contenus d'entraînement
+            category_ids (list): id de Category de chaque contenu
+            categories (dict): {id: nom} des catégories
+        """
+        # scikit-learn n'est importé qu'au moment de l'entraînement (ou du
+        # chargement d'un modèle) pour ne pas alourdir le démarrage
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        from .model_artifact import save_artifact, train_artifact
+
         try:
-            # Créer un pipeline avec TF-IDF et Naive Bayes
-            self.model = Pipeline([
-                ('vectorizer', TfidfVectorizer(max_features=5000)),
-                ('classifier', MultinomialNB())
-            ])
-            
-            # Prétraiter les textes
-            processed_texts = [self.preprocess_text(text) for text in texts]
-            
-            # Convertir les étiquettes en indices
-            label_indices = [self.categories.index(label) for label in labels]
-            
-            # Entraîner le modèle
-            self.model.fit(processed_texts, label_indices)
-            
-            # Sauvegarder le modèle
-            with open(MODEL_PATH, 'wb') as f:
-                pickle.dump(self.model, f)
+            self.model = train_artifact(
+                TfidfVectorizer(max_features=5000), MultinomialNB(), texts, category_ids, categories
+            )
+            save_artifact(self.model, self.model_path)
             
             logger.info("Modèle NLP entraîné et sauvegardé avec succès")
             return True
@@ -213,12 +223,45 @@ class FeedbackClassifier:
         else:
             return 'low'
 
-# Instance globale du classifieur par défaut
-default_classifier = FeedbackClassifier()
+# Instance globale du classifieur par défaut, créée au premier usage (le
+# chargement du modèle importe scikit-learn) ou par warm_up_classifiers()
+_default_classifier = None
+_default_classifier_lock = threading.Lock()
 
 # Dictionnaire pour stocker les instances de classifieurs personnalisés
 custom_classifiers = {}
 
+
+def get_default_classifier():
+    """Retourne le classifieur par défaut, chargé au premier appel"""
+    global _default_classifier
+    if _default_classifier is None:
+        with _default_classifier_lock:
+            if _default_classifier is None:
+                _default_classifier = FeedbackClassifier()
+    return _default_classifier
+
+
+def __getattr__(name):
+    # Compatibilité : `from feedback_api.nlp import default_classifier`
+    if name == 'default_classifier':
+        return get_default_classifier()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up_classifiers():
+    """
+    Charge explicitement le classifieur par défaut et celui du modèle actif.
+
+    Appelée uniquement par les processus qui classifient (workers Celery,
+    serveur gunicorn) : les commandes de gestion et les migrations ne paient
+    pas le coût du chargement.
+    """
+    start = time.perf_counter()
+    get_default_classifier()
+    get_active_model_classifier()
+    logger.info(f"Classifieurs NLP préchargés en {(time.perf_counter() - start) * 1000:.0f} ms")
+
 def get_active_model_classifier():
     """Récupère le classifieur du modèle NLP actif"""
     from .models import NLPModel
@@ -233,7 +276,9 @@ def get_active_model_classifier():
             # Vérifier si le classifieur est déjà chargé
             if active_model.id not in custom_classifiers:
                 # Créer une nouvelle instance de classifieur avec ce modèle
-                custom_classifiers[active_model.id] = FeedbackClassifier(model_path=model_path)
+                custom_classifiers[active_model.id] = FeedbackClassifier(
+                    model_path=model_path, expected_checksum=active_model.checksum or None
+                )
                 custom_classifiers[active_model.id].active_custom_model_id = active_model.id
                 logger.info(f"Classifieur personnalisé chargé pour le modèle {active_model.id}")
             
@@ -242,24 +287,29 @@ def get_active_model_classifier():
         logger.error(f"Erreur lors de la récupération du modèle NLP actif: {str(e)}")
     
     # Utiliser le classifieur par défaut si aucun modèle personnalisé n'est actif
-    return default_classifier
+    return get_default_classifier()
 
 def classify_feedback(text):
     """Fonction utilitaire pour classifier un feedback"""
     if not text:
-        return {'category': None, 'confidence': 0, 'priority': 'medium'}
+        return {'category': None, 'category_id': None, 'confidence': 0, 'priority': 'medium'}
     
     # Récupérer le classifieur du modèle actif
     classifier = get_active_model_classifier()
     
-    # Utiliser le modèle ML si disponible, sinon utiliser la classification par mots-clés
-    if classifier.model:
-        category, confidence = classifier.classify_by_model(text)
-    else:
-        category, confidence = classifier.classify_by_keywords(text)
+    # Les messages identiques une fois normalisés (transferts en masse,
+    # modèles de SMS) sont classés une seule fois par version du classifieur
+    cache_key = None
+    result = None
+    if settings.NLP_SETTINGS.get('CLASSIFICATION_CACHE_ENABLED', True):
+        from .classification_cache import classification_cache
+        cache_key = classification_cache.make_key(preprocess_text(text), classifier.version)
+        result = classification_cache.get(cache_key)
     
-    # Déterminer la priorité en fonction du contenu
-    priority = classifier.suggest_priority(text)
+    if result is None:
+        result = _classify_uncached(classifier, text)
+        if cache_key and result['category'] is not None:
+            classification_cache.set(cache_key, result)
     
     # Enregistrer les statistiques d'utilisation du modèle si c'est un modèle personnalisé
     if hasattr(classifier, 'active_custom_model_id') and classifier.active_custom_model_id:
@@ -272,4 +322,24 @@ def classify_feedback(text):
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour des statistiques du modèle NLP: {str(e)}")
     
-    return {'category': category, 'confidence': confidence, 'priority': priority}
+    return dict(result)
+
+
+def _classify_uncached(classifier, text):
+    """Exécute la classification complète (modèle ou mots-clés, puis priorité)"""
+    # Utiliser le modèle ML si disponible (il prédit directement l'id de la
+    # catégorie), sinon utiliser la classification par mots-clés
+    category_id = None
+    if classifier.model:
+        try:
+            category_id, category, confidence = classifier.model.predict(text)
+        except Exception as e:
+            logger.error(f"Erreur lors de la classification par modèle: {str(e)}")
+            category, confidence = None, 0.0
+    else:
+        category, confidence = classifier.classify_by_keywords(text)
+    
+    # Déterminer la priorité en fonction du contenu
+    priority = classifier.suggest_priority(text)
+    
+    return {'category': category, 'category_id': category_id, 'confidence': confidence, 'priority': priority}
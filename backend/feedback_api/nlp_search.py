@@ -0,0 +1,230 @@
+"""
+Recherche d'hyperparamètres des modèles NLP par validation croisée
+
+Les combinaisons (vectoriseur, n-grammes) x (classifieur, paramètres) sont
+évaluées en validation croisée stratifiée, en parallèle sur tous les cœurs
+(joblib, processus). Chaque vectoriseur n'est ajusté qu'une fois par pli :
+les matrices obtenues sont mises en cache et partagées par tous les
+classifieurs évalués sur ce pli.
+
+Deux stratégies : grille complète, ou division successive (successive
+halving) qui évalue d'abord toutes les combinaisons sur une fraction des
+données puis ne garde que les meilleures à chaque tour.
+"""
+import logging
+import math
+import time
+from collections import namedtuple
+
+from .nlp import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+NGRAM_RANGES = [(1, 1), (1, 2)]
+
+VECTORIZERS = ('tfidf', 'count', 'hashing')
+
+CLASSIFIER_GRID = {
+    'nb': [{'alpha': alpha} for alpha in (0.1, 0.5, 1.0)],
+    'svm': [{'C': c} for c in (0.1, 1.0, 10.0)],
+    'logreg': [{'C': c} for c in (1.0, 10.0)],
+}
+
+# Division successive : part des candidats gardée à chaque tour (1 / facteur)
+HALVING_FACTOR = 3
+
+# params : couples (nom, valeur) triés, pour que le candidat soit hachable
+Candidate = namedtuple('Candidate', ['vectorizer', 'ngram_range', 'classifier', 'params'])
+
+SearchResult = namedtuple('SearchResult', ['best', 'best_score', 'scores', 'duration_seconds'])
+
+
+def candidate_label(candidate):
+    params = ', '.join(f'{name}={value}' for name, value in candidate.params)
+    return f'{candidate.vectorizer}{candidate.ngram_range} + {candidate.classifier}({params})'
+
+
+def build_vectorizer(name, ngram_range):
+    from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfVectorizer
+
+    if name == 'tfidf':
+        return TfidfVectorizer(ngram_range=ngram_range, max_features=50000, sublinear_tf=True)
+    if name == 'count':
+        return CountVectorizer(ngram_range=ngram_range, max_features=50000)
+    if name == 'hashing':
+        # alternate_sign=False : valeurs positives, compatibles avec MultinomialNB
+        return HashingVectorizer(ngram_range=ngram_range, n_features=2 ** 18, alternate_sign=False)
+    raise ValueError(f"Vectoriseur inconnu: {name}")
+
+
+def build_classifier(name, params, probabilities=False):
+    """
+    Args:
+        probabilities (bool): le classifieur final doit fournir predict_proba
+            (utilisé par FeedbackClassifier) ; la SVM linéaire est alors calibrée
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.naive_bayes import MultinomialNB
+    from sklearn.svm import LinearSVC
+
+    params = dict(params)
+    if name == 'nb':
+        return MultinomialNB(**params)
+    if name == 'svm':
+        if probabilities:
+            from sklearn.calibration import CalibratedClassifierCV
+            return CalibratedClassifierCV(LinearSVC(dual='auto', max_iter=5000, **params), cv=3)
+        return LinearSVC(dual='auto', max_iter=5000, **params)
+    if name == 'logreg':
+        # liblinear : rapide sur les matrices creuses très larges (hachage)
+        return LogisticRegression(solver='liblinear', max_iter=1000, **params)
+    raise ValueError(f"Classifieur inconnu: {name}")
+
+
+def train_candidate(candidate, texts, category_ids, categories):
+    """Entraîne l'artefact final (vectoriseur + classifieur) pour un candidat retenu"""
+    from .model_artifact import train_artifact
+
+    return train_artifact(
+        build_vectorizer(candidate.vectorizer, candidate.ngram_range),
+        build_classifier(candidate.classifier, candidate.params, probabilities=True),
+        texts, category_ids, categories
+    )
+
+
+def candidate_grid(vectorizers=VECTORIZERS, classifiers=None, ngram_ranges=NGRAM_RANGES):
+    classifiers = classifiers or list(CLASSIFIER_GRID)
+    return [
+        Candidate(vectorizer, tuple(ngram_range), classifier, tuple(sorted(params.items())))
+        for vectorizer in vectorizers
+        for ngram_range in ngram_ranges
+        for classifier in classifiers
+        for params in CLASSIFIER_GRID[classifier]
+    ]
+
+
+def _vectorize_fold(vectorizer_name, ngram_range, train_texts, validation_texts):
+    vectorizer = build_vectorizer(vectorizer_name, ngram_range)
+    return vectorizer.fit_transform(train_texts), vectorizer.transform(validation_texts)
+
+
+def _score_candidate(candidate, X_train, y_train, X_validation, y_validation, n_samples):
+    from sklearn.metrics import f1_score
+
+    if len(set(y_train[:n_samples])) < 2:
+        return 0.0
+    classifier = build_classifier(candidate.classifier, candidate.params)
+    classifier.fit(X_train[:n_samples], y_train[:n_samples])
+    return f1_score(y_validation, classifier.predict(X_validation), average='weighted', zero_division=0)
+
+
+def search_hyperparameters(texts, labels, candidates=None, cv=5, method='grid', n_jobs=-1, random_state=42):
+    """
+    Sélectionne le meilleur candidat par validation croisée (F1 pondéré)
+
+    Args:
+        texts (list): textes d'entraînement (le jeu de test doit être tenu à part)
+        labels (list): étiquettes correspondantes
+        candidates (list): combinaisons à évaluer (par défaut : candidate_grid())
+        cv (int): nombre de plis
+        method (str): 'grid' ou 'halving'
+        n_jobs (int): processus joblib (-1 : tous les cœurs)
+
+    Returns:
+        SearchResult: meilleur candidat, son score moyen et les scores de
+        tous les candidats évalués au dernier tour où ils ont concouru
+    """
+    import numpy as np
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    start = time.perf_counter()
+    candidates = list(candidates or candidate_grid())
+
+    # Mélanger une fois : tronquer un pli revient alors à sous-échantillonner
+    order = np.random.RandomState(random_state).permutation(len(texts))
+    texts = np.array([preprocess_text(text) for text in texts], dtype=object)[order]
+    labels = np.asarray(labels)[order]
+
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=False).split(texts, labels))
+    parallel = Parallel(n_jobs=n_jobs)
+
+    # Une seule vectorisation par (vectoriseur, n-grammes, pli)
+    vectorizer_keys = sorted({(c.vectorizer, c.ngram_range) for c in candidates})
+    jobs = [(key, fold) for key in vectorizer_keys for fold in range(len(folds))]
+    matrices = dict(zip(jobs, parallel(
+        delayed(_vectorize_fold)(key[0], key[1], texts[folds[fold][0]], texts[folds[fold][1]])
+        for key, fold in jobs
+    )))
+
+    def evaluate(pool, n_samples):
+        tasks = [(candidate, fold) for candidate in pool for fold in range(len(folds))]
+        fold_scores = parallel(
+            delayed(_score_candidate)(
+                candidate,
+                matrices[(candidate.vectorizer, candidate.ngram_range), fold][0],
+                labels[folds[fold][0]],
+                matrices[(candidate.vectorizer, candidate.ngram_range), fold][1],
+                labels[folds[fold][1]],
+                n_samples
+            )
+            for candidate, fold in tasks
+        )
+        totals = {}
+        for (candidate, _), score in zip(tasks, fold_scores):
+            totals[candidate] = totals.get(candidate, 0.0) + score
+        return {candidate: total / len(folds) for candidate, total in totals.items()}
+
+    train_size = min(len(train) for train, _ in folds)
+    if method == 'halving':
+        rounds = max(1, math.ceil(math.log(len(candidates), HALVING_FACTOR)))
+        n_samples = max(train_size // HALVING_FACTOR ** (rounds - 1), min(train_size, 50))
+        pool, scores = candidates, {}
+        while True:
+            round_scores = evaluate(pool, n_samples)
+            scores.update(round_scores)
+            logger.info(f"Division successive: {len(pool)} candidat(s) sur {n_samples} échantillon(s)")
+            if len(pool) == 1 or n_samples >= train_size:
+                break
+            pool = sorted(pool, key=round_scores.get, reverse=True)[:max(1, len(pool) // HALVING_FACTOR)]
+            n_samples = min(train_size, n_samples * HALVING_FACTOR)
+        best = max(pool, key=round_scores.get)
+        best_score = round_scores[best]
+    elif method == 'grid':
+        scores = evaluate(candidates, train_size)
+        best = max(scores, key=scores.get)
+        best_score = scores[best]
+    else:
+        raise ValueError(f"Méthode de recherche inconnue: {method}")
+
+    return SearchResult(best, best_score, scores, round(time.perf_counter() - start, 3))
+
+
+def holdout_metrics(artifact, texts, labels):
+    """
+    Métriques pondérées sur un jeu de test jamais vu pendant l'entraînement ni la recherche
+
+    Args:
+        artifact (ModelArtifact): modèle entraîné
+        labels (list): ids de catégorie attendus
+    """
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+    predictions = [category_id for category_id, _, _ in artifact.predict_many(texts)]
+    return {
+        'accuracy': accuracy_score(labels, predictions),
+        'precision': precision_score(labels, predictions, average='weighted', zero_division=0),
+        'recall': recall_score(labels, predictions, average='weighted', zero_division=0),
+        'f1_score': f1_score(labels, predictions, average='weighted', zero_division=0),
+    }
+
+
+def split_holdout(texts, labels, test_size=0.2, random_state=42):
+    """Sépare un jeu de test, stratifié lorsque chaque catégorie a au moins deux exemples"""
+    from collections import Counter
+    from sklearn.model_selection import train_test_split
+
+    counts = Counter(labels)
+    n_test = math.ceil(len(labels) * test_size)
+    stratify = labels if min(counts.values()) >= 2 and n_test >= len(counts) else None
+    return train_test_split(texts, labels, test_size=test_size, random_state=random_state, stratify=stratify)
@@ -0,0 +1,149 @@
+"""
+Évaluation des modèles NLP en mode fantôme (shadow mode)
+
+Les modèles candidats (NLPModel.shadow_mode) classent les nouveaux
+feedbacks dans une tâche de fond, par lots, sans jamais intervenir dans la
+classification en service. Le modèle actif est évalué de la même façon
+pour servir de référence. Chaque prédiction est enregistrée avec sa durée
+d'inférence (ShadowPrediction) ; l'exactitude est mesurée sur les
+feedbacks dont un modérateur a fixé la catégorie (journal CATEGORIZED).
+"""
+import logging
+import time
+
+from django.db.models import Exists, Max, Min, OuterRef, Q
+
+from .delivery import percentile
+from .model_artifact import ModelArtifactError, load_artifact
+from .models import Feedback, Log, NLPModel, ShadowPrediction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Artefacts chargés dans le worker, par (id du modèle, empreinte du fichier)
+_artifacts = {}
+
+
+def _get_artifact(nlp_model):
+    key = (nlp_model.id, nlp_model.checksum)
+    if key not in _artifacts:
+        for stale in [k for k in _artifacts if k[0] == nlp_model.id]:
+            del _artifacts[stale]
+        _artifacts[key] = load_artifact(nlp_model.file.path, nlp_model.checksum or None)
+    return _artifacts[key]
+
+
+def shadow_models():
+    """Modèles à évaluer : candidats en mode fantôme et modèle actif (référence)"""
+    candidates = NLPModel.objects.filter(shadow_mode=True, is_trained=True)
+    if not candidates.exists():
+        return []
+    return list(NLPModel.objects.filter(Q(shadow_mode=True) | Q(is_active=True), is_trained=True))
+
+
+def score_shadow_batch(nlp_model, since, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Classe avec `nlp_model` les feedbacks reçus depuis `since` qu'il n'a pas
+    encore vus (ids croissants à partir de sa dernière prédiction)
+
+    Returns:
+        int: nombre de prédictions enregistrées
+    """
+    try:
+        artifact = _get_artifact(nlp_model)
+    except (ModelArtifactError, ValueError) as e:
+        logger.error(f"Modèle NLP {nlp_model.id} non évaluable en mode fantôme: {str(e)}")
+        return 0
+
+    last_id = nlp_model.shadow_predictions.aggregate(last=Max('feedback_id'))['last'] or 0
+    rows = list(
+        Feedback.objects.filter(id__gt=last_id, created_at__gte=since)
+        .order_by('id').values_list('id', 'content')[:batch_size]
+    )
+
+    predictions = []
+    for feedback_id, content in rows:
+        # Un message à la fois : durée comparable à la classification en service
+        start = time.perf_counter()
+        category_id, _, confidence = artifact.predict(content)
+        latency_us = int((time.perf_counter() - start) * 1_000_000)
+        predictions.append(ShadowPrediction(
+            nlp_model=nlp_model, feedback_id=feedback_id, predicted_category_id=category_id,
+            confidence=confidence, latency_us=latency_us
+        ))
+
+    ShadowPrediction.objects.bulk_create(predictions, ignore_conflicts=True)
+    return len(predictions)
+
+
+def score_shadow_models(batch_size=DEFAULT_BATCH_SIZE):
+    """Fait classer un lot de nouveaux feedbacks par chaque modèle évalué"""
+    models = shadow_models()
+    if not models:
+        return {}
+
+    # Le modèle actif est évalué sur la même période que les candidats
+    earliest = NLPModel.objects.filter(shadow_mode=True).aggregate(start=Min('shadow_started_at'))['start']
+    scored = {}
+    for nlp_model in models:
+        since = nlp_model.shadow_started_at if nlp_model.shadow_mode else earliest
+        if since is None:
+            continue
+        scored[nlp_model.id] = score_shadow_batch(nlp_model, since, batch_size)
+
+    logger.info(f"Évaluation en mode fantôme: {sum(scored.values())} prédiction(s) pour {len(scored)} modèle(s)")
+    return scored
+
+
+def shadow_comparison(since=None, model_ids=None):
+    """
+    Compare les modèles évalués en mode fantôme
+
+    Une prédiction est jugée lorsque le feedback a été catégorisé par un
+    modérateur (journal CATEGORIZED) : elle est correcte si elle correspond
+    à la catégorie actuelle du feedback.
+
+    Returns:
+        list: par modèle, nombre de prédictions, prédictions jugées,
+        exactitude et durées d'inférence (p50/p95/moyenne, en ms)
+    """
+    corrected = Log.objects.filter(
+        feedback=OuterRef('feedback'), action=Log.ActionChoices.CATEGORIZED, user__isnull=False
+    )
+    rows = ShadowPrediction.objects.annotate(corrected=Exists(corrected))
+    if since:
+        rows = rows.filter(created_at__gte=since)
+    if model_ids:
+        rows = rows.filter(nlp_model_id__in=model_ids)
+    rows = rows.values_list('nlp_model_id', 'predicted_category_id', 'feedback__category_id', 'corrected', 'latency_us')
+
+    per_model = {}
+    for model_id, predicted, actual, is_corrected, latency_us in rows.iterator(chunk_size=2000):
+        stats = per_model.setdefault(model_id, {'predictions': 0, 'evaluated': 0, 'correct': 0, 'latencies': []})
+        stats['predictions'] += 1
+        stats['latencies'].append(latency_us / 1000)
+        if is_corrected:
+            stats['evaluated'] += 1
+            if predicted is not None and predicted == actual:
+                stats['correct'] += 1
+
+    models = NLPModel.objects.in_bulk(list(per_model))
+    result = []
+    for model_id, stats in sorted(per_model.items()):
+        latencies = sorted(stats['latencies'])
+        nlp_model = models[model_id]
+        result.append({
+            'model_id': model_id,
+            'name': nlp_model.name,
+            'is_active': nlp_model.is_active,
+            'shadow_mode': nlp_model.shadow_mode,
+            'predictions': stats['predictions'],
+            'evaluated': stats['evaluated'],
+            'correct': stats['correct'],
+            'accuracy': stats['correct'] / stats['evaluated'] if stats['evaluated'] else None,
+            'latency_ms_p50': percentile(latencies, 0.5),
+            'latency_ms_p95': percentile(latencies, 0.95),
+            'latency_ms_mean': sum(latencies) / len(latencies),
+        })
+    return result
@@ -0,0 +1,174 @@
+"""
+Entraînement incrémental des modèles NLP
+
+Un HashingVectorizer (sans vocabulaire à apprendre) alimente un
+MultinomialNB mis à jour par partial_fit : chaque passage n'apprend que les
+données d'entraînement validées ou corrigées (NLPTrainingData.updated_at)
+depuis le point de reprise du modèle (NLPModel.training_checkpoint), son
+coût est donc proportionnel aux nouvelles données et non au corpus complet.
+
+Le classifieur apprend les indices du vocabulaire de l'artefact (toutes les
+catégories existantes, triées par id, voir model_artifact).
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .model_artifact import ModelArtifact, ModelArtifactError, load_artifact, save_artifact
+from .models import Category, NLPModel, NLPTrainingData
+
+logger = logging.getLogger(__name__)
+
+INCREMENTAL_MODEL_TYPE = 'Hashing + MultinomialNB (incrémental)'
+
+# 2^18 colonnes : collisions négligeables pour des messages courts, matrice creuse
+HASHING_FEATURES = 2 ** 18
+
+# Nombre de données apprises par appel à partial_fit
+DEFAULT_BATCH_SIZE = 1000
+
+
+def build_incremental_artifact():
+    """Artefact sans état de vocabulaire, entraînable par lots, couvrant toutes les catégories"""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+
+    categories = list(Category.objects.order_by('id').values_list('id', 'name'))
+    return ModelArtifact(
+        # alternate_sign=False : MultinomialNB n'accepte que des valeurs positives
+        HashingVectorizer(n_features=HASHING_FEATURES, ngram_range=(1, 2), alternate_sign=False),
+        MultinomialNB(alpha=0.1),
+        [category_id for category_id, _ in categories],
+        [name for _, name in categories],
+        {'incremental': True},
+    )
+
+
+def model_file_name(nlp_model):
+    """Chemin (relatif à MEDIA_ROOT) du fichier d'un modèle entraîné"""
+    return f'nlp_models/model_{nlp_model.id}.pkl'
+
+
+def _load_artifact(nlp_model):
+    if not nlp_model.file or not os.path.exists(nlp_model.file.path):
+        return None
+    try:
+        return load_artifact(nlp_model.file.path, nlp_model.checksum or None)
+    except ModelArtifactError as e:
+        logger.warning(f"Modèle NLP {nlp_model.id} illisible, réentraînement complet: {str(e)}")
+        return None
+
+
+def _save_artifact(nlp_model, artifact):
+    """Écrit l'artefact du modèle ; retourne le chemin relatif et l'empreinte"""
+    name = model_file_name(nlp_model)
+    checksum = save_artifact(artifact, os.path.join(settings.MEDIA_ROOT, name))
+    return name, checksum
+
+
+def _iter_batches(rows, batch_size):
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def train_incremental(nlp_model, batch_size=DEFAULT_BATCH_SIZE, full=False):
+    """
+    Met à jour un modèle avec les données validées ou corrigées depuis son point de reprise
+
+    Chaque lot est d'abord prédit par le modèle courant puis appris
+    (validation progressive) : les métriques portent sur des données que le
+    modèle n'avait pas encore vues.
+
+    Args:
+        nlp_model (NLPModel): modèle à mettre à jour
+        batch_size (int): nombre de données par appel à partial_fit
+        full (bool): réapprendre toutes les données validées depuis zéro
+
+    Returns:
+        dict: nombre de données apprises, métriques et durée
+    """
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+    start = time.perf_counter()
+    artifact = None if full or not nlp_model.training_checkpoint else _load_artifact(nlp_model)
+    full = artifact is None
+
+    rows = NLPTrainingData.objects.filter(is_validated=True)
+    if artifact is not None:
+        # Validées ou corrigées (contenu, catégorie) depuis le dernier passage
+        rows = rows.filter(updated_at__gt=nlp_model.training_checkpoint)
+
+        # partial_fit ne sait pas ajouter de classe : une catégorie apparue
+        # depuis le dernier passage impose de tout réapprendre
+        new_ids = set(rows.values_list('category_id', flat=True).distinct()) - set(artifact.label_ids)
+        if new_ids:
+            logger.info(f"Nouvelles catégories pour le modèle NLP {nlp_model.id} "
+                        f"({', '.join(str(i) for i in sorted(new_ids))}), réentraînement complet")
+            return train_incremental(nlp_model, batch_size=batch_size, full=True)
+        classes = None
+        fitted = True
+    else:
+        artifact = build_incremental_artifact()
+        classes = list(range(len(artifact.label_ids)))
+        fitted = False
+
+    classifier = artifact.classifier
+
+    learned = 0
+    checkpoint = nlp_model.training_checkpoint
+    y_true, y_pred = [], []
+    rows = rows.order_by('updated_at', 'id').values_list('content', 'category_id', 'updated_at')
+    for batch in _iter_batches(rows, batch_size):
+        X = artifact.transform([content for content, _, _ in batch])
+        labels = artifact.encode_labels([category_id for _, category_id, _ in batch])
+        if fitted:
+            y_true.extend(labels)
+            y_pred.extend(classifier.predict(X))
+        classifier.partial_fit(X, labels, classes=classes)
+        classes = None
+        fitted = True
+        learned += len(batch)
+        checkpoint = batch[-1][2]
+
+    result = {'status': 'unchanged', 'learned': learned, 'evaluated': len(y_true)}
+    if learned:
+        nlp_model.file.name, nlp_model.checksum = _save_artifact(nlp_model, artifact)
+        nlp_model.model_type = INCREMENTAL_MODEL_TYPE
+        nlp_model.is_trained = True
+        nlp_model.last_trained = timezone.now()
+        nlp_model.training_checkpoint = checkpoint
+        nlp_model.training_data_size = (0 if full else nlp_model.training_data_size) + learned
+        if y_true:
+            nlp_model.accuracy = accuracy_score(y_true, y_pred)
+            nlp_model.precision = precision_score(y_true, y_pred, average='weighted', zero_division=0)
+            nlp_model.recall = recall_score(y_true, y_pred, average='weighted', zero_division=0)
+            nlp_model.f1_score = f1_score(y_true, y_pred, average='weighted', zero_division=0)
+            result['accuracy'] = nlp_model.accuracy
+        nlp_model.save()
+
+        # Recharger le classifieur de ce modèle au prochain usage
+        from .nlp import custom_classifiers
+        custom_classifiers.pop(nlp_model.id, None)
+        result['status'] = 'full' if full else 'incremental'
+
+    result['duration_seconds'] = round(time.perf_counter() - start, 3)
+    logger.info(f"Entraînement incrémental du modèle NLP {nlp_model.id}: {learned} donnée(s) apprise(s) "
+                f"en {result['duration_seconds']} s")
+    return result
+
+
+def has_new_training_data(nlp_model):
+    """Indique si des données ont été validées ou corrigées depuis le point de reprise du modèle"""
+    rows = NLPTrainingData.objects.filter(is_validated=True)
+    if nlp_model.training_checkpoint:
+        rows = rows.filter(updated_at__gt=nlp_model.training_checkpoint)
+    return rows.exists()
@@ -0,0 +1,106 @@
+import hashlib
+import logging
+import threading
+
+from django.template import Context, Template
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationRegistry:
+    """
+    Cache en mémoire des canaux et modèles de notification.
+
+    Les canaux sont conservés avec la version de NotificationChannel du
+    cache partagé (voir http_cache), renouvelée à chaque enregistrement :
+    un canal modifié dans un autre processus (identifiants, activation) est
+    relu dès la demande suivante dans tous les workers.
+
+    Les modèles (sujet et contenu) sont compilés en objets Template Django
+    une seule fois par version : la clé de cache inclut une empreinte du
+    texte, de sorte qu'une modification faite dans un autre processus
+    produit automatiquement une nouvelle compilation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._compiled = {}
+
+    @staticmethod
+    def template_version(template):
+        """Empreinte du sujet et du contenu d'un modèle de notification"""
+        payload = f"{template.subject}\x00{template.content}".encode('utf-8')
+        return hashlib.sha1(payload).hexdigest()
+
+    def get_channel(self, channel_id):
+        """Récupère un canal de notification depuis le cache ou la base"""
+        from .http_cache import get_version
+        from .models import NotificationChannel
+
+        # Version lue avant la base : une modification concurrente fait relire le canal
+        version = get_version(NotificationChannel)[0]
+        cached = self._channels.get(channel_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        channel = NotificationChannel.objects.get(id=channel_id)
+        with self._lock:
+            self._channels[channel_id] = (version, channel)
+        return channel
+
+    def get_compiled(self, template):
+        """Retourne le couple (sujet, contenu) compilé pour un modèle"""
+        key = (template.pk, self.template_version(template))
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = (Template(template.subject), Template(template.content))
+            with self._lock:
+                # Ne conserver qu'une version compilée par modèle
+                for stale_key in [k for k in self._compiled if k[0] == template.pk]:
+                    del self._compiled[stale_key]
+                self._compiled[key] = compiled
+            logger.debug(f"Modèle de notification {template.pk} compilé (version {key[1][:8]})")
+        return compiled
+
+    def render(self, notification):
+        """
+        Retourne le titre et le contenu d'une notification.
+
+        Si la notification est liée à un modèle, celui-ci est rendu avec la
+        notification et son destinataire dans le contexte ; sinon le titre et
+        le contenu enregistrés sont utilisés tels quels.
+        """
+        template = notification.template
+        if template is None:
+            return notification.title, notification.content
+
+        subject, content = self.get_compiled(template)
+        context = Context({
+            'notification': notification,
+            'user': notification.user,
+            'title': notification.title,
+            'content': notification.content,
+            'link': notification.link,
+        }, autoescape=False)
+        return subject.render(context), content.render(context)
+
+    def invalidate_channel(self, channel_id=None):
+        """Invalide un canal (ou tous les canaux) du cache"""
+        with self._lock:
+            if channel_id is None:
+                self._channels.clear()
+            else:
+                self._channels.pop(channel_id, None)
+
+    def invalidate_template(self, template_id=None):
+        """Invalide la version compilée d'un modèle (ou de tous les modèles)"""
+        with self._lock:
+            if template_id is None:
+                self._compiled.clear()
+            else:
+                for stale_key in [k for k in self._compiled if k[0] == template_id]:
+                    del self._compiled[stale_key]
+
+
+# Instance globale partagée par les tâches du processus
+notification_registry = NotificationRegistry()
@@ -0,0 +1,362 @@
+"""
+Synchronisation groupée des saisies hors-ligne de la PWA
+
+POST /api/sync/ reçoit un lot de feedbacks identifiés par leur local_id
+(identifiant unique généré par l'appareil). Le lot est enregistré en
+quelques requêtes (lecture des local_id connus, insertions et mises à jour
+groupées) et peut être rejoué sans risque : un local_id déjà reçu renvoie
+le feedback existant, mis à jour si son auteur l'a modifié depuis et qu'il
+n'est pas encore pris en charge. La réponse associe chaque local_id à l'id
+du feedback sur le serveur.
+
+Les pièces jointes sont envoyées par morceaux, et l'envoi reprend après
+une coupure là où il s'est arrêté :
+    POST /api/sync/uploads/         ouvre (ou retrouve) l'envoi : client_key, feedback ou local_id,
+                                    file_name, file_type, file_size, sha256 (facultatif)
+    GET  /api/sync/uploads/<id>/    octets déjà reçus
+    PUT  /api/sync/uploads/<id>/    morceau suivant, en-tête Content-Range: bytes début-fin/taille
+Les morceaux sont écrits par blocs dans un fichier temporaire, sans être
+chargés en mémoire ; au dernier, l'empreinte est vérifiée et le fichier
+rejoint le stockage adressé par contenu (voir attachment_store), où un
+contenu déjà stocké n'est pas dupliqué.
+"""
+import logging
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .attachment_store import BLOCK_SIZE, create_attachment, file_sha256, store_blob
+from .live_feed import CREATED, publish_events
+from .models import AttachmentUpload, Category, Feedback, Log
+from .serializers import SyncFeedbackSerializer
+from .surge import observe_feedbacks
+
+logger = logging.getLogger(__name__)
+
+# Nombre de tentatives si une synchronisation concurrente insère les mêmes local_id
+MAX_PERSIST_ATTEMPTS = 3
+
+# Champs modifiables par l'auteur tant que le feedback n'est pas pris en charge
+SYNC_FIELDS = (
+    'channel', 'content', 'category_id', 'priority', 'contact_phone', 'contact_email',
+    'location', 'latitude', 'longitude'
+)
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def _setting(name, default):
+    return getattr(settings, 'SYNC_SETTINGS', {}).get(name, default)
+
+
+def _owner_id(user):
+    return user.id if user is not None and user.is_authenticated else None
+
+
+def _field_values(data):
+    values = {field: value for field, value in data.items() if field not in ('local_id', 'category')}
+    if 'category' in data:
+        values['category_id'] = data['category']
+    return values
+
+
+def _persist(fresh, changed, user):
+    """Insertions et mises à jour groupées ; retourne les feedbacks créés"""
+    created = Feedback.objects.bulk_create([
+        Feedback(
+            user=user if _owner_id(user) else None,
+            local_id=local_id,
+            status=Feedback.StatusChoices.NEW,
+            sync_status='SYNCED',
+            **_field_values(data)
+        )
+        for local_id, data in fresh
+    ])
+    if changed:
+        now = timezone.now()
+        fields = {'updated_at'}
+        for feedback, values in changed:
+            for field, value in values.items():
+                setattr(feedback, field, value)
+            feedback.updated_at = now
+            fields.update(values)
+        Feedback.objects.bulk_update([feedback for feedback, _ in changed], sorted(fields))
+
+    Log.objects.bulk_create([
+        Log(feedback=feedback, user_id=feedback.user_id, action=Log.ActionChoices.CREATED,
+            details="Feedback créé par synchronisation hors-ligne")
+        for feedback in created
+    ] + [
+        Log(feedback=feedback, user_id=feedback.user_id, action=Log.ActionChoices.UPDATED,
+            details=f"Feedback modifié hors-ligne: {', '.join(sorted(values))}")
+        for feedback, values in changed
+    ])
+    return created
+
+
+def max_batch_size():
+    return _setting('MAX_BATCH_SIZE', 500)
+
+
+def sync_feedbacks(items, user=None):
+    """
+    Enregistre un lot de feedbacks saisis hors-ligne, de façon idempotente
+
+    Args:
+        items (list): feedbacks (champs de SyncFeedbackSerializer, local_id obligatoire)
+        user: utilisateur à l'origine de la synchronisation (anonyme possible)
+
+    Returns:
+        dict: results (un résultat par élément, dans l'ordre du lot : created,
+            updated, unchanged, conflict ou error) et mapping (local_id -> id)
+    """
+    from .tasks import classify_feedback_batch
+
+    results = [None] * len(items)
+    latest = {}
+    for index, item in enumerate(items):
+        serializer = SyncFeedbackSerializer(data=item) if isinstance(item, dict) else None
+        if serializer is None or not serializer.is_valid():
+            results[index] = {
+                'index': index,
+                'local_id': item.get('local_id') if isinstance(item, dict) else None,
+                'status': 'error',
+                'errors': serializer.errors if serializer is not None else {'non_field_errors': ["Objet JSON attendu."]},
+            }
+            continue
+        data = serializer.validated_data
+        # Même local_id répété dans le lot : la dernière version l'emporte
+        previous = latest.get(data['local_id'])
+        if previous is not None:
+            results[previous[0]] = {'index': previous[0], 'local_id': data['local_id'], 'status': 'duplicate'}
+        latest[data['local_id']] = (index, data)
+
+    # Catégories inconnues : une requête pour tout le lot
+    category_ids = {data['category'] for _, data in latest.values() if data.get('category')}
+    known = set(Category.objects.filter(id__in=category_ids).values_list('id', flat=True))
+    for local_id, (index, data) in list(latest.items()):
+        if data.get('category') and data['category'] not in known:
+            results[index] = {'index': index, 'local_id': local_id, 'status': 'error',
+                              'errors': {'category': [f"Catégorie inconnue : {data['category']}."]}}
+            del latest[local_id]
+
+    owner_id = _owner_id(user)
+    for attempt in range(MAX_PERSIST_ATTEMPTS):
+        existing = {
+            feedback.local_id: feedback
+            for feedback in Feedback.objects.filter(local_id__in=latest.keys())
+            .only('id', 'local_id', 'user_id', 'status', *SYNC_FIELDS)
+        }
+        fresh, changed, unchanged, conflicts = [], [], [], []
+        for local_id, (index, data) in latest.items():
+            feedback = existing.get(local_id)
+            if feedback is None:
+                fresh.append((local_id, data))
+            elif feedback.user_id != owner_id:
+                # local_id d'un autre auteur : ne rien révéler de son feedback
+                conflicts.append(local_id)
+            else:
+                values = {field: value for field, value in _field_values(data).items()
+                          if getattr(feedback, field) != value}
+                if values and owner_id is not None and feedback.status == Feedback.StatusChoices.NEW:
+                    changed.append((feedback, values))
+                else:
+                    unchanged.append(feedback)
+        try:
+            with transaction.atomic():
+                created = _persist(fresh, changed, user)
+            break
+        except IntegrityError:
+            # Synchronisation concurrente du même lot : recommencer avec les local_id désormais connus
+            logger.warning(f"Conflit lors de la synchronisation hors-ligne (tentative {attempt + 1})")
+    else:
+        raise IntegrityError("Impossible d'enregistrer le lot hors-ligne après plusieurs tentatives")
+
+    mapping = {}
+    for status, feedbacks in (('created', created), ('updated', [f for f, _ in changed]), ('unchanged', unchanged)):
+        for feedback in feedbacks:
+            mapping[feedback.local_id] = feedback.id
+            index = latest[feedback.local_id][0]
+            results[index] = {'index': index, 'local_id': feedback.local_id, 'status': status,
+                              'feedback_id': feedback.id}
+    for local_id in conflicts:
+        index = latest[local_id][0]
+        results[index] = {'index': index, 'local_id': local_id, 'status': 'conflict',
+                          'errors': {'local_id': ["Identifiant local déjà utilisé par un autre feedback."]}}
+    for result in results:
+        if result['status'] == 'duplicate':
+            result['feedback_id'] = mapping.get(result['local_id'])
+
+    # Contenu nouveau ou modifié : (re)classification, une seule tâche pour le lot
+    to_classify = [feedback.id for feedback in created] + [f.id for f, values in changed if 'content' in values]
+    if to_classify:
+        ids = list(to_classify)
+        transaction.on_commit(lambda: classify_feedback_batch.delay(ids))
+    if created:
+        observe_feedbacks(created)
+        publish_events(CREATED, created)
+
+    logger.info(f"Synchronisation hors-ligne: {len(items)} élément(s), {len(created)} créé(s), "
+                f"{len(changed)} mis à jour, {len(unchanged)} inchangé(s), {len(conflicts)} conflit(s)")
+    return {'results': results, 'mapping': mapping}
+
+
+def chunk_size():
+    """Taille de morceau conseillée aux clients"""
+    return _setting('CHUNK_SIZE', 256 * 1024)
+
+
+def temp_path(upload):
+    return os.path.join(_setting('UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'uploads', 'partial')),
+                        f"{upload.id.hex}.part")
+
+
+def _discard_temp(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def start_upload(user, feedback, serializer):
+    """
+    Ouvre l'envoi d'une pièce jointe, ou retrouve celui de même client_key
+
+    Un envoi retrouvé dont le fichier a changé (taille ou empreinte) repart de zéro.
+    L'empreinte annoncée ne suffit jamais à obtenir un contenu déjà stocké :
+    la déduplication n'a lieu qu'après réception et vérification des octets.
+
+    Returns:
+        AttachmentUpload
+    """
+    data = serializer.validated_data
+    if data['file_size'] > _setting('MAX_UPLOAD_SIZE', 20 * 1024 * 1024):
+        raise ValidationError({'file_size': ["Fichier trop volumineux."]})
+
+    upload, created = AttachmentUpload.objects.get_or_create(
+        uploaded_by=user, client_key=data['client_key'],
+        defaults={**data, 'feedback': feedback}
+    )
+    if not created and upload.attachment_id is None and (
+        upload.feedback_id != feedback.id
+        or upload.file_size != data['file_size']
+        or upload.sha256 != data.get('sha256', '')
+    ):
+        _discard_temp(upload)
+        for field, value in data.items():
+            setattr(upload, field, value)
+        upload.feedback = feedback
+        upload.received = 0
+        upload.save()
+    if upload.attachment_id is None and upload.file_size == 0:
+        os.makedirs(os.path.dirname(temp_path(upload)), exist_ok=True)
+        with transaction.atomic():
+            open(temp_path(upload), 'wb').close()
+            _complete(upload)
+    return upload
+
+
+def parse_content_range(value):
+    """'bytes début-fin/taille' -> (début, longueur, taille) ; None si invalide"""
+    match = CONTENT_RANGE.match(value or '')
+    if not match:
+        return None
+    start, end, total = (int(group) for group in match.groups())
+    if end < start or end >= total:
+        return None
+    return start, end - start + 1, total
+
+
+def write_chunk(upload_id, start, total, length, stream):
+    """
+    Écrit un morceau à sa position et crée la pièce jointe au dernier octet
+
+    Le morceau est copié par blocs du flux de la requête vers le fichier
+    temporaire, sans verrou pendant la réception réseau. Un morceau déjà
+    reçu (accusé de réception perdu) peut être renvoyé ; un morceau qui
+    laisserait un trou est refusé.
+
+    Returns:
+        tuple: (AttachmentUpload, accepté)
+    """
+    if length > _setting('MAX_CHUNK_SIZE', 8 * 1024 * 1024):
+        raise ValidationError({'detail': "Morceau trop volumineux."})
+    upload = AttachmentUpload.objects.get(id=upload_id)
+    if upload.attachment_id is not None:
+        return upload, True
+    if total != upload.file_size:
+        raise ValidationError({'detail': "Taille totale différente de celle annoncée à l'ouverture de l'envoi."})
+    if start > upload.received:
+        return upload, False
+
+    path = temp_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b') as f:
+        f.seek(start)
+        while written < length:
+            block = stream.read(min(BLOCK_SIZE, length - written))
+            if not block:
+                break
+            f.write(block)
+            written += len(block)
+    if written != length:
+        raise ValidationError({'detail': f"Morceau incomplet : {written} octet(s) reçu(s) sur {length}."})
+
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().get(id=upload_id)
+        if upload.attachment_id is not None:
+            return upload, True
+        if start > upload.received:
+            # Envoi remis à zéro pendant l'écriture (empreinte invalide, fichier changé)
+            return upload, False
+        upload.received = max(upload.received, start + length)
+        upload.save(update_fields=['received', 'updated_at'])
+        if upload.received >= upload.file_size:
+            _complete(upload)
+    return upload, True
+
+
+def _attach(upload, blob):
+    attachment = create_attachment(upload.feedback_id, blob, upload.file_name, upload.file_type,
+                                   upload.uploaded_by)
+    upload.received = upload.file_size
+    upload.attachment = attachment
+    upload.save(update_fields=['received', 'attachment', 'updated_at'])
+    return attachment
+
+
+def _complete(upload):
+    """Vérifie l'empreinte du fichier reçu et le range dans le stockage adressé par contenu"""
+    path = temp_path(upload)
+    with open(path, 'rb') as f:
+        digest = file_sha256(f)
+        if upload.sha256 and digest != upload.sha256:
+            # Fichier corrompu en route : tout renvoyer
+            _discard_temp(upload)
+            upload.received = 0
+            upload.save(update_fields=['received', 'updated_at'])
+            logger.warning(f"Empreinte invalide pour l'envoi {upload.id}, reprise depuis le début")
+            return
+        blob, _ = store_blob(f, sha256=digest, size=upload.file_size)
+
+    attachment = _attach(upload, blob)
+    transaction.on_commit(lambda: _discard_temp(upload))
+    logger.info(f"Pièce jointe #{attachment.id} reçue par morceaux ({upload.file_size} octets)")
+
+
+def purge_stale_uploads():
+    """Supprime les envois inachevés abandonnés et leurs fichiers temporaires"""
+    limit = timezone.now() - timedelta(hours=_setting('UPLOAD_EXPIRY_HOURS', 72))
+    stale = list(AttachmentUpload.objects.filter(attachment__isnull=True, updated_at__lt=limit))
+    for upload in stale:
+        _discard_temp(upload)
+    AttachmentUpload.objects.filter(id__in=[upload.id for upload in stale]).delete()
+    # Envois terminés : seule la correspondance client_key -> pièce jointe est conservée, le temps des rejeux
+    AttachmentUpload.objects.filter(attachment__isnull=False, updated_at__lt=limit).delete()
+    return len(stale)
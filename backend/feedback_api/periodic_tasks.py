@@ -2,28 +2,16 @@ from django.utils import timezone
 from datetime import timedelta
 from celery import shared_task
 from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
-from django.db import transaction
 
-from feedback_api.advanced_tasks import (
-    check_active_nlp_models, 
-    process_pending_notifications
-)
 
 @shared_task
 def setup_periodic_tasks():
     """
     Configure les tâches périodiques pour l'application.
-    Cette fonction est appelée au démarrage de l'application pour s'assurer
-    que toutes les tâches périodiques sont correctement configurées.
+    Cette fonction est appelée après les migrations (signal post_migrate) pour
+    s'assurer que toutes les tâches périodiques sont correctement configurées ;
+    elle est idempotente.
     """
-    # Supprime les anciennes tâches pour éviter les duplications
-    PeriodicTask.objects.filter(
-        name__in=[
-            'check_active_nlp_models_hourly',
-            'process_pending_notifications_every_5_minutes'
-        ]
-    ).delete()
-    
     # Crée ou récupère les intervalles de temps
     hourly_schedule, _ = IntervalSchedule.objects.get_or_create(
         every=1,
@@ -45,25 +33,59 @@ def setup_periodic_tasks():
     )
     
     # Tâche pour vérifier les modèles NLP actifs toutes les heures
-    PeriodicTask.objects.create(
+    PeriodicTask.objects.update_or_create(
         name='check_active_nlp_models_hourly',
-        task='feedback_api.advanced_tasks.check_active_nlp_models',
-        interval=hourly_schedule,
-        args='[]',
-        kwargs='{}',
-        description='Vérifie les modèles NLP actifs toutes les heures et les entraîne si nécessaire',
-        enabled=True,
+        defaults={
+            'task': 'feedback_api.advanced_tasks.check_active_nlp_models',
+            'interval': hourly_schedule,
+            'args': '[]',
+            'kwargs': '{}',
+            'description': 'Vérifie les modèles NLP actifs toutes les heures et les entraîne si nécessaire',
+            'enabled': True,
+        }
     )
     
     # Tâche pour traiter les notifications en attente toutes les 5 minutes
-    PeriodicTask.objects.create(
+    PeriodicTask.objects.update_or_create(
         name='process_pending_notifications_every_5_minutes',
-        task='feedback_api.advanced_tasks.process_pending_notifications',
-        interval=five_minutes_schedule,
-        args='[]',
-        kwargs='{}',
-        description='Traite les notifications en attente toutes les 5 minutes',
-        enabled=True,
+        defaults={
+            'task': 'feedback_api.advanced_tasks.process_pending_notifications',
+            'interval': five_minutes_schedule,
+            'args': '[]',
+            'kwargs': '{}',
+            'description': 'Traite les notifications en attente toutes les 5 minutes',
+            'enabled': True,
+        }
+    )
+    
+    # Évaluation des modèles NLP candidats en mode fantôme toutes les 5 minutes
+    PeriodicTask.objects.update_or_create(
+        name='score_shadow_models_every_5_minutes',
+        defaults={
+            'task': 'feedback_api.advanced_tasks.score_shadow_models',
+            'interval': five_minutes_schedule,
+            'args': '[]',
+            'kwargs': '{}',
+            'description': 'Fait classer les nouveaux feedbacks par les modèles NLP évalués en mode fantôme',
+            'enabled': True,
+        }
+    )
+    
+    # Détection des zones de concentration de feedbacks toutes les 15 minutes
+    fifteen_minutes_schedule, _ = IntervalSchedule.objects.get_or_create(
+        every=15,
+        period=IntervalSchedule.MINUTES,
+    )
+    PeriodicTask.objects.update_or_create(
+        name='detect_hotspots_every_15_minutes',
+        defaults={
+            'task': 'feedback_api.advanced_tasks.detect_hotspots',
+            'interval': fifteen_minutes_schedule,
+            'args': '[]',
+            'kwargs': '{}',
+            'description': 'Rédige des alertes brouillons pour les zones de concentration de feedbacks',
+            'enabled': True,
+        }
     )
     
     # Ajouter d'autres tâches périodiques ici si nécessaire
@@ -75,10 +97,13 @@ def setup_periodic_tasks():
     }
 
 
-def register_periodic_tasks():
+def register_periodic_tasks(sender=None, **kwargs):
     """
-    Fonction à appeler dans le fichier ready() de AppConfig pour configurer les tâches périodiques
-    au démarrage de l'application.
+    Récepteur du signal post_migrate (connecté dans AppConfig.ready()) qui
+    configure les tâches périodiques une fois les tables créées.
+
+    Auparavant, ready() envoyait setup_periodic_tasks à Celery à chaque
+    démarrage de runserver ou d'un worker ; la configuration est désormais
+    faite une fois, de façon synchrone, après chaque migrate.
     """
-    # Utilise transaction.on_commit pour s'assurer que les tâches sont créées après la migration
-    transaction.on_commit(lambda: setup_periodic_tasks.delay())
+    setup_periodic_tasks()
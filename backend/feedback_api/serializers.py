@@ -1,10 +1,12 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth.models import User
 from .models import (
     Category, Feedback, Response, Log, UserProfile, Tag, FeedbackTag, 
-    Attachment, Alert, NLPModel, NLPTrainingData, KeywordRule,
-    NotificationChannel, NotificationTemplate, Notification
+    Attachment, AttachmentUpload, Alert, NLPModel, NLPTrainingData, KeywordRule,
+    NotificationChannel, NotificationTemplate, Notification, OutboundMessage, FeedbackCluster
 )
+from .attachment_store import store_blob
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -91,12 +93,18 @@ class FeedbackTagSerializer(serializers.ModelSerializer):
 class AttachmentSerializer(serializers.ModelSerializer):
     """Serializer pour les pièces jointes"""
     uploaded_by = UserSerializer(read_only=True)
+    sha256 = serializers.SerializerMethodField()
     
     class Meta:
         model = Attachment
-        fields = ['id', 'feedback', 'file', 'file_name', 'file_type', 'file_size', 'uploaded_at', 'uploaded_by']
+        fields = [
+            'id', 'feedback', 'file', 'file_name', 'file_type', 'file_size', 'sha256', 'uploaded_at', 'uploaded_by'
+        ]
         read_only_fields = ['id', 'file_name', 'file_type', 'file_size', 'uploaded_at']
     
+    def get_sha256(self, obj):
+        return obj.blob.sha256 if obj.blob_id else None
+    
     def create(self, validated_data):
         # Récupérer les métadonnées du fichier
         file = validated_data.get('file')
@@ -104,6 +112,10 @@ class AttachmentSerializer(serializers.ModelSerializer):
             validated_data['file_name'] = file.name
             validated_data['file_type'] = file.content_type
             validated_data['file_size'] = file.size
+            # Contenu déjà reçu (même photo, renvoi) : stocké une seule fois
+            blob, _ = store_blob(file, size=file.size)
+            validated_data['blob'] = blob
+            validated_data['file'] = blob.file.name
         
         # Associer l'utilisateur actuel
         request = self.context.get('request')
@@ -113,6 +125,33 @@ class AttachmentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    """Serializer pour les envois de pièces jointes par morceaux"""
+    complete = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = AttachmentUpload
+        fields = [
+            'id', 'feedback', 'client_key', 'file_name', 'file_type', 'file_size', 'sha256',
+            'received', 'complete', 'attachment', 'created_at'
+        ]
+        read_only_fields = ['id', 'feedback', 'received', 'attachment', 'created_at']
+    
+    def get_complete(self, obj):
+        return obj.attachment_id is not None
+    
+    def validate_file_size(self, value):
+        if value < 0:
+            raise serializers.ValidationError("La taille du fichier ne peut pas être négative.")
+        return value
+    
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(c not in '0123456789abcdef' for c in value)):
+            raise serializers.ValidationError("Empreinte SHA-256 invalide : 64 caractères hexadécimaux attendus.")
+        return value
+
+
 class AlertSerializer(serializers.ModelSerializer):
     """Serializer pour les alertes"""
     created_by = UserSerializer(read_only=True)
@@ -124,9 +163,11 @@ class AlertSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'feedback', 'title', 'description', 'region', 'severity', 'status',
             'created_by', 'approved_by', 'created_at', 'updated_at', 'sent_at',
-            'recipients', 'recipient_groups'
+            'recipients', 'recipient_groups', 'hotspot_cell', 'hotspot_category', 'surge_series', 'detection_latency'
+        ]
+        read_only_fields = [
+            'id', 'created_at', 'updated_at', 'sent_at', 'hotspot_cell', 'hotspot_category', 'surge_series', 'detection_latency'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'sent_at']
     
     def create(self, validated_data):
         request = self.context.get('request')
@@ -142,9 +183,13 @@ class NLPModelSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'model_type', 'version', 'file', 'is_active',
             'accuracy', 'precision', 'recall', 'f1_score', 'training_data_size',
-            'created_at', 'last_trained'
+            'created_at', 'last_trained', 'training_checkpoint', 'hyperparameters', 'checksum',
+            'shadow_mode', 'shadow_started_at'
+        ]
+        read_only_fields = [
+            'id', 'created_at', 'accuracy', 'precision', 'recall', 'f1_score', 'training_checkpoint',
+            'hyperparameters', 'checksum', 'shadow_mode', 'shadow_started_at'
         ]
-        read_only_fields = ['id', 'created_at', 'accuracy', 'precision', 'recall', 'f1_score']
 
 
 class NLPTrainingDataSerializer(serializers.ModelSerializer):
@@ -154,8 +199,8 @@ class NLPTrainingDataSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = NLPTrainingData
-        fields = ['id', 'content', 'category', 'category_name', 'is_validated', 'added_by', 'added_at']
-        read_only_fields = ['id', 'added_at']
+        fields = ['id', 'content', 'category', 'category_name', 'is_validated', 'added_by', 'added_at', 'validated_at']
+        read_only_fields = ['id', 'added_at', 'validated_at']
     
     def create(self, validated_data):
         request = self.context.get('request')
@@ -214,6 +259,18 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'sent_at', 'read_at']
 
 
+class OutboundMessageSerializer(serializers.ModelSerializer):
+    """Serializer pour le registre des messages sortants"""
+    class Meta:
+        model = OutboundMessage
+        fields = [
+            'id', 'channel', 'provider', 'provider_message_id', 'to', 'response', 'notification',
+            'status', 'provider_status', 'error_code', 'retry_count',
+            'enqueued_at', 'sent_at', 'delivered_at', 'read_at', 'failed_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class FeedbackSerializer(serializers.ModelSerializer):
     """Serializer pour les feedbacks"""
     user = UserSerializer(read_only=True)
@@ -230,9 +287,16 @@ class FeedbackSerializer(serializers.ModelSerializer):
             'priority', 'created_at', 'updated_at', 'contact_phone', 'contact_email',
             'reference_number', 'external_id', 'source_url', 'location', 'latitude', 'longitude',
             'auto_categorized', 'confidence_score', 'assigned_to', 'resolved_at', 'local_id',
-            'sync_status', 'responses', 'tags', 'attachments'
+            'sync_status', 'responses', 'tags', 'attachments', 'cluster'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'auto_categorized', 'confidence_score']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'auto_categorized', 'confidence_score', 'cluster']
+        # DRF ne tire pas de validateur de la contrainte unique partielle : 400 plutôt qu'une IntegrityError
+        extra_kwargs = {
+            'local_id': {'validators': [UniqueValidator(
+                queryset=Feedback.objects.exclude(local_id=''),
+                message="Identifiant local déjà utilisé par un autre feedback."
+            )]},
+        }
     
     def create(self, validated_data):
         # Si l'utilisateur est authentifié, l'associer au feedback
@@ -278,6 +342,17 @@ class FeedbackSerializer(serializers.ModelSerializer):
         return updated_instance
 
 
+class FeedbackClusterSerializer(serializers.ModelSerializer):
+    """Serializer pour les groupes de feedbacks quasi identiques"""
+    representative_content = serializers.CharField(source='representative.content', read_only=True)
+    open_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = FeedbackCluster
+        fields = ['id', 'representative', 'representative_content', 'size', 'open_count', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
 class FeedbackCreateSerializer(serializers.ModelSerializer):
     """Serializer pour la création de feedback (sans authentification)"""
     class Meta:
@@ -295,3 +370,17 @@ class FeedbackCreateSerializer(serializers.ModelSerializer):
         )
         
         return feedback
+
+
+class SyncFeedbackSerializer(serializers.ModelSerializer):
+    """Serializer pour les feedbacks saisis hors-ligne, dans un lot de /api/sync/"""
+    local_id = serializers.CharField(max_length=100)
+    # Existence vérifiée pour tout le lot en une requête (voir offline_sync)
+    category = serializers.IntegerField(required=False, allow_null=True)
+    
+    class Meta:
+        model = Feedback
+        fields = [
+            'local_id', 'channel', 'content', 'category', 'priority', 'contact_phone', 'contact_email',
+            'location', 'latitude', 'longitude'
+        ]
@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Feedback, Response
+from django.utils import timezone
+from .models import Feedback, Response, NotificationChannel, NotificationTemplate, NLPModel
 from .tasks import classify_feedback, send_response_message
+from .notification_registry import notification_registry
+from .classification_cache import classification_cache
+from .live_feed import CREATED, RESPONDED, STATUS_CHANGED, publish_event
+from .http_cache import VERSIONED_MODELS, bump_version, should_bump
 
 
 @receiver(post_save, sender=Feedback)
@@ -14,6 +20,19 @@ def trigger_feedback_classification(sender, instance, created, **kwargs):
         classify_feedback.delay(instance.id)
 
 
+@receiver(post_save, sender=Feedback)
+def publish_feedback_event(sender, instance, created, **kwargs):
+    """
+    Publie la création et les changements de statut dans le flux en direct
+    """
+    previous = getattr(instance, '_loaded_status', None)
+    if created:
+        publish_event(CREATED, instance)
+    elif previous is not None and previous != instance.status:
+        publish_event(STATUS_CHANGED, instance, previous_status=previous)
+    instance._loaded_status = instance.status
+
+
 @receiver(post_save, sender=Response)
 def trigger_response_sending(sender, instance, created, **kwargs):
     """
@@ -22,3 +41,54 @@ def trigger_response_sending(sender, instance, created, **kwargs):
     if created and instance.feedback.channel in ['sms', 'whatsapp']:
         # Lancer la tâche d'envoi en arrière-plan
         send_response_message.delay(instance.id)
+    if created:
+        publish_event(RESPONDED, instance.feedback, response=instance.id)
+        # Le feedback figure dans le flux des modifications (change_feed) avec sa nouvelle réponse
+        Feedback.objects.filter(id=instance.feedback_id).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=NotificationChannel)
+def invalidate_notification_channel(sender, instance, **kwargs):
+    """
+    Invalide le cache du canal de notification modifié ou supprimé
+    """
+    notification_registry.invalidate_channel(instance.id)
+
+
+@receiver([post_save, post_delete], sender=NotificationTemplate)
+def invalidate_notification_template(sender, instance, **kwargs):
+    """
+    Invalide le cache (et la version compilée) du modèle modifié ou supprimé
+    """
+    notification_registry.invalidate_template(instance.id)
+
+
+@receiver(post_save, sender=NLPModel)
+def invalidate_classification_cache(sender, instance, update_fields=None, **kwargs):
+    """
+    Vide le cache local des résultats de classification à l'activation d'un
+    modèle (les clés incluent la version du modèle : les autres processus ne
+    consultent plus les anciens résultats)
+    """
+    # Les statistiques d'utilisation, enregistrées à chaque classification, ne comptent pas
+    if update_fields is not None and not {'is_active', 'file', 'checksum'} & set(update_fields):
+        return
+    if instance.is_active:
+        classification_cache.invalidate()
+
+
+def bump_http_cache_version(sender, instance, update_fields=None, **kwargs):
+    """
+    Renouvelle la version du modèle : les ETag et réponses en cache des
+    ressources qui l'affichent ne correspondent plus
+    """
+    if should_bump(sender, update_fields):
+        # Immédiatement, puis à la validation : une lecture faite entre les
+        # deux (anciennes données) est mise en cache sous une version abandonnée
+        bump_version(sender)
+        transaction.on_commit(lambda: bump_version(sender))
+
+
+for versioned_model in VERSIONED_MODELS:
+    post_save.connect(bump_http_cache_version, sender=versioned_model, dispatch_uid=f'http-cache-{versioned_model.__name__}')
+    post_delete.connect(bump_http_cache_version, sender=versioned_model, dispatch_uid=f'http-cache-delete-{versioned_model.__name__}')
@@ -0,0 +1,287 @@
+"""
+Détection en continu des afflux de messages (surges)
+
+Chaque feedback reçu est compté, dès son arrivée, dans quelques séries
+(canal, catégorie, localisation) : à l'enregistrement par canal et par
+localisation, puis après classification par catégorie. Les compteurs sont
+des alvéoles d'une minute dans le cache partagé (Redis en production) :
+tous les processus web et workers alimentent les mêmes séries, par
+incrémentation atomique.
+
+Pour chaque série, le niveau habituel est une moyenne (et une variance)
+à décroissance exponentielle des alvéoles closes, mise à jour une seule
+fois par alvéole. Un message coûte donc un nombre fixe d'accès au cache,
+quel que soit le volume : le nombre de messages de la fenêtre récente est
+comparé au niveau habituel (écart réduit, z-score), et un afflux rédige une
+alerte brouillon et prévient les modérateurs.
+"""
+import hashlib
+import logging
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ANY = '*'
+
+# Au-delà, les alvéoles en attente sont supposées vides (décroissance en une fois)
+MAX_FOLDED_BUCKETS = 24 * 60
+
+STATE_TIMEOUT = 7 * 24 * 3600
+
+
+def _setting(name, default):
+    return getattr(settings, 'SURGE_SETTINGS', {}).get(name, default)
+
+
+def feedback_series(feedback, classified=False):
+    """
+    Séries (canal, catégorie, localisation) alimentées par un feedback
+
+    À l'arrivée, la catégorie n'est pas encore connue : le message compte
+    pour son canal et sa localisation ; après classification, pour sa
+    catégorie sur le canal et la localisation.
+    """
+    location = (feedback.location or '').strip().lower()[:100]
+    category = str(feedback.category_id) if classified and feedback.category_id else ANY
+    if classified and category == ANY:
+        return set()
+    series = {(feedback.channel, category, ANY)}
+    if location:
+        series.add((feedback.channel, category, location))
+    return series
+
+
+class SurgeDetector:
+    """Compteurs glissants et niveau habituel (EWMA) des séries, dans le cache partagé"""
+
+    def __init__(self, bucket_seconds=None, window_buckets=None, half_life_buckets=None):
+        self.bucket_seconds = bucket_seconds or _setting('BUCKET_SECONDS', 60)
+        self.window_buckets = window_buckets or _setting('WINDOW_BUCKETS', 5)
+        half_life = half_life_buckets or _setting('HALF_LIFE_BUCKETS', 6 * 60)
+        self.alpha = 1 - 0.5 ** (1 / half_life)
+        # Les alvéoles restent lisibles jusqu'à leur intégration au niveau habituel
+        self.bucket_timeout = self.bucket_seconds * MAX_FOLDED_BUCKETS
+
+    @staticmethod
+    def _prefix(series):
+        digest = hashlib.sha1('\x00'.join(series).encode('utf-8')).hexdigest()[:20]
+        return f"surge:{digest}"
+
+    def _fold(self, prefix, state, until):
+        """Intègre au niveau habituel les alvéoles closes (state['bucket'], until]"""
+        pending = until - state['bucket']
+        mean, var, weight = state['mean'], state['var'], state['weight']
+        if pending > MAX_FOLDED_BUCKETS:
+            decay = (1 - self.alpha) ** (pending - MAX_FOLDED_BUCKETS)
+            mean, var, weight = mean * decay, var * decay, weight * decay + 1 - decay
+            pending = MAX_FOLDED_BUCKETS
+        first = until - pending + 1
+        counts = cache.get_many([f"{prefix}:{bucket}" for bucket in range(first, until + 1)])
+        for bucket in range(first, until + 1):
+            deviation = counts.get(f"{prefix}:{bucket}", 0) - mean
+            mean += self.alpha * deviation
+            var = (1 - self.alpha) * (var + self.alpha * deviation * deviation)
+            weight += self.alpha * (1 - weight)
+        return {**state, 'bucket': until, 'mean': mean, 'var': var, 'weight': weight}
+
+    def observe(self, series, count=1, now=None):
+        """
+        Compte count messages dans la série et évalue la fenêtre récente
+
+        Returns:
+            dict: observed, expected, z, warm (niveau habituel établi), surge
+        """
+        now = now or timezone.now()
+        bucket = int(now.timestamp() // self.bucket_seconds)
+        prefix = self._prefix(series)
+
+        current = f"{prefix}:{bucket}"
+        cache.add(current, 0, self.bucket_timeout)
+        try:
+            cache.incr(current, count)
+        except ValueError:
+            # Alvéole expirée entre add et incr
+            cache.set(current, count, self.bucket_timeout)
+
+        state_key = f"{prefix}:state"
+        state = cache.get(state_key)
+        if state is None:
+            state = {'since': bucket, 'bucket': bucket - 1, 'mean': 0.0, 'var': 0.0, 'weight': 0.0}
+            cache.add(state_key, state, STATE_TIMEOUT)
+        elif state['bucket'] < bucket - 1 and cache.add(f"{prefix}:fold:{bucket}", 1, self.bucket_seconds * 2):
+            # Un seul processus intègre les alvéoles closes depuis le dernier passage
+            state = self._fold(prefix, state, bucket - 1)
+            cache.set(state_key, state, STATE_TIMEOUT)
+
+        window = cache.get_many([f"{prefix}:{b}" for b in range(bucket - self.window_buckets + 1, bucket + 1)])
+        observed = sum(window.values())
+        # Correction du biais de départ (moyenne initialisée à zéro), comme pour une série déjà longue
+        weight = state['weight'] or 1.0
+        mean, var = state['mean'] / weight, state['var'] / weight
+        expected = self.window_buckets * max(mean, _setting('MIN_RATE', 0.1))
+        spread = math.sqrt(max(self.window_buckets * var, expected))
+        z = (observed - expected) / spread
+        warm = bucket - state['since'] >= _setting('WARMUP_BUCKETS', 30)
+        return {
+            'observed': observed,
+            'expected': expected,
+            'z': z,
+            'warm': warm,
+            'surge': warm and observed >= _setting('MIN_COUNT', 10) and z >= _setting('Z_THRESHOLD', 4.0),
+        }
+
+    def claim_alert(self, series):
+        """Une seule alerte par série pendant le délai de carence (tous processus confondus)"""
+        return cache.add(f"{self._prefix(series)}:alerted", 1, _setting('COOLDOWN_SECONDS', 3600))
+
+
+# Instance globale partagée par les vues et les tâches du processus
+surge_detector = SurgeDetector()
+
+
+def observe_feedbacks(feedbacks, classified=False, now=None):
+    """
+    Alimente le détecteur avec des feedbacks reçus (ou classifiés) et
+    planifie une alerte pour chaque série en afflux
+
+    Returns:
+        list: séries en afflux
+    """
+    if not _setting('ENABLED', True):
+        return []
+
+    counts, latest = Counter(), {}
+    for feedback in feedbacks:
+        for series in feedback_series(feedback, classified):
+            counts[series] += 1
+            latest[series] = feedback
+
+    surges = []
+    for series, count in counts.items():
+        try:
+            result = surge_detector.observe(series, count, now)
+        except Exception as e:
+            # La détection ne doit jamais faire échouer la réception d'un message
+            logger.error(f"Erreur de la détection d'afflux pour la série {series}: {str(e)}")
+            continue
+        if result['surge'] and surge_detector.claim_alert(series):
+            feedback = latest[series]
+            logger.warning(
+                f"Afflux détecté sur {series}: {result['observed']} message(s) pour "
+                f"{result['expected']:.1f} attendu(s) (z={result['z']:.1f})"
+            )
+            _schedule_alert(series, result, feedback.id, feedback.created_at)
+            surges.append(series)
+    return surges
+
+
+def _schedule_alert(series, result, feedback_id, arrived_at):
+    from .advanced_tasks import raise_surge_alert
+
+    payload = {
+        'series': list(series),
+        'observed': result['observed'],
+        'expected': result['expected'],
+        'z': result['z'],
+        'feedback_id': feedback_id,
+        'arrived_at': arrived_at.isoformat(),
+    }
+    # Le feedback déclencheur doit être visible du worker
+    transaction.on_commit(lambda: raise_surge_alert.delay(payload))
+
+
+def series_label(series):
+    channel, category_id, location = series
+    parts = [f"canal {channel}"]
+    if category_id != ANY:
+        from .models import Category
+        name = Category.objects.filter(id=category_id).values_list('name', flat=True).first()
+        parts.append(f"catégorie {name or category_id}")
+    if location != ANY:
+        parts.append(location)
+    return ', '.join(parts)
+
+
+def _series_feedbacks(series, since):
+    from .models import Feedback
+
+    channel, category_id, location = series
+    condition = Q(channel=channel, created_at__gte=since)
+    if category_id != ANY:
+        condition &= Q(category_id=int(category_id))
+    if location != ANY:
+        condition &= Q(location__iexact=location)
+    return Feedback.objects.filter(condition)
+
+
+def draft_surge_alert(payload):
+    """
+    Rédige l'alerte brouillon d'un afflux et notifie les modérateurs
+
+    Returns:
+        Alert: alerte créée, ou None (alerte déjà en cours, aucun feedback disponible)
+    """
+    from django.contrib.auth.models import User
+    from .models import Alert, Feedback, Notification, NotificationChannel
+
+    series = tuple(payload['series'])
+    key = '|'.join(series)
+    window = surge_detector.bucket_seconds * surge_detector.window_buckets
+    since = timezone.now() - timedelta(seconds=_setting('COOLDOWN_SECONDS', 3600))
+    if Alert.objects.filter(
+        surge_series=key, created_at__gte=since,
+        status__in=[Alert.StatusChoices.DRAFT, Alert.StatusChoices.PENDING]
+    ).exists():
+        return None
+
+    # Une alerte par feedback : le déclencheur, ou à défaut le plus récent de la série sans alerte
+    feedback = Feedback.objects.filter(id=payload['feedback_id'], alert__isnull=True).first()
+    if feedback is None:
+        feedback = (
+            _series_feedbacks(series, timezone.now() - timedelta(seconds=window))
+            .filter(alert__isnull=True).order_by('-created_at').first()
+        )
+    if feedback is None:
+        return None
+
+    label = series_label(series)
+    ratio = payload['observed'] / payload['expected']
+    alert = Alert.objects.create(
+        feedback=feedback,
+        title=f"Afflux de messages: {label}"[:100],
+        description=(
+            f"{payload['observed']} message(s) en {window // 60} min ({label}) pour "
+            f"{payload['expected']:.1f} attendu(s) habituellement (z={payload['z']:.1f})."
+        ),
+        region=(series[2] if series[2] != ANY else 'Toutes zones')[:100],
+        severity=Alert.SeverityChoices.HIGH if ratio >= 10 else Alert.SeverityChoices.MEDIUM,
+        surge_series=key,
+    )
+    arrived_at = datetime.fromisoformat(payload['arrived_at'])
+    alert.detection_latency = (alert.created_at - arrived_at).total_seconds()
+    alert.save(update_fields=['detection_latency'])
+    logger.info(f"Alerte d'afflux #{alert.id} rédigée ({label}), {alert.detection_latency:.2f} s après l'arrivée du message")
+
+    channel = NotificationChannel.objects.filter(
+        is_active=True, channel_type=_setting('NOTIFICATION_CHANNEL_TYPE', NotificationChannel.ChannelChoices.PUSH)
+    ).first()
+    if channel is None:
+        logger.warning(f"Aucun canal de notification actif pour l'alerte d'afflux #{alert.id}")
+        return alert
+    notifications = Notification.objects.bulk_create([
+        Notification(user=user, title=alert.title, content=alert.description,
+                     link=f"/alerts/{alert.id}", channel=channel)
+        for user in User.objects.filter(groups__name='Moderators', is_active=True)
+    ])
+    from .advanced_tasks import send_notification
+    notification_ids = [notification.id for notification in notifications]
+    transaction.on_commit(lambda: [send_notification.delay(notification_id) for notification_id in notification_ids])
+    return alert
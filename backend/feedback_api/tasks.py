@@ -1,8 +1,6 @@
 from celery import shared_task
 import logging
 from django.conf import settings
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +11,8 @@ def send_response_message(response_id):
     """
     from .models import Response, Feedback
     from .utils import send_sms_via_twilio, send_whatsapp
+    from .delivery import start_outbound_message, record_send_result
+    from twilio.base.exceptions import TwilioRestException
     
     try:
         # Récupérer la réponse
@@ -30,6 +30,14 @@ def send_response_message(response_id):
         # Ajouter un identifiant de feedback pour le suivi
         message_body = f"[Feedback #{feedback.id}] {message_body}"
         
+        # Enregistrer la tentative dans le registre des messages sortants
+        outbound = start_outbound_message(
+            channel=feedback.channel,
+            to=feedback.contact_phone,
+            response=response,
+            enqueued_at=response.created_at
+        )
+        
         # Envoyer le message via le canal approprié
         result = None
         
@@ -50,6 +58,8 @@ def send_response_message(response_id):
                 else:
                     logger.info(f"WhatsApp envoyé à {feedback.contact_phone}, détails: {result}")
         
+        record_send_result(outbound, result)
+        
         # Vérifier si l'envoi a réussi
         if result:
             # Marquer la réponse comme envoyée
@@ -108,9 +118,14 @@ def classify_feedback(feedback_id):
         
         if suggested_category_name and confidence > confidence_threshold:
             try:
-                # Rechercher la catégorie par nom exact d'abord
-                categories = Category.objects.filter(name=suggested_category_name)
-                if not categories.exists():
+                # Un modèle entraîné prédit directement l'id de la catégorie ;
+                # les mots-clés ne fournissent qu'un nom, recherché par nom exact d'abord
+                suggested_category_id = classification_result.get('category_id')
+                if suggested_category_id:
+                    categories = Category.objects.filter(id=suggested_category_id)
+                else:
+                    categories = Category.objects.filter(name=suggested_category_name)
+                if not categories.exists() and not suggested_category_id:
                     # Si pas de correspondance exacte, essayer une correspondance partielle
                     logger.info(f"Pas de correspondance exacte pour '{suggested_category_name}', recherche partielle")
                     categories = Category.objects.filter(name__icontains=suggested_category_name)
@@ -142,6 +157,22 @@ def classify_feedback(feedback_id):
         )
         
         logger.info(f"Feedback #{feedback.id} classifié automatiquement: {details}")
+        
+        # Rattacher le feedback à son groupe de messages quasi identiques
+        if settings.NLP_SETTINGS.get('NEAR_DUPLICATE_ENABLED', True):
+            from .near_duplicates import assign_cluster
+            try:
+                assign_cluster(feedback.id, feedback.content)
+            except Exception as e:
+                logger.error(f"Erreur lors du regroupement des doublons du feedback #{feedback.id}: {str(e)}")
+        
+        from .live_feed import CLASSIFIED, publish_event
+        publish_event(CLASSIFIED, feedback, confidence=confidence)
+        
+        # Afflux par catégorie, une fois la catégorie connue
+        if category_updated:
+            from .surge import observe_feedbacks
+            observe_feedbacks([feedback], classified=True)
         return True
     
     except Feedback.DoesNotExist:
@@ -153,6 +184,42 @@ def classify_feedback(feedback_id):
         return False
 
 
+@shared_task
+def classify_feedback_batch(feedback_ids):
+    """
+    Classifie un lot de feedbacks créés en masse (bulk_create ne déclenche
+    pas le signal post_save) : une seule tâche pour tout le lot
+    """
+    classified = 0
+    for feedback_id in feedback_ids:
+        if classify_feedback(feedback_id):
+            classified += 1
+    
+    logger.info(f"{classified}/{len(feedback_ids)} feedback(s) classifié(s) automatiquement")
+    return classified
+
+
+@shared_task
+def send_whatsapp_replies(replies, provider='facebook'):
+    """
+    Envoie un lot de réponses WhatsApp (accusés de réception, réponses aux commandes)
+    
+    Args:
+        replies (list): couples (numéro du destinataire, message)
+        provider (str): Fournisseur à utiliser en priorité ('facebook' ou 'twilio')
+    """
+    from .whatsapp_utils import send_whatsapp_response
+    
+    sent = 0
+    for to, message in replies:
+        if send_whatsapp_response(to, message, provider):
+            sent += 1
+    
+    if sent < len(replies):
+        logger.warning(f"{len(replies) - sent} réponse(s) WhatsApp non envoyée(s) sur {len(replies)}")
+    return sent
+
+
 @shared_task
 def generate_weekly_report():
     """
@@ -0,0 +1,92 @@
+import hashlib
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from feedback_api.attachment_store import parse_range
+from feedback_api.models import Attachment, AttachmentBlob, Feedback
+
+
+class AttachmentStoreTestCase(TestCase):
+    """Tests pour le stockage des pièces jointes adressé par contenu"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media,
+            SYNC_SETTINGS={'UPLOAD_TEMP_DIR': f'{self.media}/partial', 'CHUNK_SIZE': 4},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='benevole', password='secret')
+        self.client.force_authenticate(self.user)
+        self.feedback = Feedback.objects.create(channel='web', content='Photo du puits', user=self.user)
+        self.content = b'photo du puits ' * 10
+
+    def upload(self, name):
+        return self.client.post('/api/attachments/', {
+            'feedback': self.feedback.id,
+            'file': SimpleUploadedFile(name, self.content, content_type='image/jpeg'),
+        }, format='multipart')
+
+    def test_same_content_is_stored_once(self):
+        first, second = self.upload('puits.jpg'), self.upload('copie.jpg')
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(first.data['sha256'], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+        files = {attachment.file.name for attachment in Attachment.objects.all()}
+        self.assertEqual(files, {AttachmentBlob.objects.get().file.name})
+        self.assertEqual(second.data['file_name'], 'copie.jpg')
+
+    def test_known_hash_alone_does_not_grant_stored_content(self):
+        sha256 = self.upload('puits.jpg').data['sha256']
+        intruder = User.objects.create_user(username='curieux', password='secret')
+        other = APIClient()
+        other.force_authenticate(intruder)
+        feedback = Feedback.objects.create(channel='web', content='Autre', user=intruder)
+        opening = {
+            'client_key': 'photo-1', 'feedback': feedback.id, 'file_name': 'vol.jpg',
+            'file_type': 'image/jpeg', 'file_size': len(self.content), 'sha256': sha256,
+        }
+        started = other.post('/api/sync/uploads/', opening, format='json')
+        self.assertEqual((started.data['complete'], started.data['received']), (False, 0))
+        self.assertFalse(Attachment.objects.filter(feedback=feedback).exists())
+
+        # Octets envoyés et vérifiés : le contenu déjà stocké est réutilisé
+        done = other.generic(
+            'PUT', f"/api/sync/uploads/{started.data['id']}/", self.content,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes 0-{len(self.content) - 1}/{len(self.content)}'
+        )
+        self.assertTrue(done.data['complete'])
+        self.assertEqual(Attachment.objects.get(id=done.data['attachment']).blob.sha256, sha256)
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+
+    def test_range_download(self):
+        attachment_id = self.upload('puits.jpg').data['id']
+        url = f'/api/attachments/{attachment_id}/download/'
+
+        full = self.client.get(url)
+        self.assertEqual((full.status_code, full['Accept-Ranges']), (200, 'bytes'))
+        self.assertEqual(b''.join(full.streaming_content), self.content)
+
+        partial = self.client.get(url, HTTP_RANGE='bytes=5-9')
+        self.assertEqual((partial.status_code, partial['Content-Range']), (206, f'bytes 5-9/{len(self.content)}'))
+        self.assertEqual(b''.join(partial.streaming_content), self.content[5:10])
+        tail = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(tail.streaming_content), self.content[-3:])
+
+        # If-Range périmé : fichier entier ; plage hors du fichier : 416
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=5-9', HTTP_IF_RANGE='"autre"').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={len(self.content)}-').status_code, 416)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=full['ETag']).status_code, 304)
+
+        self.assertIsNone(parse_range('items=0-1', 10))
+        self.assertEqual(parse_range('bytes=8-', 10), (8, 9))
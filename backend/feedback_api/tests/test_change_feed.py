@@ -0,0 +1,84 @@
+import gzip
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from feedback_api.change_feed import encode_watermark, parse_watermark
+from feedback_api.models import Feedback, Log, Response
+
+
+@override_settings(SYNC_SETTINGS={'CHANGES_SETTLE_SECONDS': 0})
+@patch('feedback_api.signals.classify_feedback.delay')
+@patch('feedback_api.signals.send_response_message.delay')
+class ChangeFeedTestCase(TestCase):
+    """Tests pour le flux des modifications (synchronisation différentielle)"""
+
+    def setUp(self):
+        self.moderator = User.objects.create_user(username='moderateur', password='secret')
+        self.moderator.groups.add(Group.objects.create(name='Moderators'))
+        self.volunteer = User.objects.create_user(username='benevole', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.moderator)
+
+    def create_feedbacks(self, count, **fields):
+        feedbacks = [Feedback.objects.create(channel='web', content=f'Message {i}', **fields) for i in range(count)]
+        # Dates distinctes et passées, comme des modifications déjà validées
+        start = timezone.now() - timedelta(minutes=10)
+        for i, feedback in enumerate(feedbacks):
+            Feedback.objects.filter(id=feedback.id).update(updated_at=start + timedelta(seconds=i))
+        return feedbacks
+
+    def test_pages_follow_watermark_and_return_only_deltas(self, *mocks):
+        feedbacks = self.create_feedbacks(5)
+        first = self.client.get('/api/sync/changes/?limit=3')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([row['id'] for row in first.data['feedbacks']], [f.id for f in feedbacks[:3]])
+        self.assertTrue(first.data['has_more'])
+        self.assertNotIn('contact_phone', first.data['feedbacks'][0])
+
+        second = self.client.get(f"/api/sync/changes/?limit=3&since={first.data['watermark']}")
+        self.assertEqual([row['id'] for row in second.data['feedbacks']], [f.id for f in feedbacks[3:]])
+        self.assertFalse(second.data['has_more'])
+
+        # À jour : rien à télécharger, même marque
+        idle = self.client.get(f"/api/sync/changes/?since={second.data['watermark']}")
+        self.assertEqual((idle.data['feedbacks'], idle.data['watermark']), ([], second.data['watermark']))
+
+        # Une réponse fait figurer son feedback dans le delta suivant
+        response = Response.objects.create(feedback=feedbacks[1], responder=self.moderator, content='Merci')
+        delta = self.client.get(f"/api/sync/changes/?since={second.data['watermark']}")
+        self.assertEqual([row['id'] for row in delta.data['feedbacks']], [feedbacks[1].id])
+        self.assertEqual([row['id'] for row in delta.data['responses']], [response.id])
+
+    def test_log_source_and_visibility(self, *mocks):
+        own, = self.create_feedbacks(1, user=self.volunteer)
+        other, = self.create_feedbacks(1)
+        for feedback in (own, other):
+            Log.objects.create(feedback=feedback, action=Log.ActionChoices.STATUS_CHANGED,
+                               details='Statut modifié de new à in_progress')
+        Log.objects.update(timestamp=timezone.now() - timedelta(seconds=1))
+
+        volunteer = APIClient()
+        volunteer.force_authenticate(self.volunteer)
+        feed = volunteer.get('/api/sync/changes/?source=log')
+        self.assertEqual([row['id'] for row in feed.data['feedbacks']], [own.id])
+        self.assertEqual([change['feedback'] for change in feed.data['status_changes']], [own.id])
+
+        self.assertEqual(len(self.client.get('/api/sync/changes/?source=log').data['feedbacks']), 2)
+        self.assertEqual(self.client.get('/api/sync/changes/?since=hier').status_code, 400)
+        self.assertEqual(APIClient().get('/api/sync/changes/').status_code, 401)
+
+    def test_gzip_and_watermark_round_trip(self, *mocks):
+        self.create_feedbacks(20)
+        compressed = self.client.get('/api/sync/changes/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        payload = json.loads(gzip.decompress(compressed.content))
+        self.assertEqual(len(payload['feedbacks']), 20)
+
+        moment = timezone.now()
+        self.assertEqual(parse_watermark(encode_watermark(moment, 42)), (moment, 42))
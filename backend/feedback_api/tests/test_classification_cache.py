@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from feedback_api import nlp
+from feedback_api.classification_cache import classification_cache
+from feedback_api.model_artifact import save_artifact, train_artifact
+from feedback_api.models import Category, NLPModel
+
+from .test_nlp_training import FOOD_TEXTS, WATER_TEXTS
+
+
+class ClassificationCacheTestCase(TestCase):
+    """Tests pour le cache des résultats de classification"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        classification_cache.flush_stats()
+        classification_cache.invalidate()
+        cache.clear()
+        nlp.custom_classifiers.clear()
+        self.classify = patch('feedback_api.nlp._classify_uncached', wraps=nlp._classify_uncached)
+        self.uncached = self.classify.start()
+
+    def tearDown(self):
+        self.classify.stop()
+        nlp.custom_classifiers.clear()
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_normalized_duplicates_hit_the_cache(self):
+        first = nlp.classify_feedback('URGENT : pas d\'eau au robinet depuis 3 jours !')
+        second = nlp.classify_feedback('urgent pas d\'eau au robinet depuis 12 jours')
+        self.assertEqual(first, second)
+        self.assertEqual(self.uncached.call_count, 1)
+
+        # Niveau partagé : un autre processus (cache local vide) retrouve le résultat
+        classification_cache.invalidate()
+        self.assertEqual(nlp.classify_feedback('Urgent, pas d\'eau au robinet depuis 5 jours.'), first)
+        self.assertEqual(self.uncached.call_count, 1)
+
+        stats = classification_cache.stats()
+        self.assertEqual((stats['local_hits'], stats['shared_hits'], stats['misses']), (1, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_model_activation_changes_cache_version(self):
+        text = 'La pompe à eau est en panne'
+        keywords_result = nlp.classify_feedback(text)
+        self.assertIsNone(keywords_result['category_id'])
+
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        water = Category.objects.create(name='Eau')
+        food = Category.objects.create(name='Alimentation')
+        artifact = train_artifact(
+            TfidfVectorizer(), MultinomialNB(), WATER_TEXTS + FOOD_TEXTS,
+            [water.id] * 4 + [food.id] * 4, {water.id: 'Eau', food.id: 'Alimentation'}
+        )
+        path = os.path.join(settings.MEDIA_ROOT, 'nlp_models', 'model.pkl')
+        NLPModel.objects.create(
+            name='Actif', model_type='TF-IDF + MultinomialNB', version='1.0', file='nlp_models/model.pkl',
+            checksum=save_artifact(artifact, path), is_trained=True, is_active=True
+        )
+
+        model_result = nlp.classify_feedback(text)
+        self.assertEqual(model_result['category_id'], water.id)
+        self.assertEqual(self.uncached.call_count, 2)
+        self.assertEqual(nlp.classify_feedback(text), model_result)
+        self.assertEqual(self.uncached.call_count, 2)
+
+    def test_stats_endpoint(self):
+        nlp.classify_feedback('Les rations sont insuffisantes')
+        nlp.classify_feedback('Les rations sont insuffisantes')
+
+        response = APIClient().get('/api/nlp-models/classification_cache/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['lookups'], 2)
+        self.assertEqual(response.data['hit_rate'], 0.5)
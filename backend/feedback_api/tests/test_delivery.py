@@ -0,0 +1,173 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from twilio.request_validator import RequestValidator
+
+from feedback_api.models import (
+    Feedback, Response, Notification, NotificationChannel, OutboundMessage
+)
+from feedback_api.delivery import (
+    record_send_result, start_outbound_message, delivery_latency_stats
+)
+
+
+class DeliveryLedgerTestCase(TestCase):
+    """Tests pour le registre des messages sortants et les callbacks de statut"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='moderateur', password='testpassword')
+        self.feedback = Feedback.objects.create(
+            content='Pas d\'eau au point 4',
+            channel=Feedback.ChannelChoices.WHATSAPP,
+            contact_phone='+22370000000'
+        )
+        # Ne pas déclencher l'envoi réel de la réponse
+        with patch('feedback_api.signals.send_response_message'):
+            self.response = Response.objects.create(
+                feedback=self.feedback, responder=self.user, content='Une équipe arrive'
+            )
+
+    def _start(self, result):
+        outbound = start_outbound_message(
+            channel=self.feedback.channel,
+            to=self.feedback.contact_phone,
+            response=self.response,
+            enqueued_at=self.response.created_at
+        )
+        return record_send_result(outbound, result)
+
+    def test_send_result_records_provider_id(self):
+        outbound = self._start({'id': 'wamid.ABC', 'status': 'sent', 'to': '+22370000000'})
+        self.assertEqual(outbound.provider, OutboundMessage.ProviderChoices.FACEBOOK)
+        self.assertEqual(outbound.provider_message_id, 'wamid.ABC')
+        self.assertEqual(outbound.status, OutboundMessage.StatusChoices.SENT)
+        self.assertIsNotNone(outbound.sent_at)
+
+    def test_retry_increments_counter(self):
+        self._start(None)
+        outbound = self._start({'sid': 'SM123', 'status': 'queued', 'to': '+22370000000'})
+        self.assertEqual(outbound.retry_count, 1)
+        self.assertEqual(outbound.provider, OutboundMessage.ProviderChoices.TWILIO)
+        self.assertEqual(OutboundMessage.objects.count(), 1)
+
+    def test_whatsapp_statuses_ingested_in_batch(self):
+        self._start({'id': 'wamid.ABC', 'status': 'sent', 'to': '+22370000000'})
+        timestamp = int(timezone.now().timestamp())
+        payload = {
+            'object': 'whatsapp_business_account',
+            'entry': [{
+                'changes': [{
+                    'value': {
+                        'statuses': [
+                            # Les statuts peuvent arriver dans le désordre
+                            {'id': 'wamid.ABC', 'status': 'read', 'timestamp': str(timestamp + 5)},
+                            {'id': 'wamid.ABC', 'status': 'delivered', 'timestamp': str(timestamp)},
+                            {'id': 'wamid.UNKNOWN', 'status': 'delivered', 'timestamp': str(timestamp)},
+                        ]
+                    }
+                }]
+            }]
+        }
+
+        response = self.client.post('/api/inbound/facebook-webhook/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        outbound = OutboundMessage.objects.get(provider_message_id='wamid.ABC')
+        self.assertEqual(outbound.status, OutboundMessage.StatusChoices.READ)
+        self.assertIsNotNone(outbound.delivered_at)
+        self.assertIsNotNone(outbound.read_at)
+
+    def post_twilio_status(self, data, token='secret-twilio'):
+        url = 'http://testserver/api/inbound/webhook/twilio-status/'
+        signature = RequestValidator(token).compute_signature(url, data)
+        return self.client.post(url, data, HTTP_X_TWILIO_SIGNATURE=signature)
+
+    @override_settings(TWILIO_AUTH_TOKEN='secret-twilio')
+    def test_twilio_status_callback(self):
+        channel = NotificationChannel.objects.create(name='SMS', channel_type='sms')
+        notification = Notification.objects.create(
+            user=self.user, title='Alerte', content='Test', channel=channel,
+            status=Notification.StatusChoices.SENT
+        )
+        outbound = start_outbound_message(
+            channel=Feedback.ChannelChoices.SMS, to='+22370000000', notification=notification
+        )
+        record_send_result(outbound, {'sid': 'SM999', 'status': 'queued', 'to': '+22370000000'})
+
+        response = self.post_twilio_status({
+            'MessageSid': 'SM999', 'MessageStatus': 'undelivered', 'ErrorCode': '30003'
+        })
+        self.assertEqual(response.status_code, 200)
+
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.StatusChoices.FAILED)
+        self.assertEqual(outbound.error_code, '30003')
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, Notification.StatusChoices.FAILED)
+
+        # Un statut ultérieur ne réactive pas un message en échec
+        self.post_twilio_status({'MessageSid': 'SM999', 'MessageStatus': 'delivered'})
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.StatusChoices.FAILED)
+
+    @override_settings(TWILIO_AUTH_TOKEN='secret-twilio')
+    def test_twilio_status_callback_requires_valid_signature(self):
+        outbound = start_outbound_message(channel=Feedback.ChannelChoices.SMS, to='+22370000000')
+        record_send_result(outbound, {'sid': 'SM998', 'status': 'queued', 'to': '+22370000000'})
+        data = {'MessageSid': 'SM998', 'MessageStatus': 'delivered'}
+
+        unsigned = self.client.post('/api/inbound/webhook/twilio-status/', data)
+        forged = self.post_twilio_status(data, token='autre-jeton')
+        self.assertEqual((unsigned.status_code, forged.status_code), (403, 403))
+        with override_settings(TWILIO_AUTH_TOKEN=''):
+            self.assertEqual(self.post_twilio_status(data, token='').status_code, 403)
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.StatusChoices.SENT)
+
+        self.assertEqual(self.post_twilio_status(data).status_code, 200)
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.StatusChoices.DELIVERED)
+
+    @override_settings(TWILIO_AUTH_TOKEN='secret-twilio',
+                       TWILIO_STATUS_CALLBACK_URL='https://feedback.example.org/api/inbound/webhook/twilio-status/')
+    def test_twilio_signature_checked_against_public_callback_url(self):
+        outbound = start_outbound_message(channel=Feedback.ChannelChoices.SMS, to='+22370000000')
+        record_send_result(outbound, {'sid': 'SM997', 'status': 'queued', 'to': '+22370000000'})
+        data = {'MessageSid': 'SM997', 'MessageStatus': 'delivered'}
+
+        # Derrière le proxy TLS, la requête arrive en http:// sur un autre hôte
+        signature = RequestValidator('secret-twilio').compute_signature(
+            'https://feedback.example.org/api/inbound/webhook/twilio-status/', data
+        )
+        response = self.client.post('/api/inbound/webhook/twilio-status/', data, HTTP_X_TWILIO_SIGNATURE=signature)
+        self.assertEqual(response.status_code, 200)
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.StatusChoices.DELIVERED)
+
+        # Signature de l'URL interne : refusée
+        self.assertEqual(self.post_twilio_status(data).status_code, 403)
+
+    def test_latency_percentiles(self):
+        now = timezone.now()
+        for seconds in range(1, 11):
+            OutboundMessage.objects.create(
+                channel=Feedback.ChannelChoices.SMS,
+                to='+22370000000',
+                status=OutboundMessage.StatusChoices.DELIVERED,
+                enqueued_at=now - timedelta(minutes=5),
+                sent_at=now - timedelta(minutes=5) + timedelta(seconds=1),
+                delivered_at=now - timedelta(minutes=5) + timedelta(seconds=seconds),
+            )
+
+        stats = delivery_latency_stats(now - timedelta(days=1))
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]['channel'], 'sms')
+        self.assertEqual(stats[0]['delivered'], 10)
+        self.assertAlmostEqual(stats[0]['delivery_latency_p50'], 5.5)
+        self.assertAlmostEqual(stats[0]['delivery_latency_p95'], 9.55)
+        self.assertAlmostEqual(stats[0]['send_latency_p95'], 1.0)
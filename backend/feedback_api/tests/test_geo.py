@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from feedback_api.models import Category, Feedback
+
+# Bamako, Ségou (~205 km), Tombouctou (~710 km), Fidji (de part et d'autre de l'antiméridien)
+PLACES = {
+    'bamako': (12.6392, -8.0029),
+    'bamako_nord': (12.6800, -7.9900),
+    'segou': (13.4317, -6.2157),
+    'tombouctou': (16.7666, -3.0026),
+    'fidji_est': (-17.71, 179.9),
+    'fidji_ouest': (-17.71, -179.9),
+}
+
+
+@patch('feedback_api.signals.classify_feedback.delay')
+class GeoFilterTestCase(TestCase):
+    """Tests pour les filtres géographiques et l'agrégation par tuiles"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.water = Category.objects.create(name='Eau')
+        self.ids = {}
+        with patch('feedback_api.signals.classify_feedback.delay'):
+            for name, (latitude, longitude) in PLACES.items():
+                self.ids[name] = Feedback.objects.create(
+                    content=name, channel='web', latitude=latitude, longitude=longitude,
+                    category=self.water if name.startswith('bamako') else None
+                ).id
+            Feedback.objects.create(content='sans position', channel='web')
+
+    def _names(self, query):
+        response = self.client.get(f'/api/feedback/?{query}&page_size=100')
+        self.assertEqual(response.status_code, 200)
+        found = {feedback['id'] for feedback in response.data['results']}
+        return {name for name, feedback_id in self.ids.items() if feedback_id in found}
+
+    def test_bbox(self, _):
+        self.assertEqual(self._names('bbox=-9,12,-6,14'), {'bamako', 'bamako_nord', 'segou'})
+        self.assertEqual(self._names('bbox=-9,12,-6,14&category=%d' % self.water.id), {'bamako', 'bamako_nord'})
+        # Ouest > est : rectangle à cheval sur l'antiméridien
+        self.assertEqual(self._names('bbox=179,-18,-179,-17'), {'fidji_est', 'fidji_ouest'})
+        self.assertEqual(self.client.get('/api/feedback/?bbox=-9,14,-6,12').status_code, 400)
+        self.assertEqual(self.client.get('/api/feedback/?bbox=abc').status_code, 400)
+
+    def test_radius(self, _):
+        self.assertEqual(self._names('near=12.6392,-8.0029&radius=10'), {'bamako', 'bamako_nord'})
+        self.assertEqual(self._names('near=12.6392,-8.0029&radius=250'), {'bamako', 'bamako_nord', 'segou'})
+        self.assertEqual(self._names('near=-17.71,179.95&radius=20'), {'fidji_est', 'fidji_ouest'})
+        self.assertEqual(self.client.get('/api/feedback/?near=12.6,-8.0').status_code, 400)
+
+    def test_tiles(self, _):
+        response = self.client.get('/api/feedback/tiles/?zoom=6&bbox=-9,12,-2,17')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+        tiles = {(tile['x'], tile['y']): tile for tile in response.data['tiles']}
+        # Tuiles d'environ 5.6° au zoom 6 : Bamako et Ségou dans (30, 29), Tombouctou dans (31, 28)
+        self.assertEqual(set(tiles), {(30, 29), (31, 28)})
+        self.assertEqual(tiles[(30, 29)]['count'], 3)
+        self.assertAlmostEqual(tiles[(30, 29)]['latitude'], (12.6392 + 12.68 + 13.4317) / 3)
+        self.assertIsNone(tiles[(30, 29)]['feedback'])
+        self.assertEqual(tiles[(31, 28)]['feedback'], self.ids['tombouctou'])
+
+        world = self.client.get('/api/feedback/tiles/?zoom=0').data
+        self.assertEqual(world['tiles'][0]['count'], len(PLACES))
+        self.assertEqual(self.client.get('/api/feedback/tiles/?zoom=30').status_code, 400)
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from feedback_api.hotspots import bin_counts, cell_bounds, cell_ids, detect_hotspots, poisson_hotspots, update_counts
+from feedback_api.models import Alert, Category, Feedback, HotspotCount
+
+HOTSPOT_SETTINGS = {
+    'CELL_SIZE_DEGREES': 0.01, 'WINDOW_HOURS': 24, 'BASELINE_HOURS': 48,
+    'MIN_COUNT': 5, 'MIN_EXPECTED': 0.5, 'ALPHA': 0.001,
+}
+
+
+class HotspotGridTestCase(TestCase):
+    """Tests pour la grille et le test de Poisson vectorisés"""
+
+    def test_cells_and_counts(self):
+        cells = cell_ids([12.6391, 12.6399, 12.6501, -90.0], [-8.0021, -8.0029, -8.0021, 180.0], 0.01)
+        self.assertEqual(cells[0], cells[1])
+        self.assertNotEqual(cells[0], cells[2])
+        south, west, north, east = cell_bounds(cells[0], 0.01)
+        self.assertTrue(south <= 12.6391 < north and west <= -8.0021 < east)
+
+        cell, category, hour, counts = bin_counts(cells, np.array([1, 1, 1, 0]), np.array([3, 3, 4, 0]))
+        self.assertEqual(counts.sum(), 4)
+        self.assertEqual(counts[(cell == cells[0]) & (category == 1) & (hour == 3)].tolist(), [2])
+
+    def test_poisson_flags_spikes_only(self):
+        flagged, expected, _ = poisson_hotspots(
+            observed=[20, 8, 6, 2], baseline=[14, 14, 0, 0], window_hours=24, baseline_hours=168
+        )
+        # Attendus : 2, 2, plancher 0.5, plancher 0.5 ; 2 est sous le minimum
+        self.assertEqual(flagged.tolist(), [True, False, True, False])
+        self.assertEqual(expected.tolist(), [2.0, 2.0, 0.5, 0.5])
+
+
+@override_settings(HOTSPOT_SETTINGS=HOTSPOT_SETTINGS)
+@patch('feedback_api.signals.classify_feedback.delay')
+class HotspotDetectionTestCase(TestCase):
+    """Tests pour la détection des zones de concentration et les alertes brouillon"""
+
+    def setUp(self):
+        self.now = timezone.now().replace(minute=30, second=0, microsecond=0)
+        self.water = Category.objects.create(name='Eau')
+
+    def _feedbacks(self, count, hours_ago, latitude=12.6395, longitude=-8.0025, category=None):
+        for index in range(count):
+            feedback = Feedback.objects.create(
+                content=f'Eau contaminée {index}', channel='web', category=category or self.water,
+                latitude=latitude, longitude=longitude, location='Sabalibougou'
+            )
+            Feedback.objects.filter(id=feedback.id).update(created_at=self.now - timedelta(hours=hours_ago))
+
+    def test_spike_drafts_a_single_alert(self, _):
+        # Niveau habituel : 1 message par jour ; pic récent : 12 messages dans la même cellule
+        for day in (2, 3):
+            self._feedbacks(1, hours_ago=24 * day - 5)
+        self._feedbacks(8, hours_ago=6)
+        self._feedbacks(4, hours_ago=0)
+        # Activité régulière ailleurs : non signalée
+        for hours_ago in range(0, 72, 6):
+            self._feedbacks(2, hours_ago=hours_ago, latitude=12.70, longitude=-7.95)
+
+        hotspots = detect_hotspots(self.now)
+        self.assertEqual(len(hotspots), 1)
+        hotspot = hotspots[0]
+        self.assertEqual((hotspot['observed'], hotspot['category']), (12, self.water.id))
+        self.assertEqual(hotspot['cell'], cell_ids([12.6395], [-8.0025], 0.01)[0])
+
+        alert = Alert.objects.get(id=hotspot['alert'])
+        self.assertEqual(alert.status, Alert.StatusChoices.DRAFT)
+        self.assertEqual((alert.hotspot_cell, alert.hotspot_category_id), (hotspot['cell'], self.water.id))
+        self.assertEqual(alert.region, 'Sabalibougou')
+
+        # Nouveau passage : pas de seconde alerte pour la même cellule
+        self.assertEqual(detect_hotspots(self.now + timedelta(minutes=15))[0]['alert'], alert.id)
+        self.assertEqual(Alert.objects.count(), 1)
+
+    def test_each_category_in_a_cell_gets_its_alert(self, _):
+        # Même cellule, deux catégories en pic : une alerte par catégorie
+        health = Category.objects.create(name='Santé')
+        for category in (self.water, health):
+            self._feedbacks(1, hours_ago=43, category=category)
+            self._feedbacks(12, hours_ago=2, category=category)
+
+        hotspots = detect_hotspots(self.now)
+        self.assertEqual(len({hotspot['cell'] for hotspot in hotspots}), 1)
+        alerts = Alert.objects.filter(id__in=[hotspot['alert'] for hotspot in hotspots])
+        self.assertCountEqual(alerts.values_list('hotspot_category', flat=True), [self.water.id, health.id])
+
+        detect_hotspots(self.now + timedelta(minutes=15))
+        self.assertEqual(Alert.objects.count(), 2)
+
+    def test_counts_are_updated_incrementally(self, _):
+        self._feedbacks(3, hours_ago=5)
+        self.assertEqual(update_counts(self.now), 1)
+        self.assertEqual(HotspotCount.objects.get().count, 3)
+
+        # Heures déjà comptées : pas relues ; seule l'heure close depuis est ajoutée
+        self._feedbacks(2, hours_ago=0)
+        self.assertEqual(update_counts(self.now), 0)
+        self.assertEqual(update_counts(self.now + timedelta(hours=1)), 1)
+        self.assertEqual(sorted(HotspotCount.objects.values_list('count', flat=True)), [2, 3])
+
+        # Comptages sortis de la période de référence supprimés
+        update_counts(self.now + timedelta(hours=80))
+        self.assertFalse(HotspotCount.objects.exists())
+
+    def test_overlapping_runs_count_each_hour_once(self, _):
+        self._feedbacks(3, hours_ago=5)
+        Feedback.objects.filter(id=Feedback.objects.create(
+            content='Sans catégorie', channel='web', latitude=12.6395, longitude=-8.0025
+        ).id).update(category=None, created_at=self.now - timedelta(hours=5))
+        update_counts(self.now)
+
+        # Passage simultané : même dernière heure lue avant l'insertion du premier
+        with patch.object(HotspotCount.objects, 'aggregate', return_value={'last': None}):
+            update_counts(self.now)
+        self.assertCountEqual(HotspotCount.objects.values_list('category', 'count'), [(None, 1), (self.water.id, 3)])
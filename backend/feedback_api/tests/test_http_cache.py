@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from feedback_api.models import Category, NLPModel, NotificationChannel, NotificationTemplate
+
+
+class ConditionalGetTestCase(TestCase):
+    """Tests pour les ETag, réponses 304 et le cache des réponses"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.water = Category.objects.create(name='Eau')
+
+    def test_not_modified_until_model_changes(self):
+        first = self.client.get('/api/categories/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+        # Autres paramètres : autre représentation
+        self.assertNotEqual(self.client.get('/api/categories/?search=eau')['ETag'], etag)
+
+        Category.objects.create(name='Santé')
+        changed = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(len(changed.data), 2)
+
+    def test_response_cache_skips_database(self):
+        detail = f'/api/categories/{self.water.id}/'
+        self.assertEqual(self.client.get(detail).data['name'], 'Eau')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(detail).data['name'], 'Eau')
+
+        self.water.name = 'Eau potable'
+        self.water.save()
+        self.assertEqual(self.client.get(detail).data['name'], 'Eau potable')
+
+    @override_settings(HTTP_CACHE_SETTINGS={'RESPONSE_CACHE_ENABLED': False})
+    def test_related_models_and_ignored_fields(self):
+        channel = NotificationChannel.objects.create(name='Email', channel_type='email')
+        NotificationTemplate.objects.create(name='Alerte', subject='Alerte', content='...', channel=channel)
+        etag = self.client.get('/api/notification-templates/')['ETag']
+
+        # Le nom du canal est affiché par les modèles de notification
+        channel.name = 'Courriel'
+        channel.save()
+        response = self.client.get('/api/notification-templates/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['channel_name'], 'Courriel')
+
+        # Statistiques d'utilisation enregistrées à chaque classification : pas de nouvelle version
+        model = NLPModel.objects.create(name='Modèle', model_type='TF-IDF + MultinomialNB', version='1.0')
+        etag = self.client.get('/api/nlp-models/')['ETag']
+        model.usage_count += 1
+        model.save(update_fields=['usage_count', 'last_used'])
+        self.assertEqual(self.client.get('/api/nlp-models/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
@@ -0,0 +1,151 @@
+import json
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from feedback_api.models import Feedback, InboundMessageReceipt, Log
+
+
+@patch('feedback_api.tasks.classify_feedback.delay')
+class InboundDeduplicationTestCase(TestCase):
+    """Tests pour l'idempotence des webhooks entrants"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_json_sms_retry_creates_single_feedback(self, mock_classify):
+        payload = {
+            'from': '+22370000000',
+            'text': 'La pompe du quartier est en panne',
+            'sentStamp': '1717267500000',
+            'receivedStamp': '1717267502000',
+            'sim': 'SIM1'
+        }
+
+        first = self.client.post('/api/inbound/webhook/json-sms/', payload, format='json')
+        second = self.client.post('/api/inbound/webhook/json-sms/', payload, format='json')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.json()['duplicate'])
+        self.assertEqual(second.json()['feedback_id'], first.json()['feedback_id'])
+        self.assertEqual(Feedback.objects.count(), 1)
+        self.assertEqual(Log.objects.count(), 1)
+
+        feedback = Feedback.objects.get()
+        self.assertEqual(len(feedback.external_id), 40)
+
+    def test_json_sms_duplicate_served_from_cache(self, mock_classify):
+        payload = {'from': '+22370000000', 'text': 'Bonjour', 'sentStamp': '1717267500000'}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/inbound/webhook/json-sms/', payload, format='json')
+
+        # Le réessai ne touche pas la base de données
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/inbound/webhook/json-sms/', payload, format='json')
+        self.assertTrue(response.json()['duplicate'])
+
+    def test_json_sms_same_text_different_stamp_is_new(self, mock_classify):
+        payload = {'from': '+22370000000', 'text': 'Bonjour', 'sentStamp': '1717267500000'}
+        self.client.post('/api/inbound/webhook/json-sms/', payload, format='json')
+        payload['sentStamp'] = '1717267600000'
+        self.client.post('/api/inbound/webhook/json-sms/', payload, format='json')
+
+        self.assertEqual(Feedback.objects.count(), 2)
+
+    def test_twilio_retry_creates_single_feedback(self, mock_classify):
+        payload = {'From': '+22370000000', 'Body': 'Pas de distribution hier', 'MessageSid': 'SM0123456789'}
+
+        self.client.post('/api/inbound/inbound/?source=twilio', payload)
+        response = self.client.post('/api/inbound/inbound/?source=twilio', payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('<Message>', response.content.decode())
+        self.assertEqual(Feedback.objects.filter(external_id='SM0123456789').count(), 1)
+
+    @patch('feedback_api.tasks.classify_feedback_batch.delay')
+    @patch('feedback_api.tasks.send_whatsapp_replies.delay')
+    def test_whatsapp_retry_creates_single_feedback(self, mock_send, mock_classify_batch, mock_classify):
+        payload = {
+            'object': 'whatsapp_business_account',
+            'entry': [{'changes': [{'value': {'messages': [{
+                'id': 'wamid.HBgLMjIzNzAwMDAwMDAVAgASGBQzQTRBNjU5OUFFRTAzODEwMTQ0RgA=',
+                'from': '22370000000',
+                'type': 'text',
+                'text': {'body': 'Les latrines sont bouchées'},
+            }]}}]}]
+        }
+
+        self.client.post('/api/inbound/facebook-webhook/messages/', payload, format='json')
+        self.client.post('/api/inbound/facebook-webhook/messages/', payload, format='json')
+
+        self.assertEqual(Feedback.objects.count(), 1)
+        # Un seul accusé de réception, pour le premier envoi
+        mock_send.assert_called_once()
+        self.assertEqual(len(mock_send.call_args.args[0]), 1)
+        self.assertEqual(mock_send.call_args.args[0][0][0], '22370000000')
+        self.assertEqual(InboundMessageReceipt.objects.get().feedback, Feedback.objects.get())
+
+
+@patch('feedback_api.tasks.classify_feedback_batch.delay')
+class JSONSMSBatchTestCase(TestCase):
+    """Tests pour les lots de SMS de la passerelle JSON"""
+
+    url = '/api/inbound/webhook/json-sms/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _messages(self, count, start=0):
+        return [
+            {'from': '+22370000000', 'text': f'Message {i}', 'sentStamp': str(1717267500000 + i), 'sim': 'SIM1'}
+            for i in range(start, start + count)
+        ]
+
+    def test_array_batch_single_transaction(self, mock_classify):
+        messages = self._messages(50)
+        messages.insert(10, {'from': '+22370000000'})
+        messages.append(messages[0])
+
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, messages, format='json')
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((data['created'], data['duplicates'], data['errors']), (50, 1, 1))
+        self.assertEqual(len(data['results']), 52)
+        self.assertEqual(data['results'][10], {'index': 10, 'status': 'error', 'message': 'Missing required fields'})
+        self.assertEqual(data['results'][-1]['feedback_id'], data['results'][0]['feedback_id'])
+        self.assertEqual(Feedback.objects.count(), 50)
+        self.assertEqual(Log.objects.count(), 50)
+        mock_classify.assert_called_once()
+        self.assertEqual(len(mock_classify.call_args[0][0]), 50)
+
+    def test_json_lines_batch(self, mock_classify):
+        body = '\n'.join(json.dumps(message) for message in self._messages(3)) + '\n{invalide\n'
+
+        response = self.client.generic('POST', self.url, body, content_type='application/x-ndjson')
+
+        data = response.json()
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'created', 'created', 'error'])
+
+    def test_replayed_batch_reports_duplicates(self, mock_classify):
+        first = self.client.post(self.url, self._messages(5), format='json').json()
+        second = self.client.post(self.url, self._messages(6), format='json').json()
+
+        self.assertEqual((second['created'], second['duplicates']), (1, 5))
+        self.assertEqual(
+            [result['feedback_id'] for result in second['results'][:5]],
+            [result['feedback_id'] for result in first['results']]
+        )
+        self.assertEqual(Feedback.objects.count(), 6)
+
+    @override_settings(JSON_SMS_MAX_BATCH_SIZE=10)
+    def test_batch_size_limit(self, mock_classify):
+        response = self.client.post(self.url, self._messages(11), format='json')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(Feedback.objects.count(), 0)
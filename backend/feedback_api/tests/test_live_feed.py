@@ -0,0 +1,112 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from feedback_api import live_feed
+from feedback_api.models import Category, Feedback, Response
+
+
+class RecordingBackplane:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, message):
+        self.events.append(json.loads(message))
+
+
+@patch('feedback_api.signals.classify_feedback.delay')
+class LiveFeedPublishTestCase(TestCase):
+    """Tests pour la publication des événements depuis les chemins existants"""
+
+    def setUp(self):
+        self.backplane = RecordingBackplane()
+        patcher = patch('feedback_api.live_feed.get_backplane', return_value=self.backplane)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_created_status_changed_and_responded(self, _):
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback = Feedback.objects.create(content='Pas de distribution', channel='web')
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback = Feedback.objects.get(id=feedback.id)
+            feedback.priority = Feedback.PriorityChoices.HIGH
+            feedback.save()
+            feedback.status = Feedback.StatusChoices.IN_PROGRESS
+            feedback.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = Response.objects.create(feedback=feedback, content='Nous vérifions')
+
+        self.assertEqual(
+            [event['type'] for event in self.backplane.events],
+            [live_feed.CREATED, live_feed.STATUS_CHANGED, live_feed.RESPONDED]
+        )
+        status_changed, responded = self.backplane.events[1:]
+        self.assertEqual((status_changed['status'], status_changed['previous_status']), ('in_progress', 'new'))
+        self.assertEqual((responded['feedback'], responded['response']), (feedback.id, response.id))
+        # Ni contenu ni coordonnées de contact dans le flux
+        self.assertNotIn('content', responded)
+
+    def test_nothing_published_on_rollback(self, _):
+        from django.db import transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Feedback.objects.create(content='Annulé', channel='web')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.backplane.events, [])
+
+
+class LiveFeedStreamTestCase(TestCase):
+    """Tests pour le point d'accès Server-Sent Events"""
+
+    def setUp(self):
+        self.backplane = live_feed.LocalBackplane()
+        patcher = patch('feedback_api.live_feed.get_backplane', return_value=self.backplane)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='moderateur', password='testpassword')
+        self.token = str(AccessToken.for_user(self.user))
+        self.water = Category.objects.create(name='Eau')
+
+    def _event(self, event_type, category):
+        return json.dumps({'type': event_type, 'feedback': 1, 'category': category, 'assigned_to': None})
+
+    async def test_stream_filters_events(self):
+        response = await self.async_client.get(
+            f'/api/events/feedback/?token={self.token}&category={self.water.id}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        chunks = response.streaming_content.__aiter__()
+        try:
+            first = await asyncio.wait_for(chunks.__anext__(), 5)
+            self.assertTrue(first.startswith(b'retry:'))
+
+            self.backplane.publish(self._event(live_feed.CLASSIFIED, None))
+            self.backplane.publish(self._event(live_feed.CLASSIFIED, self.water.id))
+            chunk = (await asyncio.wait_for(chunks.__anext__(), 5)).decode('utf-8')
+            self.assertTrue(chunk.startswith(f'event: {live_feed.CLASSIFIED}\ndata: '))
+            self.assertEqual(json.loads(chunk.split('data: ', 1)[1])['category'], self.water.id)
+        finally:
+            await chunks.aclose()
+
+    async def test_authentication_required(self):
+        response = await self.async_client.get('/api/events/feedback/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/events/feedback/?token=invalide')
+        self.assertEqual(response.status_code, 401)
+
+    def test_filters(self):
+        filters = live_feed.parse_filters(
+            {'assigned_to': 'me', 'types': 'feedback.responded,inconnu'}, self.user
+        )
+        self.assertEqual(filters, {'assigned_to': {self.user.id}, 'types': {live_feed.RESPONDED}})
+        self.assertTrue(live_feed.matches({'type': live_feed.RESPONDED, 'assigned_to': self.user.id}, filters))
+        self.assertFalse(live_feed.matches({'type': live_feed.CREATED, 'assigned_to': self.user.id}, filters))
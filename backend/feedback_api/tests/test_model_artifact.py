@@ -0,0 +1,84 @@
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from feedback_api import model_artifact
+from feedback_api.model_artifact import (
+    ModelArtifactError, load_artifact, read_artifact_header, save_artifact, train_artifact
+)
+from feedback_api.nlp import FeedbackClassifier
+
+from .test_nlp_training import FOOD_TEXTS, WATER_TEXTS
+
+# Ids volontairement dans l'ordre inverse des noms : une étiquette retrouvée
+# par position dans une liste triée par nom donnerait la mauvaise catégorie
+CATEGORIES = {7: 'Eau', 3: 'Alimentation'}
+
+
+def trained_artifact():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+
+    texts = WATER_TEXTS + FOOD_TEXTS
+    category_ids = [7] * len(WATER_TEXTS) + [3] * len(FOOD_TEXTS)
+    return train_artifact(TfidfVectorizer(), MultinomialNB(), texts, category_ids, CATEGORIES)
+
+
+class ModelArtifactTestCase(SimpleTestCase):
+    """Tests pour le format versionné des modèles NLP"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'nlp_models', 'model.pkl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_round_trip_predicts_category_ids(self):
+        checksum = save_artifact(trained_artifact(), self.path)
+
+        header = read_artifact_header(self.path)
+        self.assertEqual(header['label_ids'], [3, 7])
+        self.assertEqual(header['label_names'], ['Alimentation', 'Eau'])
+
+        artifact = load_artifact(self.path, expected_checksum=checksum)
+        category_id, name, confidence = artifact.predict('La pompe à eau ne marche plus')
+        self.assertEqual((category_id, name), (7, 'Eau'))
+        self.assertGreater(confidence, 0.5)
+
+        classifier = FeedbackClassifier(model_path=self.path)
+        self.assertEqual(classifier.classify_by_model('Les rations sont insuffisantes')[0], 'Alimentation')
+
+    def test_preprocessing_version_mismatch_is_rejected(self):
+        save_artifact(trained_artifact(), self.path)
+        with mock.patch.object(model_artifact, 'PREPROCESSING_VERSION', 2):
+            with self.assertRaises(ModelArtifactError):
+                load_artifact(self.path)
+
+    def test_corrupted_or_replaced_file_is_rejected(self):
+        save_artifact(trained_artifact(), self.path)
+        with self.assertRaises(ModelArtifactError):
+            load_artifact(self.path, expected_checksum='0' * 64)
+
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        with self.assertRaises(ModelArtifactError):
+            load_artifact(self.path)
+
+    def test_legacy_pickle_falls_back_to_keywords(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            pickle.dump({'pipeline': None}, f)
+
+        with self.assertRaises(ModelArtifactError):
+            read_artifact_header(self.path)
+        classifier = FeedbackClassifier(model_path=self.path)
+        self.assertIsNone(classifier.model)
+        self.assertEqual(classifier.classify_by_model('Pas d\'eau'), (None, 0.0))
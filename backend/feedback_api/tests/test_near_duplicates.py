@@ -0,0 +1,101 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from feedback_api.models import ClusterBucket, Feedback, FeedbackCluster, Response
+from feedback_api.near_duplicates import (
+    NearDuplicateIndex, assign_cluster, band_keys, minhash_signature, near_duplicate_index, similarity
+)
+from feedback_api.tasks import classify_feedback
+
+FORWARDED = [
+    'Le point d\'eau du quartier Sabalibougou est contaminé, les enfants sont malades',
+    'Le point d\'eau du quartier Sabalibougou est contaminé, les enfants sont malades !!',
+    'le point d eau du quartier sabalibougou est contaminé les enfants sont malades. Merci',
+]
+
+
+class MinHashTestCase(TestCase):
+    """Tests pour les signatures MinHash"""
+
+    def test_similarity_tracks_text_overlap(self):
+        first, second = minhash_signature(FORWARDED[0]), minhash_signature(FORWARDED[2])
+        other = minhash_signature('La distribution de nourriture a été annulée cette semaine')
+        self.assertGreater(similarity(first, second), 0.7)
+        self.assertLess(similarity(first, other), 0.3)
+        self.assertEqual(len(band_keys(first)), 16)
+        self.assertIsNone(minhash_signature('!!!'))
+
+
+@patch('feedback_api.signals.classify_feedback.delay')
+class NearDuplicateClusterTestCase(TestCase):
+    """Tests pour le regroupement des feedbacks quasi identiques"""
+
+    def setUp(self):
+        near_duplicate_index.reset()
+        self.client = APIClient()
+        self.moderator = User.objects.create_user(username='moderateur', password='testpassword')
+        self.moderator.groups.add(Group.objects.create(name='Moderators'))
+        self.client.force_authenticate(self.moderator)
+
+    def _feedback(self, content, channel='web', status=Feedback.StatusChoices.NEW):
+        feedback = Feedback.objects.create(content=content, channel=channel, status=status,
+                                           contact_phone='+22370000000')
+        assign_cluster(feedback.id, feedback.content)
+        feedback.refresh_from_db()
+        return feedback
+
+    def test_near_duplicates_share_a_persisted_cluster(self, _):
+        feedbacks = [self._feedback(text) for text in FORWARDED]
+        other = self._feedback('La distribution de nourriture a été annulée cette semaine')
+
+        self.assertEqual(len({feedback.cluster_id for feedback in feedbacks}), 1)
+        self.assertNotEqual(other.cluster_id, feedbacks[0].cluster_id)
+        cluster = FeedbackCluster.objects.get(id=feedbacks[0].cluster_id)
+        self.assertEqual(cluster.size, 3)
+        self.assertEqual(cluster.representative_id, feedbacks[0].id)
+        self.assertTrue(ClusterBucket.objects.filter(cluster=cluster).exists())
+
+        # Un autre processus reconstruit l'index depuis la base
+        index = NearDuplicateIndex()
+        index.refresh()
+        signature = minhash_signature('Le point d\'eau du quartier Sabalibougou est contaminé, enfants malades')
+        cluster_id, score = index.match(signature, band_keys(signature), 0.5)
+        self.assertEqual(cluster_id, cluster.id)
+
+    def test_respond_to_whole_cluster(self, _):
+        sms = self._feedback(FORWARDED[0], channel='sms')
+        web = self._feedback(FORWARDED[1])
+        resolved = self._feedback(FORWARDED[2], status=Feedback.StatusChoices.RESOLVED)
+
+        with patch('feedback_api.views.send_response_message.delay') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    f'/api/feedback/{web.id}/respond/',
+                    {'content': 'Une équipe de désinfection est en route', 'cluster': True},
+                    format='json'
+                )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['responded'], 2)
+        self.assertFalse(Response.objects.filter(feedback=resolved).exists())
+        send.assert_called_once_with(Response.objects.get(feedback=sms).id)
+        web.refresh_from_db()
+        self.assertEqual(web.status, Feedback.StatusChoices.IN_PROGRESS)
+
+        listing = self.client.get('/api/feedback-clusters/?min_size=3')
+        self.assertEqual(listing.data['count'], 1)
+        self.assertEqual(listing.data['results'][0]['open_count'], 2)
+
+    def test_feedback_classified_twice_is_counted_once(self, _):
+        # Création par l'API : classification par perform_create et par le signal post_save
+        with patch('feedback_api.tasks.classify_feedback.delay', side_effect=classify_feedback) as classify:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/feedback/', {'content': FORWARDED[0], 'channel': 'web'},
+                                            format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(classify.call_count, 2)
+        feedback = Feedback.objects.get(id=response.data['id'])
+        self.assertEqual(feedback.cluster.size, 1)
+        self.assertEqual(FeedbackCluster.objects.count(), 1)
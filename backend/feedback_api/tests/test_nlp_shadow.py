@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from feedback_api.model_artifact import save_artifact, train_artifact
+from feedback_api.models import Category, Feedback, Log, NLPModel, ShadowPrediction
+from feedback_api.nlp_shadow import score_shadow_models, shadow_comparison
+
+from .test_nlp_training import FOOD_TEXTS, WATER_TEXTS
+
+
+class ShadowEvaluationTestCase(TestCase):
+    """Tests pour l'évaluation des modèles NLP en mode fantôme"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.water = Category.objects.create(name='Eau')
+        self.food = Category.objects.create(name='Alimentation')
+        self.moderator = User.objects.create_user(username='moderateur', password='testpassword')
+        self.moderator.groups.add(Group.objects.create(name='Moderators'))
+
+        texts = WATER_TEXTS + FOOD_TEXTS
+        # Le modèle actif a appris des étiquettes inversées : il se trompe toujours
+        self.active = self._model('Actif', texts, [self.food.id] * 4 + [self.water.id] * 4, is_active=True)
+        self.candidate = self._model('Candidat', texts, [self.water.id] * 4 + [self.food.id] * 4)
+        self.candidate.shadow_mode = True
+        self.candidate.shadow_started_at = timezone.now() - timedelta(minutes=1)
+        self.candidate.save()
+
+        # bulk_create : pas de classification automatique déclenchée
+        self.feedbacks = Feedback.objects.bulk_create([
+            Feedback(content='La pompe à eau est cassée', channel='web', category=self.water),
+            Feedback(content='Les rations sont insuffisantes', channel='sms', category=self.food),
+            Feedback(content='Pas d\'eau potable au forage', channel='web'),
+        ])
+        for feedback in self.feedbacks[:2]:
+            Log.objects.create(feedback=feedback, user=self.moderator, action=Log.ActionChoices.CATEGORIZED)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _model(self, name, texts, category_ids, **fields):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+
+        categories = {self.water.id: 'Eau', self.food.id: 'Alimentation'}
+        model = NLPModel.objects.create(name=name, model_type='TF-IDF + MultinomialNB', version='1.0',
+                                        is_trained=True, **fields)
+        artifact = train_artifact(TfidfVectorizer(), MultinomialNB(), texts, category_ids, categories)
+        model.file.name = f'nlp_models/model_{model.id}.pkl'
+        model.checksum = save_artifact(artifact, os.path.join(settings.MEDIA_ROOT, model.file.name))
+        model.save()
+        return model
+
+    def test_scores_new_feedback_once_per_model(self):
+        scored = score_shadow_models()
+        self.assertEqual(scored, {self.active.id: 3, self.candidate.id: 3})
+        self.assertEqual(score_shadow_models(), {self.active.id: 0, self.candidate.id: 0})
+
+        prediction = ShadowPrediction.objects.get(nlp_model=self.candidate, feedback=self.feedbacks[0])
+        self.assertEqual(prediction.predicted_category, self.water)
+
+    def test_comparison_uses_moderator_corrections(self):
+        score_shadow_models()
+        results = {row['model_id']: row for row in shadow_comparison()}
+
+        self.assertEqual(results[self.candidate.id]['predictions'], 3)
+        self.assertEqual(results[self.candidate.id]['evaluated'], 2)
+        self.assertEqual(results[self.candidate.id]['accuracy'], 1.0)
+        self.assertEqual(results[self.active.id]['accuracy'], 0.0)
+        self.assertIsNotNone(results[self.candidate.id]['latency_ms_p95'])
+
+    def test_no_shadow_candidate_means_no_work(self):
+        self.candidate.shadow_mode = False
+        self.candidate.save()
+        self.assertEqual(score_shadow_models(), {})
+
+    def test_shadow_api(self):
+        client = APIClient()
+        client.force_authenticate(self.moderator)
+        self.candidate.shadow_mode = False
+        self.candidate.save()
+
+        response = client.post(f'/api/nlp-models/{self.candidate.id}/shadow/', {'enabled': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['shadow_mode'])
+
+        untrained = NLPModel.objects.create(name='Vide', model_type='TF-IDF + MultinomialNB', version='1.0')
+        response = client.post(f'/api/nlp-models/{untrained.id}/shadow/', {'enabled': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = client.get('/api/nlp-models/shadow_comparison/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['models'], [])
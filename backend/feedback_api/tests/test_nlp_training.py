@@ -0,0 +1,201 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from feedback_api.models import Category, Feedback, NLPModel, NLPTrainingData
+from feedback_api.nlp import FeedbackClassifier
+from feedback_api.nlp_search import Candidate, candidate_grid, search_hyperparameters
+from feedback_api.nlp_training import INCREMENTAL_MODEL_TYPE, has_new_training_data, train_incremental
+
+WATER_TEXTS = [
+    'Le forage du village ne donne plus d\'eau potable',
+    'Pas d\'eau au robinet depuis trois jours',
+    'La pompe à eau est en panne',
+    'Les latrines débordent près du point d\'eau',
+]
+FOOD_TEXTS = [
+    'La distribution de nourriture a été annulée',
+    'Les rations alimentaires sont insuffisantes',
+    'Nous avons faim, pas de repas cette semaine',
+    'Le stock de riz est épuisé à la cantine',
+]
+
+
+class IncrementalTrainingTestCase(TestCase):
+    """Tests pour l'entraînement incrémental des modèles NLP"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.water = Category.objects.create(name='Eau')
+        self.food = Category.objects.create(name='Alimentation')
+        self.model = NLPModel.objects.create(name='Incrémental', model_type=INCREMENTAL_MODEL_TYPE, version='1.0')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _add(self, texts, category, validated_at):
+        for text in texts:
+            NLPTrainingData.objects.create(
+                content=text, category=category, is_validated=True, validated_at=validated_at
+            )
+
+    def _last_update(self):
+        return NLPTrainingData.objects.filter(is_validated=True).latest('updated_at').updated_at
+
+    def test_learns_only_new_validated_data(self):
+        first = timezone.now() - timedelta(hours=2)
+        self._add(WATER_TEXTS, self.water, first)
+        self._add(FOOD_TEXTS, self.food, first)
+        NLPTrainingData.objects.create(content='Non validé', category=self.water)
+
+        result = train_incremental(self.model)
+        self.model.refresh_from_db()
+        self.assertEqual(result['learned'], 8)
+        self.assertEqual(result['evaluated'], 0)
+        self.assertTrue(self.model.is_trained)
+        # Point de reprise : dernière modification des données apprises
+        self.assertEqual(self.model.training_checkpoint, self._last_update())
+        self.assertFalse(has_new_training_data(self.model))
+
+        second = timezone.now() - timedelta(hours=1)
+        self._add(['Le puits est à sec, plus d\'eau'], self.water, second)
+
+        result = train_incremental(self.model)
+        self.model.refresh_from_db()
+        self.assertEqual(result['status'], 'incremental')
+        self.assertEqual(result['learned'], 1)
+        self.assertEqual(result['evaluated'], 1)
+        self.assertEqual(self.model.training_data_size, 9)
+        self.assertEqual(self.model.training_checkpoint, self._last_update())
+
+        # Rien de nouveau : le modèle n'est pas réécrit
+        self.assertEqual(train_incremental(self.model)['status'], 'unchanged')
+
+        classifier = FeedbackClassifier(model_path=self.model.file.path)
+        category, confidence = classifier.classify_by_model('Toujours pas d\'eau au robinet')
+        self.assertEqual(category, 'Eau')
+        self.assertGreater(confidence, 0.5)
+
+    def test_new_category_triggers_full_retrain(self):
+        first = timezone.now() - timedelta(hours=2)
+        self._add(WATER_TEXTS, self.water, first)
+        self._add(FOOD_TEXTS, self.food, first)
+        train_incremental(self.model)
+
+        health = Category.objects.create(name='Santé')
+        self._add(['Le centre de santé n\'a plus de médicaments'], health, timezone.now())
+
+        result = train_incremental(self.model)
+        self.model.refresh_from_db()
+        self.assertEqual(result['status'], 'full')
+        self.assertEqual(result['learned'], 9)
+        self.assertEqual(self.model.training_data_size, 9)
+
+    def test_validation_sets_checkpoint_date(self):
+        data = NLPTrainingData.objects.create(content='Pas d\'eau', category=self.water)
+        self.assertIsNone(data.validated_at)
+        data.is_validated = True
+        data.save(update_fields=['is_validated'])
+        data.refresh_from_db()
+        self.assertIsNotNone(data.validated_at)
+
+    def test_relabeled_row_is_learned_on_next_pass(self):
+        self._add(WATER_TEXTS, self.water, timezone.now() - timedelta(hours=1))
+        self._add(FOOD_TEXTS, self.food, timezone.now() - timedelta(hours=1))
+        mislabeled = NLPTrainingData.objects.get(content=FOOD_TEXTS[0])
+        train_incremental(self.model)
+        self.model.refresh_from_db()
+        self.assertFalse(has_new_training_data(self.model))
+
+        # Correction par un modérateur d'une donnée déjà validée
+        mislabeled.category = self.water
+        mislabeled.save(update_fields=['category'])
+        self.assertTrue(has_new_training_data(self.model))
+        result = train_incremental(self.model)
+        self.assertEqual((result['status'], result['learned']), ('incremental', 1))
+
+    def test_full_training_includes_rows_without_validation_date(self):
+        self._add(WATER_TEXTS, self.water, timezone.now() - timedelta(hours=1))
+        # Validées par une mise à jour groupée (ou avant le suivi de la date) : sans validated_at
+        for text in FOOD_TEXTS:
+            NLPTrainingData.objects.create(content=text, category=self.food)
+        NLPTrainingData.objects.filter(category=self.food).update(is_validated=True)
+
+        self.assertTrue(has_new_training_data(self.model))
+        result = train_incremental(self.model, full=True)
+        self.model.refresh_from_db()
+        self.assertEqual(result['learned'], 8)
+        self.assertIsNotNone(self.model.training_checkpoint)
+
+
+def synthetic_corpus(size=60):
+    """Corpus à deux catégories, assez séparées pour que tous les modèles apprennent"""
+    texts, labels = [], []
+    for index in range(size):
+        source, label = (WATER_TEXTS, 'Eau') if index % 2 else (FOOD_TEXTS, 'Alimentation')
+        texts.append(f'{source[index // 2 % len(source)]} (message {index})')
+        labels.append(label)
+    return texts, labels
+
+
+class HyperparameterSearchTestCase(SimpleTestCase):
+    """Tests pour la recherche d'hyperparamètres en validation croisée"""
+
+    def setUp(self):
+        self.texts, self.labels = synthetic_corpus()
+        self.candidates = candidate_grid(vectorizers=('tfidf', 'hashing'), ngram_ranges=[(1, 1)])
+
+    def test_grid_search_scores_every_candidate(self):
+        result = search_hyperparameters(self.texts, self.labels, self.candidates, cv=3, n_jobs=1)
+        self.assertIsInstance(result.best, Candidate)
+        self.assertEqual(set(result.scores), set(self.candidates))
+        self.assertEqual(result.best_score, max(result.scores.values()))
+        self.assertGreater(result.best_score, 0.9)
+
+    def test_successive_halving_keeps_a_winner(self):
+        result = search_hyperparameters(self.texts, self.labels, self.candidates, cv=3, method='halving', n_jobs=1)
+        self.assertIn(result.best, self.candidates)
+        self.assertGreater(result.best_score, 0.9)
+
+
+class TrainCommandSearchTestCase(TestCase):
+    """Tests pour train_nlp_model --search"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_search_records_best_model_and_holdout_metrics(self):
+        categories = {name: Category.objects.create(name=name) for name in ('Eau', 'Alimentation')}
+        texts, labels = synthetic_corpus()
+        # bulk_create : pas de classification automatique déclenchée
+        Feedback.objects.bulk_create([
+            Feedback(content=text, channel='web', category=categories[label])
+            for text, label in zip(texts, labels)
+        ])
+
+        call_command('train_nlp_model', '--search', '--cv', '3', '--n-jobs', '1', '--name', 'Recherche',
+                     stdout=StringIO())
+
+        model = NLPModel.objects.get(name='Recherche')
+        self.assertTrue(model.is_active)
+        self.assertEqual(model.hyperparameters['cv_folds'], 3)
+        self.assertEqual(model.hyperparameters['test_size'], 12)
+        self.assertIn(model.hyperparameters['classifier'], ('nb', 'svm', 'logreg'))
+        self.assertGreater(model.f1_score, 0.9)
+
+        classifier = FeedbackClassifier(model_path=model.file.path)
+        self.assertEqual(classifier.classify_by_model('La pompe à eau ne marche plus')[0], 'Eau')
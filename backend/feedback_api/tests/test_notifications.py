@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.template import Template
+from django.test import TestCase
+
+from feedback_api.models import (
+    Notification, NotificationChannel, NotificationTemplate, UserProfile
+)
+from feedback_api.advanced_tasks import send_notification
+from feedback_api.notification_registry import notification_registry
+
+
+class NotificationRegistryTestCase(TestCase):
+    """Tests pour le cache des canaux et modèles de notification"""
+
+    def setUp(self):
+        notification_registry.invalidate_channel()
+        notification_registry.invalidate_template()
+
+        self.user = User.objects.create_user(
+            username='destinataire',
+            email='destinataire@example.com',
+            password='testpassword'
+        )
+        UserProfile.objects.create(user=self.user, phone_number='+22370000000')
+
+        self.email_channel = NotificationChannel.objects.create(
+            name='Email', channel_type='email'
+        )
+        self.sms_channel = NotificationChannel.objects.create(
+            name='SMS', channel_type='sms'
+        )
+        self.template = NotificationTemplate.objects.create(
+            name='Alerte',
+            subject='[{{ title }}]',
+            content='Bonjour {{ user.username }}, {{ content }}',
+            channel=self.email_channel
+        )
+
+    def _create_notification(self, channel, template=None):
+        return Notification.objects.create(
+            user=self.user,
+            template=template,
+            title='Eau',
+            content='le point d\'eau est réparé',
+            channel=channel
+        )
+
+    def test_send_uses_single_select(self):
+        """L'envoi ne fait qu'une lecture et une mise à jour"""
+        notification = self._create_notification(self.email_channel, self.template)
+        # Compiler le modèle une première fois
+        notification_registry.get_compiled(self.template)
+
+        with self.assertNumQueries(2):
+            self.assertTrue(send_notification(notification.id))
+
+        self.assertEqual(mail.outbox[-1].subject, '[Eau]')
+        self.assertEqual(mail.outbox[-1].body, "Bonjour destinataire, le point d'eau est réparé")
+
+    def test_templates_compiled_once_per_version(self):
+        """Le modèle n'est recompilé que lorsque son texte change"""
+        notification = self._create_notification(self.email_channel, self.template)
+
+        with patch('feedback_api.notification_registry.Template', wraps=Template) as mock_template:
+            notification_registry.render(notification)
+            notification_registry.render(notification)
+            self.assertEqual(mock_template.call_count, 2)
+
+            self.template.content = 'Nouveau contenu'
+            self.template.save()
+            notification.template = self.template
+            _, content = notification_registry.render(notification)
+            self.assertEqual(mock_template.call_count, 4)
+            self.assertEqual(content, 'Nouveau contenu')
+
+    @patch('feedback_api.advanced_tasks.send_sms_via_twilio')
+    def test_sms_uses_profile_phone_number(self, mock_send_sms):
+        """Le numéro est lu sur le profil utilisateur (related_name 'profile')"""
+        mock_send_sms.return_value = {'sid': 'SM123', 'status': 'queued', 'to': '+22370000000'}
+        notification = self._create_notification(self.sms_channel)
+
+        self.assertTrue(send_notification(notification.id))
+
+        mock_send_sms.assert_called_once_with('+22370000000', "Eau\n\nle point d'eau est réparé")
+        self.assertEqual(Notification.objects.get(id=notification.id).status, 'sent')
+
+    def test_channel_cache_invalidated_on_save(self):
+        """La modification d'un canal invalide le cache"""
+        self.assertEqual(notification_registry.get_channel(self.sms_channel.id).name, 'SMS')
+        self.sms_channel.name = 'SMS Mali'
+        self.sms_channel.save()
+        self.assertEqual(notification_registry.get_channel(self.sms_channel.id).name, 'SMS Mali')
+
+    def test_channel_modified_by_another_process_is_reloaded(self):
+        """Un canal modifié ailleurs (sans invalidation locale) est relu grâce à la version partagée"""
+        self.assertTrue(notification_registry.get_channel(self.sms_channel.id).is_active)
+        with patch('feedback_api.signals.notification_registry.invalidate_channel'):
+            self.sms_channel.is_active = False
+            self.sms_channel.save()
+        self.assertFalse(notification_registry.get_channel(self.sms_channel.id).is_active)
@@ -0,0 +1,162 @@
+import hashlib
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from feedback_api.models import Attachment, AttachmentUpload, Category, Feedback, Log
+
+
+class OfflineSyncTestCase(TestCase):
+    """Tests pour la synchronisation groupée des feedbacks saisis hors-ligne"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='benevole', password='secret')
+        self.client.force_authenticate(self.user)
+        self.water = Category.objects.create(name='Eau')
+        classify = patch('feedback_api.tasks.classify_feedback_batch.delay')
+        self.classify = classify.start()
+        self.addCleanup(classify.stop)
+
+    def sync(self, feedbacks):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/sync/', {'feedbacks': feedbacks}, format='json')
+
+    def test_batch_is_idempotent_and_returns_mapping(self):
+        batch = [
+            {'local_id': 'a1', 'channel': 'web', 'content': "Pas d'eau au puits", 'category': self.water.id},
+            {'local_id': 'a2', 'channel': 'web', 'content': 'Route coupée', 'location': 'Mopti'},
+            {'local_id': 'a3', 'channel': 'web'},
+            {'local_id': 'a4', 'channel': 'web', 'content': 'Catégorie inconnue', 'category': 9999},
+        ]
+        response = self.sync(batch)
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['created', 'created', 'error', 'error'])
+        self.assertIn('content', response.data['results'][2]['errors'])
+        self.assertEqual(set(response.data['mapping']), {'a1', 'a2'})
+
+        feedback = Feedback.objects.get(local_id='a1')
+        self.assertEqual(response.data['mapping']['a1'], feedback.id)
+        self.assertEqual((feedback.user, feedback.category), (self.user, self.water))
+        self.assertEqual(Log.objects.filter(feedback=feedback, action=Log.ActionChoices.CREATED).count(), 1)
+        self.classify.assert_called_once()
+
+        # Rejeu après une coupure : aucun doublon, même correspondance
+        replay = self.sync(batch[:2])
+        self.assertEqual([result['status'] for result in replay.data['results']], ['unchanged', 'unchanged'])
+        self.assertEqual(replay.data['mapping'], response.data['mapping'])
+        self.assertEqual(Feedback.objects.filter(local_id__in=['a1', 'a2']).count(), 2)
+
+    def test_owner_edit_is_applied_until_taken_in_charge(self):
+        self.sync([{'local_id': 'b1', 'channel': 'web', 'content': 'Brouillon'}])
+        # Même local_id répété dans le lot : la dernière version l'emporte
+        edited = self.sync([
+            {'local_id': 'b1', 'channel': 'web', 'content': 'Version 1'},
+            {'local_id': 'b1', 'channel': 'web', 'content': 'Version finale'},
+        ])
+        self.assertEqual([result['status'] for result in edited.data['results']], ['duplicate', 'updated'])
+        feedback = Feedback.objects.get(local_id='b1')
+        self.assertEqual(feedback.content, 'Version finale')
+        self.assertEqual(edited.data['results'][0]['feedback_id'], feedback.id)
+
+        Feedback.objects.filter(id=feedback.id).update(status=Feedback.StatusChoices.IN_PROGRESS)
+        late = self.sync([{'local_id': 'b1', 'channel': 'web', 'content': 'Trop tard'}])
+        self.assertEqual(late.data['results'][0]['status'], 'unchanged')
+        self.assertEqual(Feedback.objects.get(id=feedback.id).content, 'Version finale')
+
+        # local_id d'un autre auteur : conflit, sans révéler son feedback
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='autre', password='secret'))
+        conflict = other.post('/api/sync/', {'feedbacks': [{'local_id': 'b1', 'channel': 'web', 'content': 'x'}]},
+                              format='json')
+        self.assertEqual(conflict.data['results'][0]['status'], 'conflict')
+        self.assertNotIn('feedback_id', conflict.data['results'][0])
+        self.assertEqual(conflict.data['mapping'], {})
+
+    def test_feedback_api_rejects_used_local_id(self):
+        self.sync([{'local_id': 'd1', 'channel': 'web', 'content': 'Premier'}])
+        other = Feedback.objects.create(channel='web', content='Second', user=self.user)
+        response = self.client.patch(f'/api/feedback/{other.id}/', {'local_id': 'd1'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('local_id', response.data)
+        # Vide : non concerné par l'unicité
+        self.assertEqual(self.client.patch(f'/api/feedback/{other.id}/', {'local_id': ''}, format='json').status_code,
+                         200)
+
+
+class ChunkedUploadTestCase(TestCase):
+    """Tests pour l'envoi des pièces jointes par morceaux"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media,
+            SYNC_SETTINGS={'UPLOAD_TEMP_DIR': f'{self.media}/partial', 'CHUNK_SIZE': 4},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='benevole', password='secret')
+        self.client.force_authenticate(self.user)
+        self.feedback = Feedback.objects.create(channel='web', content='Photo du puits', user=self.user,
+                                                local_id='c1')
+
+    def put(self, upload_id, data, start, total):
+        return self.client.generic(
+            'PUT', f'/api/sync/uploads/{upload_id}/', data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total}'
+        )
+
+    def test_resumable_upload_creates_attachment(self):
+        content = b'0123456789'
+        opening = {
+            'client_key': 'photo-1', 'local_id': 'c1', 'file_name': 'puits.jpg', 'file_type': 'image/jpeg',
+            'file_size': len(content), 'sha256': hashlib.sha256(content).hexdigest(),
+        }
+        started = self.client.post('/api/sync/uploads/', opening, format='json')
+        self.assertEqual(started.status_code, 200)
+        self.assertEqual((started.data['received'], started.data['chunk_size']), (0, 4))
+        upload_id = started.data['id']
+
+        self.assertEqual(self.put(upload_id, content[:4], 0, 10).data['received'], 4)
+        # Morceau renvoyé (accusé perdu) accepté ; morceau laissant un trou refusé
+        self.assertEqual(self.put(upload_id, content[:4], 0, 10).status_code, 200)
+        gap = self.put(upload_id, content[8:], 8, 10)
+        self.assertEqual((gap.status_code, gap.data['received']), (409, 4))
+
+        # Reprise après une coupure : même client_key, même envoi
+        resumed = self.client.post('/api/sync/uploads/', opening, format='json')
+        self.assertEqual((resumed.data['id'], resumed.data['received']), (upload_id, 4))
+
+        self.put(upload_id, content[4:8], 4, 10)
+        done = self.put(upload_id, content[8:], 8, 10)
+        self.assertTrue(done.data['complete'])
+        attachment = Attachment.objects.get(id=done.data['attachment'])
+        self.assertEqual((attachment.feedback, attachment.file_size), (self.feedback, 10))
+        with attachment.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(AttachmentUpload.objects.count(), 1)
+
+    def test_checksum_mismatch_restarts_upload(self):
+        started = self.client.post('/api/sync/uploads/', {
+            'client_key': 'photo-2', 'feedback': self.feedback.id, 'file_name': 'a.bin',
+            'file_type': 'application/octet-stream', 'file_size': 4, 'sha256': '0' * 64,
+        }, format='json')
+        response = self.put(started.data['id'], b'abcd', 0, 4)
+        self.assertEqual((response.data['complete'], response.data['received']), (False, 0))
+        self.assertFalse(Attachment.objects.exists())
+
+        # Feedback d'un autre utilisateur : refusé
+        other = Feedback.objects.create(channel='web', content='Autre')
+        refused = self.client.post('/api/sync/uploads/', {
+            'client_key': 'photo-3', 'feedback': other.id, 'file_name': 'b.bin',
+            'file_type': 'application/octet-stream', 'file_size': 4,
+        }, format='json')
+        self.assertEqual(refused.status_code, 400)
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django_celery_beat.models import PeriodicTask
+
+from feedback_api.management.commands.profile_imports import (
+    HEAVY_MODULES, measure_startup_imports, parse_importtime
+)
+from feedback_api.periodic_tasks import setup_periodic_tasks
+
+
+class StartupImportBudgetTestCase(SimpleTestCase):
+    """Le démarrage de Django ne doit pas charger le modèle NLP ni les SDK des fournisseurs"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.report = measure_startup_imports()
+
+    def test_no_heavy_module_at_startup(self):
+        loaded = [module for module in HEAVY_MODULES if module in self.report['modules']]
+        self.assertEqual(loaded, [])
+
+    def test_startup_within_budget(self):
+        self.assertLess(self.report['total_ms'], settings.STARTUP_IMPORT_BUDGET_MS)
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   encodings.utf_8\n"
+            "import time:       300 |        420 | encodings\n"
+        )
+        self.assertEqual(parse_importtime(output), [
+            ('encodings.utf_8', 120, 120, 1),
+            ('encodings', 300, 420, 0),
+        ])
+
+
+class PeriodicTasksSetupTestCase(TestCase):
+    """Configuration des tâches périodiques après les migrations"""
+
+    def test_setup_is_idempotent(self):
+        setup_periodic_tasks()
+        setup_periodic_tasks()
+        self.assertEqual(PeriodicTask.objects.filter(name__in=[
+            'check_active_nlp_models_hourly', 'process_pending_notifications_every_5_minutes'
+        ]).count(), 2)
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from feedback_api.models import Alert, Feedback, Notification, NotificationChannel
+from feedback_api.surge import SurgeDetector, draft_surge_alert, feedback_series
+
+SERIES = ('sms', '*', 'sabalibougou')
+
+
+class SurgeDetectorTestCase(TestCase):
+    """Tests pour les compteurs glissants et le niveau habituel (EWMA)"""
+
+    def setUp(self):
+        cache.clear()
+        self.detector = SurgeDetector(bucket_seconds=60, window_buckets=5, half_life_buckets=60)
+        self.start = timezone.now().replace(second=0, microsecond=0) - timedelta(hours=3)
+
+    def _steady(self, minutes, per_minute=2):
+        for minute in range(minutes):
+            result = self.detector.observe(SERIES, per_minute, self.start + timedelta(minutes=minute))
+            self.assertFalse(result['surge'])
+        return self.start + timedelta(minutes=minutes)
+
+    def test_spike_after_steady_rate(self):
+        now = self._steady(90)
+        result = self.detector.observe(SERIES, 30, now)
+        self.assertAlmostEqual(result['expected'], 10, delta=0.5)
+        self.assertEqual(result['observed'], 38)
+        self.assertTrue(result['surge'])
+
+        # Série voisine (autre localisation) : non concernée
+        self.assertFalse(self.detector.observe(('sms', '*', 'magnambougou'), 1, now)['surge'])
+
+    def test_quiet_gap_decays_baseline(self):
+        self._steady(60, per_minute=5)
+        # Deux jours sans message : le niveau habituel est retombé, un afflux modeste compte
+        result = self.detector.observe(SERIES, 15, self.start + timedelta(days=2))
+        self.assertLess(result['expected'], 1)
+        self.assertTrue(result['surge'])
+
+    def test_warmup(self):
+        # Série inconnue : pas d'alerte avant d'avoir observé son niveau habituel
+        result = self.detector.observe(SERIES, 50, self.start)
+        self.assertFalse(result['warm'])
+        self.assertFalse(result['surge'])
+
+    def test_series(self):
+        feedback = Feedback(channel='whatsapp', location=' Sabalibougou ', category_id=3)
+        self.assertEqual(feedback_series(feedback), {('whatsapp', '*', '*'), ('whatsapp', '*', 'sabalibougou')})
+        self.assertEqual(feedback_series(feedback, classified=True),
+                         {('whatsapp', '3', '*'), ('whatsapp', '3', 'sabalibougou')})
+        self.assertEqual(feedback_series(Feedback(channel='web'), classified=True), set())
+
+
+@override_settings(SURGE_SETTINGS={'WARMUP_BUCKETS': 0, 'MIN_COUNT': 5, 'Z_THRESHOLD': 4.0})
+@patch('feedback_api.signals.classify_feedback.delay')
+@patch('feedback_api.tasks.classify_feedback.delay')
+class SurgeAlertTestCase(TestCase):
+    """Tests pour les alertes et notifications d'afflux"""
+
+    def setUp(self):
+        cache.clear()
+        self.moderator = User.objects.create_user(username='moderateur', password='testpassword')
+        self.moderator.groups.add(Group.objects.create(name='Moderators'))
+        NotificationChannel.objects.create(name='Push', channel_type='push')
+
+    def test_surge_drafts_alert_and_notifies_moderators(self, *_):
+        client = APIClient()
+        with patch('feedback_api.advanced_tasks.raise_surge_alert.delay') as raise_alert:
+            with self.captureOnCommitCallbacks(execute=True):
+                for index in range(8):
+                    response = client.post('/api/feedback/', {'channel': 'web', 'content': f'Inondation {index}'})
+                    self.assertEqual(response.status_code, 201)
+        self.assertTrue(raise_alert.called)
+
+        # Exécution des tâches mises en file : une seule alerte par afflux en cours
+        with patch('feedback_api.advanced_tasks.send_notification.delay') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                for call in raise_alert.call_args_list:
+                    draft_surge_alert(*call.args)
+
+        alert = Alert.objects.get()
+        self.assertEqual(alert.status, Alert.StatusChoices.DRAFT)
+        self.assertEqual(alert.surge_series, 'web|*|*')
+        self.assertIsNotNone(alert.detection_latency)
+        self.assertGreaterEqual(alert.detection_latency, 0)
+        # Déclenché par le 5e message (MIN_COUNT)
+        self.assertEqual(alert.feedback.content, 'Inondation 4')
+
+        notification = Notification.objects.get()
+        self.assertEqual((notification.user, notification.link), (self.moderator, f'/alerts/{alert.id}'))
+        send.assert_called_once_with(notification.id)
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from feedback_api.models import Category, Feedback, NLPTrainingData
+from feedback_api.training_data import category_sample_counts, load_training_corpus
+
+
+class TrainingCorpusLoaderTestCase(TestCase):
+    """Tests pour le chargement en flux du corpus d'entraînement NLP"""
+
+    def setUp(self):
+        self.water = Category.objects.create(name='Eau')
+        self.food = Category.objects.create(name='Alimentation')
+        self.health = Category.objects.create(name='Santé')
+        # bulk_create : pas de classification automatique déclenchée
+        Feedback.objects.bulk_create(
+            [Feedback(content=f'Pas d\'eau au forage {i}', channel='web', category=self.water) for i in range(4)]
+            + [Feedback(content=f'Ration manquante {i}', channel='sms', category=self.food) for i in range(2)]
+            + [Feedback(content='Sans catégorie', channel='web')]
+        )
+        NLPTrainingData.objects.create(content='Plus de riz', category=self.food, is_validated=True)
+        NLPTrainingData.objects.create(content='Le puits est sec', category=self.water)
+        NLPTrainingData.objects.create(content='Clinique fermée', category=self.health, is_validated=True)
+        self.snapshot_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+
+    def test_counts_all_sources_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = {name: samples for _, name, samples in category_sample_counts()}
+        self.assertEqual(counts, {'Eau': 4, 'Alimentation': 3, 'Santé': 1})
+
+    def test_min_samples_filter(self):
+        # 1 requête d'agrégation + 1 requête par source lue en flux
+        with self.assertNumQueries(3):
+            corpus = load_training_corpus(min_samples=3)
+        self.assertEqual(set(corpus.categories.values()), {'Eau', 'Alimentation'})
+        self.assertEqual(corpus.skipped, {'Santé': 1})
+        self.assertEqual(len(corpus.texts), 7)
+        self.assertEqual(corpus.category_ids.count(self.water.id), 4)
+        self.assertIn('Plus de riz', corpus.texts)
+
+    def test_training_data_only(self):
+        corpus = load_training_corpus(include_feedback=False)
+        self.assertEqual(sorted(corpus.texts), ['Clinique fermée', 'Plus de riz'])
+
+    def test_snapshot_reused_until_sources_change(self):
+        path = os.path.join(self.snapshot_dir, 'corpus.npz')
+        first = load_training_corpus(min_samples=3, snapshot_path=path)
+        self.assertFalse(first.from_snapshot)
+        self.assertTrue(os.path.exists(path))
+
+        second = load_training_corpus(min_samples=3, snapshot_path=path)
+        self.assertTrue(second.from_snapshot)
+        self.assertEqual(second.texts, first.texts)
+        self.assertEqual(second.category_ids, first.category_ids)
+        self.assertEqual(second.categories, first.categories)
+
+        NLPTrainingData.objects.create(content='Eau trouble', category=self.water, is_validated=True)
+        third = load_training_corpus(min_samples=3, snapshot_path=path)
+        self.assertFalse(third.from_snapshot)
+        self.assertEqual(len(third.texts), 8)
+
+    def test_snapshot_refreshed_after_training_row_edit(self):
+        path = os.path.join(self.snapshot_dir, 'corpus.npz')
+        load_training_corpus(include_feedback=False, snapshot_path=path)
+
+        # Correction d'une donnée validée : ni le nombre ni les dates de validation ou d'ajout ne changent
+        row = NLPTrainingData.objects.get(content='Plus de riz')
+        row.content = 'Plus de riz ni de mil'
+        row.save()
+        corpus = load_training_corpus(include_feedback=False, snapshot_path=path)
+        self.assertFalse(corpus.from_snapshot)
+        self.assertIn('Plus de riz ni de mil', corpus.texts)
@@ -0,0 +1,173 @@
+import json
+import os
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from feedback_api.models import Category, Feedback, InboundMessageReceipt, Log
+from feedback_api.whatsapp_utils import MESSAGES, process_whatsapp_commands_batch
+from feedback_api.whatsapp_webhook import parse_whatsapp_payload
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'whatsapp')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def whatsapp_payload(*messages):
+    """Construit un webhook WhatsApp Cloud API regroupant plusieurs messages"""
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{'changes': [{'value': {'messages': list(messages)}}]}]
+    }
+
+
+def text_message(message_id, from_number, body):
+    return {'id': message_id, 'from': from_number, 'type': 'text', 'text': {'body': body}}
+
+
+@patch('feedback_api.tasks.send_whatsapp_replies.delay')
+@patch('feedback_api.tasks.classify_feedback_batch.delay')
+class WhatsAppBatchWebhookTestCase(TestCase):
+    """Tests pour le traitement groupé des webhooks WhatsApp"""
+
+    url = '/api/inbound/facebook-webhook/messages/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_payload_processed_as_single_batch(self, mock_classify, mock_replies):
+        payload = whatsapp_payload(
+            text_message('wamid.1', '22370000001', 'Pas d\'eau depuis trois jours'),
+            text_message('wamid.2', '22370000002', 'Les latrines sont bouchées'),
+            {'id': 'wamid.3', 'from': '22370000003', 'type': 'location',
+             'location': {'latitude': 12.65, 'longitude': -8.0}},
+        )
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Feedback.objects.count(), 3)
+        self.assertEqual(Log.objects.count(), 3)
+        self.assertEqual(InboundMessageReceipt.objects.count(), 3)
+        located = Feedback.objects.get(external_id='wamid.3')
+        self.assertEqual((located.latitude, located.longitude), (12.65, -8.0))
+
+        # Une seule tâche de classification et un seul lot de réponses
+        mock_classify.assert_called_once()
+        self.assertCountEqual(mock_classify.call_args[0][0], Feedback.objects.values_list('id', flat=True))
+        mock_replies.assert_called_once()
+        self.assertEqual(len(mock_replies.call_args[0][0]), 3)
+
+    def test_query_count_independent_of_batch_size(self, mock_classify, mock_replies):
+        small = whatsapp_payload(text_message('wamid.a', '22370000001', 'Message'))
+        large = whatsapp_payload(*[
+            text_message(f'wamid.b{i}', f'2237000{i:04d}', f'Message {i}') for i in range(20)
+        ])
+
+        with self.assertNumQueries(6):
+            self.client.post(self.url, small, format='json')
+        with self.assertNumQueries(6):
+            self.client.post(self.url, large, format='json')
+
+    def test_commands_answered_and_applied(self, mock_classify, mock_replies):
+        Category.objects.create(name='Eau')
+        payload = whatsapp_payload(
+            text_message('wamid.1', '22370000001', 'Fuite sur le réseau'),
+            text_message('wamid.2', '22370000001', 'categorie: eau'),
+            text_message('wamid.3', '22370000001', 'priorite: haute'),
+            text_message('wamid.4', '22370000002', 'statut'),
+        )
+
+        self.client.post(self.url, payload, format='json')
+
+        feedback = Feedback.objects.get()
+        self.assertEqual(feedback.category.name, 'Eau')
+        self.assertEqual(feedback.priority, Feedback.PriorityChoices.HIGH)
+        self.assertEqual(InboundMessageReceipt.objects.filter(feedback__isnull=True).count(), 3)
+
+        replies = mock_replies.call_args[0][0]
+        self.assertIn(('22370000001', MESSAGES['category_set'].format('Eau')), replies)
+        self.assertIn(('22370000002', MESSAGES['status']), replies)
+        self.assertIn(('22370000001', MESSAGES['welcome']), replies)
+
+    def test_retry_of_partial_batch_only_creates_new_messages(self, mock_classify, mock_replies):
+        self.client.post(self.url, whatsapp_payload(text_message('wamid.1', '22370000001', 'Premier')), format='json')
+        self.client.post(self.url, whatsapp_payload(
+            text_message('wamid.1', '22370000001', 'Premier'),
+            text_message('wamid.2', '22370000001', 'Second'),
+        ), format='json')
+
+        self.assertEqual(Feedback.objects.count(), 2)
+        self.assertEqual(mock_classify.call_args[0][0], [Feedback.objects.get(external_id='wamid.2').id])
+
+
+class WhatsAppPayloadParserTestCase(TestCase):
+    """Tests pour l'analyseur de webhooks WhatsApp sur des webhooks enregistrés"""
+
+    def test_media_messages(self):
+        messages, _ = parse_whatsapp_payload(load_fixture('media.json'))
+        self.assertEqual([m.message_type for m in messages], ['image', 'audio', 'document'])
+        self.assertEqual(messages[0].body, '[IMAGE] Latrines du site B')
+        self.assertEqual(messages[0].media_id, '1203948573839201')
+        self.assertEqual(messages[1].body, '[AUDIO] Note vocale reçue')
+        self.assertEqual(messages[2].body, '[DOCUMENT] Liste des ménages non servis')
+
+    def test_location_message(self):
+        messages, _ = parse_whatsapp_payload(load_fixture('location.json'))
+        self.assertEqual((messages[0].latitude, messages[0].longitude), (12.6392, -8.0029))
+        self.assertIn('Marché de Médine', messages[0].body)
+
+    def test_interactive_replies_use_selected_title(self):
+        messages, _ = parse_whatsapp_payload(load_fixture('interactive.json'))
+        self.assertEqual([m.body for m in messages], ['aide', 'categorie: Eau'])
+
+    def test_statuses(self):
+        messages, status_updates = parse_whatsapp_payload(load_fixture('statuses.json'))
+        self.assertEqual(messages, [])
+        self.assertEqual([u['status'] for u in status_updates], ['sent', 'delivered', 'read', 'failed'])
+        self.assertEqual(status_updates[-1]['error_code'], '131026')
+
+    def test_unknown_type_and_duplicate_ids(self):
+        payload = whatsapp_payload(
+            {'id': 'wamid.1', 'from': '22370000001', 'type': 'reaction', 'reaction': {'emoji': '👍'}},
+            {'id': 'wamid.1', 'from': '22370000001', 'type': 'reaction', 'reaction': {'emoji': '👍'}},
+            {'id': 'wamid.2', 'type': 'text', 'text': {'body': 'Sans expéditeur'}},
+        )
+        messages, _ = parse_whatsapp_payload(payload)
+        self.assertEqual([m.body for m in messages], ['[REACTION] Message reçu'])
+
+    @patch('feedback_api.tasks.send_whatsapp_replies.delay')
+    @patch('feedback_api.tasks.classify_feedback_batch.delay')
+    def test_both_endpoints_share_the_parser(self, mock_classify, mock_replies):
+        client = APIClient()
+        client.post('/api/inbound/facebook-webhook/', load_fixture('text.json'), format='json')
+        client.post('/api/inbound/facebook-webhook/messages/', load_fixture('media.json'), format='json')
+
+        self.assertEqual(Feedback.objects.count(), 4)
+        text_feedback = Feedback.objects.get(content__startswith='Le forage')
+        self.assertIn('Type: text', text_feedback.logs.get().details)
+
+
+class WhatsAppCommandsTestCase(TestCase):
+    """Tests pour le traitement groupé des commandes WhatsApp"""
+
+    def test_status_counts_feedbacks_in_one_query(self):
+        for _ in range(2):
+            Feedback.objects.create(content='Test', channel='whatsapp', contact_phone='22370000001')
+
+        with self.assertNumQueries(1):
+            results = process_whatsapp_commands_batch([
+                ('statut', '22370000001'), ('STATUS', '22370000002'), ('bonjour', '22370000001')
+            ])
+
+        self.assertEqual(results, [
+            (True, MESSAGES['status_count'].format(2)),
+            (True, MESSAGES['status']),
+            (False, None),
+        ])
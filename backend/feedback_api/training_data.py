@@ -0,0 +1,192 @@
+"""
+Chargement des données d'entraînement NLP
+
+Les exemples (feedbacks catégorisés et données d'entraînement validées)
+sont lus en flux sous forme de couples (contenu, id de catégorie), par
+paquets (curseur côté serveur sous PostgreSQL), sans instancier de modèles
+ni joindre la catégorie ligne par ligne. Le filtrage des catégories trop
+peu représentées se fait en une seule requête agrégée.
+
+Le corpus peut être mis en cache sur disque (NPZ) et réutilisé tant que
+les données sources n'ont pas changé.
+"""
+import json
+import logging
+import os
+from collections import namedtuple
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Category, Feedback, NLPTrainingData
+
+logger = logging.getLogger(__name__)
+
+# Lignes lues par aller-retour avec la base
+DEFAULT_CHUNK_SIZE = 2000
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+TrainingCorpus = namedtuple('TrainingCorpus', [
+    'texts',          # contenus, dans l'ordre de lecture
+    'category_ids',   # id de catégorie de chaque contenu
+    'categories',     # {id: nom} des catégories retenues
+    'counts',         # {id: nombre d'exemples} des catégories retenues
+    'skipped',        # {nom: nombre d'exemples} des catégories écartées
+    'from_snapshot',  # corpus relu depuis le cache disque
+])
+
+
+def _feedback_rows():
+    return Feedback.objects.filter(category__isnull=False)
+
+
+def _training_rows():
+    return NLPTrainingData.objects.filter(is_validated=True)
+
+
+def category_sample_counts(include_feedback=True, include_training_data=True):
+    """
+    Nombre d'exemples par catégorie, toutes sources confondues, en une requête
+
+    Returns:
+        list: triplets (id, nom, nombre d'exemples)
+    """
+    def count_subquery(queryset):
+        counts = (
+            queryset.filter(category=OuterRef('pk')).order_by()
+            .values('category').annotate(samples=Count('id')).values('samples')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    annotations = {}
+    if include_feedback:
+        annotations['feedback_samples'] = count_subquery(_feedback_rows())
+    if include_training_data:
+        annotations['training_samples'] = count_subquery(_training_rows())
+    if not annotations:
+        return []
+
+    rows = Category.objects.annotate(**annotations).values_list('id', 'name', *annotations)
+    return [(row[0], row[1], sum(row[2:])) for row in rows]
+
+
+def iter_training_samples(category_ids, include_feedback=True, include_training_data=True,
+                          chunk_size=DEFAULT_CHUNK_SIZE):
+    """Parcourt les couples (contenu, id de catégorie) par paquets de `chunk_size` lignes"""
+    sources = []
+    if include_feedback:
+        sources.append(_feedback_rows())
+    if include_training_data:
+        sources.append(_training_rows())
+
+    for queryset in sources:
+        rows = (
+            queryset.filter(category_id__in=category_ids).order_by()
+            .values_list('content', 'category_id')
+        )
+        yield from rows.iterator(chunk_size=chunk_size)
+
+
+def corpus_fingerprint(min_samples, include_feedback=True, include_training_data=True):
+    """Empreinte des données sources : un instantané n'est réutilisé que si elle est inchangée"""
+    fingerprint = {
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'min_samples': min_samples,
+        'categories': list(Category.objects.order_by('id').values_list('id', 'name')),
+    }
+    if include_feedback:
+        stats = _feedback_rows().aggregate(count=Count('id'), last=Max('updated_at'))
+        fingerprint['feedback'] = [stats['count'], stats['last'].isoformat() if stats['last'] else None]
+    if include_training_data:
+        # updated_at change à chaque ajout, validation ou correction (contenu, catégorie)
+        stats = _training_rows().aggregate(count=Count('id'), last=Max('updated_at'))
+        fingerprint['training_data'] = [stats['count'], stats['last'].isoformat() if stats['last'] else None]
+    return json.dumps(fingerprint, sort_keys=True)
+
+
+def _read_snapshot(path, fingerprint):
+    import numpy as np
+
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as snapshot:
+            if str(snapshot['fingerprint']) != fingerprint:
+                logger.info(f"Instantané du corpus périmé, rechargement depuis la base: {path}")
+                return None
+            meta = json.loads(str(snapshot['meta']))
+            return TrainingCorpus(
+                texts=snapshot['texts'].tolist(),
+                category_ids=snapshot['category_ids'].tolist(),
+                categories={int(key): value for key, value in meta['categories'].items()},
+                counts={int(key): value for key, value in meta['counts'].items()},
+                skipped=meta['skipped'],
+                from_snapshot=True,
+            )
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Instantané du corpus illisible ({path}): {str(e)}")
+        return None
+
+
+def _write_snapshot(path, fingerprint, corpus):
+    import numpy as np
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    meta = {
+        'categories': corpus.categories,
+        'counts': corpus.counts,
+        'skipped': corpus.skipped,
+    }
+    temporary = f'{path}.tmp.npz'
+    np.savez_compressed(
+        temporary,
+        texts=np.array(corpus.texts, dtype=str),
+        category_ids=np.array(corpus.category_ids, dtype=np.int64),
+        fingerprint=np.array(fingerprint),
+        meta=np.array(json.dumps(meta)),
+    )
+    os.replace(temporary, path)
+
+
+def load_training_corpus(min_samples=1, include_feedback=True, include_training_data=True,
+                         snapshot_path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Charge le corpus d'entraînement, depuis l'instantané disque s'il est à jour
+
+    Args:
+        min_samples (int): nombre minimum d'exemples pour retenir une catégorie
+        include_feedback (bool): inclure les feedbacks catégorisés
+        include_training_data (bool): inclure les données d'entraînement validées
+        snapshot_path (str): fichier NPZ de cache (aucun cache si None)
+        chunk_size (int): lignes lues par aller-retour avec la base
+
+    Returns:
+        TrainingCorpus
+    """
+    fingerprint = None
+    if snapshot_path:
+        fingerprint = corpus_fingerprint(min_samples, include_feedback, include_training_data)
+        corpus = _read_snapshot(snapshot_path, fingerprint)
+        if corpus is not None:
+            return corpus
+
+    categories, counts, skipped = {}, {}, {}
+    for category_id, name, samples in category_sample_counts(include_feedback, include_training_data):
+        if samples >= min_samples:
+            categories[category_id] = name
+            counts[category_id] = samples
+        elif samples:
+            skipped[name] = samples
+
+    texts, category_ids = [], []
+    for content, category_id in iter_training_samples(
+        list(categories), include_feedback, include_training_data, chunk_size
+    ):
+        texts.append(content)
+        category_ids.append(category_id)
+
+    corpus = TrainingCorpus(texts, category_ids, categories, counts, skipped, False)
+    if snapshot_path:
+        _write_snapshot(snapshot_path, fingerprint, corpus)
+    return corpus
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework import routers
-from .views import CategoryViewSet, FeedbackViewSet, ResponseViewSet, LogViewSet, InboundWebhookView, simulated_messages, FacebookWebhookVerificationView, JSONSMSWebhookView
+from .views import CategoryViewSet, FeedbackViewSet, FeedbackClusterViewSet, ResponseViewSet, LogViewSet, InboundWebhookView, simulated_messages, FacebookWebhookVerificationView, JSONSMSWebhookView, TwilioStatusCallbackView
 from .advanced_views import (
     UserProfileViewSet, TagViewSet, FeedbackTagViewSet, AttachmentViewSet, AlertViewSet,
     NLPModelViewSet, NLPTrainingDataViewSet, KeywordRuleViewSet,
-    NotificationChannelViewSet, NotificationTemplateViewSet, NotificationViewSet
+    NotificationChannelViewSet, NotificationTemplateViewSet, NotificationViewSet,
+    OutboundMessageViewSet
 )
 
 # Initialiser le routeur
@@ -13,6 +14,7 @@ router = routers.DefaultRouter()
 # Routes de base
 router.register(r'categories', CategoryViewSet)
 router.register(r'feedback', FeedbackViewSet)
+router.register(r'feedback-clusters', FeedbackClusterViewSet)
 router.register(r'responses', ResponseViewSet)
 router.register(r'logs', LogViewSet)
 
@@ -28,6 +30,7 @@ router.register(r'keyword-rules', KeywordRuleViewSet)
 router.register(r'notification-channels', NotificationChannelViewSet)
 router.register(r'notification-templates', NotificationTemplateViewSet)
 router.register(r'notifications', NotificationViewSet)
+router.register(r'outbound-messages', OutboundMessageViewSet)
 
 # URLs de l'API
 urlpatterns = [
@@ -38,4 +41,6 @@ urlpatterns = [
     path('facebook-webhook/messages/', InboundWebhookView.as_view({'post': 'create'}), name='facebook-webhook-messages'),
     # Endpoint pour le webhook JSON SMS personnalisé
     path('webhook/json-sms/', JSONSMSWebhookView.as_view(), name='json-sms-webhook'),
+    # Callbacks de statut de livraison Twilio
+    path('webhook/twilio-status/', TwilioStatusCallbackView.as_view(), name='twilio-status-webhook'),
 ]
@@ -1,11 +1,8 @@
 import logging
 import json
 import os
-import requests
 from datetime import datetime
 from django.conf import settings
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +21,18 @@ def get_twilio_client():
         logger.warning("Identifiants Twilio non configurés")
         return None
     
+    # SDK importé à la demande : le mode simulation et les processus qui
+    # n'envoient rien ne paient pas son coût de chargement
+    from twilio.rest import Client
     return Client(account_sid, auth_token)
 
+def get_status_callback_kwargs():
+    """
+    Retourne les paramètres Twilio pour recevoir les callbacks de statut de livraison
+    """
+    callback_url = getattr(settings, 'TWILIO_STATUS_CALLBACK_URL', '')
+    return {'status_callback': callback_url} if callback_url else {}
+
 def log_simulated_message(message_type, to, message_body, from_number):
     """
     Enregistre un message simulé dans un fichier JSON pour les tests
@@ -95,11 +102,13 @@ def send_sms_via_twilio(to, message):
         logger.error("Impossible d'envoyer un SMS: client Twilio non configuré")
         return None
     
+    from twilio.base.exceptions import TwilioRestException
     try:
         message = client.messages.create(
             body=message,
             from_=settings.TWILIO_PHONE_NUMBER,
-            to=to
+            to=to,
+            **get_status_callback_kwargs()
         )
         
         logger.info(f"SMS envoyé à {to}, SID: {message.sid}")
@@ -174,6 +183,7 @@ def send_whatsapp_via_facebook(to, message):
         }
     }
     
+    import requests
     try:
         # Envoi de la requête à l'API Facebook
         response = requests.post(url, headers=headers, json=data)
@@ -234,11 +244,13 @@ def send_whatsapp_via_twilio(to, message):
         logger.error("Impossible d'envoyer un message WhatsApp: client Twilio non configuré")
         return None
     
+    from twilio.base.exceptions import TwilioRestException
     try:
         message = client.messages.create(
             body=message,
             from_=whatsapp_from,
-            to=whatsapp_to
+            to=whatsapp_to,
+            **get_status_callback_kwargs()
         )
         
         logger.info(f"Message WhatsApp envoyé à {to}, SID: {message.sid}")
@@ -2,38 +2,112 @@ import json
 import logging
 from rest_framework import viewsets, permissions, status, filters
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.views import APIView
 from rest_framework.response import Response as DRFResponse
+from rest_framework.settings import api_settings
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.utils.decorators import method_decorator
+from django.db import connection, transaction
 import uuid
 import base64
-import requests
 
 # Configurer le logger
 logger = logging.getLogger(__name__)
 
-from .models import Category, Feedback, Response, Log
+from .models import AttachmentUpload, Category, Feedback, Response, Log, InboundMessageReceipt, FeedbackCluster
 from .serializers import (
+    AttachmentUploadSerializer,
     CategorySerializer, 
     FeedbackSerializer, 
     FeedbackCreateSerializer,
     ResponseSerializer, 
-    LogSerializer
+    LogSerializer,
+    FeedbackClusterSerializer
 )
 from .permissions import IsModeratorOrReadOnly, IsOwnerOrModerator
 from .tasks import send_response_message
+from .delivery import parse_twilio_status_callback, ingest_status_updates, valid_twilio_signature
+from .idempotency import (
+    lookup_inbound_message, claim_inbound_message, complete_inbound_message, json_sms_message_key
+)
+from .whatsapp_webhook import process_whatsapp_payload
+from .json_sms import parse_json_lines, process_json_sms_batch
+from .geo import GeoFilterBackend, MAX_ZOOM, tile_counts
+from .surge import observe_feedbacks
+from .http_cache import ConditionalCacheMixin
+from .live_feed import RESPONDED, STATUS_CHANGED, astream, parse_filters, publish_events, stream
+from .change_feed import SOURCES, changes, page_size, parse_watermark, renderer_classes
+from .offline_sync import chunk_size, max_batch_size, parse_content_range, start_upload, sync_feedbacks, write_chunk
+
+# Réponse TwiML vide : accusé de réception sans message de retour
+EMPTY_TWIML_RESPONSE = "<?xml version='1.0' encoding='UTF-8'?><Response></Response>"
+
+# Types de contenu acceptés pour les lots JSON Lines de la passerelle SMS
+JSON_LINES_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+
+def respond_to_cluster(cluster_id, content, user):
+    """
+    Envoie la même réponse à tous les feedbacks ouverts (nouveaux ou en
+    cours) d'un groupe de messages quasi identiques
+    """
+    content = (content or '').strip()
+    if not content:
+        return DRFResponse({"content": ["Ce champ est obligatoire."]}, status=status.HTTP_400_BAD_REQUEST)
+    
+    open_statuses = [Feedback.StatusChoices.NEW, Feedback.StatusChoices.IN_PROGRESS]
+    with transaction.atomic():
+        feedbacks = list(
+            Feedback.objects.select_for_update()
+            .filter(cluster_id=cluster_id, status__in=open_statuses)
+            .only('id', 'channel', 'status', 'category_id', 'assigned_to_id', 'priority')
+        )
+        # bulk_create : pas de signal post_save, l'envoi est planifié ci-dessous
+        responses = Response.objects.bulk_create([
+            Response(feedback=feedback, responder=user, content=content) for feedback in feedbacks
+        ])
+        # Feedbacks ouverts : nouveaux passés en cours ; tous datés pour le flux des modifications
+        Feedback.objects.filter(
+            id__in=[feedback.id for feedback in feedbacks]
+        ).update(status=Feedback.StatusChoices.IN_PROGRESS, updated_at=timezone.now())
+        Log.objects.bulk_create([
+            Log(feedback=feedback, user=user, action=Log.ActionChoices.RESPONDED,
+                details=f"Réponse au groupe #{cluster_id} envoyée: {content[:50]}...")
+            for feedback in feedbacks
+        ])
+        
+        response_ids = [
+            response.id for response, feedback in zip(responses, feedbacks)
+            if feedback.channel in [Feedback.ChannelChoices.SMS, Feedback.ChannelChoices.WHATSAPP]
+        ]
+        transaction.on_commit(lambda: [send_response_message.delay(response_id) for response_id in response_ids])
+        
+        # update et bulk_create ne déclenchent pas les signaux : événements du flux en direct publiés ici
+        opened = [feedback for feedback in feedbacks if feedback.status == Feedback.StatusChoices.NEW]
+        for feedback in opened:
+            feedback.status = Feedback.StatusChoices.IN_PROGRESS
+        publish_events(STATUS_CHANGED, opened, previous_status=Feedback.StatusChoices.NEW)
+        publish_events(RESPONDED, feedbacks)
+    
+    logger.info(f"Réponse envoyée aux {len(responses)} feedback(s) ouverts du groupe #{cluster_id}")
+    return DRFResponse(
+        {'cluster': cluster_id, 'responded': len(responses), 'feedbacks': [feedback.id for feedback in feedbacks]},
+        status=status.HTTP_201_CREATED
+    )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalCacheMixin, viewsets.ModelViewSet):
     """
     API endpoint pour gérer les catégories de feedback
     """
@@ -52,7 +126,7 @@ class FeedbackViewSet(viewsets.ModelViewSet):
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
     permission_classes = [IsOwnerOrModerator]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, GeoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'priority', 'category', 'channel']
     search_fields = ['content', 'contact_email', 'contact_phone']
     ordering_fields = ['created_at', 'updated_at', 'priority']
@@ -84,14 +158,41 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         from .tasks import classify_feedback
         classify_feedback.delay(feedback.id)
         
+        observe_feedbacks([feedback])
+        
         return feedback
     
+    @action(detail=False, methods=['get'])
+    def tiles(self, request):
+        """
+        Nombre de feedbacks par tuile de carte (?zoom=12), avec les mêmes
+        filtres que la liste (bbox, near / radius, statut, catégorie...)
+        """
+        zoom = request.query_params.get('zoom', '')
+        if not zoom.isdigit() or int(zoom) > MAX_ZOOM:
+            return DRFResponse(
+                {"detail": f"Paramètre 'zoom' invalide : entier de 0 à {MAX_ZOOM} attendu."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tiles = tile_counts(self.filter_queryset(self.get_queryset()), int(zoom))
+        return DRFResponse({
+            'zoom': int(zoom),
+            'count': sum(tile['count'] for tile in tiles),
+            'tiles': tiles,
+        })
+    
     @action(detail=True, methods=['post'], permission_classes=[IsModeratorOrReadOnly])
     def respond(self, request, pk=None):
         """
         Ajouter une réponse à un feedback et l'envoyer via le canal approprié
         """
         feedback = self.get_object()
+        
+        # {"cluster": true} : répondre à tous les feedbacks ouverts du groupe
+        # de messages quasi identiques auquel appartient ce feedback
+        if request.data.get('cluster') in (True, 'true', '1') and feedback.cluster_id:
+            return respond_to_cluster(feedback.cluster_id, request.data.get('content'), request.user)
+        
         serializer = ResponseSerializer(
             data=request.data,
             context={'request': request}
@@ -172,6 +273,44 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         })
 
 
+class FeedbackClusterViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint pour consulter les groupes de feedbacks quasi identiques
+    (?min_size=N pour ne garder que les groupes d'au moins N feedbacks)
+    """
+    serializer_class = FeedbackClusterSerializer
+    permission_classes = [IsModeratorOrReadOnly]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['size', 'updated_at', 'open_count']
+    ordering = ['-updated_at']
+    queryset = FeedbackCluster.objects.select_related('representative').annotate(
+        open_count=Count('feedbacks', filter=Q(
+            feedbacks__status__in=[Feedback.StatusChoices.NEW, Feedback.StatusChoices.IN_PROGRESS]
+        ))
+    )
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        min_size = self.request.query_params.get('min_size')
+        if min_size and min_size.isdigit():
+            queryset = queryset.filter(size__gte=int(min_size))
+        return queryset
+    
+    @action(detail=True, methods=['get'])
+    def feedbacks(self, request, pk=None):
+        """Feedbacks du groupe"""
+        cluster = self.get_object()
+        page = self.paginate_queryset(cluster.feedbacks.order_by('-created_at'))
+        serializer = FeedbackSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsModeratorOrReadOnly])
+    def respond(self, request, pk=None):
+        """Répondre en une fois à tous les feedbacks ouverts du groupe"""
+        cluster = self.get_object()
+        return respond_to_cluster(cluster.id, request.data.get('content'), request.user)
+
+
 class ResponseViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint pour consulter les réponses (lecture seule)
@@ -239,81 +378,8 @@ class InboundWebhookView(viewsets.ViewSet):
                 
                 # Vérifier que c'est bien un message WhatsApp
                 if 'object' in data and data['object'] == 'whatsapp_business_account':
-                    # Parcourir les entrées du webhook
-                    for entry in data.get('entry', []):
-                        for change in entry.get('changes', []):
-                            value = change.get('value', {})
-                            
-                            # Vérifier que c'est un message
-                            if 'messages' in value:
-                                for message in value['messages']:
-                                    # Extraire les informations du message
-                                    message_id = message.get('id')
-                                    from_number = message.get('from')
-                                    timestamp = message.get('timestamp')
-                                    
-                                    # Extraire le contenu du message selon son type
-                                    body = ''
-                                    if message.get('type') == 'text' and 'text' in message:
-                                        body = message['text'].get('body', '')
-                                    elif message.get('type') == 'image' and 'image' in message:
-                                        body = f"[IMAGE] {message['image'].get('caption', '')}" 
-                                    elif message.get('type') == 'audio':
-                                        body = "[AUDIO] Message audio reçu"
-                                    elif message.get('type') == 'document':
-                                        body = f"[DOCUMENT] {message.get('document', {}).get('caption', '')}" 
-                                    elif message.get('type') == 'location':
-                                        location = message.get('location', {})
-                                        latitude = location.get('latitude')
-                                        longitude = location.get('longitude')
-                                        body = f"[LOCATION] Latitude: {latitude}, Longitude: {longitude}"
-                                    else:
-                                        body = f"[{message.get('type', 'UNKNOWN').upper()}] Message reçu"
-                                    
-                                    logger.info(f"Message WhatsApp Facebook reçu: From={from_number}, Body={body[:50]}..., ID={message_id}")
-                                    
-                                    # Vérifier que nous avons un contenu et un numéro de téléphone
-                                    if not body:
-                                        continue
-                                    
-                                    if not from_number:
-                                        continue
-                                    
-                                    # Importer les utilitaires WhatsApp
-                                    from .whatsapp_utils import process_whatsapp_command, send_whatsapp_response, MESSAGES
-                                    
-                                    # Vérifier si c'est une commande spéciale
-                                    is_command, response_message = process_whatsapp_command(body, from_number)
-                                    
-                                    # Si c'est une commande, envoyer la réponse sans créer de feedback
-                                    if is_command:
-                                        if response_message:
-                                            # Envoyer la réponse à la commande
-                                            send_whatsapp_response(from_number, response_message, 'facebook')
-                                        continue
-                                    
-                                    # Créer le feedback
-                                    feedback = Feedback.objects.create(
-                                        channel=Feedback.ChannelChoices.WHATSAPP,
-                                        content=body,
-                                        contact_phone=from_number,
-                                        status=Feedback.StatusChoices.NEW,
-                                        priority=Feedback.PriorityChoices.MEDIUM  # Priorité par défaut
-                                    )
-                                    
-                                    # Créer un log
-                                    Log.objects.create(
-                                        feedback=feedback,
-                                        action=Log.ActionChoices.CREATED,
-                                        details=f"Feedback reçu via WhatsApp Facebook (ID: {message_id})"
-                                    )
-                                    
-                                    # Déclencher la classification automatique
-                                    from .tasks import classify_feedback
-                                    classify_feedback.delay(feedback.id)
-                                    
-                                    # Envoyer un message de confirmation
-                                    send_whatsapp_response(from_number, MESSAGES['welcome'], 'facebook')
+                    # Traiter l'ensemble des entrées du webhook en un seul lot
+                    process_whatsapp_payload(data, 'facebook')
                 
                 # Toujours renvoyer un 200 OK pour les webhooks Facebook
                 return DRFResponse({'status': 'success'}, status=status.HTTP_200_OK)
@@ -350,52 +416,67 @@ class InboundWebhookView(viewsets.ViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            # Twilio réessaie en cas de timeout : répondre sans rien retraiter
+            already_seen, _ = lookup_inbound_message(InboundMessageReceipt.SourceChoices.TWILIO, message_sid)
+            if already_seen:
+                logger.info(f"Message Twilio {message_sid} déjà traité, ignoré")
+                return HttpResponse(EMPTY_TWIML_RESPONSE, content_type='text/xml')
+            
             # Importer les utilitaires WhatsApp
             from .whatsapp_utils import process_whatsapp_command, MESSAGES
             
             # Message de réponse par défaut
             response_message = MESSAGES['welcome']
             
-            # Si c'est un message WhatsApp, vérifier s'il s'agit d'une commande spéciale
-            if channel == Feedback.ChannelChoices.WHATSAPP:
-                is_command, command_response = process_whatsapp_command(body, from_number)
+            with transaction.atomic():
+                receipt = claim_inbound_message(InboundMessageReceipt.SourceChoices.TWILIO, message_sid)
+                if receipt is None:
+                    return HttpResponse(EMPTY_TWIML_RESPONSE, content_type='text/xml')
                 
-                if is_command:
-                    if command_response:
-                        response_message = command_response
-                    
-                    # Pour les commandes, on ne crée pas de feedback
-                    # Réponse au format TwiML pour Twilio
-                    twiml_response = f"""<?xml version='1.0' encoding='UTF-8'?>
-                    <Response>
-                        <Message>{response_message}</Message>
-                    </Response>
-                    """
+                # Si c'est un message WhatsApp, vérifier s'il s'agit d'une commande spéciale
+                if channel == Feedback.ChannelChoices.WHATSAPP:
+                    is_command, command_response = process_whatsapp_command(body, from_number)
                     
-                    return HttpResponse(twiml_response, content_type='text/xml')
-            
-            # Créer le feedback pour les messages normaux (non-commandes)
-            feedback = Feedback.objects.create(
-                channel=channel,
-                content=body,
-                contact_phone=from_number,
-                status=Feedback.StatusChoices.NEW,
-                priority=Feedback.PriorityChoices.MEDIUM  # Priorité par défaut
-            )
-            
-            # Créer un log
-            Log.objects.create(
-                feedback=feedback,
-                action=Log.ActionChoices.CREATED,
-                details=f"Feedback reçu via {channel} (SID: {message_sid})"
-            )
+                    if is_command:
+                        if command_response:
+                            response_message = command_response
+                        complete_inbound_message(receipt)
+                        
+                        # Pour les commandes, on ne crée pas de feedback
+                        # Réponse au format TwiML pour Twilio
+                        twiml_response = f"""<?xml version='1.0' encoding='UTF-8'?>
+                        <Response>
+                            <Message>{response_message}</Message>
+                        </Response>
+                        """
+                        
+                        return HttpResponse(twiml_response, content_type='text/xml')
+                
+                # Créer le feedback pour les messages normaux (non-commandes)
+                feedback = Feedback.objects.create(
+                    channel=channel,
+                    content=body,
+                    contact_phone=from_number,
+                    status=Feedback.StatusChoices.NEW,
+                    priority=Feedback.PriorityChoices.MEDIUM,  # Priorité par défaut
+                    external_id=message_sid
+                )
+                
+                # Créer un log
+                Log.objects.create(
+                    feedback=feedback,
+                    action=Log.ActionChoices.CREATED,
+                    details=f"Feedback reçu via {channel} (SID: {message_sid})"
+                )
+                observe_feedbacks([feedback])
+                
+                complete_inbound_message(receipt, feedback)
             
             # Déclencher la classification automatique
             from .tasks import classify_feedback
             classify_feedback.delay(feedback.id)
             
             # Réponse au format TwiML pour Twilio
-            from django.http import HttpResponse
             twiml_response = f"""<?xml version='1.0' encoding='UTF-8'?>
             <Response>
                 <Message>{response_message}</Message>
@@ -471,18 +552,33 @@ class JSONSMSWebhookView(APIView):
         "receivedStamp": "%receivedStamp%",
         "sim": "%sim%"
     }
+    
+    Les passerelles peuvent aussi envoyer un lot de messages, sous forme de
+    tableau JSON ou de JSON Lines (un objet par ligne) : le lot est traité en
+    une seule transaction et la réponse contient un résultat par message.
     """
     permission_classes = [permissions.AllowAny]
     
     def post(self, request, *args, **kwargs):
         try:
+            # Lot au format JSON Lines
+            if request.content_type in JSON_LINES_CONTENT_TYPES:
+                return self._post_batch(parse_json_lines(request.body.decode('utf-8')))
+            
             # Essayer de parser le corps de la requête comme JSON
             try:
                 data = json.loads(request.body)
             except json.JSONDecodeError:
+                # JSON Lines envoyé sans Content-Type dédié
+                if len(request.body.strip().splitlines()) > 1:
+                    return self._post_batch(parse_json_lines(request.body.decode('utf-8')))
                 logger.error("Invalid JSON in webhook request")
                 return JsonResponse({"status": "error", "message": "Invalid JSON format"}, status=400)
             
+            # Lot au format tableau JSON
+            if isinstance(data, list):
+                return self._post_batch(data)
+            
             # Extraire les données du message
             from_number = data.get('from', '')
             body = data.get('text', '')
@@ -496,24 +592,49 @@ class JSONSMSWebhookView(APIView):
             
             logger.info(f"Received JSON SMS from {from_number}: {body[:50]}...")
             
-            # Créer un nouveau feedback
-            # Utiliser un identifiant externe plus court
-            import uuid
-            feedback = Feedback.objects.create(
-                content=body,
-                channel=Feedback.ChannelChoices.SMS,
-                contact_phone=from_number,
-                status=Feedback.StatusChoices.NEW,
-                reference_number=sim,
-                external_id=str(uuid.uuid4())[:36]  # UUID standard a 36 caractères
+            # Les passerelles réessaient en cas de timeout : ignorer les doublons
+            message_key = json_sms_message_key(from_number, sent_stamp or received_stamp, body)
+            already_seen, existing_feedback_id = lookup_inbound_message(
+                InboundMessageReceipt.SourceChoices.JSON_SMS, message_key
             )
+            if already_seen:
+                logger.info(f"Duplicate JSON SMS ignored (key: {message_key})")
+                return JsonResponse({
+                    "status": "success",
+                    "message": "Duplicate message ignored",
+                    "duplicate": True,
+                    "feedback_id": str(existing_feedback_id) if existing_feedback_id else None
+                })
             
-            # Créer un log pour la création
-            Log.objects.create(
-                feedback=feedback,
-                action=Log.ActionChoices.CREATED,
-                details="Feedback créé via webhook JSON SMS"
-            )
+            with transaction.atomic():
+                receipt = claim_inbound_message(InboundMessageReceipt.SourceChoices.JSON_SMS, message_key)
+                if receipt is None:
+                    return JsonResponse({
+                        "status": "success",
+                        "message": "Duplicate message ignored",
+                        "duplicate": True,
+                        "feedback_id": None
+                    })
+                
+                # Créer un nouveau feedback, identifié par la clé d'idempotence
+                feedback = Feedback.objects.create(
+                    content=body,
+                    channel=Feedback.ChannelChoices.SMS,
+                    contact_phone=from_number,
+                    status=Feedback.StatusChoices.NEW,
+                    reference_number=sim,
+                    external_id=message_key or ''
+                )
+                
+                # Créer un log pour la création
+                Log.objects.create(
+                    feedback=feedback,
+                    action=Log.ActionChoices.CREATED,
+                    details="Feedback créé via webhook JSON SMS"
+                )
+                
+                complete_inbound_message(receipt, feedback)
+                observe_feedbacks([feedback])
             
             # Déclencher la classification NLP de manière asynchrone
             from .tasks import classify_feedback
@@ -531,6 +652,216 @@ class JSONSMSWebhookView(APIView):
         except Exception as e:
             logger.error(f"Error processing JSON webhook: {str(e)}")
             return JsonResponse({"status": "error", "message": str(e)}, status=500)
+    
+    def _post_batch(self, items):
+        """Traite un lot de SMS et retourne un résultat par message"""
+        max_batch_size = settings.JSON_SMS_MAX_BATCH_SIZE
+        if len(items) > max_batch_size:
+            return JsonResponse({
+                "status": "error",
+                "message": f"Batch too large ({len(items)} items, maximum {max_batch_size})"
+            }, status=413)
+        
+        results = process_json_sms_batch(items)
+        counts = {status_name: 0 for status_name in ('created', 'duplicate', 'error')}
+        for result in results:
+            counts[result['status']] += 1
+        
+        return JsonResponse({
+            "status": "success",
+            "created": counts['created'],
+            "duplicates": counts['duplicate'],
+            "errors": counts['error'],
+            "results": results
+        })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def health_check(request):
+    """
+    Vérification de santé pour le répartiteur de charge et les orchestrateurs :
+    le processus répond et la base de données est joignable
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Exception as e:
+        logger.error(f"Health check: base de données injoignable: {str(e)}")
+        return DRFResponse({'status': 'error', 'database': 'unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return DRFResponse({'status': 'ok', 'database': 'ok'})
+
+
+def authenticate_event_stream(request):
+    """
+    Utilisateur du flux en direct : jeton JWT (en-tête Authorization ou
+    paramètre token, EventSource ne pouvant pas ajouter d'en-tête) ou session
+    """
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = (authentication.get_raw_token(header) if header else None) or request.GET.get('token')
+    if raw_token:
+        try:
+            return authentication.get_user(authentication.get_validated_token(raw_token))
+        except AuthenticationFailed:
+            return None
+    return request.user if request.user.is_authenticated else None
+
+
+async def feedback_events(request):
+    """
+    Flux en direct (Server-Sent Events) des événements de feedback : création,
+    classification, changement de statut, réponse (voir live_feed)
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    user = await sync_to_async(authenticate_event_stream)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentification requise."}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    filters = parse_filters(request.GET, user)
+    content = astream(filters) if isinstance(request, ASGIRequest) else stream(filters)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par le proxy inverse (nginx)
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class OfflineSyncView(APIView):
+    """
+    Synchronisation groupée des feedbacks saisis hors-ligne (voir offline_sync)
+    
+    Corps : {"feedbacks": [{"local_id": "...", "content": "...", ...}, ...]} ;
+    la réponse contient un résultat par feedback et la correspondance
+    local_id -> id du feedback sur le serveur.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request, *args, **kwargs):
+        items = request.data.get('feedbacks') if isinstance(request.data, dict) else None
+        if not isinstance(items, list):
+            return DRFResponse(
+                {"detail": "Liste 'feedbacks' attendue."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > max_batch_size():
+            return DRFResponse(
+                {"detail": f"Lot trop volumineux : {max_batch_size()} feedbacks au plus."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return DRFResponse(sync_feedbacks(items, request.user))
+
+
+@method_decorator(gzip_page, name='dispatch')
+class SyncChangesView(APIView):
+    """
+    Flux des modifications depuis une marque, pour la synchronisation
+    différentielle des clients hors-ligne (voir change_feed)
+    
+    Paramètres : since (marque renvoyée par l'appel précédent, absente la
+    première fois), limit, source=feedback|log
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES)
+    
+    def get(self, request, *args, **kwargs):
+        source = request.query_params.get('source', 'feedback')
+        if source not in SOURCES:
+            return DRFResponse(
+                {"detail": f"Paramètre 'source' invalide : {' ou '.join(SOURCES)} attendu."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        since = parse_watermark(request.query_params.get('since'))
+        return DRFResponse(changes(request.user, since, page_size(request.query_params.get('limit')), source))
+
+
+class AttachmentUploadView(APIView):
+    """
+    Envoi des pièces jointes par morceaux, reprenable après une coupure (voir offline_sync)
+    
+    POST : ouvre l'envoi (client_key, feedback ou local_id du feedback,
+    file_name, file_type, file_size, sha256) ; GET : octets déjà reçus ;
+    PUT : morceau suivant (corps brut, en-tête Content-Range).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def _target_feedback(self, request):
+        feedback_id, local_id = request.data.get('feedback'), request.data.get('local_id')
+        if local_id:
+            feedback = Feedback.objects.filter(local_id=local_id).first()
+        elif str(feedback_id or '').isdigit():
+            feedback = Feedback.objects.filter(id=feedback_id).first()
+        else:
+            feedback = None
+        is_moderator = request.user.groups.filter(name='Moderators').exists()
+        if feedback is None or not (is_moderator or feedback.user_id == request.user.id):
+            return None
+        return feedback
+    
+    def post(self, request, upload_id=None, *args, **kwargs):
+        if upload_id is not None:
+            return HttpResponseNotAllowed(['GET', 'PUT'])
+        serializer = AttachmentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        feedback = self._target_feedback(request)
+        if feedback is None:
+            return DRFResponse(
+                {"detail": "Feedback introuvable ('feedback' ou 'local_id')."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        upload = start_upload(request.user, feedback, serializer)
+        return DRFResponse({**AttachmentUploadSerializer(upload).data, 'chunk_size': chunk_size()})
+    
+    def get(self, request, upload_id=None, *args, **kwargs):
+        if upload_id is None:
+            return HttpResponseNotAllowed(['POST'])
+        upload = get_object_or_404(AttachmentUpload, id=upload_id, uploaded_by=request.user)
+        return DRFResponse({**AttachmentUploadSerializer(upload).data, 'chunk_size': chunk_size()})
+    
+    def put(self, request, upload_id=None, *args, **kwargs):
+        if upload_id is None:
+            return HttpResponseNotAllowed(['POST'])
+        upload = get_object_or_404(AttachmentUpload, id=upload_id, uploaded_by=request.user)
+        content_range = parse_content_range(request.META.get('HTTP_CONTENT_RANGE'))
+        if content_range is None:
+            return DRFResponse(
+                {"detail": "En-tête Content-Range invalide : 'bytes début-fin/taille' attendu."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        start, length, total = content_range
+        # Corps lu par blocs depuis la requête, jamais chargé en entier
+        upload, accepted = write_chunk(upload.id, start, total, length, request)
+        # 409 : morceau hors séquence, reprendre à partir de 'received'
+        return DRFResponse(
+            AttachmentUploadSerializer(upload).data,
+            status=status.HTTP_200_OK if accepted else status.HTTP_409_CONFLICT
+        )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TwilioStatusCallbackView(APIView):
+    """
+    Vue pour recevoir les callbacks de statut de livraison Twilio (SMS et WhatsApp).
+    Twilio envoie un POST par changement de statut avec MessageSid et MessageStatus,
+    signé par l'en-tête X-Twilio-Signature.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request, *args, **kwargs):
+        if not valid_twilio_signature(request):
+            logger.warning("Callback de statut Twilio refusé: signature invalide")
+            return DRFResponse({'detail': "Signature Twilio invalide."}, status=status.HTTP_403_FORBIDDEN)
+        update = parse_twilio_status_callback(request.data)
+        if update is None:
+            logger.warning(f"Callback de statut Twilio ignoré: {dict(request.data)}")
+            return DRFResponse({'status': 'ignored'}, status=status.HTTP_200_OK)
+        
+        updated = ingest_status_updates([update])
+        return DRFResponse({'status': 'success', 'updated': updated}, status=status.HTTP_200_OK)
 
 
 class FacebookWebhookVerificationView(APIView):
@@ -561,89 +892,15 @@ class FacebookWebhookVerificationView(APIView):
     
     def post(self, request):
         logger = logging.getLogger(__name__)
-        logger.info(f"Message WhatsApp Facebook reçu: {request.data}")
+        logger.debug(f"Message WhatsApp Facebook reçu: {request.data}")
         
         try:
             data = request.data
             
             # Vérifier que c'est bien un message WhatsApp Business
             if 'object' in data and data['object'] == 'whatsapp_business_account':
-                # Traiter chaque entrée (peut contenir plusieurs messages)
-                for entry in data.get('entry', []):
-                    for change in entry.get('changes', []):
-                        value = change.get('value', {})
-                        
-                        # Traiter les messages entrants
-                        if 'messages' in value:
-                            for message in value['messages']:
-                                # Extraire les informations du message
-                                message_type = message.get('type', 'unknown')
-                                from_number = message.get('from', '')
-                                timestamp = message.get('timestamp', '')
-                                message_id = message.get('id', '')
-                                
-                                # Extraire le contenu du message selon son type
-                                body = ''
-                                if message_type == 'text':
-                                    body = message.get('text', {}).get('body', '')
-                                elif message_type == 'image':
-                                    body = '[Image]'
-                                elif message_type == 'audio':
-                                    body = '[Audio]'
-                                elif message_type == 'document':
-                                    body = '[Document]'
-                                elif message_type == 'location':
-                                    body = '[Localisation]'
-                                else:
-                                    body = f'[Message de type {message_type}]'
-                                
-                                logger.info(f"Message WhatsApp reçu de {from_number}: {body}")
-                                
-                                # Vérifier si c'est une commande spéciale
-                                # Importer les fonctions en dehors du bloc try pour éviter les problèmes d'importation
-                                try:
-                                    from .whatsapp_utils import process_whatsapp_command, send_whatsapp_response, MESSAGES
-                                    is_command, response_message = process_whatsapp_command(body, from_number)
-                                except ImportError as e:
-                                    logger.error(f"Erreur d'importation des fonctions WhatsApp: {str(e)}")
-                                    is_command, response_message = False, None
-                                
-                                if is_command:
-                                    # Répondre à la commande
-                                    send_whatsapp_response(from_number, response_message, 'facebook')
-                                    logger.info(f"Réponse à la commande envoyée à {from_number}: {response_message}")
-                                    continue
-                                
-                                # Créer un feedback avec le message reçu
-                                from .models import Feedback, Log
-                                feedback = Feedback.objects.create(
-                                    content=body,
-                                    contact_phone=from_number,
-                                    channel='whatsapp'
-                                )
-                                
-                                # Créer un log pour le feedback avec des informations détaillées
-                                Log.objects.create(
-                                    feedback=feedback,
-                                    action=Log.ActionChoices.CREATED,
-                                    details=f"Feedback reçu via WhatsApp Facebook | Type: {message_type} | De: {from_number} | ID: {message_id} | Timestamp: {timestamp}"
-                                )
-                                
-                                # Déclencher la classification automatique
-                                from .tasks import classify_feedback
-                                classify_feedback.delay(feedback.id)
-                                
-                                # Envoyer un message de bienvenue
-                                try:
-                                    # Importer ici si ce n'est pas déjà fait
-                                    if 'send_whatsapp_response' not in locals():
-                                        from .whatsapp_utils import send_whatsapp_response, MESSAGES
-                                    
-                                    send_whatsapp_response(from_number, MESSAGES['welcome'], 'facebook')
-                                    logger.info(f"Message de bienvenue envoyé à {from_number}")
-                                except Exception as e:
-                                    logger.error(f"Erreur lors de l'envoi du message de bienvenue: {str(e)}")
-                
+                # Traiter l'ensemble des entrées du webhook en un seul lot
+                process_whatsapp_payload(data, 'facebook')
                 return DRFResponse({'status': 'success'}, status=status.HTTP_200_OK)
             
             return DRFResponse({'status': 'ignored'}, status=status.HTTP_200_OK)
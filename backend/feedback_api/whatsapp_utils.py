@@ -1,35 +1,181 @@
 import logging
 import re
 from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
 from .models import Feedback, Category
 from .utils import send_whatsapp
 
 logger = logging.getLogger(__name__)
 
-# Commandes WhatsApp
+# Commandes WhatsApp (les drapeaux en ligne doivent être en tête du motif)
 COMMANDS = {
-    'help': r'^(?i)(?:aide|help)$',
-    'categories': r'^(?i)(?:categories|catégories|liste)$',
-    'set_category': r'^(?i)(?:categorie|catégorie|category)\s*:\s*(.+)$',
-    'set_priority': r'^(?i)(?:priorite|priorité|priority)\s*:\s*(haute|high|moyenne|medium|basse|low)$',
+    'help': r'(?i)^(?:aide|help)$',
+    'status': r'(?i)^(?:statut|status)$',
+    'categories': r'(?i)^(?:categories|catégories|liste)$',
+    'set_category': r'(?i)^(?:categorie|catégorie|category)\s*:\s*(.+)$',
+    'set_priority': r'(?i)^(?:priorite|priorité|priority)\s*:\s*(haute|high|moyenne|medium|basse|low)$',
 }
 
+# Motifs compilés une fois pour toutes
+COMPILED_COMMANDS = {name: re.compile(pattern) for name, pattern in COMMANDS.items()}
+
 # Messages de réponse
 MESSAGES = {
     'welcome': "Merci pour votre message ! Votre feedback a été enregistré avec succès. Un membre de notre équipe le traitera prochainement.",
     'help': "Comment utiliser ce service :\n"
             "- Envoyez simplement votre message pour soumettre un feedback\n"
+            "- 'statut' : voir le nombre de vos feedbacks reçus aujourd'hui\n"
             "- 'categories' : voir la liste des catégories disponibles\n"
             "- 'categorie: [nom]' : définir la catégorie de votre dernier feedback\n"
             "- 'priorite: [haute/moyenne/basse]' : définir la priorité de votre feedback\n"
             "- 'help' : afficher ce message d'aide",
+    'status': "Vous n'avez pas de feedbacks en cours de traitement aujourd'hui.",
+    'status_count': "Vous avez {} feedback(s) en cours de traitement aujourd'hui.",
     'categories_not_found': "Aucune catégorie n'est disponible pour le moment.",
     'category_set': "La catégorie de votre feedback a été mise à jour : {}",
     'category_not_found': "Catégorie non trouvée. Envoyez 'categories' pour voir la liste des catégories disponibles.",
     'priority_set': "La priorité de votre feedback a été mise à jour : {}",
+    'no_recent_feedback': "Aucun feedback récent trouvé. Veuillez d'abord envoyer un message.",
     'error': "Une erreur s'est produite lors du traitement de votre demande. Veuillez réessayer plus tard."
 }
 
+# Correspondance entre les noms de priorité et leurs valeurs
+PRIORITY_MAP = {
+    'haute': Feedback.PriorityChoices.HIGH,
+    'high': Feedback.PriorityChoices.HIGH,
+    'moyenne': Feedback.PriorityChoices.MEDIUM,
+    'medium': Feedback.PriorityChoices.MEDIUM,
+    'basse': Feedback.PriorityChoices.LOW,
+    'low': Feedback.PriorityChoices.LOW
+}
+
+# Traduction des priorités pour l'affichage
+PRIORITY_DISPLAY = {
+    Feedback.PriorityChoices.HIGH: "Haute",
+    Feedback.PriorityChoices.MEDIUM: "Moyenne",
+    Feedback.PriorityChoices.LOW: "Basse"
+}
+
+
+def parse_whatsapp_command(message_body):
+    """
+    Reconnaît une commande spéciale sans accéder à la base de données
+    
+    Returns:
+        tuple: (nom de la commande ou None, argument éventuel)
+    """
+    if not message_body:
+        return None, None
+    
+    message_body = message_body.strip()
+    for name, pattern in COMPILED_COMMANDS.items():
+        match = pattern.match(message_body)
+        if match:
+            return name, match.group(1).strip() if match.groups() else None
+    return None, None
+
+
+def _latest_feedbacks_by_phone(phone_numbers):
+    """Dernier feedback WhatsApp de chaque numéro, en une seule requête"""
+    if not phone_numbers:
+        return {}
+    
+    latest_ids = Feedback.objects.filter(
+        contact_phone__in=phone_numbers,
+        channel=Feedback.ChannelChoices.WHATSAPP
+    ).values('contact_phone').annotate(last_id=Max('id')).values('last_id')
+    
+    return {
+        feedback.contact_phone: feedback
+        for feedback in Feedback.objects.filter(id__in=latest_ids)
+    }
+
+
+def process_whatsapp_commands_batch(messages):
+    """
+    Traite les commandes spéciales d'un lot de messages WhatsApp.
+    
+    Chaque type de donnée nécessaire (catégories, derniers feedbacks, compteurs
+    du jour) est chargé par une seule requête groupée pour tout le lot, et les
+    feedbacks modifiés sont enregistrés par une mise à jour groupée.
+    
+    Args:
+        messages (list): couples (message_body, from_number)
+        
+    Returns:
+        list: couples (is_command, response_message), dans l'ordre des messages
+    """
+    parsed = [parse_whatsapp_command(body) for body, _ in messages]
+    commands = {name for name, _ in parsed if name}
+    if not commands:
+        return [(False, None)] * len(messages)
+    
+    categories = None
+    if commands & {'categories', 'set_category'}:
+        categories = list(Category.objects.order_by('name'))
+    
+    recent_feedbacks = _latest_feedbacks_by_phone({
+        from_number for (name, _), (_, from_number) in zip(parsed, messages)
+        if name in ('set_category', 'set_priority')
+    })
+    
+    today_counts = {}
+    if 'status' in commands:
+        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_counts = dict(
+            Feedback.objects.filter(
+                contact_phone__in={from_number for (name, _), (_, from_number) in zip(parsed, messages) if name == 'status'},
+                created_at__gte=today_start
+            ).values('contact_phone').annotate(count=Count('id')).values_list('contact_phone', 'count')
+        )
+    
+    results = []
+    changed_feedbacks = {}
+    for (name, argument), (_, from_number) in zip(parsed, messages):
+        if name is None:
+            results.append((False, None))
+        
+        elif name == 'help':
+            results.append((True, MESSAGES['help']))
+        
+        elif name == 'status':
+            count = today_counts.get(from_number, 0)
+            results.append((True, MESSAGES['status_count'].format(count) if count else MESSAGES['status']))
+        
+        elif name == 'categories':
+            if not categories:
+                results.append((True, MESSAGES['categories_not_found']))
+            else:
+                categories_list = "\n".join([f"- {cat.name}" for cat in categories])
+                results.append((True, f"Catégories disponibles :\n{categories_list}"))
+        
+        else:
+            feedback = recent_feedbacks.get(from_number)
+            if not feedback:
+                results.append((True, MESSAGES['no_recent_feedback']))
+            
+            elif name == 'set_category':
+                category = next((cat for cat in categories if cat.name.lower() == argument.lower()), None)
+                if category is None:
+                    results.append((True, MESSAGES['category_not_found']))
+                else:
+                    feedback.category = category
+                    changed_feedbacks[feedback.id] = feedback
+                    results.append((True, MESSAGES['category_set'].format(category.name)))
+            
+            elif name == 'set_priority':
+                priority = PRIORITY_MAP[argument.lower()]
+                feedback.priority = priority
+                changed_feedbacks[feedback.id] = feedback
+                results.append((True, MESSAGES['priority_set'].format(PRIORITY_DISPLAY[priority])))
+    
+    if changed_feedbacks:
+        Feedback.objects.bulk_update(changed_feedbacks.values(), ['category', 'priority', 'updated_at'])
+    
+    return results
+
+
 def process_whatsapp_command(message_body, from_number, feedback=None):
     """
     Traite les commandes spéciales dans les messages WhatsApp
@@ -42,91 +188,27 @@ def process_whatsapp_command(message_body, from_number, feedback=None):
     Returns:
         tuple: (bool, str) - (True si une commande a été traitée, message de réponse)
     """
-    # Commande d'aide
-    if re.match(COMMANDS['help'], message_body):
-        return True, MESSAGES['help']
-    
-    # Liste des catégories
-    if re.match(COMMANDS['categories'], message_body):
-        categories = Category.objects.filter(active=True)
-        if not categories.exists():
-            return True, MESSAGES['categories_not_found']
-        
-        categories_list = "\n".join([f"- {cat.name}" for cat in categories])
-        return True, f"Catégories disponibles :\n{categories_list}"
+    name, argument = parse_whatsapp_command(message_body)
     
-    # Définir la catégorie
-    category_match = re.match(COMMANDS['set_category'], message_body)
-    if category_match:
-        category_name = category_match.group(1).strip()
-        
-        # Vérifier si l'utilisateur a un feedback récent
-        if not feedback:
-            recent_feedback = Feedback.objects.filter(
-                contact_phone=from_number,
-                channel=Feedback.ChannelChoices.WHATSAPP
-            ).order_by('-created_at').first()
-            
-            if recent_feedback:
-                feedback = recent_feedback
-        
-        if not feedback:
-            return True, "Aucun feedback récent trouvé. Veuillez d'abord envoyer un message."
-        
-        # Rechercher la catégorie
-        try:
-            category = Category.objects.get(name__iexact=category_name, active=True)
+    # Appliquer directement la commande au feedback fourni
+    if feedback is not None and name in ('set_category', 'set_priority'):
+        if name == 'set_category':
+            category = Category.objects.filter(name__iexact=argument).first()
+            if category is None:
+                return True, MESSAGES['category_not_found']
             feedback.category = category
             feedback.save()
-            
             return True, MESSAGES['category_set'].format(category.name)
-        except Category.DoesNotExist:
-            return True, MESSAGES['category_not_found']
-    
-    # Définir la priorité
-    priority_match = re.match(COMMANDS['set_priority'], message_body)
-    if priority_match:
-        priority_name = priority_match.group(1).lower()
-        
-        # Vérifier si l'utilisateur a un feedback récent
-        if not feedback:
-            recent_feedback = Feedback.objects.filter(
-                contact_phone=from_number,
-                channel=Feedback.ChannelChoices.WHATSAPP
-            ).order_by('-created_at').first()
-            
-            if recent_feedback:
-                feedback = recent_feedback
         
-        if not feedback:
-            return True, "Aucun feedback récent trouvé. Veuillez d'abord envoyer un message."
-        
-        # Mapper le nom de priorité à la valeur
-        priority_map = {
-            'haute': Feedback.PriorityChoices.HIGH,
-            'high': Feedback.PriorityChoices.HIGH,
-            'moyenne': Feedback.PriorityChoices.MEDIUM,
-            'medium': Feedback.PriorityChoices.MEDIUM,
-            'basse': Feedback.PriorityChoices.LOW,
-            'low': Feedback.PriorityChoices.LOW
-        }
-        
-        priority = priority_map.get(priority_name)
-        if priority:
-            feedback.priority = priority
-            feedback.save()
-            
-            # Traduire la priorité pour l'affichage
-            priority_display = {
-                Feedback.PriorityChoices.HIGH: "Haute",
-                Feedback.PriorityChoices.MEDIUM: "Moyenne",
-                Feedback.PriorityChoices.LOW: "Basse"
-            }
-            
-            return True, MESSAGES['priority_set'].format(priority_display[priority])
+        priority = PRIORITY_MAP[argument.lower()]
+        feedback.priority = priority
+        feedback.save()
+        return True, MESSAGES['priority_set'].format(PRIORITY_DISPLAY[priority])
+    
+    if name is None:
+        return False, None
     
-    # Aucune commande reconnue
-    return False, None
+    return process_whatsapp_commands_batch([(message_body, from_number)])[0]
 
 def send_whatsapp_response(to, message, provider='facebook'):
     """
@@ -0,0 +1,264 @@
+import logging
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+
+from .models import Feedback, Log, InboundMessageReceipt
+from .delivery import parse_whatsapp_statuses, ingest_status_updates
+from .idempotency import filter_new_inbound_messages, publish_inbound_messages
+from .surge import observe_feedbacks
+from .live_feed import CREATED, publish_events
+
+logger = logging.getLogger(__name__)
+
+SOURCE = InboundMessageReceipt.SourceChoices.FACEBOOK
+
+# Nombre de tentatives si une livraison concurrente insère les mêmes messages
+MAX_PERSIST_ATTEMPTS = 3
+
+# Message entrant extrait d'un webhook WhatsApp Cloud API
+WhatsAppMessage = namedtuple(
+    'WhatsAppMessage',
+    ['message_id', 'from_number', 'message_type', 'timestamp', 'body', 'latitude', 'longitude', 'media_id']
+)
+
+
+def _parse_text(message):
+    return {'body': message.get('text', {}).get('body', '')}
+
+
+def _parse_media(label):
+    """Gestionnaire commun aux médias (image, vidéo, document, autocollant)"""
+    def parse(message):
+        media = message.get(message.get('type'), {})
+        return {'body': f"[{label}] {media.get('caption', '')}".strip(), 'media_id': media.get('id', '')}
+    return parse
+
+
+def _parse_audio(message):
+    audio = message.get('audio', {})
+    label = "Note vocale reçue" if audio.get('voice') else "Message audio reçu"
+    return {'body': f"[AUDIO] {label}", 'media_id': audio.get('id', '')}
+
+
+def _parse_location(message):
+    location = message.get('location', {})
+    latitude, longitude = location.get('latitude'), location.get('longitude')
+    body = f"[LOCATION] Latitude: {latitude}, Longitude: {longitude}"
+    # Nom et adresse du lieu partagé, s'ils sont fournis
+    place = ', '.join(part for part in (location.get('name'), location.get('address')) if part)
+    if place:
+        body = f"{body} ({place})"
+    return {'body': body, 'latitude': latitude, 'longitude': longitude}
+
+
+def _parse_interactive(message):
+    """Réponse à un bouton ou à une liste : le titre choisi tient lieu de texte"""
+    interactive = message.get('interactive', {})
+    reply = interactive.get(interactive.get('type'), {})
+    return {'body': reply.get('title', '') or f"[INTERACTIVE] {reply.get('id', '')}".strip()}
+
+
+def _parse_button(message):
+    """Bouton de réponse rapide d'un message modèle"""
+    return {'body': message.get('button', {}).get('text', '')}
+
+
+def _parse_unknown(message):
+    return {'body': f"[{(message.get('type') or 'UNKNOWN').upper()}] Message reçu"}
+
+
+# Gestionnaire par type de message WhatsApp : chacun retourne les champs
+# spécifiques au type (body, et selon le cas latitude, longitude, media_id)
+MESSAGE_PARSERS = {
+    'text': _parse_text,
+    'image': _parse_media('IMAGE'),
+    'video': _parse_media('VIDEO'),
+    'document': _parse_media('DOCUMENT'),
+    'sticker': _parse_media('STICKER'),
+    'audio': _parse_audio,
+    'location': _parse_location,
+    'interactive': _parse_interactive,
+    'button': _parse_button,
+}
+
+
+def parse_message(message):
+    """
+    Convertit un message brut du webhook en WhatsAppMessage
+
+    Returns:
+        WhatsAppMessage ou None si le message n'a ni contenu ni expéditeur
+    """
+    from_number = message.get('from')
+    if not from_number:
+        return None
+
+    fields = MESSAGE_PARSERS.get(message.get('type'), _parse_unknown)(message)
+    if not fields.get('body'):
+        return None
+
+    return WhatsAppMessage(
+        message_id=message.get('id') or '',
+        from_number=from_number,
+        message_type=message.get('type') or 'unknown',
+        timestamp=message.get('timestamp') or '',
+        body=fields['body'],
+        latitude=fields.get('latitude'),
+        longitude=fields.get('longitude'),
+        media_id=fields.get('media_id', ''),
+    )
+
+
+def parse_whatsapp_payload(data):
+    """
+    Parcourt l'intégralité d'un webhook avant tout accès à la base de données.
+
+    Returns:
+        tuple: (messages, status_updates) - liste de WhatsAppMessage dédupliquée
+        sur l'identifiant du message, et mises à jour de statut des messages sortants
+    """
+    messages = []
+    status_updates = []
+    seen_ids = set()
+
+    for entry in data.get('entry', ()):
+        for change in entry.get('changes', ()):
+            value = change.get('value', {})
+            if 'statuses' in value:
+                status_updates.extend(parse_whatsapp_statuses(value))
+
+            for raw_message in value.get('messages', ()):
+                message = parse_message(raw_message)
+                if message is None:
+                    continue
+                if message.message_id:
+                    if message.message_id in seen_ids:
+                        continue
+                    seen_ids.add(message.message_id)
+                messages.append(message)
+
+    return messages, status_updates
+
+
+def _persist_messages(messages):
+    """
+    Enregistre un lot de messages dans la transaction courante : feedbacks,
+    logs et accusés de réception par insertions groupées, commandes traitées
+    par requêtes groupées.
+
+    Returns:
+        tuple: (feedbacks créés, réponses à envoyer)
+    """
+    from .whatsapp_utils import parse_whatsapp_command, process_whatsapp_commands_batch, MESSAGES
+
+    commands, feedback_messages = [], []
+    for message in messages:
+        is_command = parse_whatsapp_command(message.body)[0] is not None
+        (commands if is_command else feedback_messages).append(message)
+
+    feedbacks = Feedback.objects.bulk_create([
+        Feedback(
+            channel=Feedback.ChannelChoices.WHATSAPP,
+            content=message.body,
+            contact_phone=message.from_number,
+            status=Feedback.StatusChoices.NEW,
+            priority=Feedback.PriorityChoices.MEDIUM,  # Priorité par défaut
+            external_id=message.message_id,
+            latitude=message.latitude,
+            longitude=message.longitude,
+        )
+        for message in feedback_messages
+    ])
+
+    Log.objects.bulk_create([
+        Log(
+            feedback=feedback,
+            action=Log.ActionChoices.CREATED,
+            details=(
+                f"Feedback reçu via WhatsApp Facebook | Type: {message.message_type} | "
+                f"De: {message.from_number} | ID: {message.message_id} | Timestamp: {message.timestamp}"
+            )
+        )
+        for message, feedback in zip(feedback_messages, feedbacks)
+    ])
+
+    # Les commandes sont traitées après la création des feedbacks du lot,
+    # afin qu'une commande vise le feedback envoyé juste avant
+    command_results = process_whatsapp_commands_batch(
+        [(message.body, message.from_number) for message in commands]
+    )
+
+    processed = {message.message_id: feedback.id for message, feedback in zip(feedback_messages, feedbacks)}
+    processed.update({message.message_id: None for message in commands})
+    InboundMessageReceipt.objects.bulk_create([
+        InboundMessageReceipt(source=SOURCE, message_key=key, feedback_id=feedback_id)
+        for key, feedback_id in processed.items() if key
+    ])
+    publish_inbound_messages(SOURCE, processed)
+
+    replies = [
+        (message.from_number, response_message)
+        for message, (_, response_message) in zip(commands, command_results) if response_message
+    ]
+    replies.extend((message.from_number, MESSAGES['welcome']) for message in feedback_messages)
+
+    return feedbacks, replies
+
+
+def process_whatsapp_payload(data, provider='facebook'):
+    """
+    Traite un webhook WhatsApp Cloud API complet en un seul lot.
+
+    Le webhook est d'abord entièrement analysé ; les messages déjà traités
+    sont écartés en une lecture du cache et une requête, puis les feedbacks,
+    logs et accusés de réception sont créés dans une seule transaction. La
+    classification et les réponses partent ensuite en une tâche chacune.
+
+    Returns:
+        dict: résumé du traitement
+    """
+    from .tasks import classify_feedback_batch, send_whatsapp_replies
+
+    messages, status_updates = parse_whatsapp_payload(data)
+
+    # Mettre à jour le registre des messages sortants en un seul lot
+    if status_updates:
+        ingest_status_updates(status_updates)
+
+    feedbacks, replies, duplicates = [], [], 0
+    for attempt in range(MAX_PERSIST_ATTEMPTS):
+        # Meta réessaie en cas de timeout : ignorer les messages déjà traités
+        new_keys = filter_new_inbound_messages(SOURCE, [message.message_id for message in messages])
+        fresh = [message for message in messages if not message.message_id or message.message_id in new_keys]
+        duplicates = len(messages) - len(fresh)
+        if not fresh:
+            break
+        try:
+            with transaction.atomic():
+                feedbacks, replies = _persist_messages(fresh)
+            break
+        except IntegrityError:
+            # Livraison concurrente du même message : recommencer sans les messages déjà enregistrés
+            logger.warning(f"Conflit lors de l'enregistrement du lot WhatsApp (tentative {attempt + 1})")
+    else:
+        raise IntegrityError("Impossible d'enregistrer le lot WhatsApp après plusieurs tentatives")
+
+    if feedbacks:
+        classify_feedback_batch.delay([feedback.id for feedback in feedbacks])
+        observe_feedbacks(feedbacks)
+        publish_events(CREATED, feedbacks)
+    if replies:
+        send_whatsapp_replies.delay(replies, provider)
+
+    logger.info(
+        f"Webhook WhatsApp traité: {len(messages)} message(s), {duplicates} doublon(s), "
+        f"{len(feedbacks)} feedback(s), {len(status_updates)} statut(s)"
+    )
+    return {
+        'messages': len(messages),
+        'duplicates': duplicates,
+        'feedbacks': len(feedbacks),
+        'replies': len(replies),
+        'statuses': len(status_updates),
+    }
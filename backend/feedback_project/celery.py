@@ -4,6 +4,7 @@ Celery configuration for feedback_project.
 
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Définir la variable d'environnement par défaut pour les settings Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'feedback_project.settings')
@@ -17,6 +18,18 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Découverte automatique des tâches dans les applications Django
 app.autodiscover_tasks()
 
+
+@worker_process_init.connect
+def warm_up_worker(**kwargs):
+    """
+    Précharge les classifieurs NLP dans chaque processus worker, avant la
+    première tâche : seuls les workers paient ce coût, pas les commandes
+    de gestion ni le serveur web.
+    """
+    from feedback_api.nlp import warm_up_classifiers
+    warm_up_classifiers()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -89,13 +89,43 @@ WSGI_APPLICATION = 'feedback_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connexions persistantes (CONN_MAX_AGE), vérifiées avant réutilisation
+# pour qu'une connexion coupée par la base ne fasse pas échouer une requête
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL', 'postgres://postgres:postgres@db:5432/feedback_platform'),
-        conn_max_age=600
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=True
     )
 }
 
+# Cache partagé : Redis si disponible, sinon cache mémoire local au processus
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Durée (en secondes) pendant laquelle un identifiant de message entrant reste
+# dans le cache de déduplication (les fournisseurs réessaient sur quelques heures)
+INBOUND_DEDUP_TTL = int(os.environ.get('INBOUND_DEDUP_TTL', str(48 * 3600)))
+
+# Taille maximale d'un lot de SMS envoyé à JSONSMSWebhookView
+JSON_SMS_MAX_BATCH_SIZE = int(os.environ.get('JSON_SMS_MAX_BATCH_SIZE', 1000))
+
+# Budget (ms) du temps d'import au démarrage de Django, vérifié par
+# `manage.py profile_imports` et par les tests
+STARTUP_IMPORT_BUDGET_MS = float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', 3000))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -204,6 +234,92 @@ NLP_SETTINGS = {
     
     # Nombre minimum d'échantillons par catégorie pour l'entraînement
     'MIN_SAMPLES_PER_CATEGORY': int(os.environ.get('NLP_MIN_SAMPLES', '5')),
+    
+    # Nombre maximum de feedbacks classés par modèle à chaque passage de l'évaluation en mode fantôme
+    'SHADOW_BATCH_SIZE': int(os.environ.get('NLP_SHADOW_BATCH_SIZE', '500')),
+    
+    # Cache des résultats de classification (texte normalisé x version du modèle actif) :
+    # entrées conservées en mémoire par processus, durée de vie dans le cache partagé (s)
+    'CLASSIFICATION_CACHE_ENABLED': os.environ.get('NLP_CLASSIFICATION_CACHE_ENABLED', 'True') == 'True',
+    'CLASSIFICATION_CACHE_SIZE': int(os.environ.get('NLP_CLASSIFICATION_CACHE_SIZE', '10000')),
+    'CLASSIFICATION_CACHE_TTL': int(os.environ.get('NLP_CLASSIFICATION_CACHE_TTL', str(24 * 3600))),
+    
+    # Regroupement des feedbacks quasi identiques (MinHash / LSH) : similarité
+    # de Jaccard estimée minimale pour rattacher un feedback à un groupe existant
+    'NEAR_DUPLICATE_ENABLED': os.environ.get('NLP_NEAR_DUPLICATE_ENABLED', 'True') == 'True',
+    'NEAR_DUPLICATE_THRESHOLD': float(os.environ.get('NLP_NEAR_DUPLICATE_THRESHOLD', '0.7')),
+}
+
+# Détection des zones de concentration de feedbacks géolocalisés (feedback_api.hotspots)
+HOTSPOT_SETTINGS = {
+    # Taille des cellules de la grille, en degrés (0.01° : environ 1,1 km)
+    'CELL_SIZE_DEGREES': float(os.environ.get('HOTSPOT_CELL_SIZE_DEGREES', '0.01')),
+    
+    # Fenêtre récente et période de référence qui la précède, en heures
+    'WINDOW_HOURS': int(os.environ.get('HOTSPOT_WINDOW_HOURS', '24')),
+    'BASELINE_HOURS': int(os.environ.get('HOTSPOT_BASELINE_HOURS', str(7 * 24))),
+    
+    # Nombre minimum de feedbacks sur la fenêtre et seuil du test de Poisson
+    'MIN_COUNT': int(os.environ.get('HOTSPOT_MIN_COUNT', '5')),
+    'MIN_EXPECTED': float(os.environ.get('HOTSPOT_MIN_EXPECTED', '0.5')),
+    'ALPHA': float(os.environ.get('HOTSPOT_ALPHA', '0.001')),
+}
+
+# Détection en continu des afflux de messages par canal, catégorie et localisation (feedback_api.surge)
+SURGE_SETTINGS = {
+    'ENABLED': os.environ.get('SURGE_DETECTION_ENABLED', 'True') == 'True',
+    
+    # Alvéoles des compteurs et fenêtre récente comparée au niveau habituel
+    'BUCKET_SECONDS': int(os.environ.get('SURGE_BUCKET_SECONDS', '60')),
+    'WINDOW_BUCKETS': int(os.environ.get('SURGE_WINDOW_BUCKETS', '5')),
+    
+    # Demi-vie du niveau habituel et durée d'observation avant la première alerte d'une série
+    'HALF_LIFE_BUCKETS': int(os.environ.get('SURGE_HALF_LIFE_BUCKETS', str(6 * 60))),
+    'WARMUP_BUCKETS': int(os.environ.get('SURGE_WARMUP_BUCKETS', '30')),
+    
+    # Seuils : messages sur la fenêtre, écart réduit et taux plancher par alvéole
+    'MIN_COUNT': int(os.environ.get('SURGE_MIN_COUNT', '10')),
+    'Z_THRESHOLD': float(os.environ.get('SURGE_Z_THRESHOLD', '4.0')),
+    'MIN_RATE': float(os.environ.get('SURGE_MIN_RATE', '0.1')),
+    
+    # Une alerte par série au plus pendant ce délai ; canal des notifications aux modérateurs
+    'COOLDOWN_SECONDS': int(os.environ.get('SURGE_COOLDOWN_SECONDS', '3600')),
+    'NOTIFICATION_CHANNEL_TYPE': os.environ.get('SURGE_NOTIFICATION_CHANNEL_TYPE', 'push'),
+}
+
+# Flux en direct des événements de feedback, /api/events/feedback/ (feedback_api.live_feed)
+LIVE_FEED_SETTINGS = {
+    'ENABLED': os.environ.get('LIVE_FEED_ENABLED', 'True') == 'True',
+    
+    # Commentaire de maintien de connexion (proxys, répartiteurs de charge) et délai de reconnexion du navigateur
+    'HEARTBEAT_SECONDS': int(os.environ.get('LIVE_FEED_HEARTBEAT_SECONDS', '15')),
+    'RETRY_MS': int(os.environ.get('LIVE_FEED_RETRY_MS', '5000')),
+}
+
+# ETag / Last-Modified et cache des réponses des ressources rarement modifiées (feedback_api.http_cache)
+HTTP_CACHE_SETTINGS = {
+    'RESPONSE_CACHE_ENABLED': os.environ.get('HTTP_RESPONSE_CACHE_ENABLED', 'True') == 'True',
+    'RESPONSE_CACHE_TIMEOUT': int(os.environ.get('HTTP_RESPONSE_CACHE_TIMEOUT', '300')),
+}
+
+# Synchronisation des saisies hors-ligne de la PWA, /api/sync/ (feedback_api.offline_sync)
+SYNC_SETTINGS = {
+    'MAX_BATCH_SIZE': int(os.environ.get('SYNC_MAX_BATCH_SIZE', '500')),
+    
+    # Envoi des pièces jointes par morceaux : taille conseillée, maximale (morceaux écrits par blocs, sans tampon)
+    'CHUNK_SIZE': int(os.environ.get('SYNC_CHUNK_SIZE', str(256 * 1024))),
+    'MAX_CHUNK_SIZE': int(os.environ.get('SYNC_MAX_CHUNK_SIZE', str(8 * 1024 * 1024))),
+    'MAX_UPLOAD_SIZE': int(os.environ.get('SYNC_MAX_UPLOAD_SIZE', str(20 * 1024 * 1024))),
+    
+    # Fichiers des envois en cours, supprimés après UPLOAD_EXPIRY_HOURS sans nouveau morceau
+    'UPLOAD_TEMP_DIR': os.environ.get('SYNC_UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'uploads', 'partial')),
+    'UPLOAD_EXPIRY_HOURS': int(os.environ.get('SYNC_UPLOAD_EXPIRY_HOURS', '72')),
+    
+    # Flux des modifications, /api/sync/changes/ (feedback_api.change_feed) : taille des pages, et
+    # délai avant qu'une modification y figure (transactions validées en retard)
+    'CHANGES_PAGE_SIZE': int(os.environ.get('SYNC_CHANGES_PAGE_SIZE', '500')),
+    'CHANGES_MAX_PAGE_SIZE': int(os.environ.get('SYNC_CHANGES_MAX_PAGE_SIZE', '2000')),
+    'CHANGES_SETTLE_SECONDS': int(os.environ.get('SYNC_CHANGES_SETTLE_SECONDS', '5')),
 }
 
 # Configuration des tâches périodiques Celery
@@ -220,6 +336,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'feedback_api.advanced_tasks.process_pending_notifications',
         'schedule': timedelta(minutes=15),  # Vérification toutes les 15 minutes
     },
+    'detect-hotspots': {
+        'task': 'feedback_api.advanced_tasks.detect_hotspots',
+        'schedule': timedelta(minutes=15),  # Zones de concentration de feedbacks géolocalisés
+    },
+    'score-shadow-models': {
+        'task': 'feedback_api.advanced_tasks.score_shadow_models',
+        'schedule': timedelta(minutes=5),  # Évaluation en mode fantôme des modèles NLP candidats
+    },
+    'purge-stale-uploads': {
+        'task': 'feedback_api.advanced_tasks.purge_stale_uploads',
+        'schedule': timedelta(hours=6),  # Envois de pièces jointes abandonnés
+    },
 }
 
 # Twilio settings
@@ -227,6 +355,8 @@ TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', '')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', '')
 TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER', '')
 TWILIO_WHATSAPP_NUMBER = os.environ.get('TWILIO_WHATSAPP_NUMBER', '')
+# URL publique du callback de statut de livraison (ex: https://exemple.org/api/inbound/webhook/twilio-status/)
+TWILIO_STATUS_CALLBACK_URL = os.environ.get('TWILIO_STATUS_CALLBACK_URL', '')
 
 # Facebook WhatsApp Business API settings
 FACEBOOK_WHATSAPP_TOKEN = os.environ.get('FACEBOOK_WHATSAPP_TOKEN', '')
@@ -10,6 +10,9 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.conf import settings
 from django.conf.urls.static import static
+from feedback_api.views import (
+    AttachmentUploadView, OfflineSyncView, SyncChangesView, feedback_events, health_check
+)
 
 # Configuration de Swagger/OpenAPI
 schema_view = get_schema_view(
@@ -39,6 +42,12 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair_old'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh_old'),
     path('api/auth/user/', include('feedback_api.auth_urls')),
+    path('api/health/', health_check, name='health-check'),
+    path('api/events/feedback/', feedback_events, name='feedback-events'),
+    path('api/sync/', OfflineSyncView.as_view(), name='offline-sync'),
+    path('api/sync/changes/', SyncChangesView.as_view(), name='sync-changes'),
+    path('api/sync/uploads/', AttachmentUploadView.as_view(), name='sync-uploads'),
+    path('api/sync/uploads/<uuid:upload_id>/', AttachmentUploadView.as_view(), name='sync-upload-detail'),
     path('api/', include(router.urls)),
     path('api/inbound/', include('feedback_api.urls')),
     path('', TemplateView.as_view(template_name='index.html')),
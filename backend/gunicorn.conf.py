@@ -0,0 +1,55 @@
+"""
+Configuration gunicorn du profil de production
+
+    gunicorn -c gunicorn.conf.py feedback_project.wsgi
+
+Tous les réglages sont surchargeables par variables d'environnement.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Processus et threads : (2 x CPU) + 1 workers par défaut. La classe de
+# worker est configurable (ex. 'uvicorn.workers.UvicornWorker' avec
+# feedback_project.asgi, utilisé par le service du flux en direct).
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Charger l'application (et le modèle NLP) une seule fois dans le processus
+# maître : les workers la partagent en copie sur écriture après le fork
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Connexions persistantes avec le proxy inverse / répartiteur de charge :
+# garder keepalive supérieur au timeout d'inactivité de celui-ci
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycler périodiquement les workers (fuites mémoire), avec une part
+# aléatoire pour éviter qu'ils redémarrent tous en même temps
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Charge les classifieurs NLP dans le processus maître avant le fork des workers"""
+    if not preload_app:
+        return
+    try:
+        from feedback_api.nlp import warm_up_classifiers
+        warm_up_classifiers()
+    except Exception as e:
+        server.log.warning(f"Préchargement du modèle NLP impossible: {str(e)}")
+
+
+def post_fork(server, worker):
+    """Ne pas partager entre processus les connexions ouvertes par le maître"""
+    from django.db import connections
+    connections.close_all()
@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Container, Row, Col, Card, Table, Badge, Form, Button, Pagination, Alert } from 'react-bootstrap';
 import { Link } from 'react-router-dom';
-import { feedbackAPI, categoryAPI } from '../services/api';
+import { feedbackAPI, categoryAPI, liveAPI } from '../services/api';
 import { useAuth } from '../context/AuthContext';
 import StatisticsCards from '../components/StatisticsCards';
 
@@ -22,14 +22,42 @@ const DashboardPage = () => {
     count: 0
   });
   
+  // Incrémenté à chaque événement du flux en direct : recharge la page affichée
+  const [refreshKey, setRefreshKey] = useState(0);
+  const refreshTimer = useRef(null);
+  const liveRefresh = useRef(false);
+  
   const { isModerator } = useAuth();
   const isUserModerator = isModerator();
 
+  // Flux en direct : plus d'interrogation périodique de la liste
+  useEffect(() => {
+    const unsubscribe = liveAPI.subscribeFeedbackEvents(
+      { category: filters.category },
+      () => {
+        // Regrouper les événements rapprochés en un seul rechargement
+        clearTimeout(refreshTimer.current);
+        refreshTimer.current = setTimeout(() => {
+          liveRefresh.current = true;
+          setRefreshKey(key => key + 1);
+        }, 1000);
+      }
+    );
+    return () => {
+      clearTimeout(refreshTimer.current);
+      unsubscribe();
+    };
+  }, [filters.category]);
+
   // Charger les feedbacks et les catégories au chargement de la page
   useEffect(() => {
     const fetchData = async () => {
       try {
-        setLoading(true);
+        // Rechargement déclenché par le flux en direct : sans indicateur de chargement
+        if (!liveRefresh.current) {
+          setLoading(true);
+        }
+        liveRefresh.current = false;
         setError(null);
         
         // Construire les paramètres de requête
@@ -74,7 +102,7 @@ const DashboardPage = () => {
     };
     
     fetchData();
-  }, [filters, pagination.page]);
+  }, [filters, pagination.page, refreshKey]);
 
   // Gérer le changement de filtre
   const handleFilterChange = (e) => {
@@ -3,8 +3,9 @@ import { isOnline, saveOfflineFeedback, updateOfflineFeedback, syncOfflineFeedba
 import { saveAttachment, getAttachmentsByFeedbackId, syncAttachments } from './attachmentStorage';
 
 // Créer une instance axios avec une configuration de base
+// (origine du backend : chaque appel précise son chemin complet, /api/...)
 const api = axios.create({
-  baseURL: (process.env.REACT_APP_API_URL || 'http://localhost:8000/api'),
+  baseURL: (process.env.REACT_APP_API_URL || 'http://localhost:8000'),
   headers: {
     'Content-Type': 'application/json',
   },
@@ -47,7 +48,7 @@ api.interceptors.response.use(
           throw new Error('Pas de token de rafraîchissement disponible');
         }
 
-        const response = await axios.post('/api/auth/refresh/', { refresh: refreshToken });
+        const response = await axios.post(`${api.defaults.baseURL}/api/auth/refresh/`, { refresh: refreshToken });
         const { access } = response.data;
 
         // Mettre à jour le token dans le localStorage
@@ -137,8 +138,8 @@ export const feedbackAPI = {
     }
 
     try {
-      // Utiliser la fonction create comme callback pour syncOfflineFeedbacks
-      const results = await syncOfflineFeedbacks(feedbackAPI.create);
+      // Envoi par lots à /api/sync/, rejouable sans doublon
+      const results = await syncOfflineFeedbacks(syncAPI.syncFeedbacks);
       console.log('Résultats de la synchronisation:', results);
 
       return {
@@ -376,6 +377,173 @@ export const feedbackAPI = {
   getStats: () => api.get('/api/inbound/feedback/stats/'),
 };
 
+// Flux en direct des événements de feedback (Server-Sent Events)
+export const FEEDBACK_EVENT_TYPES = [
+  'feedback.created',
+  'feedback.classified',
+  'feedback.status_changed',
+  'feedback.responded',
+];
+
+// Rechargement périodique lorsque le flux en direct est indisponible
+const LIVE_FALLBACK_POLL_MS = 30000;
+
+export const liveAPI = {
+  /**
+   * S'abonne aux événements de feedback (filtres : category, assigned_to, types)
+   *
+   * Si le flux est indisponible (navigateur, proxy, erreur du serveur),
+   * onEvent est appelé avec null toutes les 30 secondes, jusqu'à la reconnexion.
+   * @returns {Function} fonction de désabonnement
+   */
+  subscribeFeedbackEvents: (filters = {}, onEvent) => {
+    let pollTimer = null;
+    const startPolling = () => {
+      if (!pollTimer) {
+        console.warn('Flux en direct des feedbacks indisponible, rechargement périodique');
+        pollTimer = setInterval(() => onEvent(null), LIVE_FALLBACK_POLL_MS);
+      }
+    };
+    const stopPolling = () => {
+      clearInterval(pollTimer);
+      pollTimer = null;
+    };
+
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+      return stopPolling;
+    }
+
+    // EventSource ne permet pas d'ajouter l'en-tête Authorization : jeton en paramètre
+    const params = new URLSearchParams();
+    const token = localStorage.getItem('token');
+    if (token) {
+      params.append('token', token);
+    }
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== null && value !== undefined && value !== '') {
+        params.append(key, value);
+      }
+    });
+
+    // Même base que les autres appels, qui lui ajoutent le chemin /api/...
+    const baseURL = process.env.REACT_APP_EVENTS_URL || api.defaults.baseURL;
+    const source = new EventSource(`${baseURL}/api/events/feedback/?${params.toString()}`);
+    FEEDBACK_EVENT_TYPES.forEach((type) => {
+      source.addEventListener(type, (event) => onEvent(JSON.parse(event.data)));
+    });
+    source.onopen = stopPolling;
+    // Reconnexion automatique en cours, ou abandon (réponse d'erreur) : recharger périodiquement
+    source.onerror = startPolling;
+    return () => {
+      stopPolling();
+      source.close();
+    };
+  },
+};
+
+/**
+ * Calcule l'empreinte SHA-256 d'un fichier (vide si Web Crypto est indisponible, hors HTTPS)
+ * @param {Blob} file - Fichier
+ * @returns {Promise<string>} Empreinte hexadécimale
+ */
+const computeSha256 = async (file) => {
+  if (typeof crypto === 'undefined' || !crypto.subtle) {
+    return '';
+  }
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Clé de la dernière marque du flux des modifications (synchronisation différentielle)
+const SYNC_WATERMARK_KEY = 'syncWatermark';
+
+// Fonctions API pour la synchronisation hors-ligne (lots de feedbacks, pièces jointes par morceaux)
+export const syncAPI = {
+  /**
+   * Envoie un lot de feedbacks hors-ligne, identifiés par leur local_id
+   * @param {Array} feedbacks - Feedbacks au format de l'API, avec local_id
+   * @returns {Promise<Object>} Résultat par feedback et correspondance local_id -> id du serveur
+   */
+  syncFeedbacks: (feedbacks) => api.post('/api/sync/', { feedbacks }),
+
+  /**
+   * Télécharge les modifications depuis la dernière synchronisation (feedbacks, réponses, statuts)
+   * et mémorise la nouvelle marque ; les réponses volumineuses sont compressées (gzip) par le serveur
+   * @param {Object} options - source ('feedback' ou 'log'), limit
+   * @returns {Promise<Object>} Modifications cumulées de toutes les pages
+   */
+  pullChanges: async (options = {}) => {
+    const changes = { feedbacks: [], responses: [], status_changes: [] };
+    let since = localStorage.getItem(SYNC_WATERMARK_KEY);
+    let hasMore = true;
+
+    while (hasMore) {
+      const params = new URLSearchParams(options);
+      if (since) {
+        params.append('since', since);
+      }
+      const { data } = await api.get(`/api/sync/changes/?${params.toString()}`);
+      changes.feedbacks.push(...data.feedbacks);
+      changes.responses.push(...data.responses);
+      changes.status_changes.push(...data.status_changes);
+      since = data.watermark || since;
+      hasMore = data.has_more;
+    }
+
+    // Marque mémorisée une fois toutes les pages reçues : après une coupure, le delta est redemandé
+    if (since) {
+      localStorage.setItem(SYNC_WATERMARK_KEY, since);
+    }
+    return changes;
+  },
+
+  /**
+   * Envoie une pièce jointe par morceaux, en reprenant là où un envoi précédent s'est arrêté
+   * @param {string} feedbackId - ID du feedback sur le serveur
+   * @param {File} file - Fichier à envoyer
+   * @param {string} clientKey - Identifiant de l'envoi, stable d'une tentative à l'autre
+   * @returns {Promise<Object>} Réponse compatible avec attachmentAPI.upload (data.id : pièce jointe)
+   */
+  uploadAttachment: async (feedbackId, file, clientKey) => {
+    let { data: upload } = await api.post('/api/sync/uploads/', {
+      client_key: clientKey,
+      feedback: feedbackId,
+      file_name: file.name,
+      file_type: file.type || 'application/octet-stream',
+      file_size: file.size,
+      sha256: await computeSha256(file),
+    });
+    const chunkSize = upload.chunk_size;
+    let restarts = 0;
+
+    while (!upload.complete) {
+      const start = upload.received;
+      const end = Math.min(start + chunkSize, file.size);
+      try {
+        ({ data: upload } = await api.put(`/api/sync/uploads/${upload.id}/`, file.slice(start, end), {
+          headers: {
+            'Content-Type': 'application/octet-stream',
+            'Content-Range': `bytes ${start}-${end - 1}/${file.size}`,
+          },
+        }));
+      } catch (error) {
+        // 409 : morceau hors séquence, reprendre à l'octet indiqué par le serveur
+        if (!error.response || error.response.status !== 409) {
+          throw error;
+        }
+        upload = error.response.data;
+      }
+      // Fichier complet mais empreinte invalide : le serveur repart de zéro, une seule fois
+      if (!upload.complete && upload.received === 0 && end === file.size && ++restarts > 1) {
+        throw new Error('Empreinte de la pièce jointe invalide après renvoi');
+      }
+    }
+
+    return { data: { ...upload, id: upload.attachment } };
+  },
+};
+
 // Fonctions API pour les catégories
 export const categoryAPI = {
   // Récupérer toutes les catégories (méthode simplifiée sans traitement spécial)
@@ -409,9 +577,9 @@ export const categoryAPI = {
 
 // Fonctions API pour l'authentification
 export const authAPI = {
-  login: (credentials) => api.post('/auth/login/', credentials),
-  refreshToken: (refresh) => api.post('/auth/refresh/', { refresh }),
-  getCurrentUser: () => api.get('/auth/user/'),
+  login: (credentials) => api.post('/api/auth/login/', credentials),
+  refreshToken: (refresh) => api.post('/api/auth/refresh/', { refresh }),
+  getCurrentUser: () => api.get('/api/auth/user/'),
 };
 
 // Fonctions API pour les pièces jointes
@@ -580,7 +748,7 @@ export const attachmentAPI = {
       }
 
       console.log('Début de la synchronisation des pièces jointes en attente');
-      const results = await syncAttachments((feedbackId, file) => attachmentAPI.upload(feedbackId, file));
+      const results = await syncAttachments(syncAPI.uploadAttachment);
       console.log('Synchronisation des pièces jointes terminée:', results);
 
       return results;
@@ -2,7 +2,7 @@
  * Service de gestion des pièces jointes hors-ligne
  */
 
-import { openDatabase, isOnline } from './offlineStorage';
+import { openDatabase, isOnline, generateLocalId } from './offlineStorage';
 
 // Constantes
 const ATTACHMENTS_STORE = 'attachments';
@@ -121,6 +121,10 @@ export const saveAttachment = async (feedbackId, file, options = {}) => {
     
     const attachment = {
       feedbackId: numericFeedbackId,
+      // Feedback pas encore synchronisé : rattaché au feedback du serveur lors de sa synchronisation
+      offlineFeedback: feedbackId.toString().startsWith('offline-'),
+      // Identifiant de l'envoi par morceaux, pour le reprendre après une coupure
+      clientKey: generateLocalId(),
       filename: file.name,
       type: file.type,
       size: processedFile.size,
@@ -186,7 +190,7 @@ export const getAttachmentsByFeedbackId = async (feedbackId) => {
 
 /**
  * Synchronise les pièces jointes en attente avec le serveur
- * @param {Function} uploadFunction - Fonction API à utiliser pour l'upload
+ * @param {Function} uploadFunction - Fonction API à utiliser pour l'upload (feedbackId, file, clientKey)
  * @returns {Promise<Array>} Résultats de la synchronisation
  */
 export const syncAttachments = async (uploadFunction) => {
@@ -196,10 +200,10 @@ export const syncAttachments = async (uploadFunction) => {
     const store = transaction.objectStore(ATTACHMENTS_STORE);
     const index = store.index('status');
     
-    // Récupérer toutes les pièces jointes en attente
+    // Récupérer les pièces jointes en attente dont le feedback est déjà sur le serveur
     const pendingAttachments = await new Promise((resolve, reject) => {
       const request = index.getAll('pending');
-      request.onsuccess = () => resolve(request.result || []);
+      request.onsuccess = () => resolve((request.result || []).filter(a => !a.offlineFeedback));
       request.onerror = () => reject(request.error);
     });
     
@@ -218,7 +222,8 @@ export const syncAttachments = async (uploadFunction) => {
         const file = new File([blob], attachment.filename, { type: attachment.type });
         
         // Uploader la pièce jointe
-        const response = await uploadFunction(attachment.feedbackId, file);
+        const clientKey = attachment.clientKey || `attachment-${attachment.id}-${attachment.createdAt}`;
+        const response = await uploadFunction(attachment.feedbackId, file, clientKey);
         
         // Mettre à jour le statut de la pièce jointe avec la nouvelle fonction
         await updateAttachmentStatus(attachment.id, 'synced', {
@@ -9,6 +9,23 @@ const OFFLINE_FEEDBACK_STORE = 'offline-feedback';
 const PENDING_REQUESTS_STORE = 'pending-requests';
 const ATTACHMENTS_STORE = 'attachments';
 
+// Nombre de feedbacks envoyés par requête de synchronisation
+const SYNC_BATCH_SIZE = 100;
+
+// Statuts de /api/sync/ pour lesquels le feedback est enregistré sur le serveur
+const SYNCED_STATUSES = ['created', 'updated', 'unchanged', 'duplicate'];
+
+/**
+ * Génère un identifiant local unique (local_id), qui rend la synchronisation idempotente
+ * @returns {string} Identifiant unique
+ */
+export const generateLocalId = () => {
+  if (typeof crypto !== 'undefined' && crypto.randomUUID) {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+};
+
 /**
  * Ouvre la base de données IndexedDB
  * @returns {Promise<IDBDatabase>} Instance de la base de données
@@ -66,6 +83,7 @@ export const saveOfflineFeedback = async (feedback) => {
     // Ajouter des métadonnées pour la synchronisation
     const feedbackToSave = {
       ...feedback,
+      localId: generateLocalId(),
       createdAt: new Date().toISOString(),
       synced: false
     };
@@ -261,11 +279,72 @@ export const updateOfflineFeedback = async (id, data) => {
 };
 
 /**
- * Synchronise les feedbacks hors-ligne avec le serveur
- * @param {Function} apiFunction - Fonction API à utiliser pour la synchronisation
+ * Enregistre un feedback hors-ligne existant (sans modifier ses métadonnées)
+ * @param {Object} feedback - Feedback hors-ligne complet
+ * @returns {Promise<void>}
+ */
+const putOfflineFeedback = async (feedback) => {
+  const db = await openDatabase();
+  const transaction = db.transaction(OFFLINE_FEEDBACK_STORE, 'readwrite');
+  const store = transaction.objectStore(OFFLINE_FEEDBACK_STORE);
+
+  return new Promise((resolve, reject) => {
+    const request = store.put(feedback);
+    request.onsuccess = () => resolve();
+    request.onerror = (event) => reject(event.target.error);
+  });
+};
+
+/**
+ * Supprime un feedback hors-ligne synchronisé et rattache ses pièces jointes au feedback du serveur
+ * @param {number} offlineId - ID du feedback hors-ligne
+ * @param {number} serverId - ID du feedback sur le serveur
+ * @returns {Promise<void>}
+ */
+const completeOfflineFeedback = async (offlineId, serverId) => {
+  const db = await openDatabase();
+  const transaction = db.transaction([OFFLINE_FEEDBACK_STORE, ATTACHMENTS_STORE], 'readwrite');
+  const attachmentStore = transaction.objectStore(ATTACHMENTS_STORE);
+
+  return new Promise((resolve, reject) => {
+    transaction.oncomplete = () => resolve();
+    transaction.onerror = (event) => reject(event.target.error);
+
+    transaction.objectStore(OFFLINE_FEEDBACK_STORE).delete(offlineId);
+    const request = attachmentStore.index('feedbackId').getAll(offlineId);
+    request.onsuccess = () => {
+      (request.result || [])
+        .filter((attachment) => attachment.offlineFeedback)
+        .forEach((attachment) => {
+          attachmentStore.put({ ...attachment, feedbackId: serverId, offlineFeedback: false });
+        });
+    };
+  });
+};
+
+/**
+ * Prépare un feedback hors-ligne pour /api/sync/ (sans les métadonnées locales ni les champs vides)
+ * @param {Object} feedback - Feedback hors-ligne
+ * @returns {Object} Feedback au format de l'API
+ */
+const toSyncPayload = (feedback) => {
+  const { id, localId, createdAt, updatedAt, synced, ...data } = feedback;
+  const payload = { local_id: localId };
+  Object.entries(data).forEach(([key, value]) => {
+    if (value !== null && value !== undefined && value !== '') {
+      payload[key] = value;
+    }
+  });
+  return payload;
+};
+
+/**
+ * Synchronise les feedbacks hors-ligne avec le serveur, par lots
+ * @param {Function} batchFunction - Fonction API recevant un lot de feedbacks (avec leur local_id)
+ * @param {number} batchSize - Nombre de feedbacks par requête
  * @returns {Promise<Array>} Résultats de la synchronisation
  */
-export const syncOfflineFeedbacks = async (apiFunction) => {
+export const syncOfflineFeedbacks = async (batchFunction, batchSize = SYNC_BATCH_SIZE) => {
   try {
     const offlineFeedbacks = await getOfflineFeedbacks();
     if (!offlineFeedbacks.length) {
@@ -274,28 +353,37 @@ export const syncOfflineFeedbacks = async (apiFunction) => {
     
     console.log(`Synchronisation de ${offlineFeedbacks.length} feedbacks hors-ligne`);
     
+    // Feedbacks enregistrés sans local_id : en attribuer un, conservé pour les rejeux
+    for (const feedback of offlineFeedbacks) {
+      if (!feedback.localId) {
+        feedback.localId = generateLocalId();
+        await putOfflineFeedback(feedback);
+      }
+    }
+    
     const results = [];
-    const db = await openDatabase();
     
-    for (const feedback of offlineFeedbacks) {
+    for (let start = 0; start < offlineFeedbacks.length; start += batchSize) {
+      const batch = offlineFeedbacks.slice(start, start + batchSize);
       try {
-        // Envoyer le feedback au serveur
-        const response = await apiFunction(feedback);
-        
-        // Marquer comme synchronisé ou supprimer
-        const transaction = db.transaction(OFFLINE_FEEDBACK_STORE, 'readwrite');
-        const store = transaction.objectStore(OFFLINE_FEEDBACK_STORE);
+        // Un lot peut être renvoyé sans risque de doublon (local_id)
+        const response = await batchFunction(batch.map(toSyncPayload));
+        const batchResults = response.data.results;
         
-        await new Promise((resolve, reject) => {
-          const request = store.delete(feedback.id);
-          request.onsuccess = () => resolve();
-          request.onerror = (event) => reject(event.target.error);
-        });
-        
-        results.push({ success: true, feedback, response });
+        for (const [index, feedback] of batch.entries()) {
+          const result = batchResults[index];
+          if (SYNCED_STATUSES.includes(result.status)) {
+            await completeOfflineFeedback(feedback.id, result.feedback_id);
+            results.push({ success: true, feedback, response: { data: result } });
+          } else {
+            console.error(`Feedback #${feedback.id} refusé par le serveur:`, result.errors);
+            results.push({ success: false, feedback, error: result.errors });
+          }
+        }
       } catch (error) {
-        console.error(`Erreur lors de la synchronisation du feedback #${feedback.id}:`, error);
-        results.push({ success: false, feedback, error });
+        // Lot en échec (réseau) : ses feedbacks restent en attente
+        console.error('Erreur lors de la synchronisation d\'un lot de feedbacks:', error);
+        batch.forEach((feedback) => results.push({ success: false, feedback, error }));
       }
     }
     
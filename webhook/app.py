@@ -24,12 +24,18 @@ import json
 import logging
 import argparse
 import datetime
+import threading
+import time
 from flask import Flask, request, jsonify
 import requests
+from requests.adapters import HTTPAdapter
 
-# Configuration du logging
+from sms_payload import normalize_sms, backend_headers
+from sms_queue import SMSQueue, interpret_batch_response
+
+# Configuration du logging (LOG_LEVEL=DEBUG pour journaliser en-têtes et contenus)
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(),
@@ -52,9 +58,19 @@ config = {
     'feedback_url': os.environ.get('FEEDBACK_URL', DEFAULT_FEEDBACK_URL),
     'api_key': os.environ.get('API_KEY', DEFAULT_API_KEY),
     'verify_ssl': os.environ.get('VERIFY_SSL', 'true').lower() == 'true',
-    'public_url': os.environ.get('WEBHOOK_PUBLIC_URL', 'http://localhost:5000')
+    'public_url': os.environ.get('WEBHOOK_PUBLIC_URL', 'http://localhost:5000'),
+    # File d'attente durable : les SMS sont enregistrés avant l'accusé de réception
+    'store_and_forward': os.environ.get('STORE_AND_FORWARD', 'true').lower() == 'true',
+    'queue_path': os.environ.get('QUEUE_PATH', 'sms_queue.db'),
+    'batch_size': int(os.environ.get('FORWARD_BATCH_SIZE', '50')),
+    'poll_interval': float(os.environ.get('QUEUE_POLL_INTERVAL', '1')),
 }
 
+# Session HTTP partagée : les connexions vers le backend sont réutilisées
+http_session = requests.Session()
+http_session.mount('http://', HTTPAdapter(pool_maxsize=int(os.environ.get('FORWARD_CONCURRENCY', '10'))))
+http_session.mount('https://', HTTPAdapter(pool_maxsize=int(os.environ.get('FORWARD_CONCURRENCY', '10'))))
+
 # Afficher la configuration au démarrage
 print(f"\n\n==== CONFIGURATION DU WEBHOOK ====")
 print(f"FEEDBACK_URL (env): {os.environ.get('FEEDBACK_URL', 'Non défini')}")
@@ -71,18 +87,94 @@ api_key_status = 'Défini' if config['api_key'] else 'Non défini'
 logger.info(f"Configuration du webhook: URL={config['feedback_url']}, VERIFY_SSL={config['verify_ssl']}, API_KEY={api_key_status}")
 
 
+class ForwardWorker(threading.Thread):
+    """Transmet au backend, par lots, les SMS de la file d'attente durable"""
+    
+    def __init__(self, queue):
+        super().__init__(name='sms-forwarder', daemon=True)
+        self.queue = queue
+        self.state = {'forwarded': 0, 'dropped': 0, 'last_success_at': None, 'last_error': None}
+    
+    def run(self):
+        while True:
+            try:
+                batch = self.queue.claim_batch(config['batch_size'])
+                if batch:
+                    self.forward_batch(batch)
+                else:
+                    time.sleep(config['poll_interval'])
+            except Exception as e:
+                logger.exception("Erreur du worker de transmission")
+                time.sleep(config['poll_interval'])
+    
+    def forward_batch(self, batch):
+        """Transmet un lot en un appel ; les messages en échec sont reprogrammés avec un délai exponentiel"""
+        ids = [message_id for message_id, _, _ in batch]
+        try:
+            response = http_session.post(
+                config['feedback_url'],
+                json=[payload for _, payload, _ in batch],
+                headers=backend_headers(config['api_key']),
+                verify=config['verify_ssl'],
+                timeout=30
+            )
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            done, failures, dropped = interpret_batch_response(ids, response.status_code, data)
+        except requests.exceptions.RequestException as e:
+            done, failures, dropped = [], [(message_id, f"Erreur de connexion: {str(e)}") for message_id in ids], []
+        
+        self.queue.ack(done)
+        self.queue.retry(failures)
+        for message_id, error in dropped:
+            logger.error(f"SMS {message_id} rejeté par le backend: {error}")
+        self.state['forwarded'] += len(done) - len(dropped)
+        self.state['dropped'] += len(dropped)
+        if done:
+            self.state['last_success_at'] = datetime.datetime.now().isoformat()
+        if failures:
+            self.state['last_error'] = failures[-1][1]
+            logger.warning(f"{len(failures)} SMS reprogrammé(s): {failures[-1][1]}")
+
+
+# File d'attente et worker, créés à la première utilisation (après le fork des workers gunicorn)
+sms_queue = None
+forward_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_sms_queue():
+    """Retourne la file d'attente durable et démarre le worker de transmission si nécessaire"""
+    global sms_queue, forward_worker
+    if sms_queue is None or not forward_worker.is_alive():
+        with _worker_lock:
+            if sms_queue is None:
+                sms_queue = SMSQueue(config['queue_path'])
+            if forward_worker is None or not forward_worker.is_alive():
+                forward_worker = ForwardWorker(sms_queue)
+                forward_worker.start()
+    return sms_queue
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint de vérification de santé du service"""
-    return jsonify({
+    payload = {
         'status': 'ok',
         'timestamp': datetime.datetime.now().isoformat(),
         'config': {
             'feedback_url': config['feedback_url'],
             'has_api_key': config['api_key'] is not None,
-            'verify_ssl': config['verify_ssl']
+            'verify_ssl': config['verify_ssl'],
+            'store_and_forward': config['store_and_forward']
         }
-    })
+    }
+    if config['store_and_forward']:
+        payload['queue'] = get_sms_queue().stats()
+        payload['forwarder'] = forward_worker.state
+    return jsonify(payload)
 
 @app.route('/webhook', methods=['POST'])
 def receive_sms():
@@ -91,84 +183,44 @@ def receive_sms():
     """
     try:
         # Vérifier si le contenu est du JSON
-        logger.info(f"Headers reçus: {dict(request.headers)}")
+        logger.debug(f"Headers reçus: {dict(request.headers)}")
         if request.headers.get('Content-Type') != 'application/json':
             logger.error(f"Content-Type incorrect: {request.headers.get('Content-Type')}")
             return jsonify({"status": "error", "message": "Content-Type must be application/json"}), 400
         
         # Récupérer les données JSON
         data = request.get_json()
-        logger.info(f"Données reçues: {data}")
+        logger.debug(f"Données reçues: {data}")
         
-        # Adapter les données selon le format (Android app ou format standard)
-        feedback_data = {}
+        # Lot de SMS (ex. l'application Android qui vide sa file après une coupure)
+        if isinstance(data, list):
+            return receive_sms_batch(data)
         
-        # Format Android app
-        if 'sender' in data and 'body' in data:
-            feedback_data = {
-                'from': data.get('sender', ''),
-                'text': data.get('body', ''),
-                'sentStamp': data.get('timestamp', datetime.datetime.now().isoformat()),
-                'receivedStamp': datetime.datetime.now().isoformat(),
-                'sim': 'android'
-            }
-            logger.info(f"Format Android détecté, données adaptées: {feedback_data}")
-        # Format standard
-        elif 'from' in data and 'text' in data:
-            feedback_data = {
-                'from': data.get('from', ''),
-                'text': data.get('text', ''),
-                'sentStamp': data.get('sentStamp', datetime.datetime.now().isoformat()),
-                'receivedStamp': data.get('receivedStamp', datetime.datetime.now().isoformat()),
-                'sim': data.get('sim', 'default')
-            }
-        else:
+        # Adapter les données selon le format (Android app ou format standard)
+        feedback_data = normalize_sms(data)
+        if feedback_data is None:
             logger.error("Champs obligatoires manquants")
             return jsonify({"status": "error", "message": "Missing required fields: 'from'/'sender' and 'text'/'body' are required"}), 400
         
-        # Préparer les en-têtes
-        headers = {'Content-Type': 'application/json'}
-        if config['api_key']:
-            headers['X-API-Key'] = config['api_key']
+        # Mode store-and-forward : enregistrer le SMS avant l'accusé de réception
+        if config['store_and_forward']:
+            message_id = get_sms_queue().enqueue(feedback_data)
+            logger.debug(f"SMS {message_id} mis en file d'attente: {feedback_data}")
+            return jsonify({"status": "success", "message": "SMS enregistré", "queued": True}), 200
         
-        logger.info(f"Envoi des données à {config['feedback_url']} avec les headers: {headers}")
-        logger.info(f"Données envoyées: {feedback_data}")
+        logger.debug(f"Envoi des données à {config['feedback_url']}: {feedback_data}")
         
-        # Envoyer les données à la plateforme de feedback
+        # Envoyer les données à la plateforme de feedback (connexion réutilisée)
         try:
-            logger.info(f"Tentative de connexion à {config['feedback_url']}")
-            
-            # Tester d'abord si le backend est accessible
-            try:
-                test_url = config['feedback_url'].rsplit('/', 2)[0] + '/'
-                logger.info(f"Test d'accessibilité du backend: {test_url}")
-                test_response = requests.get(
-                    test_url,
-                    verify=config['verify_ssl'],
-                    timeout=5
-                )
-                logger.info(f"Test d'accessibilité du backend: {test_response.status_code}")
-                logger.info(f"Contenu de la réponse de test: {test_response.text[:200]}...")
-            except Exception as test_e:
-                logger.error(f"Erreur lors du test d'accessibilité du backend: {str(test_e)}")
-            
-            # Envoi de la requête réelle
-            response = requests.post(
+            response = http_session.post(
                 config['feedback_url'],
                 json=feedback_data,
-                headers=headers,
+                headers=backend_headers(config['api_key']),
                 verify=config['verify_ssl'],
                 timeout=10  # Ajouter un timeout pour éviter les blocages
             )
             
-            logger.info(f"Réponse reçue du backend: Status={response.status_code}, Content={response.text}")
-            
-            # Essayer de parser la réponse JSON si possible
-            try:
-                response_json = response.json()
-                logger.info(f"Réponse JSON: {response_json}")
-            except:
-                logger.warning("La réponse n'est pas au format JSON")
+            logger.debug(f"Réponse reçue du backend: Status={response.status_code}, Content={response.text}")
             
             # Vérifier la réponse
             if response.status_code == 200:
@@ -212,6 +264,33 @@ def receive_sms():
             'message': f'Internal server error: {str(e)}'
         }), 500
 
+def receive_sms_batch(items):
+    """Enregistre un lot de SMS dans la file d'attente, ou le transmet directement au backend"""
+    normalized = [normalize_sms(item) for item in items]
+    errors = [index for index, feedback_data in enumerate(normalized) if feedback_data is None]
+    valid = [feedback_data for feedback_data in normalized if feedback_data is not None]
+    
+    if config['store_and_forward']:
+        get_sms_queue().enqueue_many(valid)
+        return jsonify({"status": "success", "queued": len(valid), "errors": errors}), 200
+    
+    try:
+        response = http_session.post(
+            config['feedback_url'],
+            json=valid,
+            headers=backend_headers(config['api_key']),
+            verify=config['verify_ssl'],
+            timeout=30
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Erreur de connexion au backend: {str(e)}")
+        return jsonify({"status": "error", "message": "Impossible de se connecter au backend"}), 500
+    
+    if response.status_code != 200:
+        return jsonify({"status": "error", "message": f"Erreur du backend: {response.status_code}"}), 500
+    return jsonify({"status": "success", "backend_response": response.json(), "errors": errors}), 200
+
+
 @app.route('/test', methods=['GET'])
 def test_form():
     """Page de test pour envoyer des SMS manuellement"""
@@ -333,6 +412,10 @@ def parse_args():
                         help='Clé API pour l\'authentification (optionnel)')
     parser.add_argument('--no-verify-ssl', action='store_true',
                         help='Désactiver la vérification SSL pour les requêtes vers la plateforme de feedback')
+    parser.add_argument('--queue-path', type=str, default=config['queue_path'],
+                        help='Fichier SQLite de la file d\'attente durable (défaut: sms_queue.db)')
+    parser.add_argument('--no-store-and-forward', action='store_true',
+                        help='Transmettre directement chaque SMS au backend, sans file d\'attente durable')
     return parser.parse_args()
 
 if __name__ == '__main__':
@@ -344,6 +427,9 @@ if __name__ == '__main__':
     config['api_key'] = args.api_key
     if args.no_verify_ssl:
         config['verify_ssl'] = False
+    config['queue_path'] = args.queue_path
+    if args.no_store_and_forward:
+        config['store_and_forward'] = False
     
     # Afficher la configuration
     logger.info(f"Démarrage du webhook sur {args.host}:{args.port}")
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+"""
+Webhook JSON SMS asynchrone pour la plateforme de feedback
+
+Variante aiohttp de app.py pour les gros volumes : un seul client HTTP avec
+pool de connexions vers le backend, un nombre de transmissions simultanées
+borné, et une vérification périodique de l'accessibilité du backend en
+tâche de fond au lieu d'une sonde avant chaque SMS. Comme app.py, les SMS
+sont enregistrés dans la file d'attente durable (sms_queue.py) avant
+l'accusé de réception, puis transmis par lots en tâche de fond.
+
+Usage:
+    python async_app.py [--port PORT] [--host HOST] [--feedback-url URL] [--concurrency N]
+"""
+from dotenv import load_dotenv
+load_dotenv()  # prend les variables d'environnement du fichier .env
+import os
+import json
+import asyncio
+import logging
+import argparse
+import datetime
+
+from aiohttp import web, ClientSession, ClientTimeout, TCPConnector, ClientError
+
+from sms_payload import normalize_sms, backend_headers, health_check_url
+from sms_queue import SMSQueue, interpret_batch_response
+
+# Configuration du logging (LOG_LEVEL=DEBUG pour journaliser les contenus)
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('sms_webhook')
+
+# Configuration par défaut
+DEFAULT_PORT = 5000
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_FEEDBACK_URL = 'http://backend:8000/api/inbound/webhook/json-sms/'
+DEFAULT_CONCURRENCY = 50
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+
+config = {
+    'feedback_url': os.environ.get('FEEDBACK_URL', DEFAULT_FEEDBACK_URL),
+    'api_key': os.environ.get('API_KEY'),
+    'verify_ssl': os.environ.get('VERIFY_SSL', 'true').lower() == 'true',
+    'concurrency': int(os.environ.get('FORWARD_CONCURRENCY', DEFAULT_CONCURRENCY)),
+    'health_check_interval': float(os.environ.get('HEALTH_CHECK_INTERVAL', DEFAULT_HEALTH_CHECK_INTERVAL)),
+    'forward_timeout': float(os.environ.get('FORWARD_TIMEOUT', 10)),
+    # File d'attente durable : les SMS sont enregistrés avant l'accusé de réception
+    'store_and_forward': os.environ.get('STORE_AND_FORWARD', 'true').lower() == 'true',
+    'queue_path': os.environ.get('QUEUE_PATH', 'sms_queue.db'),
+    'batch_size': int(os.environ.get('FORWARD_BATCH_SIZE', '50')),
+    'poll_interval': float(os.environ.get('QUEUE_POLL_INTERVAL', '1')),
+}
+
+
+async def check_backend(app):
+    """Vérifie l'accessibilité du backend et mémorise le résultat"""
+    state = app['backend_state']
+    try:
+        async with app['http'].get(health_check_url(config['feedback_url']), timeout=ClientTimeout(total=5)) as response:
+            state['reachable'] = response.status < 500
+            state['status_code'] = response.status
+    except (ClientError, asyncio.TimeoutError) as e:
+        if state['reachable'] is not False:
+            logger.error(f"Backend inaccessible: {str(e)}")
+        state['reachable'] = False
+        state['status_code'] = None
+    state['checked_at'] = datetime.datetime.now().isoformat()
+
+
+async def health_check_loop(app):
+    """Vérification périodique de l'accessibilité du backend"""
+    while True:
+        await check_backend(app)
+        await asyncio.sleep(config['health_check_interval'])
+
+
+async def forward_sms(app, feedback_data):
+    """
+    Transmet un SMS au backend en respectant la limite de transmissions simultanées
+
+    Returns:
+        tuple: (code HTTP du backend, corps de la réponse)
+    """
+    async with app['semaphore']:
+        async with app['http'].post(
+            config['feedback_url'],
+            json=feedback_data,
+            headers=backend_headers(config['api_key']),
+        ) as response:
+            return response.status, await response.text()
+
+
+async def forward_batch(app, batch):
+    """
+    Transmet un lot de la file en un seul appel au backend
+
+    Returns:
+        tuple: (ids à supprimer, échecs à reprogrammer, messages rejetés)
+    """
+    ids = [message_id for message_id, _, _ in batch]
+    try:
+        async with app['http'].post(
+            config['feedback_url'],
+            json=[payload for _, payload, _ in batch],
+            headers=backend_headers(config['api_key']),
+        ) as response:
+            try:
+                data = await response.json(content_type=None)
+            except ValueError:
+                data = None
+            return interpret_batch_response(ids, response.status, data)
+    except (ClientError, asyncio.TimeoutError) as e:
+        error = f"Erreur de connexion: {str(e) or type(e).__name__}"
+        return [], [(message_id, error) for message_id in ids], []
+
+
+async def forward_loop(app):
+    """Transmet au backend, par lots, les SMS de la file d'attente durable"""
+    queue = app['queue']
+    state = app['forwarder_state']
+    while True:
+        try:
+            batch = await asyncio.to_thread(queue.claim_batch, config['batch_size'])
+            if not batch:
+                await asyncio.sleep(config['poll_interval'])
+                continue
+            
+            done, failures, dropped = await forward_batch(app, batch)
+            await asyncio.to_thread(queue.ack, done)
+            await asyncio.to_thread(queue.retry, failures)
+            
+            for message_id, error in dropped:
+                logger.error(f"SMS {message_id} rejeté par le backend: {error}")
+            state['forwarded'] += len(done) - len(dropped)
+            state['dropped'] += len(dropped)
+            if done:
+                state['last_success_at'] = datetime.datetime.now().isoformat()
+            if failures:
+                state['last_error'] = failures[-1][1]
+                logger.warning(f"{len(failures)} SMS reprogrammé(s): {failures[-1][1]}")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Erreur du worker de transmission")
+            await asyncio.sleep(config['poll_interval'])
+
+
+async def receive_sms(request):
+    """Endpoint principal pour recevoir les SMS au format JSON"""
+    if request.content_type != 'application/json':
+        logger.error(f"Content-Type incorrect: {request.content_type}")
+        return web.json_response({"status": "error", "message": "Content-Type must be application/json"}, status=400)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.json_response({"status": "error", "message": "Invalid JSON"}, status=400)
+    logger.debug(f"Données reçues: {data}")
+
+    # Lot de SMS (ex. l'application Android qui vide sa file après une coupure)
+    if isinstance(data, list):
+        return await receive_sms_batch(request.app, data)
+
+    feedback_data = normalize_sms(data)
+    if feedback_data is None:
+        logger.error("Champs obligatoires manquants")
+        return web.json_response({"status": "error", "message": "Missing required fields: 'from'/'sender' and 'text'/'body' are required"}, status=400)
+
+    # Mode store-and-forward : enregistrer le SMS avant l'accusé de réception
+    if config['store_and_forward']:
+        message_id = await asyncio.to_thread(request.app['queue'].enqueue, feedback_data)
+        logger.debug(f"SMS {message_id} mis en file d'attente")
+        return web.json_response({"status": "success", "message": "SMS enregistré", "queued": True})
+
+    try:
+        status_code, body = await forward_sms(request.app, feedback_data)
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout lors de la connexion au backend: {config['feedback_url']}")
+        return web.json_response({"status": "error", "message": "Timeout lors de la connexion au backend"}, status=500)
+    except ClientError as e:
+        logger.error(f"Erreur de connexion au backend: {str(e)}")
+        return web.json_response({
+            "status": "error",
+            "message": "Impossible de se connecter au backend",
+            "error_details": str(e)
+        }, status=500)
+
+    if status_code == 200:
+        logger.debug("SMS transmis avec succès au backend")
+        return web.json_response({"status": "success", "message": "SMS transmis avec succès"})
+
+    logger.error(f"Erreur du backend: {status_code} - {body}")
+    return web.json_response({
+        "status": "error",
+        "message": f"Erreur du backend: {status_code}",
+        "backend_response": body
+    }, status=500)
+
+
+async def receive_sms_batch(app, items):
+    """Enregistre un lot de SMS dans la file d'attente, ou le transmet directement au backend"""
+    normalized = [normalize_sms(item) for item in items]
+    errors = [index for index, feedback_data in enumerate(normalized) if feedback_data is None]
+    valid = [feedback_data for feedback_data in normalized if feedback_data is not None]
+
+    if config['store_and_forward']:
+        await asyncio.to_thread(app['queue'].enqueue_many, valid)
+        return web.json_response({"status": "success", "queued": len(valid), "errors": errors})
+
+    try:
+        status_code, body = await forward_sms(app, valid)
+    except (ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Erreur de connexion au backend: {str(e)}")
+        return web.json_response({"status": "error", "message": "Impossible de se connecter au backend"}, status=500)
+
+    if status_code != 200:
+        return web.json_response({"status": "error", "message": f"Erreur du backend: {status_code}"}, status=500)
+    return web.json_response({"status": "success", "backend_response": json.loads(body), "errors": errors})
+
+
+async def health(request):
+    """Endpoint de vérification de santé du service"""
+    payload = {
+        'status': 'ok',
+        'timestamp': datetime.datetime.now().isoformat(),
+        'backend': request.app['backend_state'],
+        'config': {
+            'feedback_url': config['feedback_url'],
+            'has_api_key': config['api_key'] is not None,
+            'verify_ssl': config['verify_ssl'],
+            'concurrency': config['concurrency'],
+            'store_and_forward': config['store_and_forward'],
+        }
+    }
+    if config['store_and_forward']:
+        payload['queue'] = await asyncio.to_thread(request.app['queue'].stats)
+        payload['forwarder'] = request.app['forwarder_state']
+    return web.json_response(payload)
+
+
+async def on_startup(app):
+    app['http'] = ClientSession(
+        connector=TCPConnector(limit=config['concurrency'], ssl=None if config['verify_ssl'] else False),
+        timeout=ClientTimeout(total=config['forward_timeout'])
+    )
+    app['semaphore'] = asyncio.Semaphore(config['concurrency'])
+    app['health_task'] = asyncio.create_task(health_check_loop(app))
+    if config['store_and_forward']:
+        app['queue'] = SMSQueue(config['queue_path'])
+        app['forward_task'] = asyncio.create_task(forward_loop(app))
+
+
+async def on_cleanup(app):
+    app['health_task'].cancel()
+    if config['store_and_forward']:
+        app['forward_task'].cancel()
+        app['queue'].close()
+    await app['http'].close()
+
+
+def create_app():
+    """Construit l'application aiohttp"""
+    app = web.Application()
+    app['backend_state'] = {'reachable': None, 'status_code': None, 'checked_at': None}
+    app['forwarder_state'] = {'forwarded': 0, 'dropped': 0, 'last_success_at': None, 'last_error': None}
+    app.router.add_post('/webhook', receive_sms)
+    app.router.add_get('/health', health)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def parse_args():
+    """Parse les arguments de ligne de commande"""
+    parser = argparse.ArgumentParser(description='Webhook JSON SMS asynchrone pour la plateforme de feedback')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port d\'écoute (défaut: {DEFAULT_PORT})')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                        help=f'Hôte d\'écoute (défaut: {DEFAULT_HOST})')
+    parser.add_argument('--feedback-url', type=str, default=config['feedback_url'],
+                        help=f'URL de l\'API de la plateforme de feedback (défaut: {DEFAULT_FEEDBACK_URL})')
+    parser.add_argument('--api-key', type=str, default=config['api_key'],
+                        help='Clé API pour l\'authentification (optionnel)')
+    parser.add_argument('--no-verify-ssl', action='store_true',
+                        help='Désactiver la vérification SSL pour les requêtes vers la plateforme de feedback')
+    parser.add_argument('--queue-path', type=str, default=config['queue_path'],
+                        help='Fichier SQLite de la file d\'attente durable (défaut: sms_queue.db)')
+    parser.add_argument('--no-store-and-forward', action='store_true',
+                        help='Transmettre directement chaque SMS au backend, sans file d\'attente durable')
+    parser.add_argument('--concurrency', type=int, default=config['concurrency'],
+                        help=f'Nombre maximal de transmissions simultanées vers le backend (défaut: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--health-check-interval', type=float, default=config['health_check_interval'],
+                        help=f'Intervalle en secondes entre deux vérifications du backend (défaut: {DEFAULT_HEALTH_CHECK_INTERVAL})')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    config['feedback_url'] = args.feedback_url
+    config['api_key'] = args.api_key
+    config['concurrency'] = args.concurrency
+    config['health_check_interval'] = args.health_check_interval
+    if args.no_verify_ssl:
+        config['verify_ssl'] = False
+    config['queue_path'] = args.queue_path
+    if args.no_store_and_forward:
+        config['store_and_forward'] = False
+
+    logger.info(f"Démarrage du webhook asynchrone sur {args.host}:{args.port}")
+    logger.info(f"URL de la plateforme de feedback: {config['feedback_url']}, concurrence: {config['concurrency']}")
+
+    web.run_app(create_app(), host=args.host, port=args.port, access_log=None)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Test de charge du webhook JSON SMS
+
+Démarre un backend factice (qui imite JSONSMSWebhookView avec une latence
+configurable), puis envoie des SMS au webhook avec un nombre de requêtes
+simultanées donné et affiche le débit et les latences.
+
+Usage:
+    # Backend factice seul (pour un webhook déjà démarré)
+    python load_test.py stub --port 8001 --latency 0.05
+
+    # Webhook asynchrone + backend factice dans le même processus
+    python load_test.py run --requests 5000 --concurrency 200
+
+    # Idem avec la file d'attente durable (mesure aussi le temps de vidage)
+    python load_test.py run --requests 5000 --store-and-forward
+
+    # Webhook déjà démarré (Flask ou asynchrone), pointé vers le backend factice
+    python load_test.py run --webhook-url http://localhost:5000/webhook --no-stub
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from aiohttp import web, ClientSession, TCPConnector
+
+
+async def stub_backend(request):
+    """Backend factice : accepte le SMS (ou le lot de SMS) après la latence configurée"""
+    data = await request.json()
+    await asyncio.sleep(request.app['latency'])
+    stats = request.app['stats']
+    if isinstance(data, list):
+        results = []
+        for index in range(len(data)):
+            stats['received'] += 1
+            results.append({'index': index, 'status': 'created', 'feedback_id': str(stats['received'])})
+        return web.json_response({'status': 'success', 'results': results})
+    stats['received'] += 1
+    return web.json_response({'status': 'success', 'feedback_id': str(stats['received'])})
+
+
+async def start_stub(host, port, latency):
+    app = web.Application()
+    app['latency'] = latency
+    app['stats'] = {'received': 0}
+    app.router.add_post('/api/inbound/webhook/json-sms/', stub_backend)
+    app.router.add_get('/api/inbound/', lambda request: web.json_response({}))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, app
+
+
+async def start_forwarder(port, feedback_url, concurrency, queue_path=None):
+    """Démarre le webhook asynchrone dans le processus courant"""
+    import async_app
+    async_app.config['feedback_url'] = feedback_url
+    async_app.config['concurrency'] = concurrency
+    async_app.config['store_and_forward'] = queue_path is not None
+    async_app.config['queue_path'] = queue_path
+    async_app.config['poll_interval'] = 0.05
+    runner = web.AppRunner(async_app.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+async def drive(webhook_url, total, concurrency):
+    """Envoie `total` SMS au webhook avec `concurrency` requêtes simultanées"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker(session):
+        nonlocal errors
+        for i in counter:
+            payload = {
+                'from': f'+2237{i % 10000000:07d}',
+                'text': f'Message de test de charge {i}',
+                'sentStamp': str(1717267500000 + i),
+                'sim': 'SIM1',
+            }
+            start = time.perf_counter()
+            try:
+                async with session.post(webhook_url, json=payload) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"Requêtes: {total}, erreurs: {errors}, durée: {elapsed:.2f} s")
+    print(f"Débit: {total / elapsed:.0f} req/s")
+    print(f"Latence p50: {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
+
+
+async def run(args):
+    runners = []
+    stub_app = None
+    if not args.no_stub:
+        runner, stub_app = await start_stub('127.0.0.1', args.stub_port, args.latency)
+        runners.append(runner)
+
+    queue_dir = tempfile.TemporaryDirectory() if args.store_and_forward else None
+    webhook_url = args.webhook_url
+    if webhook_url is None:
+        feedback_url = f'http://127.0.0.1:{args.stub_port}/api/inbound/webhook/json-sms/'
+        queue_path = os.path.join(queue_dir.name, 'sms_queue.db') if queue_dir else None
+        runners.append(await start_forwarder(args.webhook_port, feedback_url, args.forward_concurrency, queue_path))
+        webhook_url = f'http://127.0.0.1:{args.webhook_port}/webhook'
+
+    try:
+        start = time.perf_counter()
+        await drive(webhook_url, args.requests, args.concurrency)
+        if stub_app is not None:
+            # En mode store-and-forward, attendre que la file soit vidée
+            deadline = time.monotonic() + args.drain_timeout
+            while stub_app['stats']['received'] < args.requests and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            print(f"SMS reçus par le backend factice: {stub_app['stats']['received']} "
+                  f"en {time.perf_counter() - start:.2f} s")
+    finally:
+        for runner in reversed(runners):
+            await runner.cleanup()
+        if queue_dir:
+            queue_dir.cleanup()
+
+
+async def serve_stub(args):
+    runner, _ = await start_stub(args.host, args.port, args.latency)
+    print(f"Backend factice sur http://{args.host}:{args.port}/api/inbound/webhook/json-sms/")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Test de charge du webhook JSON SMS')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stub = subparsers.add_parser('stub', help='Démarrer uniquement le backend factice')
+    stub.add_argument('--host', default='127.0.0.1')
+    stub.add_argument('--port', type=int, default=8001)
+    stub.add_argument('--latency', type=float, default=0.05, help='Latence simulée du backend (s)')
+
+    run_parser = subparsers.add_parser('run', help='Lancer le test de charge')
+    run_parser.add_argument('--requests', type=int, default=2000)
+    run_parser.add_argument('--concurrency', type=int, default=100, help='Requêtes simultanées envoyées au webhook')
+    run_parser.add_argument('--webhook-url', default=None,
+                            help='Webhook à tester (par défaut : webhook asynchrone démarré dans ce processus)')
+    run_parser.add_argument('--webhook-port', type=int, default=5001)
+    run_parser.add_argument('--forward-concurrency', type=int, default=50,
+                            help='Concurrence du webhook asynchrone démarré dans ce processus')
+    run_parser.add_argument('--stub-port', type=int, default=8001)
+    run_parser.add_argument('--latency', type=float, default=0.05, help='Latence simulée du backend (s)')
+    run_parser.add_argument('--no-stub', action='store_true', help='Ne pas démarrer le backend factice')
+    run_parser.add_argument('--store-and-forward', action='store_true',
+                            help='Activer la file d\'attente durable du webhook démarré dans ce processus')
+    run_parser.add_argument('--drain-timeout', type=float, default=60,
+                            help='Attente maximale (s) de la réception de tous les SMS par le backend factice')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    asyncio.run(serve_stub(args) if args.command == 'stub' else run(args))
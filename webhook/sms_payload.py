@@ -0,0 +1,54 @@
+"""
+Normalisation des SMS reçus par le webhook, commune au serveur Flask
+(app.py) et au serveur asynchrone (async_app.py)
+"""
+import datetime
+
+
+def normalize_sms(data):
+    """
+    Adapte les données reçues (format Android ou format standard) au format
+    attendu par JSONSMSWebhookView.
+
+    Returns:
+        dict ou None si les champs obligatoires manquent
+    """
+    if not isinstance(data, dict):
+        return None
+
+    now = datetime.datetime.now().isoformat()
+
+    # Format Android app
+    if 'sender' in data and 'body' in data:
+        return {
+            'from': data.get('sender', ''),
+            'text': data.get('body', ''),
+            'sentStamp': data.get('timestamp', now),
+            'receivedStamp': now,
+            'sim': 'android'
+        }
+
+    # Format standard
+    if 'from' in data and 'text' in data:
+        return {
+            'from': data.get('from', ''),
+            'text': data.get('text', ''),
+            'sentStamp': data.get('sentStamp', now),
+            'receivedStamp': data.get('receivedStamp', now),
+            'sim': data.get('sim', 'default')
+        }
+
+    return None
+
+
+def backend_headers(api_key):
+    """En-têtes des requêtes vers la plateforme de feedback"""
+    headers = {'Content-Type': 'application/json'}
+    if api_key:
+        headers['X-API-Key'] = api_key
+    return headers
+
+
+def health_check_url(feedback_url):
+    """URL sondée pour vérifier l'accessibilité du backend"""
+    return feedback_url.rsplit('/', 2)[0] + '/'
@@ -0,0 +1,197 @@
+"""
+File d'attente durable des SMS reçus par le webhook (store-and-forward)
+
+Chaque SMS accepté est enregistré dans une base SQLite en mode WAL avant
+l'accusé de réception. Un worker le transmet ensuite au backend par lots
+(un appel à JSONSMSWebhookView par lot) et ne le supprime qu'après
+confirmation ; en cas d'échec, le message est reprogrammé avec un délai
+exponentiel. Le backend déduplique les SMS
+(expéditeur, horodatage d'envoi, texte), une retransmission après une
+coupure ne crée donc pas de doublon.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+# Délais de reprise (s) : BACKOFF_BASE * 2^tentatives, plafonné à BACKOFF_MAX
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+
+# Durée de réservation d'un lot par un worker : passé ce délai (worker
+# arrêté en cours de transmission), le lot redevient disponible
+LEASE_SECONDS = 60.0
+
+
+def backoff_delay(attempts, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """Délai avant la prochaine tentative après `attempts` échecs"""
+    return min(base * (2 ** max(attempts - 1, 0)), maximum)
+
+
+class SMSQueue:
+    """File d'attente SMS persistante partagée entre threads et processus"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Chaque SMS est sur disque avant l'accusé de réception
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS messages ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' payload TEXT NOT NULL,'
+            ' enqueued_at REAL NOT NULL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' next_attempt_at REAL NOT NULL,'
+            ' last_error TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS messages_next_attempt ON messages (next_attempt_at)')
+
+    def enqueue(self, payload):
+        """Enregistre un SMS ; retourne son identifiant dans la file"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO messages (payload, enqueued_at, next_attempt_at) VALUES (?, ?, ?)',
+                (json.dumps(payload), now, now)
+            )
+        return cursor.lastrowid
+
+    def enqueue_many(self, payloads):
+        """Enregistre un lot de SMS en une seule transaction"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(
+                    'INSERT INTO messages (payload, enqueued_at, next_attempt_at) VALUES (?, ?, ?)',
+                    [(json.dumps(payload), now, now) for payload in payloads]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def claim_batch(self, limit, lease=LEASE_SECONDS):
+        """
+        Réserve jusqu'à `limit` messages prêts à être transmis, par ordre d'arrivée
+
+        Returns:
+            list: couples (id, payload, attempts)
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT id, payload, attempts FROM messages WHERE next_attempt_at <= ? ORDER BY id LIMIT ?',
+                    (now, limit)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        'UPDATE messages SET next_attempt_at = ? WHERE id = ?',
+                        [(now + lease, row[0]) for row in rows]
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [(message_id, json.loads(payload), attempts) for message_id, payload, attempts in rows]
+
+    def ack(self, ids):
+        """Supprime les messages confirmés par le backend"""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany('DELETE FROM messages WHERE id = ?', [(message_id,) for message_id in ids])
+
+    def retry(self, failures):
+        """
+        Reprogramme des messages en échec avec un délai exponentiel
+
+        Args:
+            failures (list): couples (id, message d'erreur)
+        """
+        if not failures:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for message_id, error in failures:
+                    row = self._conn.execute('SELECT attempts FROM messages WHERE id = ?', (message_id,)).fetchone()
+                    if row is None:
+                        continue
+                    attempts = row[0] + 1
+                    self._conn.execute(
+                        'UPDATE messages SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?',
+                        (attempts, now + backoff_delay(attempts), error, message_id)
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def stats(self):
+        """Profondeur de la file et âge (s) du plus ancien message"""
+        with self._lock:
+            depth, oldest = self._conn.execute('SELECT COUNT(*), MIN(enqueued_at) FROM messages').fetchone()
+        return {
+            'depth': depth,
+            'oldest_age_seconds': round(time.time() - oldest, 3) if oldest is not None else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def classify_backend_response(status_code):
+    """
+    Décide du sort d'un message d'après la réponse du backend
+
+    Returns:
+        str: 'ack' (transmis), 'drop' (rejeté définitivement) ou 'retry'
+    """
+    if status_code == 200:
+        return 'ack'
+    # Lot rejeté comme invalide : le retransmettre ne changera rien
+    if status_code in (400, 422):
+        return 'drop'
+    # Tout le reste se retente : 401/403 (jeton renouvelé, configuration),
+    # 404 (URL erronée, déploiement en cours), 413 (lot plus grand que
+    # JSON_SMS_MAX_BATCH_SIZE), 429, 5xx... aucun SMS n'est perdu
+    return 'retry'
+
+
+def interpret_batch_response(ids, status_code, data):
+    """
+    Répartit un lot transmis en un seul appel à JSONSMSWebhookView d'après
+    les résultats par message renvoyés par le backend
+
+    Args:
+        ids (list): identifiants dans la file, dans l'ordre du lot envoyé
+        status_code (int): code HTTP de la réponse
+        data (dict): corps JSON de la réponse (None s'il n'est pas décodable)
+
+    Returns:
+        tuple: (ids à supprimer de la file, échecs à reprogrammer [(id, erreur)],
+        messages rejetés définitivement [(id, erreur)])
+    """
+    decision = classify_backend_response(status_code)
+    if decision == 'retry':
+        return [], [(message_id, f"HTTP {status_code}") for message_id in ids], []
+    if decision == 'drop':
+        return list(ids), [], [(message_id, f"HTTP {status_code}") for message_id in ids]
+
+    results = (data or {}).get('results')
+    if not isinstance(results, list) or len(results) != len(ids):
+        return [], [(message_id, "Réponse inattendue du backend") for message_id in ids], []
+
+    dropped = [
+        (message_id, result.get('message', 'error'))
+        for message_id, result in zip(ids, results) if result.get('status') == 'error'
+    ]
+    return list(ids), [], dropped
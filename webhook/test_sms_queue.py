@@ -0,0 +1,81 @@
+"""
+Tests unitaires de la file d'attente durable des SMS
+
+    python -m unittest test_sms_queue
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from sms_queue import SMSQueue, backoff_delay, classify_backend_response, interpret_batch_response
+
+
+class SMSQueueTestCase(unittest.TestCase):
+    """Tests pour la persistance, la réservation et la reprise des messages"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'queue.db')
+        self.queue = SMSQueue(self.path)
+        self.addCleanup(self.queue.close)
+
+    def test_messages_survive_restart_and_are_acked(self):
+        self.queue.enqueue({'from': '+22370000000', 'text': 'Bonjour'})
+        self.queue.enqueue_many([{'from': '+22370000001', 'text': f'Message {i}'} for i in range(2)])
+        self.queue.close()
+
+        # Redémarrage du webhook : la file est relue depuis le disque
+        self.queue = SMSQueue(self.path)
+        batch = self.queue.claim_batch(10)
+        self.assertEqual([payload['text'] for _, payload, _ in batch], ['Bonjour', 'Message 0', 'Message 1'])
+        # Lot réservé : un autre worker ne le reprend pas
+        self.assertEqual(self.queue.claim_batch(10), [])
+
+        self.queue.ack([message_id for message_id, _, _ in batch])
+        self.assertEqual(self.queue.stats(), {'depth': 0, 'oldest_age_seconds': None})
+
+    def test_retry_reschedules_with_backoff(self):
+        message_id = self.queue.enqueue({'from': '+22370000000', 'text': 'Bonjour'})
+        self.queue.claim_batch(10, lease=0)
+        self.queue.retry([(message_id, 'HTTP 503')])
+        self.assertEqual(self.queue.claim_batch(10), [])
+        self.assertEqual(self.queue.stats()['depth'], 1)
+
+        # Échéance passée : le message revient avec son nombre de tentatives
+        self.queue._conn.execute('UPDATE messages SET next_attempt_at = ?', (time.time() - 1,))
+        self.assertEqual(self.queue.claim_batch(10)[0][2], 1)
+        self.assertEqual([backoff_delay(n) for n in (1, 2, 3)], [2.0, 4.0, 8.0])
+        self.assertEqual(backoff_delay(100), 300.0)
+
+
+class BackendResponseTestCase(unittest.TestCase):
+    """Tests pour le sort des messages selon la réponse du backend"""
+
+    def test_only_invalid_batches_are_dropped(self):
+        self.assertEqual(classify_backend_response(200), 'ack')
+        for status_code in (400, 422):
+            self.assertEqual(classify_backend_response(status_code), 'drop')
+        # Jeton renouvelé, URL erronée, déploiement en cours... : retenter
+        for status_code in (401, 403, 404, 408, 409, 413, 429, 500, 502, 503):
+            self.assertEqual(classify_backend_response(status_code), 'retry')
+
+    def test_batch_results_per_message(self):
+        results = {'results': [{'status': 'created'}, {'status': 'error', 'message': 'Texte vide'},
+                               {'status': 'duplicate'}]}
+        done, failures, dropped = interpret_batch_response([1, 2, 3], 200, results)
+        self.assertEqual((done, failures, dropped), ([1, 2, 3], [], [(2, 'Texte vide')]))
+
+        done, failures, dropped = interpret_batch_response([1, 2], 403, None)
+        self.assertEqual((done, dropped), ([], []))
+        self.assertEqual(failures, [(1, 'HTTP 403'), (2, 'HTTP 403')])
+
+        # Réponse tronquée : tout retenter plutôt que perdre des messages
+        done, failures, _ = interpret_batch_response([1, 2], 200, {'results': [{'status': 'created'}]})
+        self.assertEqual((done, len(failures)), ([], 2))
+
+
+if __name__ == '__main__':
+    unittest.main()